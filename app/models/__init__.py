@@ -12,6 +12,7 @@ from app.models.venta import (
     Caja, AperturaCaja, Venta, VentaDetalle, FormaPago, Pago,
     NotaCredito
 )
+from app.models.venta_diaria import VentaDiaria
 from app.models.nota_debito import NotaDebito
 from app.models.nota_credito_detalle import NotaCreditoDetalle
 from app.models.nota_debito_detalle import NotaDebitoDetalle
@@ -21,7 +22,9 @@ from app.models.compra import (
     PresupuestoProveedorDetalle, OrdenCompra, OrdenCompraDetalle,
     Compra, CompraDetalle, CuentaPorPagar, PagoProveedor, PagoCompra, MovimientoCaja
 )
-from app.models.configuracion import ConfiguracionEmpresa
+from app.models.configuracion import ConfiguracionEmpresa, SecuenciaFactura, SecuenciaDocumento
+from app.models.trabajo_reporte import TrabajoReporte
+from app.models.inventario_fisico import ConteoInventario, ConteoInventarioLinea
 
 from app.models.nota_credito_compra import NotaCreditoCompra, NotaCreditoCompraDetalle
 from app.models.nota_debito_compra import NotaDebitoCompra, NotaDebitoCompraDetalle
@@ -32,12 +35,13 @@ __all__ = [
     'Producto', 'Categoria', 'MovimientoProducto', 'HistorialPrecio',
     'TipoServicio', 'SolicitudServicio', 'Presupuesto', 'PresupuestoDetalle',
     'OrdenServicio', 'OrdenServicioDetalle', 'Reclamo', 'ReclamoSeguimiento', 'ReclamoHistorial',
-    'Caja', 'AperturaCaja', 'Venta', 'VentaDetalle', 'FormaPago', 'Pago',
+    'Caja', 'AperturaCaja', 'Venta', 'VentaDetalle', 'FormaPago', 'Pago', 'VentaDiaria',
     'NotaCredito', 'NotaDebito', 'NotaCreditoDetalle', 'NotaDebitoDetalle', 'PagoNotaDebito',
     'Proveedor', 'PedidoCompra', 'PedidoCompraDetalle', 'PresupuestoProveedor',
     'PresupuestoProveedorDetalle', 'OrdenCompra', 'OrdenCompraDetalle',
     'Compra', 'CompraDetalle', 'CuentaPorPagar', 'PagoProveedor', 'PagoCompra', 'MovimientoCaja',
     'NotaCreditoCompra', 'NotaCreditoCompraDetalle', 'NotaDebitoCompra', 'NotaDebitoCompraDetalle',
-    'ConfiguracionEmpresa',
+    'ConfiguracionEmpresa', 'SecuenciaFactura', 'SecuenciaDocumento', 'TrabajoReporte',
+    'ConteoInventario', 'ConteoInventarioLinea',
     'Bitacora'
 ]
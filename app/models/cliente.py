@@ -16,6 +16,7 @@ class Cliente(db.Model):
     descuento_especial = db.Column(db.Numeric(5, 2), default=0)
     activo = db.Column(db.Boolean, default=True)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     observaciones = db.Column(db.Text)
     
     # Relaciones
@@ -28,10 +29,10 @@ class Cliente(db.Model):
     
     @property
     def saldo_pendiente(self):
-        """Calcula el saldo pendiente del cliente"""
+        """Calcula el saldo pendiente del cliente (suma del saldo de sus ventas no anuladas)"""
         from app.models.venta import Venta
-        ventas_pendientes = Venta.query.filter_by(
-            cliente_id=self.id,
-            estado_pago='pendiente'
-        ).all()
-        return sum(v.saldo_pendiente for v in ventas_pendientes)
+        return db.session.query(db.func.coalesce(db.func.sum(Venta.saldo), 0)).filter(
+            Venta.cliente_id == self.id,
+            Venta.saldo > 0,
+            Venta.estado != 'anulada'
+        ).scalar()
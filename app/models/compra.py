@@ -16,6 +16,7 @@ class Proveedor(db.Model):
     tipo_proveedor = db.Column(db.String(50))  # nacional, internacional
     activo = db.Column(db.Boolean, default=True)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     observaciones = db.Column(db.Text)
     
     # Relaciones
@@ -173,6 +174,7 @@ class Compra(db.Model):
     
     # AUDITORÍA
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     observaciones = db.Column(db.Text)
     
     # Campos legacy para compatibilidad
@@ -189,11 +191,16 @@ class Compra(db.Model):
     usuario_registra = db.relationship('Usuario', foreign_keys=[usuario_registra_id], backref='compras_registradas')
     usuario_recibe = db.relationship('Usuario', foreign_keys=[usuario_recibe_id], backref='compras_recibidas')
     
+    # Total pagado calculado en la consulta (perfil 'compras_con_pagado'); None si no se cargó así
+    pagado_consulta = db.query_expression()
+    
     def __repr__(self):
         return f'<Compra {self.numero_compra}>'
     
     def monto_pagado(self):
         """Calcula total pagado"""
+        if self.pagado_consulta is not None:
+            return float(self.pagado_consulta)
         return sum(float(p.monto) for p in self.pagos)
     
     def monto_pendiente(self):
@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.exc import IntegrityError
 from app import db
 
 class ConfiguracionEmpresa(db.Model):
@@ -49,16 +50,152 @@ class ConfiguracionEmpresa(db.Model):
             db.session.commit()
         return config
     
-    def generar_numero_factura(self):
-        """Generar el siguiente número de factura automáticamente"""
-        # Verificar que no se exceda el rango autorizado
-        if self.numero_factura_actual > self.numero_factura_hasta:
-            raise ValueError(f'Se ha alcanzado el límite de facturas autorizadas ({self.numero_factura_hasta}). Debe actualizar el timbrado.')
+    def generar_numero_factura(self, numero_expedicion=None):
+        """
+        Generar el siguiente número de factura automáticamente.
+        El número se reserva en SecuenciaFactura (una fila por establecimiento y
+        punto de expedición), dentro de la transacción actual: llamar justo antes
+        del commit para que el bloqueo de la fila dure lo menos posible.
+        """
+        establecimiento = self.numero_establecimiento or '001'
+        expedicion = numero_expedicion or self.numero_expedicion or '001'
+        # La secuencia del punto de expedición de la empresa continúa desde numero_factura_actual
+        if expedicion == (self.numero_expedicion or '001'):
+            inicio = self.numero_factura_actual or self.numero_factura_desde or 1
+        else:
+            inicio = self.numero_factura_desde or 1
+        numero = SecuenciaFactura.reservar(establecimiento, expedicion, inicio,
+                                           int(self.numero_factura_hasta or 99999))
         
         # Formato: 001-001-0000001 (Establecimiento-Expedición-Número)
-        numero = f"{self.numero_establecimiento or '001'}-{self.numero_expedicion or '001'}-{str(self.numero_factura_actual).zfill(7)}"
-        
-        # Incrementar contador
-        self.numero_factura_actual += 1
-        
-        return numero
+        return f"{establecimiento}-{expedicion}-{str(numero).zfill(7)}"
+    
+    @property
+    def numero_factura_siguiente(self):
+        """Próximo número de factura del punto de expedición de la empresa (solo lectura)"""
+        secuencia = SecuenciaFactura.query.filter_by(
+            numero_establecimiento=self.numero_establecimiento or '001',
+            numero_expedicion=self.numero_expedicion or '001'
+        ).first()
+        return secuencia.proximo if secuencia else self.numero_factura_actual
+
+
+class SecuenciaFactura(db.Model):
+    """Numeración de facturas por establecimiento y punto de expedición"""
+    __tablename__ = 'secuencias_factura'
+    __table_args__ = (
+        db.UniqueConstraint('numero_establecimiento', 'numero_expedicion', name='uq_secuencia_factura'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    numero_establecimiento = db.Column(db.String(10), nullable=False)
+    numero_expedicion = db.Column(db.String(10), nullable=False)
+    proximo = db.Column(db.Integer, nullable=False, default=1)
+    numero_hasta = db.Column(db.Integer, nullable=False, default=99999)
+    
+    def __repr__(self):
+        return f'<SecuenciaFactura {self.numero_establecimiento}-{self.numero_expedicion} {self.proximo}>'
+    
+    @classmethod
+    def reservar(cls, numero_establecimiento, numero_expedicion, numero_desde=1, numero_hasta=99999):
+        """
+        Reserva el siguiente número de la secuencia con un UPDATE ... RETURNING.
+        La fila queda bloqueada hasta el commit de la transacción, así que dos
+        cajas del mismo punto no pueden tomar el mismo número, y si la
+        transacción se deshace el número vuelve a quedar libre (sin saltos).
+        Puntos de expedición distintos usan filas distintas y no se bloquean.
+        """
+        for _ in range(2):
+            numero = db.session.execute(
+                db.update(cls).where(
+                    cls.numero_establecimiento == numero_establecimiento,
+                    cls.numero_expedicion == numero_expedicion,
+                    cls.proximo <= cls.numero_hasta
+                ).values(proximo=cls.proximo + 1).returning(cls.proximo),
+                execution_options={'synchronize_session': False}
+            ).scalar()
+            if numero is not None:
+                return numero - 1
+            
+            secuencia = db.session.query(cls.numero_hasta).filter_by(
+                numero_establecimiento=numero_establecimiento,
+                numero_expedicion=numero_expedicion
+            ).first()
+            if secuencia is not None:
+                raise ValueError(f'Se ha alcanzado el límite de facturas autorizadas ({secuencia.numero_hasta}). Debe actualizar el timbrado.')
+            
+            # Primera factura del punto: crear la secuencia (si otro proceso la
+            # creó al mismo tiempo, la restricción única lo detecta y se reintenta)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(numero_establecimiento=numero_establecimiento,
+                                       numero_expedicion=numero_expedicion,
+                                       proximo=numero_desde, numero_hasta=numero_hasta))
+            except IntegrityError:
+                pass
+        raise ValueError(f'No se pudo reservar un número de factura para {numero_establecimiento}-{numero_expedicion}')
+    
+    @classmethod
+    def actualizar_rango(cls, numero_establecimiento, numero_hasta):
+        """Aplica el límite del timbrado a todas las secuencias del establecimiento"""
+        db.session.execute(
+            db.update(cls).where(cls.numero_establecimiento == numero_establecimiento)
+            .values(numero_hasta=numero_hasta),
+            execution_options={'synchronize_session': False}
+        )
+
+
+class SecuenciaDocumento(db.Model):
+    """
+    Numeración de documentos internos por serie (códigos de producto,
+    solicitudes, compras, reclamos, notas de crédito y débito...). El formato
+    es prefijo + número con ceros a la izquierda hasta `relleno` dígitos; las
+    series y sus valores iniciales están en app.utils.numeracion.
+    """
+    __tablename__ = 'secuencias_documento'
+    
+    serie = db.Column(db.String(50), primary_key=True)
+    prefijo = db.Column(db.String(20), nullable=False, default='')
+    relleno = db.Column(db.Integer, nullable=False, default=6)
+    proximo = db.Column(db.Integer, nullable=False, default=1)
+    
+    def __repr__(self):
+        return f'<SecuenciaDocumento {self.serie} {self.prefijo}{self.proximo}>'
+    
+    @staticmethod
+    def formatear(prefijo, relleno, numero):
+        return f"{prefijo}{str(numero).zfill(relleno)}"
+    
+    @classmethod
+    def reservar(cls, serie, prefijo='', relleno=6, inicio=1):
+        """
+        Reserva y devuelve (ya formateado) el siguiente número de la serie con
+        un UPDATE ... RETURNING, igual que SecuenciaFactura.reservar: la fila
+        queda bloqueada hasta el commit y un rollback devuelve el número.
+        Si la serie no existe se crea con prefijo, relleno e inicio (inicio
+        puede ser una función, se llama solo al crear la fila).
+        """
+        for _ in range(2):
+            fila = db.session.execute(
+                db.update(cls).where(cls.serie == serie)
+                .values(proximo=cls.proximo + 1)
+                .returning(cls.proximo, cls.prefijo, cls.relleno),
+                execution_options={'synchronize_session': False}
+            ).first()
+            if fila is not None:
+                return cls.formatear(fila.prefijo, fila.relleno, fila.proximo - 1)
+            
+            # Primer documento de la serie (si otro proceso la creó al mismo
+            # tiempo, la clave primaria lo detecta y se reintenta)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(serie=serie, prefijo=prefijo, relleno=relleno,
+                                       proximo=inicio() if callable(inicio) else inicio))
+            except IntegrityError:
+                pass
+        raise ValueError(f'No se pudo reservar un número de la serie {serie}')
+    
+    @classmethod
+    def consultar(cls, serie):
+        """(prefijo, relleno, proximo) de la serie o None si todavía no existe (solo lectura)"""
+        return db.session.query(cls.prefijo, cls.relleno, cls.proximo).filter_by(serie=serie).first()
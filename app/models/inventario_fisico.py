@@ -0,0 +1,55 @@
+from datetime import datetime
+from app import db
+
+
+class ConteoInventario(db.Model):
+    """Sesión de inventario físico (ver app.utils.inventario_fisico)"""
+    __tablename__ = 'conteos_inventario'
+
+    id = db.Column(db.Integer, primary_key=True)
+    numero = db.Column(db.String(50), unique=True, nullable=False, index=True)
+    descripcion = db.Column(db.String(200))
+    estado = db.Column(db.String(20), nullable=False, default='abierto')  # abierto, aplicado, anulado
+    # Conteo completo: al aplicar, los productos activos no contados quedan en 0
+    completo = db.Column(db.Boolean, nullable=False, default=False)
+    observaciones = db.Column(db.Text)
+
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=False)
+    fecha_apertura = db.Column(db.DateTime, default=datetime.utcnow)
+    usuario_aplica_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+    fecha_aplicacion = db.Column(db.DateTime)
+
+    # Resumen guardado al aplicar
+    productos_ajustados = db.Column(db.Integer, default=0)
+    unidades_sobrantes = db.Column(db.Integer, default=0)
+    unidades_faltantes = db.Column(db.Integer, default=0)
+    valor_diferencia = db.Column(db.Numeric(14, 2), default=0)
+
+    usuario = db.relationship('Usuario', foreign_keys=[usuario_id])
+    usuario_aplica = db.relationship('Usuario', foreign_keys=[usuario_aplica_id])
+    lineas = db.relationship('ConteoInventarioLinea', backref='conteo', lazy='dynamic',
+                             cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<ConteoInventario {self.numero} {self.estado}>'
+
+
+class ConteoInventarioLinea(db.Model):
+    """Cantidad contada de un producto en una sesión de inventario"""
+    __tablename__ = 'conteos_inventario_lineas'
+    __table_args__ = (
+        db.UniqueConstraint('conteo_id', 'producto_id', name='uq_conteo_inventario_producto'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    conteo_id = db.Column(db.Integer, db.ForeignKey('conteos_inventario.id'), nullable=False)
+    producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'), nullable=False)
+    cantidad_contada = db.Column(db.Integer, nullable=False, default=0)
+    # Stock del sistema y costo al aplicar (vacíos mientras el conteo está abierto)
+    stock_sistema = db.Column(db.Integer)
+    costo_unitario = db.Column(db.Numeric(12, 2))
+
+    producto = db.relationship('Producto')
+
+    def __repr__(self):
+        return f'<ConteoInventarioLinea {self.conteo_id} {self.producto_id}: {self.cantidad_contada}>'
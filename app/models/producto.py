@@ -9,6 +9,7 @@ class Categoria(db.Model):
     nombre = db.Column(db.String(100), nullable=False)
     descripcion = db.Column(db.Text)
     activo = db.Column(db.Boolean, default=True)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     productos = db.relationship('Producto', backref='categoria', lazy='dynamic')
     
@@ -34,6 +35,7 @@ class Producto(db.Model):
     es_importado = db.Column(db.Boolean, default=False)
     activo = db.Column(db.Boolean, default=True)
     fecha_registro = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     imagen_url = db.Column(db.String(255))
     
     # Relaciones
@@ -46,23 +48,6 @@ class Producto(db.Model):
     def necesita_reposicion(self):
         return self.stock_actual <= self.stock_minimo
     
-    @staticmethod
-    def generar_proximo_codigo():
-        """Genera el siguiente código de producto con formato 001, 002, 003, etc"""
-        ultimo_producto = Producto.query.order_by(Producto.id.desc()).first()
-        
-        if not ultimo_producto or not ultimo_producto.codigo:
-            return '001'
-        
-        try:
-            # Extraer número del último código
-            ultimo_numero = int(ultimo_producto.codigo)
-            nuevo_numero = ultimo_numero + 1
-            # Formatear con ceros a la izquierda
-            return str(nuevo_numero).zfill(3)
-        except (ValueError, AttributeError):
-            # Si no se puede parsear, empezar desde 001
-            return '001'
 
 class MovimientoProducto(db.Model):
     __tablename__ = 'movimientos_producto'
@@ -16,6 +16,7 @@ class Reclamo(db.Model):
     responsable_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'), nullable=True)
     resolucion = db.Column(db.Text)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     fecha_estimada_resolucion = db.Column(db.DateTime, nullable=True)
     fecha_cierre = db.Column(db.DateTime, nullable=True)
 
@@ -11,6 +11,7 @@ class TipoServicio(db.Model):
     precio_base = db.Column(db.Numeric(12, 2), default=0)
     tiempo_estimado = db.Column(db.Integer, default=1)
     activo = db.Column(db.Boolean, default=True)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     solicitudes = db.relationship('SolicitudServicio', backref='tipo_servicio', lazy='dynamic')
     
@@ -23,6 +24,7 @@ class SolicitudServicio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     numero_solicitud = db.Column(db.String(50), unique=True, nullable=False, index=True)
     fecha_solicitud = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
     tipo_servicio_id = db.Column(db.Integer, db.ForeignKey('tipos_servicio.id'), nullable=False)
     producto_id = db.Column(db.Integer, db.ForeignKey('productos.id'))
@@ -51,6 +53,7 @@ class Presupuesto(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     numero_presupuesto = db.Column(db.String(50), unique=True, nullable=False, index=True)
     fecha_emision = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     solicitud_id = db.Column(db.Integer, db.ForeignKey('solicitudes_servicio.id'), nullable=False)
     descripcion_trabajo = db.Column(db.Text, nullable=False)
     mano_obra = db.Column(db.Numeric(12, 2), default=0)
@@ -100,6 +103,7 @@ class OrdenServicio(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     numero_orden = db.Column(db.String(50), unique=True, nullable=False, index=True)
     fecha_orden = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     solicitud_id = db.Column(db.Integer, db.ForeignKey('solicitudes_servicio.id'), nullable=False)
     presupuesto_id = db.Column(db.Integer, db.ForeignKey('presupuestos.id'))
     tecnico_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))  # Cambiado de empleados a usuarios
@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+from app import db
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_proceso')
+
+
+class TrabajoReporte(db.Model):
+    """Reporte generado en segundo plano (ver app.utils.trabajos_reporte)"""
+    __tablename__ = 'trabajos_reporte'
+    __table_args__ = (
+        db.Index('ix_trabajos_reporte_usuario_estado', 'usuario_id', 'estado'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    tipo = db.Column(db.String(50), nullable=False)
+    parametros = db.Column(db.Text)  # JSON
+    estado = db.Column(db.String(20), nullable=False, default='pendiente')  # pendiente, en_proceso, terminado, error
+    usuario_id = db.Column(db.Integer, db.ForeignKey('usuarios.id'))
+
+    fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_inicio = db.Column(db.DateTime)
+    fecha_fin = db.Column(db.DateTime)
+    fecha_expiracion = db.Column(db.DateTime, index=True)
+
+    ruta_archivo = db.Column(db.String(500))
+    nombre_archivo = db.Column(db.String(255))
+    mimetype = db.Column(db.String(100))
+    tamano = db.Column(db.Integer)
+    error = db.Column(db.Text)
+
+    usuario = db.relationship('Usuario')
+
+    @property
+    def parametros_dict(self):
+        return json.loads(self.parametros) if self.parametros else {}
+
+    @property
+    def activo(self):
+        return self.estado in ESTADOS_ACTIVOS
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'tipo': self.tipo,
+            'parametros': self.parametros_dict,
+            'estado': self.estado,
+            'fecha_creacion': self.fecha_creacion.isoformat() if self.fecha_creacion else None,
+            'fecha_inicio': self.fecha_inicio.isoformat() if self.fecha_inicio else None,
+            'fecha_fin': self.fecha_fin.isoformat() if self.fecha_fin else None,
+            'fecha_expiracion': self.fecha_expiracion.isoformat() if self.fecha_expiracion else None,
+            'nombre_archivo': self.nombre_archivo,
+            'tamano': self.tamano,
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return f'<TrabajoReporte {self.id} {self.tipo} {self.estado}>'
@@ -19,6 +19,7 @@ class Usuario(UserMixin, db.Model):
     rol = db.Column(db.String(20), nullable=False)  # admin, vendedor, tecnico, cajero
     activo = db.Column(db.Boolean, default=True)
     fecha_creacion = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     ultimo_acceso = db.Column(db.DateTime)
     
     def set_password(self, password):
@@ -1,6 +1,29 @@
+import time
+from collections import namedtuple
 from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import case, event, func, or_, select
+from sqlalchemy.orm import object_session
 from app import db
 
+# Categorías de forma de pago que se controlan en el arqueo de caja
+CATEGORIAS_PAGO = ('efectivo', 'tarjeta', 'transferencia', 'cheque')
+
+# Palabras del nombre que definen la categoría de una forma de pago sin categoría
+# cargada, en orden de prioridad (lo que no coincide es 'otros')
+PALABRAS_CATEGORIA_PAGO = (
+    ('efectivo', ('efectivo',)),
+    ('tarjeta', ('tarjeta', 'débito', 'crédito')),
+    ('transferencia', ('transferencia',)),
+    ('cheque', ('cheque',)),
+)
+
+# Copia en memoria de una forma de pago (no depende de la sesión)
+FormaPagoInfo = namedtuple('FormaPagoInfo', 'id codigo nombre descripcion categoria activo requiere_referencia')
+
+# Segundos que se conserva el cache de formas de pago, por si otro proceso las modifica
+CACHE_FORMAS_PAGO_TTL = 300
+
 class Caja(db.Model):
     __tablename__ = 'cajas'
     
@@ -8,6 +31,8 @@ class Caja(db.Model):
     numero_caja = db.Column(db.String(20), unique=True, nullable=False)
     nombre = db.Column(db.String(100), nullable=False)
     activo = db.Column(db.Boolean, default=True)
+    numero_expedicion = db.Column(db.String(10))  # Punto de expedición propio (si no, el de la empresa)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     aperturas = db.relationship('AperturaCaja', backref='caja', lazy='dynamic')
     
@@ -41,6 +66,14 @@ class AperturaCaja(db.Model):
     monto_transferencias_esperado = db.Column(db.Numeric(12, 2))
     monto_cheques_esperado = db.Column(db.Numeric(12, 2))
     
+    # Acumulados en línea: se actualizan en la misma transacción que cada
+    # Pago, PagoNotaDebito y egreso de MovimientoCaja (ver reconciliar_caja.py)
+    acumulado_efectivo = db.Column(db.Numeric(12, 2), default=0)
+    acumulado_tarjeta = db.Column(db.Numeric(12, 2), default=0)
+    acumulado_transferencia = db.Column(db.Numeric(12, 2), default=0)
+    acumulado_cheque = db.Column(db.Numeric(12, 2), default=0)
+    acumulado_egresos = db.Column(db.Numeric(12, 2), default=0)
+    
     cajero = db.relationship('Usuario', backref='aperturas_caja')
     ventas = db.relationship('Venta', backref='apertura_caja', lazy='dynamic')
     movimientos = db.relationship('MovimientoCaja', backref='apertura_caja', lazy='dynamic', cascade='all, delete-orphan')
@@ -56,15 +89,70 @@ class AperturaCaja(db.Model):
         if self.monto_final:
             self.diferencia = self.monto_final - self.monto_sistema
     
+    @staticmethod
+    def acumular(apertura_id, egresos=0, **montos):
+        """
+        Suma montos a los acumulados de una apertura con un UPDATE atómico.
+        Debe llamarse dentro de la transacción que registra el movimiento.
+        """
+        if not apertura_id:
+            return
+        valores = {}
+        for categoria, monto in montos.items():
+            if monto:
+                columna = getattr(AperturaCaja, f'acumulado_{categoria}')
+                valores[columna] = db.func.coalesce(columna, 0) + Decimal(str(monto))
+        if egresos:
+            valores[AperturaCaja.acumulado_egresos] = db.func.coalesce(AperturaCaja.acumulado_egresos, 0) + Decimal(str(egresos))
+        if valores:
+            db.session.execute(
+                db.update(AperturaCaja).where(AperturaCaja.id == apertura_id).values(valores)
+            )
+    
+    @staticmethod
+    def aplicar_cambio_venta(antes, despues):
+        """
+        Ajusta los acumulados según el cambio de una venta.
+        antes/despues son tuplas (apertura_id, montos) de Venta.estado_caja()
+        """
+        apertura_antes, montos_antes = antes
+        apertura_despues, montos_despues = despues
+        if apertura_antes == apertura_despues:
+            AperturaCaja.acumular(apertura_antes, **{
+                cat: montos_despues[cat] - montos_antes[cat] for cat in CATEGORIAS_PAGO
+            })
+        else:
+            AperturaCaja.acumular(apertura_antes, **{cat: -montos_antes[cat] for cat in CATEGORIAS_PAGO})
+            AperturaCaja.acumular(apertura_despues, **montos_despues)
+    
+    def totales_acumulados(self):
+        """Totales por forma de pago desde los acumulados (sin recorrer pagos)"""
+        totales = {cat: Decimal(str(getattr(self, f'acumulado_{cat}') or 0)) for cat in CATEGORIAS_PAGO}
+        totales['total'] = sum(totales.values(), Decimal('0'))
+        totales['egresos'] = Decimal(str(self.acumulado_egresos or 0))
+        return totales
+    
+    @property
+    def efectivo_disponible(self):
+        """Monto inicial + efectivo cobrado - egresos de caja chica"""
+        return (Decimal(str(self.monto_inicial or 0)) + Decimal(str(self.acumulado_efectivo or 0))
+                - Decimal(str(self.acumulado_egresos or 0)))
+    
     def __repr__(self):
         return f'<AperturaCaja {self.caja.nombre} - {self.fecha_apertura}>'
 
 class Venta(db.Model):
     __tablename__ = 'ventas'
+    __table_args__ = (
+        db.Index('ix_ventas_cliente_saldo', 'cliente_id', 'saldo'),
+        db.Index('ix_ventas_estado_fecha', 'estado', 'fecha_venta'),
+        db.Index('ix_ventas_apertura_estado_fecha', 'apertura_caja_id', 'estado', 'fecha_venta'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     numero_factura = db.Column(db.String(50), unique=True, nullable=False, index=True)
     fecha_venta = db.Column(db.DateTime, default=datetime.utcnow)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     tipo_venta = db.Column(db.String(20), nullable=False)  # producto, servicio, mixta
     cliente_id = db.Column(db.Integer, db.ForeignKey('clientes.id'), nullable=False)
     orden_servicio_id = db.Column(db.Integer, db.ForeignKey('ordenes_servicio.id'))
@@ -75,6 +163,15 @@ class Venta(db.Model):
     descuento = db.Column(db.Numeric(12, 2), default=0)
     iva = db.Column(db.Numeric(12, 2), default=0)
     total = db.Column(db.Numeric(12, 2), default=0)
+    # Desglose de IVA (montos gravados con IVA incluido), calculado al registrar la venta
+    gravada_10 = db.Column(db.Numeric(12, 2), default=0)
+    iva_10 = db.Column(db.Numeric(12, 2), default=0)
+    gravada_5 = db.Column(db.Numeric(12, 2), default=0)
+    iva_5 = db.Column(db.Numeric(12, 2), default=0)
+    exenta = db.Column(db.Numeric(12, 2), default=0)
+    # Desnormalizados: se actualizan en actualizar_estado_pago (pagos confirmados)
+    monto_pagado = db.Column(db.Numeric(12, 2), default=0)
+    saldo = db.Column(db.Numeric(12, 2), default=0, index=True)
     
     estado = db.Column(db.String(20), default='completada')  # completada, anulada
     estado_pago = db.Column(db.String(20), default='pagado')  # pagado, pendiente, parcial
@@ -89,15 +186,83 @@ class Venta(db.Model):
     pagos = db.relationship('Pago', backref='venta', lazy='dynamic', cascade='all, delete-orphan')
     
     @property
-    def monto_pagado(self):
-        return sum(p.monto for p in self.pagos if p.estado == 'confirmado')
+    def saldo_pendiente(self):
+        return (self.total or 0) - (self.monto_pagado or 0)
+    
+    def recalcular_monto_pagado(self):
+        """Suma en la base los pagos confirmados y actualiza monto_pagado y saldo"""
+        self.monto_pagado = self.pagos.filter_by(estado='confirmado').with_entities(
+            db.func.coalesce(db.func.sum(Pago.monto), 0)
+        ).scalar()
+        self.saldo = (self.total or 0) - self.monto_pagado
+        return self.monto_pagado
+    
+    def calcular_desglose_iva(self):
+        """
+        Calcula y guarda gravada/IVA 10%, 5% y exenta a partir de los detalles
+        (una sola consulta). Los precios incluyen IVA; las líneas sin producto
+        (servicios) tributan 10%.
+        """
+        from app.models.producto import Producto
+        montos = {'10': Decimal('0'), '5': Decimal('0'), 'exenta': Decimal('0')}
+        filas = db.session.query(
+            VentaDetalle.cantidad, VentaDetalle.precio_unitario, VentaDetalle.producto_id, Producto.tipo_iva
+        ).outerjoin(Producto, Producto.id == VentaDetalle.producto_id).filter(
+            VentaDetalle.venta_id == self.id
+        ).all()
+        for cantidad, precio_unitario, producto_id, tipo_iva in filas:
+            tipo = (tipo_iva or '10') if producto_id else '10'
+            importe = Decimal(str(cantidad)) * Decimal(str(precio_unitario))
+            montos[tipo if tipo in montos else 'exenta'] += importe
+        centimos = Decimal('0.01')
+        self.gravada_10 = montos['10'].quantize(centimos)
+        self.iva_10 = (montos['10'] / 11).quantize(centimos)
+        self.gravada_5 = montos['5'].quantize(centimos)
+        self.iva_5 = (montos['5'] / 21).quantize(centimos)
+        self.exenta = montos['exenta'].quantize(centimos)
+        return self.desglose_iva
     
     @property
-    def saldo_pendiente(self):
-        return self.total - self.monto_pagado
+    def desglose_iva(self):
+        """Desglose guardado, con el formato de GeneradorTicket.calcular_subtotales_iva"""
+        return {
+            'exenta': {'subtotal': Decimal(str(self.exenta or 0)), 'iva': Decimal('0')},
+            '5': {'subtotal': Decimal(str(self.gravada_5 or 0)), 'iva': Decimal(str(self.iva_5 or 0))},
+            '10': {'subtotal': Decimal(str(self.gravada_10 or 0)), 'iva': Decimal(str(self.iva_10 or 0))},
+        }
+    
+    def montos_por_categoria(self):
+        """
+        Montos confirmados por categoría de forma de pago que esta venta aporta
+        a su caja. El efectivo se toma neto del vuelto en el orden de los pagos,
+        igual que en el arqueo: cada pago en efectivo cubre lo que falta.
+        """
+        montos = {cat: Decimal('0') for cat in CATEGORIAS_PAGO}
+        if self.estado != 'completada' or not self.apertura_caja_id:
+            return montos
+        filas = db.session.query(Pago.forma_pago_id, Pago.monto).filter(
+            Pago.venta_id == self.id,
+            Pago.estado == 'confirmado'
+        ).order_by(Pago.id).all()
+        total = Decimal(str(self.total or 0))
+        pagado = Decimal('0')
+        for forma_pago_id, monto in filas:
+            categoria = FormaPago.categoria_de(forma_pago_id)
+            if categoria not in montos:
+                continue
+            monto = Decimal(str(monto or 0))
+            if categoria == 'efectivo':
+                monto = min(monto, total - pagado)
+            montos[categoria] += monto
+            pagado += monto
+        return montos
+    
+    def estado_caja(self):
+        """Apertura y montos por categoría, para AperturaCaja.aplicar_cambio_venta"""
+        return (self.apertura_caja_id, self.montos_por_categoria())
     
-    def actualizar_estado_pago(self):
-        pagado = self.monto_pagado
+    def actualizar_estado_pago(self, descontar_stock=True):
+        pagado = self.recalcular_monto_pagado()
         estado_anterior = self.estado_pago
         
         if pagado >= self.total:
@@ -108,47 +273,28 @@ class Venta(db.Model):
             self.estado_pago = 'pendiente'
         
         # Si cambió a "pagado", descontar stock de los productos
-        if self.estado_pago == 'pagado' and estado_anterior != 'pagado':
+        if descontar_stock and self.estado_pago == 'pagado' and estado_anterior != 'pagado':
             self._descontar_stock()
     
     def _descontar_stock(self):
         """Descuenta el stock de los productos cuando la venta se marca como pagada"""
-        from app.models.producto import Producto, MovimientoProducto
-        from flask_login import current_user
-        from datetime import datetime
+        from app.utils.inventario import aplicar_movimientos_stock
         
-        for detalle in self.detalles:
-            if detalle.producto_id:
-                producto = Producto.query.get(detalle.producto_id)
-                if producto:
-                    # Registrar movimiento anterior
-                    stock_anterior = producto.stock_actual
-                    
-                    # Descontar stock (convertir a int)
-                    cantidad = int(detalle.cantidad)
-                    producto.stock_actual -= cantidad
-                    
-                    # Registrar movimiento en la auditoría
-                    movimiento = MovimientoProducto(
-                        producto_id=producto.id,
-                        tipo_movimiento='salida',
-                        cantidad=cantidad,
-                        stock_anterior=stock_anterior,
-                        stock_actual=producto.stock_actual,
-                        motivo='venta',
-                        referencia_tipo='venta',
-                        referencia_id=self.id,
-                        costo_unitario=producto.precio_compra,
-                        usuario_id=self.vendedor_id if hasattr(self, 'vendedor_id') else None
-                    )
-                    from app import db
-                    db.session.add(movimiento)
+        aplicar_movimientos_stock(
+            [(d.producto_id, int(d.cantidad)) for d in self.detalles if d.producto_id],
+            'salida', 'venta', referencia_tipo='venta', referencia_id=self.id,
+            usuario_id=self.vendedor_id
+        )
     
     def __repr__(self):
         return f'<Venta {self.numero_factura}>'
 
 class VentaDetalle(db.Model):
     __tablename__ = 'venta_detalles'
+    __table_args__ = (
+        db.Index('ix_venta_detalles_venta', 'venta_id'),
+        db.Index('ix_venta_detalles_producto', 'producto_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     venta_id = db.Column(db.Integer, db.ForeignKey('ventas.id'), nullable=False)
@@ -160,6 +306,7 @@ class VentaDetalle(db.Model):
     subtotal = db.Column(db.Numeric(12, 2), nullable=False)
     descuento = db.Column(db.Numeric(12, 2), default=0)
     total = db.Column(db.Numeric(12, 2), nullable=False)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     producto = db.relationship('Producto')
     
@@ -176,13 +323,77 @@ class FormaPago(db.Model):
     activo = db.Column(db.Boolean, default=True)
     requiere_referencia = db.Column(db.Boolean, default=False)
     # Si es True, se debe capturar número de cheque, últimos 4 dígitos, etc.
+    categoria = db.Column(db.String(20), index=True)  # efectivo, tarjeta, transferencia, cheque, otros
+
+    # Cache del proceso: (instante de carga, {id: FormaPagoInfo})
+    _cache = None
+
+    @staticmethod
+    def categoria_por_nombre(nombre):
+        """Clasifica una forma de pago por su nombre (efectivo, tarjeta, transferencia, cheque u otros)"""
+        nombre = (nombre or '').lower()
+        for categoria, palabras in PALABRAS_CATEGORIA_PAGO:
+            if any(palabra in nombre for palabra in palabras):
+                return categoria
+        return 'otros'
+
+    @classmethod
+    def expresion_categoria(cls):
+        """
+        Categoría en SQL con el mismo criterio que el cache: la columna categoria
+        o, si está vacía (filas cargadas fuera del ORM), la que da el nombre.
+        """
+        nombre = func.lower(cls.nombre)
+        por_nombre = case(
+            *[(or_(*[nombre.contains(palabra, autoescape=True) for palabra in palabras]), categoria)
+              for categoria, palabras in PALABRAS_CATEGORIA_PAGO],
+            else_='otros'
+        )
+        return func.coalesce(cls.categoria, por_nombre)
+
+    @classmethod
+    def _formas_cacheadas(cls):
+        """Todas las formas de pago (activas o no) por id, desde el cache del proceso."""
+        cache = cls._cache
+        if cache is None or time.monotonic() - cache[0] > CACHE_FORMAS_PAGO_TTL:
+            formas = {}
+            for fp in cls.query.order_by(cls.nombre, cls.id).all():
+                formas[fp.id] = FormaPagoInfo(
+                    fp.id, fp.codigo, fp.nombre, fp.descripcion,
+                    fp.categoria or cls.categoria_por_nombre(fp.nombre),
+                    bool(fp.activo), bool(fp.requiere_referencia)
+                )
+            cache = (time.monotonic(), formas)
+            cls._cache = cache
+        return cache[1]
+
+    @classmethod
+    def invalidar_cache(cls):
+        cls._cache = None
+
+    @classmethod
+    def categoria_de(cls, forma_pago_id):
+        """Categoría de una forma de pago por id ('otros' si no existe)"""
+        info = cls._formas_cacheadas().get(forma_pago_id)
+        return info.categoria if info else 'otros'
+
+    @classmethod
+    def id_por_codigo(cls, codigo):
+        for fp in cls._formas_cacheadas().values():
+            if fp.codigo == codigo:
+                return fp.id
+        return None
+
+    @classmethod
+    def ids_por_categoria(cls, categoria):
+        return [fp.id for fp in cls._formas_cacheadas().values() if fp.categoria == categoria]
 
     @classmethod
     def activas_unicas(cls):
-        """Devuelve formas de pago activas sin duplicados por código/nombre."""
+        """Devuelve formas de pago activas sin duplicados por código/nombre (desde el cache)."""
         vistos = set()
         resultado = []
-        registros = cls.query.filter_by(activo=True).order_by(cls.nombre, cls.id).all()
+        registros = [fp for fp in cls._formas_cacheadas().values() if fp.activo]
         for fp in registros:
             clave = (fp.codigo or '').strip().lower() or (fp.nombre or '').strip().lower() or str(fp.id)
             if clave in vistos:
@@ -194,6 +405,39 @@ class FormaPago(db.Model):
     def __repr__(self):
         return f'<FormaPago {self.nombre}>'
 
+
+@event.listens_for(Venta, 'before_insert')
+@event.listens_for(Venta, 'before_update')
+def _sincronizar_saldo(mapper, connection, venta):
+    # Mantiene el saldo al día si cambia el total (p. ej. al facturar un servicio)
+    venta.saldo = (venta.total or 0) - (venta.monto_pagado or 0)
+
+
+@event.listens_for(FormaPago, 'before_insert')
+@event.listens_for(FormaPago, 'before_update')
+def _completar_categoria(mapper, connection, forma_pago):
+    if not forma_pago.categoria:
+        forma_pago.categoria = FormaPago.categoria_por_nombre(forma_pago.nombre)
+
+
+@event.listens_for(FormaPago, 'after_insert')
+@event.listens_for(FormaPago, 'after_update')
+@event.listens_for(FormaPago, 'after_delete')
+def _marcar_formas_pago_modificadas(mapper, connection, forma_pago):
+    # Se invalida ya y otra vez al terminar la transacción, para no conservar
+    # datos cargados antes del commit o que se deshicieron con rollback
+    FormaPago.invalidar_cache()
+    session = object_session(forma_pago)
+    if session is not None:
+        session.info['formas_pago_modificadas'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _invalidar_cache_formas_pago(session):
+    if session.info.pop('formas_pago_modificadas', False):
+        FormaPago.invalidar_cache()
+
 class Pago(db.Model):
     __tablename__ = 'pagos'
     
@@ -212,6 +456,41 @@ class Pago(db.Model):
     def __repr__(self):
         return f'<Pago {self.forma_pago.nombre if self.forma_pago else "N/A"} - {self.monto}>'
 
+
+def montos_pagos_por_venta(*filtros):
+    """
+    Subconsulta (venta_id, efectivo, tarjeta, transferencia, cheque) con los
+    pagos confirmados de las ventas que cumplen los filtros. Misma lógica que
+    Venta.montos_por_categoria: el efectivo se toma neto del vuelto en el
+    orden de los pagos (id), cada pago en efectivo cubre solo lo que falta del
+    total luego de los pagos previos. La usan el arqueo de caja y la
+    reconstrucción de ventas_diarias.
+    """
+    categoria = FormaPago.expresion_categoria()
+    # Pagos con lo pagado hasta cada uno (solo las categorías del arqueo, en orden de id)
+    pagos = db.session.query(
+        Pago.venta_id.label('venta_id'),
+        Venta.total.label('total'),
+        categoria.label('categoria'),
+        Pago.monto.label('monto'),
+        func.sum(case((categoria.in_(CATEGORIAS_PAGO), Pago.monto), else_=0)).over(
+            partition_by=Pago.venta_id, order_by=Pago.id).label('acumulado'),
+    ).join(Venta, Venta.id == Pago.venta_id).join(
+        FormaPago, FormaPago.id == Pago.forma_pago_id
+    ).filter(Pago.estado == 'confirmado', *filtros).subquery()
+
+    def suma(cat):
+        return func.coalesce(func.sum(case((pagos.c.categoria == cat, pagos.c.monto), else_=0)), 0)
+
+    # Vuelto de la venta: lo más que llegó a superar el total lo pagado al
+    # momento de un pago en efectivo (el vuelto sale siempre del efectivo)
+    exceso = func.max(case((pagos.c.categoria == 'efectivo', pagos.c.acumulado - pagos.c.total)))
+    return select(
+        pagos.c.venta_id,
+        (suma('efectivo') - case((exceso > 0, exceso), else_=0)).label('efectivo'),
+        *[suma(cat).label(cat) for cat in CATEGORIAS_PAGO if cat != 'efectivo'],
+    ).group_by(pagos.c.venta_id).subquery()
+
 class NotaCredito(db.Model):
     __tablename__ = 'notas_credito'
     
@@ -0,0 +1,127 @@
+from datetime import datetime
+from decimal import Decimal
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.venta import CATEGORIAS_PAGO
+
+# Montos acumulados por fila: total de la venta y su reparto por forma de pago
+# ('otros' es lo no cobrado en efectivo/tarjeta/transferencia/cheque: crédito, otras formas)
+MONTOS_VENTA_DIARIA = ('total',) + CATEGORIAS_PAGO + ('otros',)
+
+
+class VentaDiaria(db.Model):
+    """Resumen de ventas completadas por día, caja, vendedor y tipo de venta"""
+    __tablename__ = 'ventas_diarias'
+    __table_args__ = (
+        db.UniqueConstraint('fecha', 'caja_id', 'vendedor_id', 'tipo_venta', name='uq_venta_diaria'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    caja_id = db.Column(db.Integer, nullable=False, default=0)  # 0 = venta sin caja
+    vendedor_id = db.Column(db.Integer, nullable=False)
+    tipo_venta = db.Column(db.String(20), nullable=False)
+
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    efectivo = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    tarjeta = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    transferencia = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    cheque = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    otros = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    fecha_modificacion = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<VentaDiaria {self.fecha} caja={self.caja_id} vendedor={self.vendedor_id} {self.total}>'
+
+    @staticmethod
+    def resumen_venta(venta):
+        """
+        Aporte de una venta al resumen: (clave, montos) o None si no está completada.
+        Usar antes y después de cada cambio con aplicar_cambio_venta.
+        """
+        if venta.estado != 'completada' or not venta.fecha_venta:
+            return None
+        clave = (
+            venta.fecha_venta.date(),
+            venta.apertura_caja.caja_id if venta.apertura_caja else 0,
+            venta.vendedor_id,
+            venta.tipo_venta,
+        )
+        montos = {'cantidad': 1, 'total': Decimal(str(venta.total or 0))}
+        montos.update(venta.montos_por_categoria())
+        montos['otros'] = montos['total'] - sum(montos[cat] for cat in CATEGORIAS_PAGO)
+        return clave, montos
+
+    @classmethod
+    def aplicar_cambio_venta(cls, antes, despues):
+        """Resta el aporte anterior de la venta y suma el nuevo, en la transacción actual"""
+        if antes == despues:
+            return
+        if antes is not None:
+            cls._acumular(antes[0], antes[1], -1)
+        if despues is not None:
+            cls._acumular(despues[0], despues[1], 1)
+
+    @classmethod
+    def _acumular(cls, clave, montos, signo):
+        fecha, caja_id, vendedor_id, tipo_venta = clave
+        filtro = (cls.fecha == fecha, cls.caja_id == caja_id,
+                  cls.vendedor_id == vendedor_id, cls.tipo_venta == tipo_venta)
+        incrementos = {col: signo * montos.get(col, 0) for col in ('cantidad',) + MONTOS_VENTA_DIARIA}
+
+        def actualizar():
+            return db.session.execute(
+                db.update(cls).where(*filtro).values(
+                    **{col: getattr(cls, col) + valor for col, valor in incrementos.items()}
+                ),
+                execution_options={'synchronize_session': False}
+            ).rowcount
+
+        if actualizar():
+            return
+        # Primera venta de la combinación: crear la fila (si otra transacción la
+        # creó al mismo tiempo, la restricción única lo detecta y se actualiza)
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(cls).values(
+                    fecha=fecha, caja_id=caja_id, vendedor_id=vendedor_id, tipo_venta=tipo_venta,
+                    **incrementos
+                ))
+        except IntegrityError:
+            actualizar()
+
+    @classmethod
+    def consulta_agregada(cls, desde=None, hasta=None):
+        """
+        Agrega las ventas completadas directamente desde ventas y pagos (misma
+        lógica que resumen_venta: montos de Venta.montos_por_categoria, con el
+        efectivo neto del vuelto en el orden de los pagos). La usa la
+        reconstrucción del resumen.
+        """
+        from app.models.venta import Venta, AperturaCaja, montos_pagos_por_venta
+
+        fecha = func.date(Venta.fecha_venta)
+        filtros = [Venta.estado == 'completada']
+        if desde:
+            filtros.append(fecha >= desde)
+        if hasta:
+            filtros.append(fecha <= hasta)
+        # Solo se reparten los montos de ventas con caja (igual que Venta.montos_por_categoria)
+        por_venta = montos_pagos_por_venta(Venta.apertura_caja_id.isnot(None), *filtros)
+
+        total = func.coalesce(Venta.total, 0)
+        montos = {cat: func.coalesce(por_venta.c[cat], 0) for cat in CATEGORIAS_PAGO}
+        caja_id = func.coalesce(AperturaCaja.caja_id, 0)
+
+        query = db.session.query(
+            fecha.label('fecha'), caja_id.label('caja_id'), Venta.vendedor_id, Venta.tipo_venta,
+            func.count(Venta.id).label('cantidad'),
+            func.sum(total).label('total'),
+            *[func.sum(expr).label(cat) for cat, expr in montos.items()],
+            func.sum(total - sum(montos.values())).label('otros'),
+        ).outerjoin(por_venta, por_venta.c.venta_id == Venta.id).outerjoin(
+            AperturaCaja, AperturaCaja.id == Venta.apertura_caja_id
+        ).filter(*filtros)
+        return query.group_by(fecha, caja_id, Venta.vendedor_id, Venta.tipo_venta)
@@ -5,80 +5,72 @@ Incluye: apertura, cierre, arqueo y consulta de estado
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.perfiles_consulta import con_perfil
 from app import db
 from app.models import Caja, AperturaCaja, Venta, Pago, FormaPago, PagoNotaDebito
+from app.models.venta import CATEGORIAS_PAGO, montos_pagos_por_venta
 from datetime import datetime
 from decimal import Decimal
-from sqlalchemy import func, and_
-from decimal import Decimal
+from sqlalchemy import func, and_, case, select, true
 from app.utils.reports import generar_reporte_arqueo
-from app.models import ConfiguracionEmpresa
 from app.utils import registrar_bitacora
 
 bp = Blueprint('caja', __name__, url_prefix='/caja')
 
+# Ventas y pagos de compras que lista /caja/estado
+ULTIMOS_MOVIMIENTOS = 10
+
 def calcular_totales_por_forma_pago(apertura_id):
     """
-    Calcula los totales esperados por forma de pago para una apertura de caja
+    Calcula los totales esperados por forma de pago para una apertura de caja.
+    Todo se resuelve en una sola consulta agrupada: los pagos de ventas se
+    suman por venta y categoría con el efectivo neto del vuelto, en el orden
+    de los pagos (ver app.models.venta.montos_pagos_por_venta).
+    Los pagos de Notas de Débito se suman aparte; los que no tienen forma
+    de pago se cuentan como efectivo.
     """
-    ventas = Venta.query.filter_by(
-        apertura_caja_id=apertura_id,
-        estado='completada'
-    ).all()
-    
-    totales = {
-        'efectivo': Decimal('0'),
-        'tarjeta': Decimal('0'),
-        'transferencia': Decimal('0'),
-        'cheque': Decimal('0')
-    }
-    
-    # Agrupar pagos confirmados por forma de pago (Ventas)
-    for venta in ventas:
-        total_venta = Decimal(venta.total)
-        pagado = Decimal('0')
-        for pago in venta.pagos:
-            if pago.estado == 'confirmado':
-                forma_nombre = pago.forma_pago.nombre.lower() if pago.forma_pago else 'otros'
-                monto_pago = Decimal(pago.monto)
-                if 'efectivo' in forma_nombre:
-                    # Solo sumar el neto de efectivo que queda en caja (no el vuelto)
-                    neto_efectivo = min(monto_pago, total_venta - pagado)
-                    totales['efectivo'] += neto_efectivo
-                    pagado += neto_efectivo
-                elif 'tarjeta' in forma_nombre or 'débito' in forma_nombre or 'crédito' in forma_nombre:
-                    totales['tarjeta'] += monto_pago
-                    pagado += monto_pago
-                elif 'transferencia' in forma_nombre:
-                    totales['transferencia'] += monto_pago
-                    pagado += monto_pago
-                elif 'cheque' in forma_nombre:
-                    totales['cheque'] += monto_pago
-                    pagado += monto_pago
+    por_venta = montos_pagos_por_venta(
+        Venta.apertura_caja_id == apertura_id,
+        Venta.estado == 'completada'
+    )
+    ventas_sq = select(
+        *[func.coalesce(func.sum(por_venta.c[cat]), 0).label(cat) for cat in CATEGORIAS_PAGO]
+    ).subquery()
 
-    # Agregar pagos de Notas de Débito (ND)
-    pagos_nd = PagoNotaDebito.query.filter_by(
-        apertura_caja_id=apertura_id,
-        estado='confirmado'
-    ).all()
-    for pago in pagos_nd:
-        forma_nombre = pago.forma_pago.nombre.lower() if pago.forma_pago else None
-        monto_pago = Decimal(pago.monto)
-        if forma_nombre is None:
-            # Loguear advertencia y sumar como efectivo
-            registrar_bitacora('arqueo-warning', f"Pago ND sin forma_pago_id (id={pago.id}), sumado como efectivo")
-            totales['efectivo'] += monto_pago
-        elif 'efectivo' in forma_nombre:
-            totales['efectivo'] += monto_pago
-        elif 'tarjeta' in forma_nombre or 'débito' in forma_nombre or 'crédito' in forma_nombre:
-            totales['tarjeta'] += monto_pago
-        elif 'transferencia' in forma_nombre:
-            totales['transferencia'] += monto_pago
-        elif 'cheque' in forma_nombre:
-            totales['cheque'] += monto_pago
-    
+    # Pagos de Notas de Débito (ND)
+    categoria_nd = case((FormaPago.id.is_(None), 'efectivo'), else_=FormaPago.expresion_categoria())
+
+    def suma_nd(cat):
+        return func.coalesce(func.sum(case((categoria_nd == cat, PagoNotaDebito.monto), else_=0)), 0)
+
+    nd_sq = select(
+        suma_nd('efectivo').label('efectivo'),
+        suma_nd('tarjeta').label('tarjeta'),
+        suma_nd('transferencia').label('transferencia'),
+        suma_nd('cheque').label('cheque'),
+        func.coalesce(func.sum(case((FormaPago.id.is_(None), 1), else_=0)), 0).label('sin_forma'),
+    ).select_from(PagoNotaDebito).outerjoin(
+        FormaPago, FormaPago.id == PagoNotaDebito.forma_pago_id
+    ).where(
+        PagoNotaDebito.apertura_caja_id == apertura_id,
+        PagoNotaDebito.estado == 'confirmado'
+    ).subquery()
+
+    fila = db.session.execute(select(ventas_sq, nd_sq.c.efectivo.label('nd_efectivo'),
+                                     nd_sq.c.tarjeta.label('nd_tarjeta'),
+                                     nd_sq.c.transferencia.label('nd_transferencia'),
+                                     nd_sq.c.cheque.label('nd_cheque'),
+                                     nd_sq.c.sin_forma).select_from(ventas_sq.join(nd_sq, true()))).one()
+
+    if fila.sin_forma:
+        # Loguear advertencia: se sumaron como efectivo
+        registrar_bitacora('arqueo-warning', f"{fila.sin_forma} pago(s) ND sin forma_pago_id en apertura {apertura_id}, sumados como efectivo")
+
+    totales = {}
+    for cat in ('efectivo', 'tarjeta', 'transferencia', 'cheque'):
+        totales[cat] = Decimal(str(getattr(fila, cat) or 0)) + Decimal(str(getattr(fila, f'nd_{cat}') or 0))
     totales['total'] = totales['efectivo'] + totales['tarjeta'] + totales['transferencia'] + totales['cheque']
-    
+
     return totales
 
 @bp.route('/estado')
@@ -107,35 +99,38 @@ def estado():
     total_otros = Decimal('0')
     ventas_list = []
     pagos_compras = []
+    cantidad_ventas = 0
+    cantidad_pagos_compras = 0
     total_egresos = Decimal('0')
     monto_esperado = Decimal('0')
     
     if apertura_actual:
-        # Ventas de esta apertura
-        ventas_list = Venta.query.filter_by(
-            apertura_caja_id=apertura_actual.id,
-            estado='completada'
-        ).all()
-        total_ventas = sum(v.total for v in ventas_list)
-        # Usar la función helper para calcular totales por forma de pago
-        totales = calcular_totales_por_forma_pago(apertura_actual.id)
-        # Calcular egresos (compras pagadas desde caja chica)
-        egresos = MovimientoCaja.query.filter_by(
-            apertura_caja_id=apertura_actual.id,
-            tipo='egreso'
-        ).all()
-        total_egresos = sum(m.monto for m in egresos)
+        # Cantidad y total de ventas en una consulta; solo se cargan las últimas que se muestran
+        ventas_apertura = Venta.query.filter_by(apertura_caja_id=apertura_actual.id, estado='completada')
+        cantidad_ventas, total_ventas = ventas_apertura.with_entities(
+            func.count(Venta.id), func.coalesce(func.sum(Venta.total), 0)
+        ).one()
+        ventas_list = con_perfil(ventas_apertura, 'ventas').order_by(
+            Venta.fecha_venta.desc(), Venta.id.desc()
+        ).limit(ULTIMOS_MOVIMIENTOS).all()
+        # Totales por forma de pago y egresos desde los acumulados de la apertura
+        totales = apertura_actual.totales_acumulados()
+        total_egresos = totales['egresos']
         # Sumar el monto inicial al total efectivo y descontar egresos
-        total_efectivo = apertura_actual.monto_inicial + totales['efectivo'] - total_egresos
+        total_efectivo = apertura_actual.efectivo_disponible
         total_tarjeta = totales['tarjeta']
         total_transferencias = totales['transferencia']
         total_cheques = totales['cheque']
         total_otros = total_transferencias + total_cheques
-        # Obtener pagos de compras de esta apertura
-        pagos_compras = PagoCompra.query.filter_by(
+        # Pagos de compras de esta apertura: cantidad y los últimos
+        pagos_apertura = PagoCompra.query.filter_by(
             apertura_caja_id=apertura_actual.id,
             origen_pago='caja_chica'
-        ).order_by(PagoCompra.fecha_pago.desc()).all()
+        )
+        cantidad_pagos_compras = pagos_apertura.count()
+        pagos_compras = con_perfil(pagos_apertura, 'pagos_compra').order_by(
+            PagoCompra.fecha_pago.desc(), PagoCompra.id.desc()
+        ).limit(ULTIMOS_MOVIMIENTOS).all()
         # El monto esperado es igual al efectivo disponible
         monto_esperado = total_efectivo
     
@@ -149,7 +144,9 @@ def estado():
                          total_cheques=total_cheques,
                          total_otros=total_otros,
                          ventas_list=ventas_list,
+                         cantidad_ventas=cantidad_ventas,
                          pagos_compras=pagos_compras,
+                         cantidad_pagos_compras=cantidad_pagos_compras,
                          total_egresos=total_egresos,
                          monto_esperado=monto_esperado)
 
@@ -266,22 +263,13 @@ def cerrar():
         
         # ===== GENERAR PDF =====
         try:
-            # Obtener configuración de la empresa
-            empresa = ConfiguracionEmpresa.query.first()
-            empresa_config = {
-                'nombre': empresa.nombre_empresa if empresa else 'JUGUETERÍA',
-                'subtitulo': 'El Mundo Feliz',
-                'ruc': empresa.ruc if empresa else 'N/A',
-                'direccion': empresa.direccion if empresa else ''
-            }
-            
             # Generar PDF
             # Los totales esperados deben incluir el monto_inicial en efectivo y restar egresos
             totales_con_inicial = totales.copy()
             totales_con_inicial['efectivo'] = apertura.monto_inicial + totales['efectivo'] - total_egresos
             totales_con_inicial['total'] = apertura.monto_inicial + totales['total'] - total_egresos
             
-            pdf_buffer = generar_reporte_arqueo(apertura, totales_con_inicial, empresa_config)
+            pdf_buffer = generar_reporte_arqueo(apertura, totales_con_inicial)
             
             # Nombre del archivo
             fecha_str = datetime.now().strftime('%Y%m%d_%H%M%S')
@@ -448,10 +436,9 @@ def historial():
     page = request.args.get('page', 1, type=int)
     
     # Si es admin, ver todas; si no, solo las propias
-    if current_user.rol == 'admin':
-        query = AperturaCaja.query
-    else:
-        query = AperturaCaja.query.filter_by(cajero_id=current_user.id)
+    query = con_perfil(AperturaCaja.query, 'aperturas_caja')
+    if current_user.rol != 'admin':
+        query = query.filter_by(cajero_id=current_user.id)
     
     aperturas = query.order_by(AperturaCaja.fecha_apertura.desc()).paginate(
         page=page, per_page=20, error_out=False
@@ -478,20 +465,13 @@ def arqueo(id):
     if request.args.get('pdf') == '1':
         # Generar PDF profesional usando el generador existente
         from app.utils.reports import generar_reporte_arqueo
-        empresa = ConfiguracionEmpresa.query.first()
-        empresa_config = {
-            'nombre': empresa.nombre_empresa if empresa else 'JUGUETERÍA',
-            'subtitulo': 'El Mundo Feliz',
-            'ruc': empresa.ruc if empresa else 'N/A',
-            'direccion': empresa.direccion if empresa else ''
-        }
         # Calcular totales esperados
         from app.routes.caja import calcular_totales_por_forma_pago
         totales = calcular_totales_por_forma_pago(apertura.id)
         totales_con_inicial = totales.copy()
         totales_con_inicial['efectivo'] = apertura.monto_inicial + totales['efectivo']
         totales_con_inicial['total'] = apertura.monto_inicial + totales['total']
-        pdf_buffer = generar_reporte_arqueo(apertura, totales_con_inicial, empresa_config)
+        pdf_buffer = generar_reporte_arqueo(apertura, totales_con_inicial)
         fecha_str = apertura.fecha_cierre.strftime('%Y%m%d_%H%M') if apertura.fecha_cierre else ''
         filename = f"Arqueo_Caja_{apertura.caja.nombre}_{fecha_str}.pdf"
         return send_file(
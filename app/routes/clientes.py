@@ -4,6 +4,7 @@ from app import db
 from app.models import Cliente
 from datetime import datetime
 from app.utils import registrar_bitacora
+from app.utils.catalogo_memoria import obtener_catalogo, CatalogoClientes
 
 bp = Blueprint('clientes', __name__, url_prefix='/clientes')
 
@@ -116,6 +117,10 @@ def buscar():
     """Endpoint para búsqueda AJAX"""
     term = request.args.get('term', '')
     
+    catalogo = obtener_catalogo(CatalogoClientes)
+    if catalogo is not None:
+        return jsonify(catalogo.autocompletar(term))
+    
     clientes = Cliente.query.filter(
         Cliente.activo == True,
         (Cliente.nombre.ilike(f'%{term}%')) |
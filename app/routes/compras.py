@@ -2,12 +2,15 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.perfiles_consulta import con_perfil
 from app import db
 from app.models import (Proveedor, PedidoCompra, PedidoCompraDetalle,
                         PresupuestoProveedor, PresupuestoProveedorDetalle, OrdenCompra, Compra, CompraDetalle,
                         CuentaPorPagar, PagoProveedor, Producto, PagoCompra, 
-                        MovimientoCaja, AperturaCaja, MovimientoProducto, HistorialPrecio)
+                        MovimientoCaja, AperturaCaja, HistorialPrecio)
 from app.utils import registrar_bitacora
+from app.utils.inventario import aplicar_movimientos_stock
+from app.utils.numeracion import siguiente_numero
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 import json
@@ -187,8 +190,7 @@ def solicitar_cotizaciones():
 def crear_pedido():
     if request.method == 'POST':
         try:
-            ultimo = PedidoCompra.query.order_by(PedidoCompra.id.desc()).first()
-            numero = f"PED-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('pedido_compra')
             fecha_entrega = request.form.get('fecha_entrega_estimada') or None
             if fecha_entrega:
                 fecha_entrega = datetime.strptime(fecha_entrega, '%Y-%m-%d').date()
@@ -245,8 +247,7 @@ def crear_presupuesto_proveedor(pedido_id):
     
     if request.method == 'POST':
         try:
-            ultimo = PresupuestoProveedor.query.order_by(PresupuestoProveedor.id.desc()).first()
-            numero = f"PRES-PROV-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('presupuesto_proveedor')
             
             presupuesto = PresupuestoProveedor(
                 numero_presupuesto=numero,
@@ -293,8 +294,7 @@ def crear_orden(pedido_id):
     
     if request.method == 'POST':
         try:
-            ultimo = OrdenCompra.query.order_by(OrdenCompra.id.desc()).first()
-            numero = f"OC-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('orden_compra')
             
             orden = OrdenCompra(
                 numero_orden=numero,
@@ -334,7 +334,7 @@ def ver_orden(id):
 @login_required
 def listar():
     page = request.args.get('page', 1, type=int)
-    compras = Compra.query.order_by(Compra.fecha_compra.desc()).paginate(
+    compras = con_perfil(Compra.query, 'compras_con_pagado').order_by(Compra.fecha_compra.desc()).paginate(
         page=page, per_page=20, error_out=False
     )
     return render_template('compras/listar.html', compras=compras)
@@ -420,6 +420,7 @@ def registrar_pago_proveedor(cuenta_id):
                 observaciones=f'Pago a proveedor desde cuentas por pagar. {request.form.get("observaciones", "")}'
             )
             db.session.add(movimiento)
+            AperturaCaja.acumular(apertura.id, egresos=monto_decimal)
             # Descontar efectivo disponible
             if apertura.monto_final is not None:
                 apertura.monto_final -= monto_decimal
@@ -457,9 +458,7 @@ def registrar_compra():
     if request.method == 'POST':
         try:
             # Generar número de compra
-            ultimo = Compra.query.filter(Compra.numero_compra.isnot(None)).order_by(
-                Compra.id.desc()).first()
-            numero = f"C-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('compra')
             
             numero_factura = request.form.get('numero_factura') or None
             fecha_factura_str = request.form.get('fecha_factura') or None
@@ -557,7 +556,7 @@ def pendientes_pago():
     
     # Mostrar solo compras registradas o parcialmente pagadas que NO sean a crédito (sin cuenta por pagar pendiente/parcial)
     from app.models.compra import CuentaPorPagar
-    compras = Compra.query.filter(
+    compras = con_perfil(Compra.query, 'compras').filter(
         Compra.estado.in_(['registrada', 'parcial_pagada']),
         (
             (~Compra.cuenta_por_pagar.has())
@@ -599,8 +598,7 @@ def presupuestos_lista():
 def crear_presupuesto_independiente():
     if request.method == 'POST':
         try:
-            ultimo = PresupuestoProveedor.query.order_by(PresupuestoProveedor.id.desc()).first()
-            numero = f"PRES-PROV-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('presupuesto_proveedor')
             
             presupuesto = PresupuestoProveedor(
                 numero_presupuesto=numero,
@@ -716,8 +714,7 @@ def convertir_presupuesto_a_compra(id):
     presupuesto = PresupuestoProveedor.query.get_or_404(id)
     
     try:
-        ultimo_pedido = PedidoCompra.query.order_by(PedidoCompra.id.desc()).first()
-        numero_pedido = f"PED-{(ultimo_pedido.id + 1 if ultimo_pedido else 1):06d}"
+        numero_pedido = siguiente_numero('pedido_compra')
 
         pedido = PedidoCompra(
             numero_pedido=numero_pedido,
@@ -737,8 +734,7 @@ def convertir_presupuesto_a_compra(id):
             )
             db.session.add(detalle)
 
-        ultimo_compra = Compra.query.filter(Compra.numero_compra.isnot(None)).order_by(Compra.id.desc()).first()
-        numero_compra = f"C-{(ultimo_compra.id + 1 if ultimo_compra else 1):06d}"
+        numero_compra = siguiente_numero('compra')
 
         compra = Compra(
             numero_compra=numero_compra,
@@ -800,41 +796,26 @@ def pagar_compra(id):
         
         # Actualizar stock SOLO al pagar (si es tipo producto y no se ha actualizado)
         if compra.tipo == 'producto' and not compra.stock_actualizado:
-            for det in compra.detalles:
-                if det.producto_id:
-                    producto = Producto.query.get(det.producto_id)
-                    if producto:
-                        stock_anterior = int(producto.stock_actual or 0)
-                        cantidad_int = int(round(det.cantidad))
-                        stock_nuevo = stock_anterior + cantidad_int
-                        producto.stock_actual = stock_nuevo
-                        
-                        # Registrar movimiento de stock
-                        movimiento = MovimientoProducto(
-                            producto_id=producto.id,
-                            tipo_movimiento='entrada',
-                            cantidad=cantidad_int,
-                            stock_anterior=stock_anterior,
-                            stock_actual=stock_nuevo,
-                            motivo='compra_pagada',
-                            referencia_tipo='compra',
-                            referencia_id=compra.id,
-                            costo_unitario=det.precio_unitario,
-                            usuario_id=current_user.id
-                        )
-                        db.session.add(movimiento)
-                        
-                        # Actualizar precio de compra si es diferente
-                        if det.precio_unitario != (producto.precio_compra or Decimal('0')):
-                            historial = HistorialPrecio(
-                                producto_id=producto.id,
-                                precio_compra_anterior=producto.precio_compra,
-                                precio_compra_nuevo=det.precio_unitario,
-                                usuario_id=current_user.id,
-                                motivo='Actualización por compra pagada'
-                            )
-                            db.session.add(historial)
-                            producto.precio_compra = det.precio_unitario
+            detalles_producto = [det for det in compra.detalles if det.producto_id]
+            # Stock en lote: productos bloqueados hasta el commit y movimientos en un solo INSERT
+            productos = aplicar_movimientos_stock(
+                [(det.producto_id, det.cantidad, det.precio_unitario) for det in detalles_producto],
+                'entrada', 'compra_pagada', referencia_tipo='compra', referencia_id=compra.id,
+                usuario_id=current_user.id
+            )
+            for det in detalles_producto:
+                producto = productos.get(det.producto_id)
+                # Actualizar precio de compra si es diferente
+                if producto and det.precio_unitario != (producto.precio_compra or Decimal('0')):
+                    historial = HistorialPrecio(
+                        producto_id=producto.id,
+                        precio_compra_anterior=producto.precio_compra,
+                        precio_compra_nuevo=det.precio_unitario,
+                        usuario_id=current_user.id,
+                        motivo='Actualización por compra pagada'
+                    )
+                    db.session.add(historial)
+                    producto.precio_compra = det.precio_unitario
             
             compra.stock_actualizado = True
         
@@ -878,17 +859,8 @@ def pagar_compra(id):
                 flash('Debe abrir una caja primero', 'danger')
                 return redirect(url_for('compras.pendientes_pago'))
 
-            # Calcular efectivo disponible igual que en caja/estado
-            from app.routes.caja import calcular_totales_por_forma_pago
-            from app.models import MovimientoCaja
-            totales = calcular_totales_por_forma_pago(apertura.id)
-            total_efectivo = apertura.monto_inicial + totales['efectivo']
-            egresos = MovimientoCaja.query.filter_by(
-                apertura_caja_id=apertura.id,
-                tipo='egreso'
-            ).all()
-            total_egresos = sum(m.monto for m in egresos)
-            disponible = total_efectivo - total_egresos
+            # Efectivo disponible igual que en caja/estado (desde los acumulados)
+            disponible = apertura.efectivo_disponible
             print(f"DEBUG: disponible={disponible}, monto={monto}", file=sys.stderr, flush=True)
             if disponible < monto:
                 flash('Fondos insuficientes en caja', 'danger')
@@ -906,6 +878,7 @@ def pagar_compra(id):
                 usuario_id=current_user.id
             )
             db.session.add(movimiento)
+            AperturaCaja.acumular(apertura.id, egresos=monto)
             db.session.flush()  # Obtener ID del movimiento
 
             # Crear registro de pago
@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app import db
-from app.models import ConfiguracionEmpresa, Usuario
+from app.models import ConfiguracionEmpresa, SecuenciaFactura, Usuario
 from app.routes.auth import admin_required
 
 bp = Blueprint('configuracion', __name__, url_prefix='/configuracion')
@@ -85,6 +85,9 @@ def actualizar_empresa():
                 file.save(filepath)
                 config.logo_url = f'uploads/{new_filename}'
         
+        # Aplicar el rango del timbrado a las secuencias de facturación
+        SecuenciaFactura.actualizar_rango(config.numero_establecimiento or '001',
+                                          int(config.numero_factura_hasta or 99999))
         db.session.commit()
         flash('Configuración de empresa actualizada correctamente', 'success')
     except Exception as e:
@@ -1,8 +1,18 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.perfiles_consulta import con_perfil
+from app.utils.busqueda_productos import filtrar_productos
+from app.utils.catalogo_memoria import obtener_catalogo, CatalogoProductos
+from app.utils.numeracion import siguiente_numero, proximo_numero
+from app.utils.inventario_fisico import (leer_archivo_conteo, leer_lecturas, cargar_cantidades, aplicar_conteo,
+                                         consulta_diferencias, resumen_diferencias, filas_diferencias,
+                                         bloquear_conteo, ENCABEZADOS_DIFERENCIAS)
+from app.utils.sincronizacion_productos import (parametros_sincronizacion, sello_productos, etag_catalogo,
+                                                catalogo_completo, pagina_catalogo, respuesta_json,
+                                                respuesta_no_modificada)
 from app import db
-from app.models import Producto, Categoria, MovimientoProducto, HistorialPrecio
+from app.models import Producto, Categoria, MovimientoProducto, HistorialPrecio, ConteoInventario
 from app.utils import registrar_bitacora
 from datetime import datetime
 
@@ -44,13 +54,7 @@ def listar():
     categoria_id = request.args.get('categoria_id', type=int)
     tipo = request.args.get('tipo', '')
     
-    query = Producto.query
-    
-    if search:
-        query = query.filter(
-            (Producto.nombre.ilike(f'%{search}%')) |
-            (Producto.codigo.ilike(f'%{search}%'))
-        )
+    query = filtrar_productos(con_perfil(Producto.query, 'productos'), search)
     
     if categoria_id:
         query = query.filter_by(categoria_id=categoria_id)
@@ -58,7 +62,7 @@ def listar():
     if tipo:
         query = query.filter_by(tipo_producto=tipo)
     
-    productos = query.order_by(Producto.nombre).paginate(
+    productos = query.paginate(
         page=page, per_page=20, error_out=False
     )
     
@@ -74,9 +78,8 @@ def listar():
 def crear():
     if request.method == 'POST':
         try:
-            codigo = Producto.generar_proximo_codigo()
             producto = Producto(
-                codigo=codigo,
+                codigo=siguiente_numero('producto'),
                 nombre=request.form.get('nombre'),
                 descripcion=request.form.get('descripcion'),
                 categoria_id=request.form.get('categoria_id'),
@@ -99,7 +102,7 @@ def crear():
             db.session.rollback()
             flash(f'Error al crear producto: {str(e)}', 'danger')
     categorias = Categoria.query.filter_by(activo=True).all()
-    proximo_codigo = Producto.generar_proximo_codigo()
+    proximo_codigo = proximo_numero('producto')
     return render_template('productos/crear.html', categorias=categorias, proximo_codigo=proximo_codigo)
 
 @bp.route('/<int:id>')
@@ -187,7 +190,7 @@ def ajustar_stock(id):
 @bp.route('/stock-bajo')
 @login_required
 def stock_bajo():
-    productos = Producto.query.filter(
+    productos = con_perfil(Producto.query, 'productos').filter(
         Producto.stock_actual <= Producto.stock_minimo,
         Producto.activo == True
     ).all()
@@ -201,11 +204,11 @@ def buscar():
     term = request.args.get('term', '')
     tipo = request.args.get('tipo', '')
     
-    query = Producto.query.filter(
-        Producto.activo == True,
-        (Producto.nombre.ilike(f'%{term}%')) |
-        (Producto.codigo.ilike(f'%{term}%'))
-    )
+    catalogo = obtener_catalogo(CatalogoProductos)
+    if catalogo is not None:
+        return jsonify(catalogo.autocompletar(term, tipo=tipo))
+    
+    query = filtrar_productos(Producto.query.filter(Producto.activo == True), term)
     
     if tipo:
         query = query.filter_by(tipo_producto=tipo)
@@ -230,16 +233,163 @@ def buscar():
 @bp.route('/api/productos')
 @login_required
 def api_productos():
-    """API endpoint para obtener todos los productos activos"""
-    productos = Producto.query.filter_by(activo=True).all()
-    
-    return jsonify([{
-        'id': p.id,
-        'codigo': p.codigo,
-        'nombre': p.nombre,
-        'precio_compra': float(p.precio_compra or 0),
-        'precio_venta': float(p.precio_venta or 0),
-        'stock_actual': float(p.stock_actual or 0),
-        'unidad_medida': p.unidad_medida or 'und'
-    } for p in productos])
+    """
+    Productos activos (JSON). Con since, cursor o limite, sincronización por
+    partes con bajas; ETag/304 y gzip (ver app.utils.sincronizacion_productos)
+    """
+    try:
+        parametros = parametros_sincronizacion(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    sello = sello_productos()
+    etag = etag_catalogo(sello, request.args)
+    if request.if_none_match.contains_weak(etag):
+        return respuesta_no_modificada(etag)
+    datos = catalogo_completo() if parametros is None else pagina_catalogo(parametros, sello)
+    return respuesta_json(datos, etag, 'gzip' in request.accept_encodings)
+
+
+
+# ===== INVENTARIO FÍSICO =====
+DIFERENCIAS_POR_PAGINA = 50
+
+@bp.route('/inventario')
+@login_required
+@require_roles('admin', 'tecnico')
+def inventario():
+    page = request.args.get('page', 1, type=int)
+    conteos = ConteoInventario.query.order_by(ConteoInventario.id.desc()).paginate(
+        page=page, per_page=20, error_out=False
+    )
+    return render_template('productos/inventario.html', conteos=conteos)
+
+@bp.route('/inventario/abrir', methods=['POST'])
+@login_required
+@require_roles('admin', 'tecnico')
+def abrir_conteo():
+    try:
+        conteo = ConteoInventario(
+            numero=siguiente_numero('conteo_inventario'),
+            descripcion=request.form.get('descripcion'),
+            completo=request.form.get('completo') == 'on',
+            observaciones=request.form.get('observaciones'),
+            usuario_id=current_user.id
+        )
+        db.session.add(conteo)
+        db.session.commit()
+        registrar_bitacora('abrir-conteo-inventario', f'Conteo de inventario abierto: {conteo.numero}')
+        flash(f'Conteo {conteo.numero} abierto', 'success')
+        return redirect(url_for('productos.ver_conteo', id=conteo.id))
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al abrir el conteo: {str(e)}', 'danger')
+    return redirect(url_for('productos.inventario'))
+
+@bp.route('/inventario/<int:id>')
+@login_required
+@require_roles('admin', 'tecnico')
+def ver_conteo(id):
+    conteo = ConteoInventario.query.get_or_404(id)
+    page = max(request.args.get('page', 1, type=int), 1)
+    solo_diferencias = request.args.get('solo_diferencias', '1') == '1'
+    orden = 'valor' if request.args.get('orden') == 'valor' else 'codigo'
+    filas = db.session.execute(
+        consulta_diferencias(conteo, solo_diferencias, orden)
+        .limit(DIFERENCIAS_POR_PAGINA + 1).offset((page - 1) * DIFERENCIAS_POR_PAGINA)
+    ).all()
+    return render_template('productos/inventario_conteo.html',
+                         conteo=conteo,
+                         resumen=resumen_diferencias(conteo),
+                         filas=filas[:DIFERENCIAS_POR_PAGINA],
+                         hay_siguiente=len(filas) > DIFERENCIAS_POR_PAGINA,
+                         page=page,
+                         solo_diferencias=solo_diferencias,
+                         orden=orden)
 
+@bp.route('/inventario/<int:id>/cargar', methods=['POST'])
+@login_required
+@require_roles('admin', 'tecnico')
+def cargar_conteo(id):
+    try:
+        archivo = request.files.get('archivo')
+        if archivo and archivo.filename:
+            cantidades = leer_archivo_conteo(archivo.stream, archivo.filename)
+        else:
+            cantidades = leer_lecturas(request.form.get('lecturas'))
+        if not cantidades:
+            raise ValueError('No se encontraron cantidades para cargar')
+        resultado = cargar_cantidades(id, cantidades, request.form.get('modo', 'reemplazar'))
+        db.session.commit()
+        flash(f"Cantidades cargadas: {resultado['productos']} productos "
+              f"({resultado['nuevos']} nuevos, {resultado['actualizados']} actualizados)", 'success')
+        if resultado['desconocidos']:
+            desconocidos = resultado['desconocidos']
+            flash(f"{len(desconocidos)} códigos no existen y se ignoraron: {', '.join(desconocidos[:20])}"
+                  f"{'...' if len(desconocidos) > 20 else ''}", 'warning')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al cargar las cantidades: {str(e)}', 'danger')
+    return redirect(url_for('productos.ver_conteo', id=id))
+
+@bp.route('/inventario/<int:id>/aplicar', methods=['POST'])
+@login_required
+@require_roles('admin', 'tecnico')
+def aplicar_conteo_inventario(id):
+    try:
+        resumen = aplicar_conteo(id, current_user.id)
+        db.session.commit()
+        conteo = db.session.get(ConteoInventario, id)
+        registrar_bitacora('aplicar-conteo-inventario',
+                           f"Conteo {conteo.numero} aplicado: {resumen['productos_ajustados']} productos ajustados, "
+                           f"+{resumen['unidades_sobrantes']} / -{resumen['unidades_faltantes']} unidades")
+        flash(f"Conteo aplicado: {resumen['productos_ajustados']} productos ajustados", 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Error al aplicar el conteo: {str(e)}', 'danger')
+    return redirect(url_for('productos.ver_conteo', id=id))
+
+@bp.route('/inventario/<int:id>/anular', methods=['POST'])
+@login_required
+@require_roles('admin', 'tecnico')
+def anular_conteo(id):
+    try:
+        conteo = bloquear_conteo(id)
+        conteo.estado = 'anulado'
+        db.session.commit()
+        registrar_bitacora('anular-conteo-inventario', f'Conteo de inventario anulado: {conteo.numero}')
+        flash(f'Conteo {conteo.numero} anulado', 'success')
+    except ValueError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    return redirect(url_for('productos.ver_conteo', id=id))
+
+@bp.route('/inventario/<int:id>/diferencias.<formato>')
+@login_required
+@require_roles('admin', 'tecnico')
+def exportar_diferencias(id, formato):
+    """Reporte de diferencias del conteo en CSV o XLSX (?todos=1 incluye los productos sin diferencia)"""
+    import os
+    from werkzeug.exceptions import NotFound
+    from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+    from app.utils.exportar_reportes import FORMATOS, escribir_csv, escribir_xlsx
+
+    if formato not in FORMATOS:
+        raise NotFound()
+    conteo = ConteoInventario.query.get_or_404(id)
+    filas = filas_diferencias(conteo, solo_diferencias=request.args.get('todos') != '1')
+    ruta = ruta_temporal('.' + formato)
+    try:
+        if formato == 'csv':
+            escribir_csv(ruta, ENCABEZADOS_DIFERENCIAS, filas)
+        else:
+            escribir_xlsx(ruta, f'Diferencias {conteo.numero}', ENCABEZADOS_DIFERENCIAS, filas)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return respuesta_archivo_temporal(ruta, f'diferencias_{conteo.numero}.{formato}', FORMATOS[formato])
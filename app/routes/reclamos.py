@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.numeracion import siguiente_numero
 from app import db
 from app.models.reclamo import Reclamo, ReclamoHistorial
 from app.models.cliente import Cliente
@@ -11,13 +12,6 @@ from datetime import datetime
 
 bp = Blueprint('reclamos', __name__, url_prefix='/servicios/reclamos')
 
-# Utilidad para generar número de reclamo
-
-def generar_numero_reclamo():
-    ultimo = Reclamo.query.order_by(Reclamo.id.desc()).first()
-    nro = f"REC-{(ultimo.id + 1 if ultimo else 1):06d}"
-    return nro
-
 @bp.route('/')
 @login_required
 @require_roles('admin', 'tecnico', 'recepcion')
@@ -29,7 +23,7 @@ def listar():
 @login_required
 def crear():
     if request.method == 'POST':
-        numero = generar_numero_reclamo()
+        numero = siguiente_numero('reclamo')
         cliente_id = request.form.get('cliente_id') or None
         documento_tipo = request.form.get('documento_tipo')
         documento_numero = request.form.get('documento_numero')
@@ -3,21 +3,32 @@ from flask import Blueprint, render_template, request, make_response, redirect,
 from flask_login import login_required
 from flask_login import current_user
 from app.utils.roles import require_roles
+from app.utils.cache_reportes import reporte_cacheado
+from app.utils.estilos_pdf import ESTILOS, estilo_tabla, membrete, datos_empresa
+from app.utils.perfiles_consulta import con_perfil
 from io import BytesIO
 from datetime import datetime, timedelta
+from sqlalchemy import func
 from reportlab.lib.pagesizes import A4, letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak
 from reportlab.pdfgen import canvas
 from app import db
-from app.models import Compra, Proveedor, Venta, Producto, Cliente, ConfiguracionEmpresa, OrdenServicio, AperturaCaja, Caja, Usuario, Reclamo
+from app.models import Compra, Proveedor, Venta, Producto, Cliente, ConfiguracionEmpresa, OrdenServicio, AperturaCaja, Caja, Usuario, Reclamo, VentaDiaria
 from app.models.servicio import Presupuesto
 
 
 # ==== BLUEPRINT ====
 bp = Blueprint('reportes', __name__, url_prefix='/reportes')
 
+# Columnas de series en el PDF de ventas por período (las demás se suman en "Resto")
+MAX_SERIES_PDF = 5
+
+# Filas por lote de las consultas de los listados PDF (se leen a medida que se arman las páginas)
+LOTE_PDF = 1000
+
+# Facturas por página del reporte de ventas en pantalla
+VENTAS_POR_PAGINA = 20
+
 # ==== RUTAS ====
 @bp.route('/personalizado', methods=['POST'], endpoint='reporte_personalizado')
 @login_required
@@ -55,96 +66,55 @@ def reporte_personalizado():
 
 @bp.route('/clientes/pdf', endpoint='clientes_pdf')
 @login_required
+@reporte_cacheado('clientes_pdf', ('clientes',))
 def clientes_pdf():
-    datos = []
-    clientes = Cliente.query.all()
-    for c in clientes:
-        datos.append([
-            c.id,
-            c.nombre,
-            c.documento,
-            c.telefono,
-            c.email,
-            c.direccion
-        ])
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=20)
-    elements.append(Paragraph("Reporte de Clientes", title_style))
-    elements.append(Spacer(1, 12))
-    data = [['ID', 'Nombre', 'Documento', 'Teléfono', 'Email', 'Dirección']] + datos
-    table = Table(data, colWidths=[40, 120, 80, 80, 120, 120])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980b9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#34495e')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=reporte_clientes.pdf'
-    return response
+    from app.utils.base_pdf import PDFReportBase
+    clientes = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.tipo_documento, Cliente.numero_documento,
+        Cliente.telefono, Cliente.email, Cliente.direccion
+    ).order_by(Cliente.id).yield_per(LOTE_PDF)
+    headers = ['ID', 'Nombre', 'Documento', 'Teléfono', 'Email', 'Dirección']
+    col_widths = [40, 120, 80, 80, 120, 120]
+    filas = ([
+        c.id,
+        c.nombre,
+        f"{c.tipo_documento} {c.numero_documento}",
+        c.telefono or '',
+        c.email or '',
+        c.direccion or ''
+    ] for c in clientes)
+    pdf = PDFReportBase("Reporte de Clientes", "reporte_clientes.pdf")
+    pdf.add_membrete()
+    pdf.add_title()
+    pdf.add_tabla(headers, filas, col_widths, color_encabezado='#2980b9')
+    return pdf.build()
 
 
 
 @bp.route('/productos/pdf')
 @login_required
+@reporte_cacheado('productos_pdf', ('productos',))
 def productos_pdf():
-    from io import BytesIO
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    productos = Producto.query.filter_by(activo=True).all()
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=20)
-    elements.append(Paragraph("Reporte de Productos", title_style))
-    elements.append(Spacer(1, 12))
-    data = [['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Precio Venta', 'Estado']]
-    for p in productos:
-        data.append([
-            p.codigo,
-            p.nombre,
-            f"{p.stock_actual:,.0f}",
-            f"{p.stock_minimo:,.0f}",
-            f"Gs. {p.precio_venta:,.2f}",
-            'Activo' if p.activo else 'Inactivo'
-        ])
-    table = Table(data, colWidths=[70, 180, 70, 70, 90, 70])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980b9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#34495e')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f9e79f')),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#2c3e50')),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
-        ('TOPPADDING', (0, -1), (-1, -1), 8),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=reporte_productos.pdf'
-    return response
+    from app.utils.base_pdf import PDFReportBase
+    productos = db.session.query(
+        Producto.codigo, Producto.nombre, Producto.stock_actual, Producto.stock_minimo,
+        Producto.precio_venta, Producto.activo
+    ).filter(Producto.activo.is_(True)).order_by(Producto.id).yield_per(LOTE_PDF)
+    headers = ['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Precio Venta', 'Estado']
+    col_widths = [70, 180, 70, 70, 90, 70]
+    filas = ([
+        p.codigo,
+        p.nombre,
+        f"{p.stock_actual or 0:,.0f}",
+        f"{p.stock_minimo or 0:,.0f}",
+        f"Gs. {p.precio_venta or 0:,.2f}",
+        'Activo' if p.activo else 'Inactivo'
+    ] for p in productos)
+    pdf = PDFReportBase("Reporte de Productos", "reporte_productos.pdf")
+    pdf.add_membrete()
+    pdf.add_title()
+    pdf.add_tabla(headers, filas, col_widths, color_encabezado='#2980b9')
+    return pdf.build()
 
 @bp.route('/caja')
 @login_required
@@ -167,6 +137,7 @@ def reportes_servicios():
 # =====================================================
 @bp.route('/proveedores/pdf')
 @login_required
+@reporte_cacheado('proveedores_pdf', ('proveedores',))
 def proveedores_pdf():
     fecha_desde = request.args.get('desde')
     fecha_hasta = request.args.get('hasta')
@@ -184,38 +155,22 @@ def proveedores_pdf():
             query = query.filter(Proveedor.fecha_registro <= fecha_hasta_dt)
         except Exception:
             pass
-    proveedores = query.all()
+    proveedores = query.yield_per(LOTE_PDF)
     from app.utils.base_pdf import PDFReportBase
-    empresa = ConfiguracionEmpresa.query.first()
     headers = ["Código", "RUC", "Razón Social", "Teléfono", "Email", "Estado"]
     col_widths = [60, 70, 150, 80, 120, 50]
-    table_data = [headers]
-    for p in proveedores:
-        table_data.append([
-            p.codigo,
-            p.ruc,
-            p.razon_social,
-            p.telefono or '',
-            p.email or '',
-            'Activo' if p.activo else 'Inactivo'
-        ])
-    pdf = PDFReportBase(empresa, "Reporte de Proveedores", "reporte_proveedores.pdf")
+    filas = ([
+        p.codigo,
+        p.ruc,
+        p.razon_social,
+        p.telefono or '',
+        p.email or '',
+        'Activo' if p.activo else 'Inactivo'
+    ] for p in proveedores)
+    pdf = PDFReportBase("Reporte de Proveedores", "reporte_proveedores.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    pdf.elements.append(table)
+    pdf.add_tabla(headers, filas, col_widths, color_encabezado='#27ae60', tamano_fuente=9)
     return pdf.build()
 
 # =====================================================
@@ -223,10 +178,11 @@ def proveedores_pdf():
 # =====================================================
 @bp.route('/reclamos/pdf')
 @login_required
+@reporte_cacheado('reclamos_pdf', ('reclamos', 'clientes'))
 def reclamos_pdf():
     fecha_desde = request.args.get('desde')
     fecha_hasta = request.args.get('hasta')
-    query = Reclamo.query
+    query = con_perfil(Reclamo.query, 'reclamos')
     if fecha_desde:
         try:
             fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
@@ -240,44 +196,27 @@ def reclamos_pdf():
             query = query.filter(Reclamo.fecha_creacion <= fecha_hasta_dt)
         except Exception:
             pass
-    reclamos = query.all()
+    reclamos = query.yield_per(LOTE_PDF)
     from app.utils.base_pdf import PDFReportBase
-    empresa = ConfiguracionEmpresa.query.first()
     headers = ["N° Reclamo", "Fecha", "Cliente", "Tipo", "Prioridad", "Estado"]
     col_widths = [70, 70, 140, 100, 70, 80]
-    table_data = [headers]
-    for r in reclamos:
-        cliente_nombre = ''
-        if r.cliente_id:
-            cliente = Cliente.query.get(r.cliente_id)
-            if cliente:
-                cliente_nombre = cliente.nombre
-        fecha_str = r.fecha_creacion.strftime('%d/%m/%Y') if r.fecha_creacion else ''
-        table_data.append([
-            r.numero,
-            fecha_str,
-            cliente_nombre,
-            r.tipo_reclamo or '',
-            (r.prioridad or '').capitalize(),
-            (r.estado or '').capitalize()
-        ])
-    pdf = PDFReportBase(empresa, "Reporte de Reclamos", "reporte_reclamos.pdf")
+
+    def filas():
+        for r in reclamos:
+            cliente_nombre = r.cliente.nombre if r.cliente else ''
+            fecha_str = r.fecha_creacion.strftime('%d/%m/%Y') if r.fecha_creacion else ''
+            yield [
+                r.numero,
+                fecha_str,
+                cliente_nombre,
+                r.tipo_reclamo or '',
+                (r.prioridad or '').capitalize(),
+                (r.estado or '').capitalize()
+            ]
+    pdf = PDFReportBase("Reporte de Reclamos", "reporte_reclamos.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e74c3c')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    pdf.elements.append(table)
+    pdf.add_tabla(headers, filas(), col_widths, color_encabezado='#e74c3c', tamano_fuente=9)
     return pdf.build()
 
 # =====================================================
@@ -285,10 +224,11 @@ def reclamos_pdf():
 # =====================================================
 @bp.route('/presupuestos-sin-aprobar/pdf')
 @login_required
+@reporte_cacheado('presupuestos_sin_aprobar_pdf', ('presupuestos', 'solicitudes_servicio', 'clientes'))
 def presupuestos_sin_aprobar_pdf():
     fecha_desde = request.args.get('desde')
     fecha_hasta = request.args.get('hasta')
-    query = Presupuesto.query.filter(Presupuesto.estado != 'aprobado')
+    query = con_perfil(Presupuesto.query, 'presupuestos').filter(Presupuesto.estado != 'aprobado')
     if fecha_desde:
         try:
             fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
@@ -302,41 +242,28 @@ def presupuestos_sin_aprobar_pdf():
             query = query.filter(Presupuesto.fecha_emision <= fecha_hasta_dt)
         except Exception:
             pass
-    presupuestos = query.all()
+    presupuestos = query.yield_per(LOTE_PDF)
     from app.utils.base_pdf import PDFReportBase
-    empresa = ConfiguracionEmpresa.query.first()
     headers = ["N° Presup.", "Fecha", "Cliente", "Total (Gs.)", "Estado"]
     col_widths = [90, 80, 160, 100, 100]
-    table_data = [headers]
-    for p in presupuestos:
-        cliente_nombre = ''
-        if p.solicitud and p.solicitud.cliente:
-            cliente_nombre = p.solicitud.cliente.nombre
-        fecha_str = p.fecha_emision.strftime('%d/%m/%Y') if p.fecha_emision else ''
-        table_data.append([
-            p.numero_presupuesto,
-            fecha_str,
-            cliente_nombre,
-            f"{p.total:,.0f}" if p.total else "0",
-            (p.estado or '').capitalize()
-        ])
-    pdf = PDFReportBase(empresa, "Reporte de Presupuestos Sin Aprobar", "reporte_presupuestos_sin_aprobar.pdf")
+
+    def filas():
+        for p in presupuestos:
+            cliente_nombre = ''
+            if p.solicitud and p.solicitud.cliente:
+                cliente_nombre = p.solicitud.cliente.nombre
+            fecha_str = p.fecha_emision.strftime('%d/%m/%Y') if p.fecha_emision else ''
+            yield [
+                p.numero_presupuesto,
+                fecha_str,
+                cliente_nombre,
+                f"{p.total:,.0f}" if p.total else "0",
+                (p.estado or '').capitalize()
+            ]
+    pdf = PDFReportBase("Reporte de Presupuestos Sin Aprobar", "reporte_presupuestos_sin_aprobar.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f39c12')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    pdf.elements.append(table)
+    pdf.add_tabla(headers, filas(), col_widths, color_encabezado='#f39c12', tamano_fuente=10)
     return pdf.build()
 
 
@@ -346,10 +273,11 @@ def presupuestos_sin_aprobar_pdf():
 # =====================================================
 @bp.route('/compras/pdf')
 @login_required
+@reporte_cacheado('compras_pdf', ('compras', 'proveedores'))
 def compras_pdf():
     fecha_desde = request.args.get('desde')
     fecha_hasta = request.args.get('hasta')
-    query = Compra.query
+    query = con_perfil(Compra.query, 'compras')
     if fecha_desde:
         try:
             fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
@@ -363,44 +291,29 @@ def compras_pdf():
             query = query.filter(Compra.fecha_compra <= fecha_hasta_dt)
         except Exception:
             pass
-    compras = query.all()
+    compras = query.yield_per(LOTE_PDF)
     from app.utils.base_pdf import PDFReportBase
-    from app.utils.tabla_pdf import build_pdf_table
-    empresa = ConfiguracionEmpresa.query.first()
     headers = ["N° Compra", "Proveedor", "Fecha", "Total", "Estado"]
     # Ajuste para A4: suma total ~500 puntos
     col_widths = [80, 140, 80, 100, 100]
-    table_data = [headers]
-    for c in compras:
-        proveedor = c.proveedor.razon_social if c.proveedor else ''
-        fecha = c.fecha_compra.strftime('%d/%m/%Y') if c.fecha_compra else ''
-        total = f"Gs. {c.total:,.0f}" if c.total else ''
-        estado = c.estado.capitalize() if c.estado else ''
-        table_data.append([
-            c.numero_compra,
-            proveedor,
-            fecha,
-            total,
-            estado
-        ])
-    pdf = PDFReportBase(empresa, "Reporte de Compras", "reporte_compras.pdf")
+
+    def filas():
+        for c in compras:
+            proveedor = c.proveedor.razon_social if c.proveedor else ''
+            fecha = c.fecha_compra.strftime('%d/%m/%Y') if c.fecha_compra else ''
+            total = f"Gs. {c.total:,.0f}" if c.total else ''
+            estado = c.estado.capitalize() if c.estado else ''
+            yield [
+                c.numero_compra,
+                proveedor,
+                fecha,
+                total,
+                estado
+            ]
+    pdf = PDFReportBase("Reporte de Compras", "reporte_compras.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    # Usar fuente más pequeña en la tabla para mayor contenido
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#27ae60')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    pdf.elements.append(table)
+    pdf.add_tabla(headers, filas(), col_widths, color_encabezado='#27ae60', tamano_fuente=10)
     return pdf.build()
 
 # =====================================================
@@ -408,50 +321,36 @@ def compras_pdf():
 # =====================================================
 @bp.route('/compras-pendientes-pago/pdf')
 @login_required
+@reporte_cacheado('compras_pendientes_pago_pdf', ('compras', 'proveedores'))
 def compras_pendientes_pago_pdf():
     # Match web view: show compras with estado 'registrada' or 'parcial_pagada'
-    query = Compra.query.filter(Compra.estado.in_(['registrada', 'parcial_pagada']))
-    compras = query.all()
+    query = con_perfil(Compra.query, 'compras_con_pagado').filter(Compra.estado.in_(['registrada', 'parcial_pagada']))
+    compras = query.yield_per(LOTE_PDF)
     from app.utils.base_pdf import PDFReportBase
-    from app.utils.tabla_pdf import build_pdf_table
-    empresa = ConfiguracionEmpresa.query.first()
     headers = ["N° Compra", "Proveedor", "Fecha", "Total", "Saldo Pendiente", "Estado"]
     # Ajuste para A4: suma total ~500 puntos
     col_widths = [70, 120, 70, 80, 80, 80]
-    table_data = [headers]
-    for c in compras:
-        proveedor = c.proveedor.razon_social if c.proveedor else ''
-        fecha = c.fecha_compra.strftime('%d/%m/%Y') if c.fecha_compra else ''
-        total = f"Gs. {c.total:,.0f}" if c.total else ''
-        saldo_pendiente = c.monto_pendiente() if hasattr(c, 'monto_pendiente') else ''
-        saldo = f"Gs. {saldo_pendiente:,.0f}" if saldo_pendiente else ''
-        estado = c.estado.capitalize() if c.estado else ''
-        table_data.append([
-            c.numero_compra,
-            proveedor,
-            fecha,
-            total,
-            saldo,
-            estado
-        ])
-    pdf = PDFReportBase(empresa, "Compras Pendientes de Pago", "compras_pendientes_pago.pdf")
+
+    def filas():
+        for c in compras:
+            proveedor = c.proveedor.razon_social if c.proveedor else ''
+            fecha = c.fecha_compra.strftime('%d/%m/%Y') if c.fecha_compra else ''
+            total = f"Gs. {c.total:,.0f}" if c.total else ''
+            saldo_pendiente = c.monto_pendiente() if hasattr(c, 'monto_pendiente') else ''
+            saldo = f"Gs. {saldo_pendiente:,.0f}" if saldo_pendiente else ''
+            estado = c.estado.capitalize() if c.estado else ''
+            yield [
+                c.numero_compra,
+                proveedor,
+                fecha,
+                total,
+                saldo,
+                estado
+            ]
+    pdf = PDFReportBase("Compras Pendientes de Pago", "compras_pendientes_pago.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    # Usar fuente más pequeña en la tabla para mayor contenido
-    from reportlab.platypus import Table, TableStyle
-    from reportlab.lib import colors
-    table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e67e22')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    pdf.elements.append(table)
+    pdf.add_tabla(headers, filas(), col_widths, color_encabezado='#e67e22', tamano_fuente=10)
     return pdf.build()
 
 # =====================================================
@@ -459,29 +358,14 @@ def compras_pendientes_pago_pdf():
 # =====================================================
 @bp.route('/servicios/pdf')
 @login_required
+@reporte_cacheado('servicios_pdf', ('ordenes_servicio', 'solicitudes_servicio', 'tipos_servicio', 'clientes', 'usuarios'))
 def servicios_pdf():
-    from app.models import Venta, OrdenServicio
     fecha_desde = request.args.get('desde')
     fecha_hasta = request.args.get('hasta')
     # Filtro de fechas
 
-    # Mostrar todas las fechas de ordenes existentes sin filtro
-    from app.models import OrdenServicio
-    todas_ordenes = OrdenServicio.query.all()
-    print(f"[DEBUG] Fechas de TODAS las ordenes de servicio en la base de datos:")
-    for o in todas_ordenes:
-        print(f"  - {o.numero_orden}: {o.fecha_orden} (type: {type(o.fecha_orden)})")
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    styles = getSampleStyleSheet()
-    elements = []
-    empresa = ConfiguracionEmpresa.query.first()
-    nombre = empresa.nombre_empresa if empresa else 'Juguetería'
-    ruc = empresa.ruc if empresa else 'N/A'
     from app.utils.base_pdf import PDFReportBase
-    from app.utils.tabla_pdf import build_pdf_table
-    direccion = empresa.direccion if empresa else ''
-    from app.models import Venta, SolicitudServicio
+    from app.models import SolicitudServicio
     query = SolicitudServicio.query
     if fecha_desde:
         try:
@@ -496,26 +380,27 @@ def servicios_pdf():
             query = query.filter(SolicitudServicio.fecha_solicitud <= fecha_hasta_dt)
         except Exception:
             pass
-    solicitudes = query.all()
+    solicitudes = query.yield_per(LOTE_PDF)
     headers = ["N° Solicitud", "Prioridad", "Precio", "Fecha Estimada", "Estado"]
     col_widths = [110, 90, 110, 110, 110]
-    table_data = [headers]
-    for s in solicitudes:
-        prioridad = s.prioridad.capitalize() if s.prioridad else ''
-        precio = s.total_estimado if s.total_estimado else ''
-        fecha_estimada = s.fecha_estimada.strftime('%d/%m/%Y') if s.fecha_estimada else ''
-        estado = s.estado.capitalize() if s.estado else ''
-        table_data.append([
-            s.numero_solicitud,
-            prioridad,
-            f"Gs. {precio:,.0f}" if precio else '',
-            fecha_estimada,
-            estado
-        ])
-    pdf = PDFReportBase(empresa, "Servicios por Fecha y Prioridad", "servicios_por_fecha.pdf")
+
+    def filas():
+        for s in solicitudes:
+            prioridad = s.prioridad.capitalize() if s.prioridad else ''
+            precio = s.total_estimado if s.total_estimado else ''
+            fecha_estimada = s.fecha_estimada.strftime('%d/%m/%Y') if s.fecha_estimada else ''
+            estado = s.estado.capitalize() if s.estado else ''
+            yield [
+                s.numero_solicitud,
+                prioridad,
+                f"Gs. {precio:,.0f}" if precio else '',
+                fecha_estimada,
+                estado
+            ]
+    pdf = PDFReportBase("Servicios por Fecha y Prioridad", "servicios_por_fecha.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    pdf.elements.append(build_pdf_table(table_data, col_widths, header_color='#3498db'))
+    pdf.add_tabla(headers, filas(), col_widths, color_encabezado='#3498db')
     return pdf.build()
 # Endpoint para buscar aperturas de caja cerradas por fecha (AJAX)
 @bp.route('/cajas-cerradas')
@@ -532,7 +417,7 @@ def cajas_cerradas():
     except Exception:
         return jsonify([])
     dia_siguiente = fecha_dt + timedelta(days=1)
-    aperturas = AperturaCaja.query.filter(
+    aperturas = con_perfil(AperturaCaja.query, 'aperturas_caja').filter(
         AperturaCaja.fecha_apertura >= fecha_dt,
         AperturaCaja.fecha_apertura < dia_siguiente,
         AperturaCaja.estado == 'cerrada'
@@ -551,16 +436,23 @@ def cajas_cerradas():
 # =====================================================
 # HELPERS PDF
 # =====================================================
-def membrete(elements, styles, empresa: ConfiguracionEmpresa | None):
-    nombre = empresa.nombre_empresa if empresa else 'JUGUETERÍA'
-    ruc = empresa.ruc if empresa else 'N/A'
-    direccion = empresa.direccion if empresa else ''
-
-    elements.append(Paragraph(f"<b>{nombre}</b>", styles['Title']))
-    elements.append(Paragraph("El Mundo Feliz", styles['Normal']))
-    elements.append(Paragraph(f"RUC: {ruc}", styles['Normal']))
-    elements.append(Paragraph(direccion, styles['Normal']))
-    elements.append(Spacer(1, 12))
+def _respuesta_reporte(nombre, parametros, url_error):
+    """Genera en línea un reporte de app.utils.generadores_reporte y lo devuelve como descarga"""
+    import os
+    from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+    from app.utils.generadores_reporte import GENERADORES, generar_reporte
+
+    ruta = ruta_temporal(GENERADORES[nombre][1])
+    try:
+        nombre_descarga, mimetype = generar_reporte(nombre, ruta, parametros.to_dict())
+    except ValueError:
+        os.remove(ruta)
+        flash('Parámetros de filtro inválidos', 'danger')
+        return redirect(url_error)
+    except Exception:
+        os.remove(ruta)
+        raise
+    return respuesta_archivo_temporal(ruta, nombre_descarga, mimetype)
 
 
 # =====================================================
@@ -579,7 +471,12 @@ def index():
     anio_actual = hoy.year
     primer_dia = hoy.replace(day=1).strftime('%Y-%m-%d')
     hoy_str = hoy.strftime('%Y-%m-%d')
-    return render_template('reportes/index.html', mes_actual=mes_actual, anio_actual=anio_actual, primer_dia=primer_dia, hoy_str=hoy_str)
+    from app.utils.exportar_reportes import REPORTES
+    from app.utils.series_tiempo import GRANULARIDADES, DIMENSIONES
+    from app.utils.cubo_ventas import DIMENSIONES as DIMENSIONES_CUBO, MEDIDAS as MEDIDAS_CUBO
+    return render_template('reportes/index.html', mes_actual=mes_actual, anio_actual=anio_actual, primer_dia=primer_dia, hoy_str=hoy_str,
+                           exportaciones=REPORTES, granularidades=GRANULARIDADES, dimensiones=DIMENSIONES,
+                           dimensiones_cubo=DIMENSIONES_CUBO, medidas_cubo=MEDIDAS_CUBO)
 
 
 # =====================================================
@@ -600,14 +497,21 @@ def ventas():
 
     fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
     fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d')
+    page = request.args.get('page', 1, type=int)
 
-    ventas = Venta.query.filter(
+    # Días completos, igual que el resumen diario del que sale el total
+    ventas = con_perfil(Venta.query, 'ventas').filter(
         Venta.fecha_venta >= fecha_desde_dt,
-        Venta.fecha_venta <= fecha_hasta_dt,
+        Venta.fecha_venta < fecha_hasta_dt + timedelta(days=1),
         Venta.estado == 'completada'
-    ).all()
+    ).order_by(Venta.fecha_venta.desc(), Venta.id.desc()).paginate(
+        page=page, per_page=VENTAS_POR_PAGINA, error_out=False
+    )
 
-    total = sum(v.total for v in ventas)
+    total = db.session.query(func.coalesce(func.sum(VentaDiaria.total), 0)).filter(
+        VentaDiaria.fecha >= fecha_desde_dt.date(),
+        VentaDiaria.fecha <= fecha_hasta_dt.date()
+    ).scalar()
 
     return render_template(
         'reportes/ventas.html',
@@ -623,118 +527,9 @@ def ventas():
 # =====================================================
 @bp.route('/ventas/pdf')
 @login_required
+@reporte_cacheado('ventas_pdf', ('ventas', 'clientes', 'usuarios'))
 def ventas_pdf():
-
-    from datetime import datetime, date, timedelta
-    fecha_desde = request.args.get('fecha_desde')
-    fecha_hasta = request.args.get('fecha_hasta')
-    hoy = date.today()
-    # Si no se especifica, usar el mes actual
-    if not fecha_desde:
-        fecha_desde_dt = hoy.replace(day=1)
-        fecha_desde = fecha_desde_dt.strftime('%Y-%m-%d')
-    else:
-        fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
-    if not fecha_hasta:
-        # último día del mes actual
-        next_month = hoy.replace(day=28) + timedelta(days=4)
-        fecha_hasta_dt = next_month - timedelta(days=next_month.day)
-        fecha_hasta = fecha_hasta_dt.strftime('%Y-%m-%d')
-    else:
-        fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d')
-
-    query = Venta.query
-    query = query.filter(Venta.fecha_venta >= fecha_desde_dt)
-    query = query.filter(Venta.fecha_venta <= fecha_hasta_dt)
-    query = query.filter(Venta.estado == 'completada')
-    ventas = query.all()
-
-    empresa = ConfiguracionEmpresa.query.first()
-
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        alignment=1,
-        spaceAfter=20,
-        textColor=colors.HexColor('#2c3e50'),
-        backColor=colors.HexColor('#f4f6f7'),
-    )
-
-    membrete(elements, styles, empresa)
-
-    # Traducir mes al español
-    meses_es = [
-        'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
-        'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
-    ]
-    periodo_str = f"{fecha_desde_dt.strftime('%d/%m/%Y')} al {fecha_hasta_dt.strftime('%d/%m/%Y')}"
-    if fecha_desde_dt.day == 1 and fecha_hasta_dt.day in [28,29,30,31] and fecha_desde_dt.month == fecha_hasta_dt.month:
-        mes = meses_es[fecha_desde_dt.month - 1]
-        periodo_str = f"{mes.capitalize()} {fecha_desde_dt.year}"
-
-    # Encabezado de período mejorado
-    elements.append(
-        Paragraph(
-            f"<b>Reporte de Ventas</b>", title_style
-        )
-    )
-    elements.append(Spacer(1, 8))
-    periodo_style = ParagraphStyle(
-        'Periodo', parent=styles['Normal'], fontSize=14, alignment=1,
-        textColor=colors.HexColor('#2980b9'), spaceAfter=12
-    )
-    elements.append(Paragraph(f"Período: {periodo_str}", periodo_style))
-    elements.append(Spacer(1, 10))
-
-    # Ajustar ancho de columnas para que no se salga el texto
-    data = [['Factura', 'Fecha', 'Cliente', 'Vendedor', 'Total']]
-    for v in ventas:
-        cliente = v.cliente.nombre if hasattr(v, 'cliente') and v.cliente else str(v.cliente_id)
-        vendedor = v.vendedor.nombre_completo if hasattr(v, 'vendedor') and v.vendedor else str(v.vendedor_id)
-        data.append([
-            v.numero_factura,
-            v.fecha_venta.strftime('%d/%m/%Y'),
-            cliente[:30],
-            vendedor[:30],
-            f"Gs. {v.total:,.0f}"
-        ])
-
-    total = sum(v.total for v in ventas)
-    data.append(['', '', '', 'TOTAL', f"Gs. {total:,.0f}"])
-
-    table = Table(data, colWidths=[100, 70, 120, 120, 80])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2980b9')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#34495e')),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f9e79f')),
-        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#2c3e50')),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('TOPPADDING', (0, 0), (-1, 0), 8),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
-        ('TOPPADDING', (0, -1), (-1, -1), 8),
-    ]))
-
-    elements.append(table)
-    doc.build(elements)
-
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = (
-        f'attachment; filename=reporte_ventas_{fecha_desde}_{fecha_hasta}.pdf'
-    )
-    return response
+    return _respuesta_reporte('ventas_pdf', request.args, url_for('reportes.index'))
 
 
 # =====================================================
@@ -765,28 +560,27 @@ def productos_stock_bajo():
 # =====================================================
 @bp.route('/productos-stock-bajo/pdf')
 @login_required
+@reporte_cacheado('productos_stock_bajo_pdf', ('productos',))
 def productos_stock_bajo_pdf():
     from app.utils.base_pdf import PDFReportBase
-    from app.utils.tabla_pdf import build_pdf_table
-    productos = Producto.query.filter(
+    productos = db.session.query(
+        Producto.codigo, Producto.nombre, Producto.stock_actual, Producto.stock_minimo
+    ).filter(
         Producto.stock_actual <= Producto.stock_minimo,
         Producto.activo.is_(True)
-    ).all()
-    empresa = ConfiguracionEmpresa.query.first()
+    ).yield_per(LOTE_PDF)
     headers = ["Código", "Nombre", "Stock Actual", "Stock Mínimo"]
     col_widths = [90, 260, 90, 90]
-    table_data = [headers]
-    for p in productos:
-        table_data.append([
-            p.codigo,
-            p.nombre,
-            str(p.stock_actual),
-            str(p.stock_minimo)
-        ])
-    pdf = PDFReportBase(empresa, "Productos con Stock Bajo", "productos_stock_bajo.pdf")
+    filas = ([
+        p.codigo,
+        p.nombre,
+        str(p.stock_actual),
+        str(p.stock_minimo)
+    ] for p in productos)
+    pdf = PDFReportBase("Productos con Stock Bajo", "productos_stock_bajo.pdf")
     pdf.add_membrete()
     pdf.add_title()
-    pdf.elements.append(build_pdf_table(table_data, col_widths, header_color='#e74c3c'))
+    pdf.add_tabla(headers, filas, col_widths, color_encabezado='#e74c3c')
     return pdf.build()
 
 # =====================================================
@@ -804,7 +598,7 @@ def servicios():
         datetime.now().strftime('%Y-%m-%d')
     )
 
-    ordenes = OrdenServicio.query.filter(
+    ordenes = con_perfil(OrdenServicio.query, 'ordenes_servicio').filter(
         OrdenServicio.fecha_orden >= fecha_desde,
         OrdenServicio.fecha_orden <= fecha_hasta
     ).all()
@@ -823,20 +617,16 @@ def servicios():
 @bp.route('/clientes')
 @login_required
 def clientes():
-    clientes = Cliente.query.filter_by(activo=True).all()
-
-    datos = []
-    for c in clientes:
-        ventas = [v for v in c.ventas if v.estado == 'completada']
-        datos.append({
-            'cliente': c,
-            'cantidad': len(ventas),
-            'total': sum(v.total for v in ventas)
-        })
-
-    datos.sort(key=lambda x: x['total'], reverse=True)
+    from app.utils.ranking_clientes import parametros_ranking_clientes, ranking_clientes, POR_PAGINA
+    try:
+        filtros = parametros_ranking_clientes(request.args)
+    except ValueError:
+        flash('Parámetros de filtro inválidos', 'danger')
+        return redirect(url_for('reportes.clientes'))
+    datos, siguiente = ranking_clientes(limite=POR_PAGINA, **filtros)
 
-    return render_template('reportes/clientes.html', datos_clientes=datos)
+    return render_template('reportes/clientes.html', datos_clientes=datos, filtros=filtros,
+                           siguiente_cursor=siguiente)
 
 
 # =====================================================
@@ -846,7 +636,7 @@ def clientes():
 @login_required
 def factura_pdf(venta_id):
     venta = Venta.query.get_or_404(venta_id)
-    empresa = ConfiguracionEmpresa.get_config()
+    empresa = datos_empresa() or ConfiguracionEmpresa.get_config()
 
     buffer = BytesIO()
     c = canvas.Canvas(buffer, pagesize=letter)
@@ -909,89 +699,61 @@ def factura_pdf(venta_id):
 # =====================================================
 @bp.route('/ventas-cliente/pdf')
 @login_required
+@reporte_cacheado('ventas_cliente_pdf', ('ventas', 'clientes'))
 def ventas_cliente_pdf():
-    ventas = Venta.query.filter(Venta.estado == 'completada').all()
-    clientes = {}
-    for v in ventas:
-        nombre = v.cliente.nombre
-        if nombre not in clientes:
-            clientes[nombre] = {'cantidad': 0, 'total': 0}
-        clientes[nombre]['cantidad'] += 1
-        clientes[nombre]['total'] += v.total
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    membrete(elements, styles, ConfiguracionEmpresa.query.first())
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=16)
-    elements.append(Paragraph("Reporte de Ventas por Cliente", title_style))
-    elements.append(Spacer(1, 12))
-    table_data = [['Cliente', 'Cantidad de Compras', 'Total Comprado']]
-    for nombre, info in sorted(clientes.items(), key=lambda x: x[1]['total'], reverse=True):
-        table_data.append([nombre, info['cantidad'], f"Gs. {info['total']:,.0f}"])
-    table = Table(table_data, colWidths=[320, 150, 150])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 13),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=ventas_cliente.pdf'
-    return response
+    return _respuesta_reporte('ventas_cliente_pdf', request.args, url_for('reportes.clientes'))
+
+# =====================================================
+# PRODUCTOS MÁS VENDIDOS (HTML / PDF / JSON)
+# =====================================================
+def _ranking_productos_desde_request():
+    """Filtros del request y ranking, o (None, None) si los parámetros no son válidos"""
+    from app.utils.ranking_productos import parametros_ranking, productos_mas_vendidos
+    try:
+        filtros = parametros_ranking(request.args)
+    except ValueError:
+        return None, None
+    return filtros, productos_mas_vendidos(**filtros)
+
+
+@bp.route('/productos-mas-vendidos')
+@login_required
+def productos_mas_vendidos():
+    from app.models.producto import Categoria
+    filtros, ranking = _ranking_productos_desde_request()
+    if filtros is None:
+        flash('Parámetros de filtro inválidos', 'danger')
+        return redirect(url_for('reportes.productos_mas_vendidos'))
+    categorias = Categoria.query.filter_by(activo=True).order_by(Categoria.nombre).all()
+    return render_template('reportes/productos_mas_vendidos.html', ranking=ranking,
+                           filtros=filtros, categorias=categorias)
+
+
+@bp.route('/api/productos-mas-vendidos')
+@login_required
+def api_productos_mas_vendidos():
+    filtros, ranking = _ranking_productos_desde_request()
+    if filtros is None:
+        return jsonify({'error': 'Parámetros de filtro inválidos'}), 400
+    return jsonify({
+        'desde': filtros['desde'].isoformat() if filtros['desde'] else None,
+        'hasta': filtros['hasta'].isoformat() if filtros['hasta'] else None,
+        'categoria_id': filtros['categoria_id'],
+        'top': filtros['top'],
+        'productos': [dict(p, cantidad=float(p['cantidad']), total=float(p['total'])) for p in ranking],
+    })
+
 
 @bp.route('/productos-mas-vendidos/pdf')
 @login_required
+@reporte_cacheado('productos_mas_vendidos_pdf', ('ventas', 'venta_detalles', 'productos', 'categorias'))
 def productos_mas_vendidos_pdf():
-    ventas = Venta.query.filter(Venta.estado == 'completada').all()
-    productos = {}
-    for v in ventas:
-        for d in v.detalles:
-            nombre = d.descripcion
-            if nombre not in productos:
-                productos[nombre] = {'cantidad': 0, 'total': 0}
-            productos[nombre]['cantidad'] += d.cantidad
-            productos[nombre]['total'] += d.total
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    membrete(elements, styles, ConfiguracionEmpresa.query.first())
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=16)
-    elements.append(Paragraph("Productos Más Vendidos", title_style))
-    elements.append(Spacer(1, 12))
-    table_data = [['Producto', 'Cantidad Vendida', 'Total Vendido']]
-    for nombre, info in sorted(productos.items(), key=lambda x: x[1]['cantidad'], reverse=True):
-        table_data.append([nombre, int(info['cantidad']), f"Gs. {info['total']:,.0f}"])
-    table = Table(table_data, colWidths=[200, 120, 120])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 13),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
-    elements.append(table)
-    doc.build(elements)
-    buffer.seek(0)
-    response = make_response(buffer.getvalue())
-    response.headers['Content-Type'] = 'application/pdf'
-    response.headers['Content-Disposition'] = 'attachment; filename=productos_mas_vendidos.pdf'
-    return response
+    return _respuesta_reporte('productos_mas_vendidos_pdf', request.args,
+                              url_for('reportes.productos_mas_vendidos'))
 
 @bp.route('/ventas-diarias/pdf')
 @login_required
+@reporte_cacheado('ventas_diarias_pdf', ('ventas', 'clientes'))
 def ventas_diarias_pdf():
     desde = request.args.get('desde')
     from datetime import datetime, timedelta
@@ -1002,7 +764,7 @@ def ventas_diarias_pdf():
         except Exception:
             desde_dt = None
 
-    query = Venta.query
+    query = con_perfil(Venta.query, 'ventas')
     if desde_dt:
         # Filtrar solo ese día
         dia_siguiente = desde_dt + timedelta(days=1)
@@ -1012,10 +774,8 @@ def ventas_diarias_pdf():
     ventas = query.all()
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    membrete(elements, styles, ConfiguracionEmpresa.query.first())
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=16)
+    elements = membrete()
+    title_style = ESTILOS['TituloReporte']
     fecha_str = desde_dt.strftime('%d/%m/%Y') if desde_dt else ''
     elements.append(Paragraph(f"Arqueo de Caja ({fecha_str})", title_style))
     elements.append(Spacer(1, 12))
@@ -1028,16 +788,7 @@ def ventas_diarias_pdf():
             f"Gs. {v.total:,.0f}"
         ])
     table = Table(table_data, colWidths=[90, 90, 200, 90])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 13),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
+    table.setStyle(estilo_tabla('encabezado', '#2c3e50'))
     elements.append(table)
     doc.build(elements)
     buffer.seek(0)
@@ -1048,41 +799,44 @@ def ventas_diarias_pdf():
 
 @bp.route('/ventas-periodo/pdf')
 @login_required
+@reporte_cacheado('ventas_periodo_pdf', ('ventas', 'ventas_diarias', 'venta_detalles', 'productos',
+                                         'categorias', 'cajas', 'usuarios'))
 def ventas_periodo_pdf():
-    desde = request.args.get('desde')
-    hasta = request.args.get('hasta')
-    ventas = Venta.query.filter(
-        Venta.fecha_venta >= desde,
-        Venta.fecha_venta <= hasta,
-        Venta.estado == 'completada'
-    ).all()
+    from app.utils.series_tiempo import parametros_serie, serie_ventas, GRANULARIDADES, DIMENSIONES
+    # Totales por período (semana por defecto) agrupados en la base, con los períodos sin ventas en cero
+    try:
+        parametros = parametros_serie(request.args, granularidad='semana')
+        serie = serie_ventas(max_series=MAX_SERIES_PDF, **parametros)
+    except ValueError as e:
+        flash(f'Parámetros inválidos: {e}', 'danger')
+        return redirect(url_for('reportes.index'))
+    desde, hasta = serie['desde'], serie['hasta']
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
-    elements = []
-    styles = getSampleStyleSheet()
-    membrete(elements, styles, ConfiguracionEmpresa.query.first())
-    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=16)
-    elements.append(Paragraph(f"Ventas por Período ({desde} a {hasta})", title_style))
+    elements = membrete()
+    elements.append(Paragraph(
+        f"Ventas por Período ({desde.strftime('%d/%m/%Y')} a {hasta.strftime('%d/%m/%Y')})",
+        ESTILOS['TituloReporte']
+    ))
+    agrupado = f"Agrupado por {GRANULARIDADES[serie['granularidad']].lower()}"
+    if serie['dimension']:
+        agrupado += f" y {DIMENSIONES[serie['dimension']].lower()}"
+    elements.append(Paragraph(agrupado, ESTILOS['Centrado']))
     elements.append(Spacer(1, 12))
-    table_data = [['Semana', 'Total']]
-    ventas_por_semana = {}
-    for v in ventas:
-        semana_key = v.fecha_venta.strftime('%Y-%U')
-        ventas_por_semana.setdefault(semana_key, 0)
-        ventas_por_semana[semana_key] += v.total
-    for k, total in ventas_por_semana.items():
-        table_data.append([f"Semana {k}", f"Gs. {total:,.0f}"])
-    table = Table(table_data, colWidths=[200, 120])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 13),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
+
+    series = serie['series'] if serie['dimension'] else []
+    table_data = [[GRANULARIDADES[serie['granularidad']]] + [s['nombre'][:18] for s in series] + ['Total']]
+    for i, etiqueta in enumerate(serie['etiquetas']):
+        table_data.append([etiqueta] + [f"Gs. {s['valores'][i]:,.0f}" for s in series]
+                          + [f"Gs. {serie['totales'][i]:,.0f}"])
+    table_data.append(['TOTAL'] + [f"Gs. {s['total']:,.0f}" for s in series] + [f"Gs. {serie['total']:,.0f}"])
+    if series:
+        ancho = (doc.width - 130) / (len(series) + 1)
+        table = Table(table_data, colWidths=[130] + [ancho] * (len(series) + 1), repeatRows=1)
+        table.setStyle(estilo_tabla('grilla', '#2c3e50', 8))
+    else:
+        table = Table(table_data, colWidths=[200, 120], repeatRows=1)
+        table.setStyle(estilo_tabla('encabezado', '#2c3e50'))
     elements.append(table)
     doc.build(elements)
     buffer.seek(0)
@@ -1090,3 +844,140 @@ def ventas_periodo_pdf():
     response.headers['Content-Type'] = 'application/pdf'
     response.headers['Content-Disposition'] = f'attachment; filename=ventas_periodo_{desde}_{hasta}.pdf'
     return response
+
+
+@bp.route('/api/series-ventas')
+@login_required
+def api_series_ventas():
+    """Serie de ventas por período para los gráficos (mismos parámetros que ventas_periodo_pdf)"""
+    from app.utils.series_tiempo import parametros_serie, serie_ventas, serie_a_json
+    try:
+        parametros = parametros_serie(request.args)
+        max_series = int(request.args.get('max_series') or 0) or None
+        serie = serie_ventas(max_series=max_series, **parametros)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(serie_a_json(serie))
+
+
+@bp.route('/api/cubo-ventas')
+@login_required
+def api_cubo_ventas():
+    """Ventas agrupadas por cualquier combinación de dimensiones, desde el cubo en memoria"""
+    from app.utils.cubo_ventas import parametros_cubo, obtener_cubo, consulta_a_json
+    try:
+        parametros = parametros_cubo(request.args)
+        cubo = obtener_cubo(recargar=request.args.get('recargar') == '1')
+        resultado = cubo.consultar(**parametros)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(consulta_a_json(resultado))
+
+
+# =====================================================
+# EXPORTACIÓN A CSV / EXCEL
+# =====================================================
+@bp.route('/exportar/<reporte>.<formato>')
+@login_required
+def exportar(reporte, formato):
+    """Cualquier reporte de app.utils.exportar_reportes como CSV o XLSX (?desde=&hasta= donde aplica)"""
+    import os
+    from werkzeug.exceptions import NotFound
+    from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+    from app.utils.exportar_reportes import REPORTES, FORMATOS, exportar_reporte
+
+    if reporte not in REPORTES or formato not in FORMATOS:
+        raise NotFound()
+    ruta = ruta_temporal('.' + formato)
+    try:
+        nombre_descarga, mimetype = exportar_reporte(reporte, formato, ruta, request.args.to_dict())
+    except ValueError:
+        os.remove(ruta)
+        flash('Parámetros de filtro inválidos', 'danger')
+        return redirect(url_for('reportes.index'))
+    except Exception:
+        os.remove(ruta)
+        raise
+    return respuesta_archivo_temporal(ruta, nombre_descarga, mimetype)
+
+
+# =====================================================
+# REPORTES EN SEGUNDO PLANO
+# =====================================================
+def _trabajo_del_usuario(trabajo_id):
+    from app.utils.trabajos_reporte import consultar_trabajo
+    trabajo = consultar_trabajo(trabajo_id)
+    if trabajo is None or (trabajo.usuario_id != current_user.id and current_user.rol != 'admin'):
+        return None
+    return trabajo
+
+
+@bp.route('/trabajos', methods=['GET', 'POST'])
+@login_required
+def trabajos():
+    from app.models import TrabajoReporte
+    from app.utils.generadores_reporte import GENERADORES
+    from app.utils.trabajos_reporte import encolar_reporte, limpiar_trabajos_vencidos, LimiteTrabajosError
+
+    quiere_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+    if request.method == 'POST':
+        datos = request.get_json(silent=True) or request.form.to_dict()
+        tipo = datos.pop('tipo', None)
+        try:
+            trabajo = encolar_reporte(tipo, datos, usuario_id=current_user.id)
+        except (ValueError, LimiteTrabajosError) as e:
+            if quiere_json:
+                return jsonify({'error': str(e)}), 429 if isinstance(e, LimiteTrabajosError) else 400
+            flash(str(e), 'danger')
+            return redirect(url_for('reportes.trabajos'))
+        if quiere_json:
+            return jsonify(dict(trabajo.to_dict(),
+                                url_estado=url_for('reportes.estado_trabajo', trabajo_id=trabajo.id),
+                                url_descarga=url_for('reportes.descargar_trabajo', trabajo_id=trabajo.id))), 202
+        flash(f'Reporte "{GENERADORES[tipo][0]}" en preparación', 'info')
+        return redirect(url_for('reportes.trabajos'))
+
+    limpiar_trabajos_vencidos()
+    lista = TrabajoReporte.query.filter_by(usuario_id=current_user.id).order_by(
+        TrabajoReporte.fecha_creacion.desc()
+    ).limit(50).all()
+    if quiere_json:
+        return jsonify([t.to_dict() for t in lista])
+    return render_template('reportes/trabajos.html', trabajos=lista, generadores=GENERADORES)
+
+
+@bp.route('/trabajos/<trabajo_id>')
+@login_required
+def estado_trabajo(trabajo_id):
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if trabajo is None:
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+    return jsonify(trabajo.to_dict())
+
+
+@bp.route('/trabajos/<trabajo_id>/descargar')
+@login_required
+def descargar_trabajo(trabajo_id):
+    import os
+    from flask import send_file
+    trabajo = _trabajo_del_usuario(trabajo_id)
+    if trabajo is None or trabajo.estado != 'terminado' or not trabajo.ruta_archivo \
+            or not os.path.exists(trabajo.ruta_archivo):
+        flash('El reporte no está disponible (todavía en preparación, con error o vencido)', 'warning')
+        return redirect(url_for('reportes.trabajos'))
+    return send_file(trabajo.ruta_archivo, mimetype=trabajo.mimetype, as_attachment=True,
+                     download_name=trabajo.nombre_archivo)
+
+
+# =====================================================
+# CACHE DE REPORTES
+# =====================================================
+@bp.route('/cache', methods=['GET', 'POST'])
+@login_required
+@require_roles('admin')
+def cache_reportes():
+    """GET: aciertos/fallos y uso del cache (JSON). POST: vacía el cache."""
+    from app.utils.cache_reportes import estadisticas_cache, vaciar_cache
+    if request.method == 'POST':
+        return jsonify({'eliminadas': vaciar_cache()})
+    return jsonify(estadisticas_cache())
@@ -3,12 +3,14 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.perfiles_consulta import con_perfil
 from app import db
 from app.models import (TipoServicio, SolicitudServicio, Presupuesto, PresupuestoDetalle,
                         OrdenServicio, OrdenServicioDetalle, Reclamo, ReclamoSeguimiento,
                         Cliente, Producto, Venta, VentaDetalle, Usuario)
 from datetime import datetime, date
 from app.utils import registrar_bitacora
+from app.utils.numeracion import siguiente_numero
 
 bp = Blueprint('servicios', __name__, url_prefix='/servicios')
 
@@ -154,7 +156,7 @@ def solicitudes():
     page = request.args.get('page', 1, type=int)
     estado = request.args.get('estado', '')
     
-    query = SolicitudServicio.query
+    query = con_perfil(SolicitudServicio.query, 'solicitudes_servicio')
     
     if estado:
         query = query.filter_by(estado=estado)
@@ -213,8 +215,7 @@ def crear_solicitud():
             
             # Si hay suficiente stock, continuar
             # Generar número de solicitud
-            ultimo = SolicitudServicio.query.order_by(SolicitudServicio.id.desc()).first()
-            numero = f"SOL-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('solicitud_servicio')
 
             # Procesar líneas
             cliente_id = request.form.get('cliente_id')
@@ -359,6 +360,8 @@ def aprobar_solicitud(id):
         subtotal_general = 0  # Suma de precios IVA incluido
         iva_10_monto = 0
         iva_5_monto = 0
+        gravada_10_monto = 0
+        gravada_5_monto = 0
         subtotal_exentas = 0
         
         numero_provisorio = f"TMP-{solicitud.numero_solicitud}"
@@ -408,9 +411,11 @@ def aprobar_solicitud(id):
             if tipo_iva == '10':
                 iva_linea = subtotal_linea / 11  # IVA incluido al 10%
                 iva_10_monto += iva_linea
+                gravada_10_monto += subtotal_linea
             elif tipo_iva == '5':
                 iva_linea = subtotal_linea / 21  # IVA incluido al 5%
                 iva_5_monto += iva_linea
+                gravada_5_monto += subtotal_linea
             else:  # exenta
                 subtotal_exentas += subtotal_linea
             
@@ -437,14 +442,12 @@ def aprobar_solicitud(id):
         # Total ya incluye IVA en cada línea; no sumamos de nuevo
         venta.total = subtotal_general - venta.descuento
         
-        # Guardar desglose de IVA en observaciones de venta (formato JSON para parsear fácil)
-        import json
-        desglose_iva = {
-            'iva_10': iva_10_monto,
-            'iva_5': iva_5_monto,
-            'exentas': subtotal_exentas
-        }
-        venta.observaciones += f"\n[DESGLOSE_IVA]{json.dumps(desglose_iva)}"
+        # Desglose de IVA de la venta
+        venta.gravada_10 = round(gravada_10_monto, 2)
+        venta.iva_10 = round(iva_10_monto, 2)
+        venta.gravada_5 = round(gravada_5_monto, 2)
+        venta.iva_5 = round(iva_5_monto, 2)
+        venta.exenta = round(subtotal_exentas, 2)
         
         db.session.commit()
         registrar_bitacora('aprobar-solicitud', f'Solicitud aprobada: {solicitud.numero_solicitud} por usuario {current_user.username}')
@@ -490,8 +493,7 @@ def crear_presupuesto(solicitud_id):
     
     if request.method == 'POST':
         try:
-            ultimo = Presupuesto.query.order_by(Presupuesto.id.desc()).first()
-            numero = f"PRES-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('presupuesto_servicio')
             
             presupuesto = Presupuesto(
                 numero_presupuesto=numero,
@@ -572,7 +574,7 @@ def ordenes():
     page = request.args.get('page', 1, type=int)
     estado = request.args.get('estado', '')
     
-    query = OrdenServicio.query
+    query = con_perfil(OrdenServicio.query, 'ordenes_servicio')
     
     if estado:
         query = query.filter_by(estado=estado)
@@ -591,8 +593,7 @@ def crear_orden(solicitud_id):
     
     if request.method == 'POST':
         try:
-            ultimo = OrdenServicio.query.order_by(OrdenServicio.id.desc()).first()
-            numero = f"OS-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('orden_servicio')
             
             orden = OrdenServicio(
                 numero_orden=numero,
@@ -705,7 +706,7 @@ def reclamos():
     page = request.args.get('page', 1, type=int)
     estado = request.args.get('estado', '')
     
-    query = Reclamo.query
+    query = con_perfil(Reclamo.query, 'reclamos')
     
     if estado:
         query = query.filter_by(estado=estado)
@@ -721,8 +722,7 @@ def reclamos():
 def crear_reclamo():
     if request.method == 'POST':
         try:
-            ultimo = Reclamo.query.order_by(Reclamo.id.desc()).first()
-            numero = f"REC-{(ultimo.id + 1 if ultimo else 1):06d}"
+            numero = siguiente_numero('reclamo')
             factura_id = request.form.get('factura_id')
             factura = Venta.query.get(factura_id)
             reclamo = Reclamo(
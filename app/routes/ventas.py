@@ -2,12 +2,15 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, send_file
 from flask_login import login_required, current_user
 from app.utils.roles import require_roles
+from app.utils.perfiles_consulta import con_perfil
 from app import db
 from app.models import (Caja, AperturaCaja, Venta, VentaDetalle, Pago, 
-                        NotaCredito, NotaDebito, Cliente, Producto, OrdenServicio)
+                        NotaCredito, NotaDebito, Cliente, Producto, OrdenServicio, VentaDiaria)
 from datetime import datetime, date
 from decimal import Decimal
 from app.utils import registrar_bitacora
+from app.utils.inventario import aplicar_movimientos_stock
+from app.utils.numeracion import siguiente_numero, proximo_numero
 from app.routes.notas_credito_pdf import descargar_nota_credito_pdf as descargar_nota_credito_pdf_func
 
 bp = Blueprint('ventas', __name__, url_prefix='/ventas')
@@ -37,9 +40,8 @@ def emitir_nota_credito(venta_id):
     if nota_existente:
         flash('Ya existe una Nota de Crédito para esta factura. No se puede emitir otra.', 'warning')
         return redirect(url_for('ventas.ver', id=venta.id))
-    # Calcular el número de Nota de Crédito que se mostraría
-    ultimo = NotaCredito.query.order_by(NotaCredito.id.desc()).first()
-    numero_nc = f"NC-{'%07d' % (ultimo.id + 1 if ultimo else 1)}"
+    # Número de Nota de Crédito que se mostraría (se reserva al emitir)
+    numero_nc = proximo_numero('nota_credito')
     if request.method == 'POST':
         try:
             motivo = request.form.get('motivo')
@@ -52,6 +54,7 @@ def emitir_nota_credito(venta_id):
                 detalles = json.loads(detalle_json)
             monto = sum(float(d['cantidad']) * float(d['precio_unitario']) for d in detalles)
             # Crear la nota de crédito
+            numero_nc = siguiente_numero('nota_credito')
             nota = NotaCredito(
                 numero_nota=numero_nc,
                 venta_id=venta.id,
@@ -204,7 +207,7 @@ def listar():
     fecha_desde = request.form.get('fecha_desde')
     fecha_hasta = request.form.get('fecha_hasta')
     
-    query = Venta.query
+    query = con_perfil(Venta.query, 'ventas_listado')
     
     if fecha_desde:
         query = query.filter(Venta.fecha_venta >= fecha_desde)
@@ -217,8 +220,8 @@ def listar():
     
     # Totales para el pie de tabla
     total_ventas = sum(Decimal(v.total or 0) for v in ventas.items if v.estado != 'anulada')
-    total_pagado = sum(Decimal(getattr(v, 'monto_pagado', 0) or 0) for v in ventas.items if v.estado != 'anulada')
-    total_saldo = sum(Decimal(getattr(v, 'saldo_pendiente', 0) or 0) for v in ventas.items if v.estado != 'anulada')
+    total_pagado = sum(Decimal(v.monto_pagado or 0) for v in ventas.items if v.estado != 'anulada')
+    total_saldo = sum(Decimal(v.saldo or 0) for v in ventas.items if v.estado != 'anulada')
     
     return render_template(
         'ventas/listar.html',
@@ -243,24 +246,21 @@ def crear():
                 flash('Debe abrir una caja antes de realizar ventas', 'warning')
                 return redirect(url_for('ventas.apertura_caja'))
             
-            # Generar número de factura
-            from app.models import ConfiguracionEmpresa
-            config = ConfiguracionEmpresa.get_config()
-            numero_factura = f"{config.numero_establecimiento}-{config.numero_expedicion}-{config.numero_factura_actual:07d}"
-            config.numero_factura_actual += 1
+            # El número de factura definitivo se reserva al final, antes del commit
+            from uuid import uuid4
             
             venta = Venta(
-                numero_factura=numero_factura,
+                numero_factura=f'TMP-{uuid4().hex}',
                 tipo_venta=request.form.get('tipo_venta'),
                 cliente_id=request.form.get('cliente_id'),
                 orden_servicio_id=request.form.get('orden_servicio_id'),
                 apertura_caja_id=apertura.id,
                 vendedor_id=current_user.id,
-                subtotal=request.form.get('subtotal'),
-                descuento=request.form.get('descuento', 0),
-                iva=request.form.get('iva'),
-                total=request.form.get('total'),
-                dias_credito=request.form.get('dias_credito', 0),
+                subtotal=Decimal(str(request.form.get('subtotal') or 0)),
+                descuento=Decimal(str(request.form.get('descuento') or 0)),
+                iva=Decimal(str(request.form.get('iva') or 0)),
+                total=Decimal(str(request.form.get('total') or 0)),
+                dias_credito=int(request.form.get('dias_credito') or 0),
                 observaciones=request.form.get('observaciones')
             )
             
@@ -275,6 +275,7 @@ def crear():
             detalles_json = request.form.get('detalles_json')
             detalles = json.loads(detalles_json)
             
+            lineas_stock = []
             for det in detalles:
                 detalle = VentaDetalle(
                     venta=venta,
@@ -291,43 +292,39 @@ def crear():
                 
                 # Descontar stock si es producto
                 if det.get('producto_id') and det['tipo_item'] == 'producto':
-                    producto = Producto.query.get(det['producto_id'])
-                    cantidad = int(float(det['cantidad']))
-                    
-                    from app.models import MovimientoProducto
-                    producto.stock_actual -= cantidad
-                    
-                    movimiento = MovimientoProducto(
-                        producto_id=producto.id,
-                        tipo_movimiento='salida',
-                        cantidad=cantidad,
-                        stock_anterior=producto.stock_actual + cantidad,
-                        stock_actual=producto.stock_actual,
-                        motivo='venta',
-                        referencia_tipo='venta',
-                        referencia_id=venta.id,
-                        costo_unitario=producto.precio_compra,
-                        usuario_id=current_user.id
-                    )
-                    db.session.add(movimiento)
+                    lineas_stock.append((det['producto_id'], int(float(det['cantidad']))))
             
             # Agregar pagos
             pagos_json = request.form.get('pagos_json')
             pagos = json.loads(pagos_json)
             
+            from app.models import FormaPago
             for pag in pagos:
                 pago = Pago(
                     venta=venta,
-                    forma_pago=pag['forma_pago'],
+                    forma_pago_id=FormaPago.id_por_codigo(pag['forma_pago']),
                     monto=pag['monto'],
                     referencia=pag.get('referencia'),
                     banco=pag.get('banco')
                 )
                 db.session.add(pago)
             
-            venta.actualizar_estado_pago()
+            # El stock ya se descuenta aquí, no al quedar pagada
+            venta.actualizar_estado_pago(descontar_stock=False)
             
             db.session.add(venta)
+            db.session.flush()
+            venta.calcular_desglose_iva()
+            # Descontar stock en lote (productos bloqueados hasta el commit)
+            aplicar_movimientos_stock(lineas_stock, 'salida', 'venta', referencia_tipo='venta',
+                                      referencia_id=venta.id, usuario_id=current_user.id)
+            # Actualizar acumulados de la caja en la misma transacción
+            AperturaCaja.acumular(apertura.id, **venta.montos_por_categoria())
+            VentaDiaria.aplicar_cambio_venta(None, VentaDiaria.resumen_venta(venta))
+            # Generar número de factura (bloquea la secuencia del punto hasta el commit)
+            from app.models import ConfiguracionEmpresa
+            venta.numero_factura = ConfiguracionEmpresa.get_config().generar_numero_factura(
+                apertura.caja.numero_expedicion)
             db.session.commit()
             registrar_bitacora('crear-venta', f'Venta creada: {venta.numero_factura} para cliente {venta.cliente_id}')
             flash('Venta registrada correctamente', 'success')
@@ -354,20 +351,7 @@ def crear():
 @require_roles('admin', 'caja', 'vendedor', 'recepcion')
 def ver(id):
     venta = Venta.query.get_or_404(id)
-    
-    # Parsear desglose de IVA si existe
-    desglose_iva = None
-    if venta.observaciones and '[DESGLOSE_IVA]' in venta.observaciones:
-        try:
-            import json
-            partes = venta.observaciones.split('[DESGLOSE_IVA]')
-            if len(partes) > 1:
-                json_str = partes[1].strip()
-                desglose_iva = json.loads(json_str)
-        except:
-            pass
-    
-    return render_template('ventas/ver.html', venta=venta, desglose_iva=desglose_iva)
+    return render_template('ventas/ver.html', venta=venta)
 
 @bp.route('/<int:id>/ticket')
 @login_required
@@ -430,13 +414,10 @@ def facturar(id):
     if request.method == 'POST':
         try:
             from app.models.venta import FormaPago
-            # Generar número de factura real
-            from app.models import ConfiguracionEmpresa
-            config = ConfiguracionEmpresa.get_config()
-            numero_factura = config.generar_numero_factura()
+            estado_caja_anterior = venta.estado_caja()
+            resumen_anterior = VentaDiaria.resumen_venta(venta)
             
             # Actualizar venta
-            venta.numero_factura = numero_factura
             venta.apertura_caja_id = apertura.id
             venta.estado = 'completada'
             
@@ -452,7 +433,7 @@ def facturar(id):
             
             total_pagado = Decimal(0)
             total_efectivo_entregado = Decimal(0)
-            efectivo_forma_ids = [fp.id for fp in FormaPago.query.filter(FormaPago.nombre.ilike('%efectivo%')).all()]
+            efectivo_forma_ids = FormaPago.ids_por_categoria('efectivo')
             print(f"[DEBUG] efectivo_forma_ids: {efectivo_forma_ids}")
             print(f"[DEBUG] pagos_list: {pagos_list}")
             for pag in pagos_list:
@@ -495,6 +476,16 @@ def facturar(id):
             # Actualizar estado de pago
             venta.actualizar_estado_pago()
             
+            # Actualizar acumulados de la caja en la misma transacción
+            AperturaCaja.aplicar_cambio_venta(estado_caja_anterior, venta.estado_caja())
+            VentaDiaria.aplicar_cambio_venta(resumen_anterior, VentaDiaria.resumen_venta(venta))
+            
+            # Generar número de factura real (bloquea la secuencia del punto hasta el commit)
+            from app.models import ConfiguracionEmpresa
+            numero_factura = ConfiguracionEmpresa.get_config().generar_numero_factura(
+                apertura.caja.numero_expedicion)
+            venta.numero_factura = numero_factura
+            
             db.session.commit()
             
             # Retornar con información del vuelto
@@ -518,35 +509,11 @@ def facturar(id):
     from app.models.venta import FormaPago
     formas_pago = FormaPago.activas_unicas()
     
-    # Calcular efectivo disponible en la caja abierta actual
-    efectivo_disponible = 0
-    apertura = AperturaCaja.query.filter_by(
-        cajero_id=current_user.id,
-        estado='abierto'
-    ).first()
-    if apertura:
-        efectivo_disponible = float(apertura.monto_inicial or 0)
-        # Sumar efectivo de todas las ventas de esta apertura (solo pagos confirmados)
-        for v in apertura.ventas:
-            for p in v.pagos:
-                if p.estado == 'confirmado' and p.forma_pago_id == 1:  # ID 1 = Efectivo (Efectivo es la forma_pago con id=1)
-                    efectivo_disponible += float(p.monto)
-    
-    # Parsear desglose de IVA si existe
-    desglose_iva = None
-    if venta.observaciones and '[DESGLOSE_IVA]' in venta.observaciones:
-        try:
-            import json
-            partes = venta.observaciones.split('[DESGLOSE_IVA]')
-            if len(partes) > 1:
-                json_str = partes[1].strip()
-                desglose_iva = json.loads(json_str)
-        except:
-            pass
+    # Efectivo disponible en la caja abierta actual (desde los acumulados)
+    efectivo_disponible = float(apertura.efectivo_disponible)
     
     return render_template('ventas/facturar.html', 
                          venta=venta, 
-                         desglose_iva=desglose_iva,
                          formas_pago=formas_pago,
                          efectivo_disponible=efectivo_disponible)
 
@@ -583,30 +550,19 @@ def anular(id):
     venta = Venta.query.get_or_404(id)
     
     try:
+        estado_caja_anterior = venta.estado_caja()
+        resumen_anterior = VentaDiaria.resumen_venta(venta)
         venta.estado = 'anulada'
+        AperturaCaja.aplicar_cambio_venta(estado_caja_anterior, venta.estado_caja())
+        VentaDiaria.aplicar_cambio_venta(resumen_anterior, VentaDiaria.resumen_venta(venta))
         
         # Revertir movimientos de stock
-        for detalle in venta.detalles:
-            if detalle.producto_id and detalle.tipo_item == 'producto':
-                producto = Producto.query.get(detalle.producto_id)
-                cantidad = int(float(detalle.cantidad))
-                
-                from app.models import MovimientoProducto
-                producto.stock_actual += cantidad
-                
-                movimiento = MovimientoProducto(
-                    producto_id=producto.id,
-                    tipo_movimiento='entrada',
-                    cantidad=cantidad,
-                    stock_anterior=producto.stock_actual - cantidad,
-                    stock_actual=producto.stock_actual,
-                    motivo='devolucion',
-                    referencia_tipo='venta',
-                    referencia_id=venta.id,
-                    usuario_id=current_user.id,
-                    observaciones='Anulación de venta'
-                )
-                db.session.add(movimiento)
+        aplicar_movimientos_stock(
+            [(d.producto_id, int(float(d.cantidad))) for d in venta.detalles
+             if d.producto_id and d.tipo_item == 'producto'],
+            'entrada', 'devolucion', referencia_tipo='venta', referencia_id=venta.id,
+            usuario_id=current_user.id, observaciones='Anulación de venta'
+        )
         
         db.session.commit()
         flash('Venta anulada correctamente', 'success')
@@ -625,8 +581,7 @@ def crear_nota_credito(venta_id):
     
     if request.method == 'POST':
         try:
-            ultimo = NotaCredito.query.order_by(NotaCredito.id.desc()).first()
-            numero = f"NC-{(ultimo.id + 1 if ultimo else 1):07d}"
+            numero = siguiente_numero('nota_credito')
             
             nota = NotaCredito(
                 numero_nota=numero,
@@ -704,8 +659,7 @@ def crear_nota_debito(venta_id):
                 raise ValueError('Duplicado detectado')
             
             # Generar número secuencial
-            ultimo = NotaDebito.query.order_by(NotaDebito.id.desc()).first()
-            numero = f"ND-{(ultimo.id + 1 if ultimo else 1):07d}"
+            numero = siguiente_numero('nota_debito')
             
             # CREAR NOTA DE DÉBITO
             nota = NotaDebito(
@@ -753,8 +707,7 @@ def crear_nota_debito(venta_id):
             traceback.print_exc()
     
     # GET: Mostrar formulario
-    ultimo = NotaDebito.query.order_by(NotaDebito.id.desc()).first()
-    numero_nota = f"ND-{(ultimo.id + 1 if ultimo else 1):07d}"
+    numero_nota = proximo_numero('nota_debito')
     fecha_emision = datetime.now().strftime('%d/%m/%Y')
     
     return render_template('ventas/crear_nota_debito.html', 
@@ -799,6 +752,7 @@ def descargar_nota_debito_pdf(nota_id):
 @login_required
 def cobrar_nota_debito(nota_id):
     from app.models import NotaDebito, PagoNotaDebito, FormaPago
+    from app.models.venta import CATEGORIAS_PAGO
     from decimal import Decimal
     import json
     
@@ -836,12 +790,11 @@ def cobrar_nota_debito(nota_id):
                 raise ValueError('Saldo incompleto')
 
             # Validar vuelto: solo se puede devolver hasta el efectivo entregado
-            forma_ids = [int(p['forma_pago_id']) for p in pagos if p.get('forma_pago_id') is not None]
-            formas = {fp.id: fp.nombre.lower() for fp in FormaPago.query.filter(FormaPago.id.in_(forma_ids)).all()}
             total_efectivo = sum(
                 Decimal(str(p['monto']))
                 for p in pagos
-                if 'efectivo' in (formas.get(int(p['forma_pago_id']), '') or '')
+                if p.get('forma_pago_id') is not None
+                and FormaPago.categoria_de(int(p['forma_pago_id'])) == 'efectivo'
             )
             excedente = total_pagos - Decimal(str(nota.monto_pendiente))
             if excedente > 0 and total_efectivo < excedente:
@@ -876,6 +829,10 @@ def cobrar_nota_debito(nota_id):
                     estado='confirmado'
                 )
                 db.session.add(pago)
+                # Acumulado de la caja por categoría de la forma de pago
+                categoria = FormaPago.categoria_de(forma_pago_obj.id)
+                if categoria in CATEGORIAS_PAGO:
+                    AperturaCaja.acumular(apertura.id, **{categoria: pago.monto})
             
             # ACTUALIZAR ESTADO DE PAGO AUTOMÁTICAMENTE
             nota.actualizar_estado_pago()
@@ -905,18 +862,59 @@ def cobrar_nota_debito(nota_id):
     return render_template('ventas/cobrar_nota_debito.html', nota=nota, formas_pago=formas_pago)
 
 # ===== CUENTAS POR COBRAR =====
+def _fecha_corte_param():
+    """Fecha de corte de la antigüedad (?fecha=YYYY-MM-DD), por defecto hoy"""
+    try:
+        return datetime.strptime(request.args.get('fecha', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return date.today()
+
 @bp.route('/cuentas-por-cobrar')
 @login_required
 def cuentas_por_cobrar():
+    from app.utils.cuentas_por_cobrar import antiguedad_saldos, TRAMOS_ANTIGUEDAD
     page = request.args.get('page', 1, type=int)
+    fecha_corte = _fecha_corte_param()
     
     ventas = Venta.query.filter(
-        Venta.estado_pago.in_(['pendiente', 'parcial'])
+        Venta.saldo > 0,
+        Venta.estado != 'anulada'
     ).order_by(Venta.fecha_vencimiento).paginate(
         page=page, per_page=20, error_out=False
     )
     
-    return render_template('ventas/cuentas_por_cobrar.html', ventas=ventas)
+    return render_template('ventas/cuentas_por_cobrar.html', ventas=ventas,
+                           antiguedad=antiguedad_saldos(fecha_corte),
+                           tramos=TRAMOS_ANTIGUEDAD)
+
+@bp.route('/api/cuentas-por-cobrar/antiguedad')
+@login_required
+def api_antiguedad_saldos():
+    from app.utils.cuentas_por_cobrar import antiguedad_saldos, TRAMOS_ANTIGUEDAD
+    datos = antiguedad_saldos(_fecha_corte_param())
+    claves = [clave for clave, _ in TRAMOS_ANTIGUEDAD] + ['total']
+    return jsonify({
+        'fecha_corte': datos['fecha_corte'].isoformat(),
+        'tramos': [{'clave': clave, 'etiqueta': etiqueta} for clave, etiqueta in TRAMOS_ANTIGUEDAD],
+        'totales': dict({k: float(datos['totales'][k]) for k in claves}, ventas=datos['totales']['ventas']),
+        'clientes': [
+            dict({k: float(c[k]) for k in claves}, id=c['id'], nombre=c['nombre'],
+                 documento=c['documento'], ventas=c['ventas'])
+            for c in datos['clientes']
+        ],
+    })
+
+@bp.route('/cuentas-por-cobrar/antiguedad.xlsx')
+@login_required
+def exportar_antiguedad_saldos():
+    from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+    from app.utils.cuentas_por_cobrar import exportar_antiguedad_xlsx
+    fecha_corte = _fecha_corte_param()
+    ruta = exportar_antiguedad_xlsx(ruta_temporal('.xlsx'), fecha_corte)
+    return respuesta_archivo_temporal(
+        ruta, f'antiguedad_saldos_{fecha_corte.strftime("%Y%m%d")}.xlsx',
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
 
 @bp.route('/registrar-pago', methods=['POST'])
 @login_required
@@ -925,9 +923,12 @@ def registrar_pago():
     venta = Venta.query.get_or_404(venta_id)
     
     try:
+        from app.models import FormaPago
+        estado_caja_anterior = venta.estado_caja()
+        resumen_anterior = VentaDiaria.resumen_venta(venta)
         pago = Pago(
             venta_id=venta.id,
-            forma_pago=request.form.get('forma_pago'),
+            forma_pago_id=FormaPago.id_por_codigo(request.form.get('forma_pago')),
             monto=request.form.get('monto'),
             referencia=request.form.get('referencia'),
             banco=request.form.get('banco'),
@@ -936,6 +937,8 @@ def registrar_pago():
         
         db.session.add(pago)
         venta.actualizar_estado_pago()
+        AperturaCaja.aplicar_cambio_venta(estado_caja_anterior, venta.estado_caja())
+        VentaDiaria.aplicar_cambio_venta(resumen_anterior, VentaDiaria.resumen_venta(venta))
         db.session.commit()
         
         flash('Pago registrado correctamente', 'success')
@@ -0,0 +1,39 @@
+"""
+Descarga de archivos generados en disco (exportaciones, reportes grandes).
+El archivo se envía por bloques y se borra al terminar la descarga, así el
+contenido nunca se carga completo en memoria.
+"""
+import os
+import tempfile
+from flask import Response
+
+TAMANO_BLOQUE = 64 * 1024
+
+
+def ruta_temporal(sufijo):
+    """Crea un archivo temporal vacío y devuelve su ruta"""
+    descriptor, ruta = tempfile.mkstemp(suffix=sufijo)
+    os.close(descriptor)
+    return ruta
+
+
+def respuesta_archivo_temporal(ruta, nombre_descarga, mimetype):
+    """Response que envía el archivo por bloques y lo elimina al finalizar (o si se corta la descarga)"""
+    def generar():
+        try:
+            with open(ruta, 'rb') as archivo:
+                while True:
+                    bloque = archivo.read(TAMANO_BLOQUE)
+                    if not bloque:
+                        break
+                    yield bloque
+        finally:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    return Response(generar(), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{nombre_descarga}"',
+        'Content-Length': str(os.path.getsize(ruta)),
+    })
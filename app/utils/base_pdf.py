@@ -1,50 +1,46 @@
+import os
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from io import BytesIO
-from flask import make_response
+from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+from app.utils.estilos_pdf import ESTILOS, membrete
+from app.utils.pdf_streaming import TablaPorPartes
 
 class PDFReportBase:
-    def __init__(self, empresa, title, filename):
-        self.buffer = BytesIO()
-        self.doc = SimpleDocTemplate(self.buffer, pagesize=A4)
-        self.styles = getSampleStyleSheet()
+    def __init__(self, title, filename, empresa=None):
+        # El archivo de salida se define en build(): temporal, enviado por bloques
+        self.doc = SimpleDocTemplate(None, pagesize=A4)
+        self.styles = ESTILOS
         self.elements = []
         self.empresa = empresa
         self.title = title
         self.filename = filename
 
     def add_membrete(self):
-        nombre = getattr(self.empresa, 'nombre_empresa', 'Juguetería') if self.empresa else 'Juguetería'
-        ruc = getattr(self.empresa, 'ruc', 'N/A') if self.empresa else 'N/A'
-        direccion = getattr(self.empresa, 'direccion', '') if self.empresa else ''
-        # Espaciado superior reducido
-        self.elements.append(Spacer(1, 10))
-        # Membrete con fuente más pequeña y alineado
-        membrete_style = ParagraphStyle('Membrete', parent=self.styles['Normal'], fontSize=11, alignment=1, spaceAfter=2)
-        self.elements.append(Paragraph(f"<b>{nombre}</b>", membrete_style))
-        self.elements.append(Paragraph("El Mundo Feliz", ParagraphStyle('Subtitulo', parent=self.styles['Normal'], fontSize=10, alignment=1, textColor='#888')))
-        self.elements.append(Paragraph(f"RUC: {ruc}", membrete_style))
-        self.elements.append(Paragraph(direccion, membrete_style))
-        self.elements.append(Spacer(1, 8))
+        # Sin empresa explícita se usa el membrete cacheado de la configuración
+        self.elements.extend(membrete('base', self.empresa))
 
     def add_title(self):
-        title_style = ParagraphStyle('Title', parent=self.styles['Heading1'], fontSize=17, alignment=1, spaceAfter=10, textColor='#222')
-        self.elements.append(Paragraph(self.title, title_style))
+        self.elements.append(Paragraph(self.title, ESTILOS['TituloBase']))
         self.elements.append(Spacer(1, 8))
 
+    def add_tabla(self, encabezados, filas, anchos, pie=None, color_encabezado='#27ae60', tamano_fuente=9):
+        # Las filas se leen del iterador (p. ej. una consulta con yield_per) al armar cada página
+        self.elements.append(TablaPorPartes(encabezados, filas, anchos, pie=pie,
+                                            color_encabezado=color_encabezado, tamano_fuente=tamano_fuente))
+
     def add_footer(self):
         from datetime import datetime
         fecha = datetime.now().strftime('%d/%m/%Y %H:%M')
-        footer_style = ParagraphStyle('Footer', parent=self.styles['Normal'], fontSize=9, alignment=1, textColor='#888', spaceBefore=16)
         self.elements.append(Spacer(1, 16))
-        self.elements.append(Paragraph(f"Documento generado el {fecha} | Sistema de Gestión - Juguetería", footer_style))
+        self.elements.append(Paragraph(f"Documento generado el {fecha} | Sistema de Gestión - Juguetería", ESTILOS['PieBase']))
 
     def build(self):
         self.add_footer()
-        self.doc.build(self.elements)
-        self.buffer.seek(0)
-        response = make_response(self.buffer.getvalue())
-        response.headers['Content-Type'] = 'application/pdf'
-        response.headers['Content-Disposition'] = f'attachment; filename={self.filename}'
-        return response
+        ruta = ruta_temporal('.pdf')
+        self.doc.filename = ruta
+        try:
+            self.doc.build(self.elements)
+        except Exception:
+            os.remove(ruta)
+            raise
+        return respuesta_archivo_temporal(ruta, self.filename, 'application/pdf')
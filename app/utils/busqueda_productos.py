@@ -0,0 +1,101 @@
+"""
+Búsqueda de productos por nombre o código (autocompletado del POS y listado).
+
+El término se normaliza (minúsculas, sin acentos: "Muñeca" -> "muneca") y
+se compara contra normalizar_busqueda(nombre) y lower(codigo) (los códigos
+no llevan acentos):
+
+- En PostgreSQL normalizar_busqueda es una función SQL inmutable sobre la
+  extensión unaccent, y las dos expresiones tienen índices GIN de trigramas
+  (pg_trgm), así que el LIKE '%termino%' usa índice en lugar de recorrer la
+  tabla. La función y los índices los crea sincronizar_bd.py
+  (migrar_indices_busqueda_productos); si todavía no se corrió, se busca con
+  lower() sin índice.
+- En SQLite (pruebas y desarrollo) la misma función se registra en cada
+  conexión con la normalización de Python.
+
+Cada palabra del término tiene que aparecer en el nombre o en el código
+("auto rojo" encuentra "Auto de carrera rojo"). Los resultados salen
+ordenados: código exacto, código que empieza con el término, nombre que
+empieza con el término, alguna palabra del nombre que empieza con el
+término, el resto; y dentro de cada grupo por nombre.
+"""
+import re
+import sqlite3
+import unicodedata
+from sqlalchemy import case, event, func, or_, text
+from sqlalchemy.engine import Engine
+from app import db
+from app.models import Producto
+
+FUNCION_NORMALIZAR = 'normalizar_busqueda'
+
+# None = no verificado todavía; en PostgreSQL se verifica una vez por proceso
+_funcion_en_base = None
+
+_DIACRITICOS = re.compile('[\u0300-\u036f]')
+
+
+def normalizar(texto):
+    """Texto en minúsculas y sin acentos ni diéresis (la ñ queda como n)"""
+    if texto.isascii():  # la mayoría de los nombres: sin descomponer
+        return texto.lower()
+    return _DIACRITICOS.sub('', unicodedata.normalize('NFKD', texto)).lower()
+
+
+def _escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+@event.listens_for(Engine, 'connect')
+def _registrar_funcion_sqlite(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.create_function(
+            FUNCION_NORMALIZAR, 1, lambda texto: None if texto is None else normalizar(texto),
+            deterministic=True
+        )
+
+
+def _funcion_disponible():
+    """Si la base tiene normalizar_busqueda (siempre en SQLite; en PostgreSQL, después de la migración)"""
+    global _funcion_en_base
+    if db.engine.dialect.name != 'postgresql':
+        return True
+    if _funcion_en_base is None:
+        _funcion_en_base = db.session.execute(
+            text("SELECT to_regprocedure('normalizar_busqueda(text)') IS NOT NULL")
+        ).scalar()
+    return _funcion_en_base
+
+
+def _normalizada(columna):
+    if _funcion_disponible():
+        return getattr(func, FUNCION_NORMALIZAR)(columna)
+    return func.lower(columna)
+
+
+def filtrar_productos(query, termino):
+    """
+    La consulta de productos filtrada por `termino` y ordenada por relevancia.
+    Sin término la consulta solo se ordena por nombre.
+    """
+    palabras = normalizar(termino or '').split()
+    if not palabras:
+        return query.order_by(Producto.nombre)
+
+    nombre = _normalizada(Producto.nombre)
+    codigo = func.lower(Producto.codigo)
+    for palabra in palabras:
+        patron = f'%{_escapar_like(palabra)}%'
+        query = query.filter(or_(nombre.like(patron, escape='\\'), codigo.like(patron, escape='\\')))
+
+    completo = ' '.join(palabras)
+    prefijo = f'{_escapar_like(completo)}%'
+    relevancia = case(
+        (codigo == completo, 0),
+        (codigo.like(prefijo, escape='\\'), 1),
+        (nombre.like(prefijo, escape='\\'), 2),
+        (nombre.like(f'% {prefijo}', escape='\\'), 3),
+        else_=4
+    )
+    return query.order_by(relevancia, Producto.nombre)
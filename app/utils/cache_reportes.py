@@ -0,0 +1,263 @@
+"""
+Cache en disco de reportes generados (PDF / Excel).
+La clave combina el nombre del reporte, los parámetros normalizados, la
+fecha del día (los reportes con período por defecto dependen de "hoy") y
+un sello de las tablas que lee el reporte, leído al consultar el cache:
+COUNT(*), MAX(id) y MAX(fecha_modificacion) de cada tabla. Altas y bajas
+cambian la cantidad y el máximo id; las modificaciones, la fecha (default y
+onupdate de la columna, también en los UPDATE masivos que la asignan). Las
+escrituras no tocan ninguna fila compartida.
+
+Una transacción que confirma tarde puede dejar una fecha menor a la máxima
+ya vista: mientras el último cambio de alguna tabla tenga menos de
+MARGEN_CAMBIOS el reporte se genera sin leer ni guardar el cache.
+
+Los archivos se guardan en REPORTES_CACHE_DIR; al superar
+REPORTES_CACHE_MAX_MB se eliminan los de uso más antiguo (cada acierto
+actualiza la fecha de modificación del archivo). Los contadores de aciertos
+y fallos son del proceso.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import wraps
+from flask import current_app, request, send_file
+from sqlalchemy import func, literal, select
+from app import db
+
+MIMETYPES_CACHEABLES = (
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'text/csv',
+)
+
+# Columnas con la fecha de la última modificación de la fila
+COLUMNAS_MODIFICACION = ('fecha_modificacion', 'fecha_actualizacion')
+# Antigüedad mínima del último cambio para usar el cache (transacciones que confirman tarde)
+MARGEN_CAMBIOS = timedelta(seconds=30)
+
+# Tablas de las que depende algún reporte cacheado (se registran con el decorador)
+_tablas_vigiladas = set()
+
+_contadores = {}  # nombre -> {'aciertos': n, 'fallos': n, 'recientes': n}
+_contadores_lock = threading.Lock()
+
+
+def _contar(nombre, tipo):
+    with _contadores_lock:
+        _contadores.setdefault(nombre, {'aciertos': 0, 'fallos': 0, 'recientes': 0})[tipo] += 1
+
+
+# -----------------------------------------------------------------------
+# Sello de versión de los datos
+# -----------------------------------------------------------------------
+
+def columna_modificacion(tabla):
+    """Columna con la fecha de modificación de la tabla (Table), o None"""
+    return next((tabla.c[nombre] for nombre in COLUMNAS_MODIFICACION if nombre in tabla.c), None)
+
+
+def version_datos(tablas):
+    """Sello [(tabla, filas, max_id, última modificación), ...] de las tablas, en una sola consulta"""
+    tablas = sorted(tablas)
+    columnas = []
+    for nombre in tablas:
+        tabla = db.metadata.tables[nombre]
+        modificacion = columna_modificacion(tabla)
+        columnas += [
+            select(func.count()).select_from(tabla).scalar_subquery(),
+            select(func.max(tabla.c.id)).scalar_subquery(),
+            select(func.max(modificacion)).scalar_subquery() if modificacion is not None else literal(None),
+        ]
+    valores = db.session.execute(select(*columnas)).one()
+    return [(nombre, *valores[3 * i:3 * i + 3]) for i, nombre in enumerate(tablas)]
+
+
+def datos_recientes(sello):
+    """True si alguna tabla del sello cambió hace menos de MARGEN_CAMBIOS"""
+    limite = datetime.utcnow() - MARGEN_CAMBIOS
+    return any(modificacion is not None and modificacion > limite for *_, modificacion in sello)
+
+
+# -----------------------------------------------------------------------
+# Almacenamiento
+# -----------------------------------------------------------------------
+
+def _carpeta():
+    carpeta = current_app.config['REPORTES_CACHE_DIR']
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def clave_reporte(nombre, parametros, sello):
+    """Clave del cache: nombre + parámetros normalizados + fecha del día + sello de las tablas (version_datos)"""
+    normalizados = sorted(
+        (str(k), str(v).strip()) for k, v in parametros.items()
+        if v is not None and str(v).strip() != ''
+    )
+    contenido = json.dumps([nombre, normalizados, date.today().isoformat(), sello],
+                           default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+
+def _leer(nombre, clave):
+    ruta = os.path.join(_carpeta(), clave + '.dat')
+    try:
+        with open(ruta + '.json', encoding='utf-8') as archivo:
+            meta = json.load(archivo)
+        os.utime(ruta)  # uso reciente, para el desalojo LRU
+        respuesta = send_file(ruta, mimetype=meta['mimetype'], conditional=False)
+    except (OSError, ValueError):
+        return None  # no está (o fue desalojado mientras tanto)
+    if meta.get('disposicion'):
+        respuesta.headers['Content-Disposition'] = meta['disposicion']
+    respuesta.headers['X-Reporte-Cache'] = 'HIT'
+    return respuesta
+
+
+def _publicar(carpeta, limite_bytes, nombre, clave, ruta_parcial, respuesta):
+    ruta = os.path.join(carpeta, clave + '.dat')
+    os.replace(ruta_parcial, ruta)
+    meta = {
+        'nombre': nombre,
+        'mimetype': respuesta.mimetype,
+        'disposicion': respuesta.headers.get('Content-Disposition'),
+        'tamano': os.path.getsize(ruta),
+        'creado': datetime.utcnow().isoformat(),
+    }
+    with open(ruta + '.json', 'w', encoding='utf-8') as archivo:
+        json.dump(meta, archivo)
+    recortar_cache(limite_bytes, carpeta)
+
+
+def _guardar(nombre, clave, respuesta):
+    """Guarda la respuesta mientras se envía. Devuelve la respuesta (la misma u otra equivalente)."""
+    if respuesta.status_code != 200 or respuesta.mimetype not in MIMETYPES_CACHEABLES:
+        return respuesta
+    # La copia por bloques termina fuera del contexto de la app: carpeta y límite se leen ahora
+    carpeta = _carpeta()
+    limite_bytes = current_app.config['REPORTES_CACHE_MAX_MB'] * 1024 * 1024
+    ruta_parcial = os.path.join(carpeta, f'{clave}.{os.getpid()}.{time.monotonic_ns()}.parcial')
+
+    if not respuesta.is_streamed:
+        with open(ruta_parcial, 'wb') as archivo:
+            archivo.write(respuesta.get_data())
+        _publicar(carpeta, limite_bytes, nombre, clave, ruta_parcial, respuesta)
+        return respuesta
+
+    # Respuesta por bloques (archivo temporal): se copia cada bloque al cache
+    # y la entrada se publica solo si la descarga llegó completa
+    original = respuesta.response
+
+    def copiar():
+        try:
+            with open(ruta_parcial, 'wb') as archivo:
+                for bloque in original:
+                    archivo.write(bloque)
+                    yield bloque
+            _publicar(carpeta, limite_bytes, nombre, clave, ruta_parcial, respuesta)
+        finally:
+            cerrar = getattr(original, 'close', None)
+            if cerrar:
+                cerrar()
+            if os.path.exists(ruta_parcial):
+                os.remove(ruta_parcial)
+
+    respuesta.response = copiar()
+    return respuesta
+
+
+def _entradas(carpeta):
+    for nombre_archivo in os.listdir(carpeta):
+        if nombre_archivo.endswith('.dat'):
+            ruta = os.path.join(carpeta, nombre_archivo)
+            try:
+                estado = os.stat(ruta)
+            except OSError:
+                continue
+            yield ruta, estado.st_size, estado.st_mtime
+
+
+def _eliminar(ruta):
+    for archivo in (ruta, ruta + '.json'):
+        try:
+            os.remove(archivo)
+        except OSError:
+            pass  # en uso (Windows) o ya eliminado; se reintenta en el próximo recorte
+
+
+def recortar_cache(limite_bytes=None, carpeta=None):
+    """Elimina las entradas usadas hace más tiempo hasta quedar bajo el límite. Devuelve cuántas se eliminaron."""
+    if limite_bytes is None:
+        limite_bytes = current_app.config['REPORTES_CACHE_MAX_MB'] * 1024 * 1024
+    entradas = sorted(_entradas(carpeta or _carpeta()), key=lambda e: e[2])
+    total = sum(tamano for _, tamano, _ in entradas)
+    eliminadas = 0
+    for ruta, tamano, _ in entradas:
+        if total <= limite_bytes:
+            break
+        _eliminar(ruta)
+        total -= tamano
+        eliminadas += 1
+    return eliminadas
+
+
+def vaciar_cache():
+    """Elimina todas las entradas. Devuelve cuántas había."""
+    return recortar_cache(limite_bytes=-1)
+
+
+def estadisticas_cache():
+    entradas = list(_entradas(_carpeta()))
+    with _contadores_lock:
+        contadores = {nombre: dict(c) for nombre, c in _contadores.items()}
+    aciertos = sum(c['aciertos'] for c in contadores.values())
+    fallos = sum(c['fallos'] for c in contadores.values())
+    recientes = sum(c['recientes'] for c in contadores.values())
+    return {
+        'entradas': len(entradas),
+        'tamano_bytes': sum(tamano for _, tamano, _ in entradas),
+        'limite_bytes': current_app.config['REPORTES_CACHE_MAX_MB'] * 1024 * 1024,
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'recientes': recientes,
+        'tasa_aciertos': round(aciertos / (aciertos + fallos), 3) if aciertos + fallos else None,
+        'por_reporte': contadores,
+    }
+
+
+# -----------------------------------------------------------------------
+# Decorador para las rutas de reportes
+# -----------------------------------------------------------------------
+
+def reporte_cacheado(nombre, tablas):
+    """
+    Sirve la vista desde el cache si los parámetros (query string y
+    argumentos de la URL) y los datos de `tablas` no cambiaron.
+    configuracion_empresa (membrete) se agrega siempre. Cada tabla necesita
+    una columna de COLUMNAS_MODIFICACION para notar las modificaciones.
+    """
+    tablas = frozenset(tablas) | {'configuracion_empresa'}
+    _tablas_vigiladas.update(tablas)
+
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            if not current_app.config.get('REPORTES_CACHE_MAX_MB'):
+                return vista(*args, **kwargs)
+            sello = version_datos(tablas)
+            if datos_recientes(sello):
+                _contar(nombre, 'recientes')
+                return vista(*args, **kwargs)
+            clave = clave_reporte(nombre, dict(request.args.items(), **kwargs), sello)
+            respuesta = _leer(nombre, clave)
+            if respuesta is not None:
+                _contar(nombre, 'aciertos')
+                return respuesta
+            _contar(nombre, 'fallos')
+            return _guardar(nombre, clave, current_app.make_response(vista(*args, **kwargs)))
+        return envoltura
+    return decorador
@@ -0,0 +1,507 @@
+"""
+Catálogos de productos y clientes en memoria para el autocompletado
+(productos.buscar y clientes.buscar), uno por proceso.
+
+Se activan con CATALOGO_MEMORIA; sin esa opción las búsquedas van a la base.
+El criterio es el de app.utils.busqueda_productos: cada palabra del término
+(sin acentos ni mayúsculas) tiene que aparecer en el nombre o en el código,
+y el orden es código exacto, código que empieza con el término, nombre que
+empieza con el término, palabra del nombre que empieza con el término, el
+resto; dentro de cada grupo por nombre normalizado.
+
+Estructura, sin un objeto por fila:
+- _Segmento: índice de texto que no cambia. Los códigos, los nombres y los
+  nombres normalizados van concatenados en un str cada uno (separados por
+  \\x00), con el inicio de cada fila en un array. Las filas están ordenadas
+  por nombre normalizado: el prefijo de nombre es una búsqueda binaria, y
+  los demás grupos salen en orden buscando con str.find hasta juntar los
+  resultados pedidos. Las palabras de los nombres forman un vocabulario
+  ordenado con las filas de cada palabra (prefijos y subcadenas de palabra);
+  los códigos tienen además un orden alfabético (código exacto y prefijo) y
+  las filas de cada trigrama (partes de código).
+- Precio, stock, IVA, etc. están en arrays indexados por id y se actualizan
+  en el lugar.
+- Un producto nuevo, reactivado o con código o nombre cambiado se marca como
+  no vigente en su segmento y pasa a un segmento adicional chico que se
+  rearma en cada refresco; cuando el adicional crece se rearma el principal
+  (en memoria, sin volver a leer la base).
+
+Refresco: como mucho cada CATALOGO_REFRESCO_SEGUNDOS se leen solo las filas
+con fecha_modificacion posterior a la última vista, menos MARGEN_REFRESCO
+(transacciones que confirman tarde, relojes de distintos servidores); un
+commit del mismo proceso que toca productos o clientes fuerza el refresco en
+el próximo uso. Cada CATALOGO_TTL se recarga completo.
+
+Medido con tests/benchmark_catalogo_memoria.py (nombres de ~35 caracteres,
+códigos de 7): unos 17 MB cada 100.000 productos, contra ~117 MB de los
+mismos datos en objetos Producto; 0,1-0,5 ms por búsqueda sobre 200.000
+productos; la carga completa lleva ~2 s cada 100.000.
+"""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import Producto, Cliente
+from app.utils.busqueda_productos import normalizar
+
+SEPARADOR = '\x00'
+CATALOGO_TTL = 3600
+MARGEN_REFRESCO = timedelta(seconds=30)
+LIMITE = 10
+# El adicional se integra al principal al pasar de este tamaño (o del 5% del principal)
+MAX_ADICIONAL = 2000
+# Hasta cuántos códigos con el mismo prefijo se ordenan por nombre; con más se recorren en orden con find
+MAX_ORDENAR_CODIGOS = 5000
+
+
+def _concatenar(textos):
+    """(str con los textos entre separadores, array con el inicio de cada uno más el final)"""
+    inicios = array('i', accumulate((len(texto) + 1 for texto in textos), initial=1))
+    return SEPARADOR + SEPARADOR.join(textos) + SEPARADOR, inicios
+
+
+def _primera(cantidad, es_menor):
+    """Primera posición de 0..cantidad para la que es_menor(posición) es falso (búsqueda binaria)"""
+    desde, hasta = 0, cantidad
+    while desde < hasta:
+        medio = (desde + hasta) // 2
+        if es_menor(medio):
+            desde = medio + 1
+        else:
+            hasta = medio
+    return desde
+
+
+def _filas_con(texto, inicios, patron):
+    """Filas, en orden y una vez cada una, cuyo texto contiene `patron`"""
+    corrimiento = 1 if patron.startswith(SEPARADOR) else 0
+    posicion = texto.find(patron)
+    while posicion != -1:
+        fila = bisect_right(inicios, posicion + corrimiento) - 1
+        yield fila
+        posicion = texto.find(patron, inicios[fila + 1] - 1)
+
+
+def _unir(listas):
+    """Filas de varias listas ordenadas, en orden y sin repetir"""
+    if len(listas) == 1:
+        yield from listas[0]
+        return
+    anterior = -1
+    for fila in heapq.merge(*listas):
+        if fila != anterior:
+            yield fila
+            anterior = fila
+
+
+class _Segmento:
+    """Índice de texto de un conjunto de filas (id, código, nombre), ordenadas por nombre normalizado"""
+    __slots__ = ('ids', 'vigente', 'codigos', 'inicio_codigos', 'claves', 'inicio_claves', 'orden_claves',
+                 'trigramas_claves', 'nombres', 'inicio_nombres', 'normalizados', 'inicio_normalizados', 'vocabulario', 'filas_palabra',
+                 'texto_vocabulario', 'inicio_vocabulario')
+
+    def __init__(self, filas):
+        ordenadas = sorted((normalizar(nombre), id_, codigo, nombre) for id_, codigo, nombre in filas)
+        self.ids = array('i', [f[1] for f in ordenadas])
+        self.vigente = array('b', [1]) * len(ordenadas)
+        self.codigos, self.inicio_codigos = _concatenar([f[2] for f in ordenadas])
+        claves = [f[2].lower() for f in ordenadas]
+        self.claves, self.inicio_claves = _concatenar(claves)
+        self.orden_claves = array('i', sorted(range(len(claves)), key=claves.__getitem__))
+        # Filas de cada trigrama de los códigos, para buscar partes de código sin recorrerlos todos
+        self.trigramas_claves = {}
+        for fila, clave in enumerate(claves):
+            for trigrama in {clave[i:i + 3] for i in range(len(clave) - 2)}:
+                self.trigramas_claves.setdefault(trigrama, array('i')).append(fila)
+        self.nombres, self.inicio_nombres = _concatenar([f[3] for f in ordenadas])
+        self.normalizados, self.inicio_normalizados = _concatenar([f[0] for f in ordenadas])
+        palabras = {}
+        for fila, (normalizado, *_) in enumerate(ordenadas):
+            for palabra in set(normalizado.split()):
+                palabras.setdefault(palabra, array('i')).append(fila)
+        self.vocabulario = sorted(palabras)
+        self.filas_palabra = [palabras[p] for p in self.vocabulario]
+        self.texto_vocabulario, self.inicio_vocabulario = _concatenar(self.vocabulario)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def codigo(self, fila):
+        return self.codigos[self.inicio_codigos[fila]:self.inicio_codigos[fila + 1] - 1]
+
+    def nombre(self, fila):
+        return self.nombres[self.inicio_nombres[fila]:self.inicio_nombres[fila + 1] - 1]
+
+    def normalizado(self, fila):
+        return self.normalizados[self.inicio_normalizados[fila]:self.inicio_normalizados[fila + 1] - 1]
+
+    def clave(self, fila):
+        return self.claves[self.inicio_claves[fila]:self.inicio_claves[fila + 1] - 1]
+
+    def vigentes(self):
+        """(id, código, nombre) de las filas vigentes"""
+        return [(self.ids[f], self.codigo(f), self.nombre(f)) for f in range(len(self.ids)) if self.vigente[f]]
+
+    # Cada búsqueda devuelve las filas en orden (de nombre normalizado)
+
+    def _claves_con_prefijo(self, prefijo):
+        """(desde, hasta) en orden_claves de los códigos que empiezan con `prefijo`"""
+        orden, largo = self.orden_claves, len(prefijo)
+        desde = _primera(len(orden), lambda p: self.clave(orden[p]) < prefijo)
+        hasta = _primera(len(orden), lambda p: self.clave(orden[p])[:largo] <= prefijo)
+        return desde, hasta
+
+    def codigo_igual(self, clave):
+        desde, hasta = self._claves_con_prefijo(clave)
+        return sorted(f for f in self.orden_claves[desde:hasta] if self.clave(f) == clave)
+
+    def codigo_empieza(self, prefijo):
+        desde, hasta = self._claves_con_prefijo(prefijo)
+        if hasta - desde <= MAX_ORDENAR_CODIGOS:
+            return sorted(self.orden_claves[desde:hasta])
+        return _filas_con(self.claves, self.inicio_claves, SEPARADOR + prefijo)
+
+    def nombre_empieza(self, prefijo):
+        desde = _primera(len(self.ids), lambda f: self.normalizado(f) < prefijo)
+        while desde < len(self.ids) and self.normalizado(desde).startswith(prefijo):
+            yield desde
+            desde += 1
+
+    def palabra_empieza(self, prefijo):
+        listas = []
+        posicion = bisect_left(self.vocabulario, prefijo)
+        while posicion < len(self.vocabulario) and self.vocabulario[posicion].startswith(prefijo):
+            listas.append(self.filas_palabra[posicion])
+            posicion += 1
+        return _unir(listas) if listas else iter(())
+
+    def codigo_contiene(self, parte):
+        if len(parte) >= 3:
+            trigramas = [self.trigramas_claves.get(parte[i:i + 3], ()) for i in range(len(parte) - 2)]
+            candidatas = min(trigramas, key=len)
+            if len(candidatas) <= MAX_ORDENAR_CODIGOS:
+                return (f for f in candidatas if parte in self.clave(f))
+        return _filas_con(self.claves, self.inicio_claves, parte)
+
+    def contiene(self, parte):
+        listas = [self.filas_palabra[p] for p in _filas_con(self.texto_vocabulario, self.inicio_vocabulario, parte)]
+        listas.append(self.codigo_contiene(parte))
+        return _unir(listas)
+
+
+class _Valores:
+    """Textos repetidos (tipo de IVA, unidad de medida...) guardados como números chicos"""
+    __slots__ = ('textos', 'numeros')
+
+    def __init__(self):
+        self.textos, self.numeros = [None], {None: 0}
+
+    def numero(self, texto):
+        if texto not in self.numeros:
+            self.numeros[texto] = len(self.textos)
+            self.textos.append(texto)
+        return self.numeros[texto]
+
+
+class _Catalogo:
+    """
+    Segmento principal y adicional más los datos de cada fila indexados por id.
+    Las subclases definen MODELO, COLUMNAS (las cinco primeras: id, código,
+    nombre, activo, fecha_modificacion), _guardar y resultado.
+    """
+    __slots__ = ('principal', 'adicional', 'fila_principal', 'fila_adicional', 'marca')
+    MODELO = None
+    COLUMNAS = ()
+
+    def __init__(self, filas):
+        self.marca = None
+        self.fila_principal = array('i')
+        self._asegurar(max((f[0] for f in filas), default=0))
+        activas = []
+        for fila in filas:
+            self._guardar_fila(fila)
+            if fila[3]:
+                activas.append(fila[:3])
+        self._integrar(activas)
+
+    @classmethod
+    def cargar(cls):
+        return cls(db.session.execute(select(*cls.COLUMNAS).where(cls.MODELO.activo == True)).all())
+
+    def refrescar(self):
+        """
+        Lee de la base las filas modificadas desde la última marca. Sin marca
+        (tabla vacía o sin fechas de modificación al cargar) se leen todas.
+        """
+        consulta = select(*self.COLUMNAS)
+        if self.marca is not None:
+            consulta = consulta.where(self.MODELO.fecha_modificacion >= self.marca - MARGEN_REFRESCO)
+        self.aplicar(db.session.execute(consulta).all())
+
+    def aplicar(self, filas):
+        """Incorpora filas leídas de la base (nuevas, modificadas o desactivadas)"""
+        nuevas = []
+        for fila in filas:
+            id_, codigo, nombre, activo = fila[:4]
+            self._asegurar(id_)
+            self._guardar_fila(fila)
+            segmento, posicion = self._ubicar(id_)
+            if segmento is not None:
+                if activo and segmento.codigo(posicion) == codigo and segmento.nombre(posicion) == nombre:
+                    continue  # cambiaron solo los datos, ya actualizados
+                segmento.vigente[posicion] = 0
+                if segmento is self.principal:
+                    self.fila_principal[id_] = -1
+                else:
+                    del self.fila_adicional[id_]
+            if activo:
+                nuevas.append((id_, codigo or '', nombre or ''))
+        if nuevas:
+            nuevas += self.adicional.vigentes()
+            if len(nuevas) > max(MAX_ADICIONAL, len(self.principal) // 20):
+                self._integrar(self.principal.vigentes() + nuevas)
+            else:
+                self.adicional = _Segmento(nuevas)
+                self.fila_adicional = {id_: f for f, id_ in enumerate(self.adicional.ids)}
+
+    def _integrar(self, filas):
+        """Rearma el principal con `filas` y deja el adicional vacío"""
+        self.principal = _Segmento(filas)
+        self.adicional = _Segmento([])
+        self.fila_adicional = {}
+        self.fila_principal = array('i', [-1]) * len(self.fila_principal)
+        for posicion, id_ in enumerate(self.principal.ids):
+            self.fila_principal[id_] = posicion
+
+    def _guardar_fila(self, fila):
+        modificado = fila[4]
+        if modificado is not None and (self.marca is None or modificado > self.marca):
+            self.marca = modificado
+        self._guardar(fila[0], fila[5:])
+
+    def _asegurar(self, id_):
+        """Agranda los arrays indexados por id hasta `id_`"""
+        faltan = id_ + 1 - len(self.fila_principal)
+        if faltan > 0:
+            self.fila_principal.extend(array('i', [-1]) * faltan)
+            self._agrandar(faltan)
+
+    def _ubicar(self, id_):
+        posicion = self.fila_principal[id_]
+        if posicion >= 0:
+            return self.principal, posicion
+        if id_ in self.fila_adicional:
+            return self.adicional, self.fila_adicional[id_]
+        return None, None
+
+    def __len__(self):
+        return len(self.principal) + len(self.adicional) - (self.principal.vigente.count(0)
+                                                            + self.adicional.vigente.count(0))
+
+    def buscar(self, termino, limite=LIMITE, filtro=None):
+        """(segmento, fila) de los resultados, en orden; `filtro(id)` descarta filas"""
+        palabras = normalizar(termino or '').replace(SEPARADOR, '').split()
+        if not palabras:
+            niveles = [lambda s: range(len(s))]
+        else:
+            completo = ' '.join(palabras)
+            con_espacio = ' ' + completo
+            parte = max(palabras, key=len)
+            resto = [p for p in palabras if p != parte]
+            niveles = [
+                lambda s: s.codigo_igual(completo),
+                lambda s: s.codigo_empieza(completo),
+                lambda s: s.nombre_empieza(completo),
+                lambda s: (f for f in s.palabra_empieza(palabras[0]) if con_espacio in s.normalizado(f)),
+                # Cualquier parte: se busca la palabra más larga y se verifican las demás
+                lambda s: (f for f in s.contiene(parte)
+                           if all(p in s.normalizado(f) or p in s.clave(f) for p in resto)),
+            ]
+
+        def candidatos(segmento, filas):
+            for fila in filas:
+                if segmento.vigente[fila] and (filtro is None or filtro(segmento.ids[fila])):
+                    yield segmento, fila
+
+        resultados, vistos = [], set()
+        for nivel in niveles:
+            fuentes = [candidatos(s, nivel(s)) for s in (self.principal, self.adicional) if len(s)]
+            if len(fuentes) > 1:
+                fuentes = [heapq.merge(*fuentes, key=lambda c: (c[0].normalizado(c[1]), c[0].ids[c[1]]))]
+            for segmento, fila in (fuentes[0] if fuentes else ()):
+                id_ = segmento.ids[fila]
+                if id_ not in vistos:
+                    vistos.add(id_)
+                    resultados.append((segmento, fila))
+                    if len(resultados) == limite:
+                        return resultados
+        return resultados
+
+    def autocompletar(self, termino, limite=LIMITE, filtro=None):
+        """Resultados como los devuelve la búsqueda AJAX de la base"""
+        return [self.resultado(s, f) for s, f in self.buscar(termino, limite, filtro)]
+
+
+class CatalogoProductos(_Catalogo):
+    __slots__ = ('precio_venta', 'precio_compra', 'stock', 'tipo_iva', 'unidad', 'tipo', 'valores')
+    MODELO = Producto
+    COLUMNAS = (Producto.id, Producto.codigo, Producto.nombre, Producto.activo, Producto.fecha_modificacion,
+                Producto.precio_venta, Producto.precio_compra, Producto.stock_actual, Producto.tipo_iva,
+                Producto.unidad_medida, Producto.tipo_producto)
+
+    def __init__(self, filas):
+        self.precio_venta, self.precio_compra = array('d'), array('d')
+        self.stock = array('q')
+        self.tipo_iva, self.unidad, self.tipo = array('H'), array('H'), array('H')
+        self.valores = _Valores()
+        super().__init__(filas)
+
+    def _agrandar(self, faltan):
+        for columna in (self.precio_venta, self.precio_compra, self.stock, self.tipo_iva, self.unidad, self.tipo):
+            columna.extend(array(columna.typecode, bytes(faltan * columna.itemsize)))
+
+    def _guardar(self, id_, datos):
+        precio_venta, precio_compra, stock, tipo_iva, unidad, tipo = datos
+        self.precio_venta[id_] = float(precio_venta or 0)
+        self.precio_compra[id_] = float(precio_compra or 0)
+        self.stock[id_] = int(stock or 0)
+        self.tipo_iva[id_] = self.valores.numero(tipo_iva)
+        self.unidad[id_] = self.valores.numero(unidad)
+        self.tipo[id_] = self.valores.numero(tipo)
+
+    def autocompletar(self, termino, limite=LIMITE, tipo=None):
+        filtro = None
+        if tipo:
+            numero = self.valores.numeros.get(tipo, -1)
+            filtro = lambda id_: self.tipo[id_] == numero
+        return super().autocompletar(termino, limite, filtro)
+
+    def resultado(self, segmento, fila):
+        id_, codigo, nombre = segmento.ids[fila], segmento.codigo(fila), segmento.nombre(fila)
+        return {
+            'id': id_,
+            'label': f'{codigo} - {nombre}',
+            'value': nombre,
+            'codigo': codigo,
+            'precio_venta': self.precio_venta[id_],
+            'precio_compra': self.precio_compra[id_],
+            'tipo_iva': self.valores.textos[self.tipo_iva[id_]],
+            'stock_actual': self.stock[id_],
+            'unidad_medida': self.valores.textos[self.unidad[id_]]
+        }
+
+
+class CatalogoClientes(_Catalogo):
+    __slots__ = ('direccion', 'telefono', 'limite_credito', 'descuento_especial')
+    MODELO = Cliente
+    COLUMNAS = (Cliente.id, Cliente.numero_documento, Cliente.nombre, Cliente.activo, Cliente.fecha_modificacion,
+                Cliente.direccion, Cliente.telefono, Cliente.limite_credito, Cliente.descuento_especial)
+
+    def __init__(self, filas):
+        self.direccion, self.telefono = [], []
+        self.limite_credito, self.descuento_especial = array('d'), array('d')
+        super().__init__(filas)
+
+    def _agrandar(self, faltan):
+        self.direccion.extend([None] * faltan)
+        self.telefono.extend([None] * faltan)
+        for columna in (self.limite_credito, self.descuento_especial):
+            columna.extend(array('d', bytes(faltan * columna.itemsize)))
+
+    def _guardar(self, id_, datos):
+        direccion, telefono, limite_credito, descuento_especial = datos
+        self.direccion[id_], self.telefono[id_] = direccion, telefono
+        self.limite_credito[id_] = float(limite_credito or 0)
+        self.descuento_especial[id_] = float(descuento_especial or 0)
+
+    def resultado(self, segmento, fila):
+        id_, numero_documento, nombre = segmento.ids[fila], segmento.codigo(fila), segmento.nombre(fila)
+        return {
+            'id': id_,
+            'label': f'{numero_documento} - {nombre}',
+            'value': nombre,
+            'numero_documento': numero_documento,
+            'direccion': self.direccion[id_],
+            'telefono': self.telefono[id_],
+            'limite_credito': self.limite_credito[id_],
+            'descuento_especial': self.descuento_especial[id_]
+        }
+
+
+# -----------------------------------------------------------------------
+# Catálogos del proceso
+# -----------------------------------------------------------------------
+
+_MODELOS = {Producto: CatalogoProductos, Cliente: CatalogoClientes}
+
+_catalogos = {}  # clase -> [catálogo, instante de la carga completa, instante del último refresco]
+_locks = {clase: threading.Lock() for clase in _MODELOS.values()}
+_pendientes = set()  # clases con cambios confirmados en este proceso
+
+
+def obtener_catalogo(clase):
+    """
+    El catálogo al día, o None si CATALOGO_MEMORIA está desactivado.
+    Si otro hilo lo está refrescando se devuelve el que hay.
+    """
+    if not current_app.config.get('CATALOGO_MEMORIA'):
+        return None
+    estado = _catalogos.get(clase)
+    ahora = time.monotonic()
+    intervalo = current_app.config.get('CATALOGO_REFRESCO_SEGUNDOS', 2)
+    if estado is not None and clase not in _pendientes and ahora - estado[2] < intervalo:
+        return estado[0]
+    lock = _locks[clase]
+    if not lock.acquire(blocking=estado is None):
+        return estado[0]
+    try:
+        _pendientes.discard(clase)
+        estado = _catalogos.get(clase)
+        if estado is None or ahora - estado[1] > CATALOGO_TTL:
+            _catalogos[clase] = [clase.cargar(), ahora, ahora]
+        else:
+            estado[0].refrescar()
+            estado[2] = ahora
+        return _catalogos[clase][0]
+    finally:
+        lock.release()
+
+
+def invalidar_catalogos():
+    for clase, lock in _locks.items():
+        with lock:
+            _catalogos.pop(clase, None)
+
+
+@event.listens_for(Producto, 'after_insert')
+@event.listens_for(Producto, 'after_update')
+@event.listens_for(Cliente, 'after_insert')
+@event.listens_for(Cliente, 'after_update')
+def _marcar_catalogo(mapper, connection, objeto):
+    session = object_session(objeto)
+    if session is not None:
+        marcar_modificado(session, type(objeto))
+
+
+def marcar_modificado(session, modelo):
+    """Refresca el catálogo de `modelo` después del commit (para UPDATE masivos, que no disparan los eventos)"""
+    session.info.setdefault('catalogos_modificados', set()).add(_MODELOS[modelo])
+
+
+@event.listens_for(db.session, 'after_commit')
+def _registrar_pendientes(session):
+    clases = session.info.pop('catalogos_modificados', None)
+    if clases:
+        _pendientes.update(clases)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_pendientes(session):
+    session.info.pop('catalogos_modificados', None)
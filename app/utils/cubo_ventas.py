@@ -0,0 +1,521 @@
+"""
+Cubo de ventas en memoria para análisis ad hoc.
+Cada línea de venta completada es una fila con columnas NumPy: la venta,
+el día (días desde 1970-01-01), las dimensiones codificadas como enteros
+consecutivos (producto, categoría, tipo de cliente, vendedor, caja y forma
+de pago) y las medidas (monto en guaraníes como int64 y cantidad). Agrupar
+y filtrar por cualquier combinación son operaciones vectorizadas
+(bincount, isin), del orden de milisegundos con millones de filas.
+
+Los diccionarios de cada dimensión traducen clave original <-> código; solo
+crecen, así un cubo viejo sigue siendo válido mientras se arma el nuevo.
+La forma de pago es la de los pagos confirmados de la venta: "mixto" si hay
+más de una, "sin_pago" si no hay ninguno (ventas a crédito). Los montos son
+los de venta_detalles (el descuento general de la venta no se reparte).
+
+El cubo se carga completo la primera vez y después se refresca por partes:
+las ventas con id mayor al último cargado y las que este proceso modificó
+(facturadas, anuladas, pagos nuevos). Los cambios a ventas viejas hechos por
+otro proceso entran en la recarga completa, cada CUBO_VENTAS_TTL segundos.
+"""
+import threading
+import time
+from array import array
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from sqlalchemy import case, event, func, literal, or_
+from sqlalchemy.orm import object_session
+
+from app import db
+from app.models import (Venta, VentaDetalle, Pago, FormaPago, Producto, Cliente, Usuario, Caja,
+                        AperturaCaja)
+from app.models.producto import Categoria
+from app.utils.series_tiempo import GRANULARIDADES, etiqueta_periodo
+
+DIMENSIONES = {
+    'producto': 'Producto',
+    'categoria': 'Categoría',
+    'tipo_cliente': 'Tipo de cliente',
+    'vendedor': 'Vendedor',
+    'caja': 'Caja',
+    'forma_pago': 'Forma de pago',
+}
+# Dimensiones cuya clave es un id (las demás son texto)
+DIMENSIONES_ID = ('producto', 'categoria', 'vendedor', 'caja')
+# Dimensiones de la cabecera: iguales en todas las líneas de una venta
+DIMENSIONES_VENTA = ('tipo_cliente', 'vendedor', 'caja', 'forma_pago')
+MEDIDAS = {'total': 'Total (Gs.)', 'cantidad': 'Cantidad', 'lineas': 'Líneas', 'ventas': 'Ventas'}
+
+# Segundos entre recargas completas (ver docstring del módulo)
+CUBO_VENTAS_TTL = 600
+# Filas por lote al leer de la base
+LOTE = 5000
+# Máximo de filas que devuelve una consulta (las demás se cuentan en 'grupos')
+MAX_FILAS = 1000
+# Hasta este tamaño del espacio de claves se agrupa con bincount directo, sin ordenar
+LIMITE_DENSO = 1 << 22
+
+_EPOCA = date(1970, 1, 1)
+_ORDINAL_EPOCA = _EPOCA.toordinal()
+
+_NOMBRES_FIJOS = {
+    'forma_pago': {'mixto': 'Mixto', 'sin_pago': 'Sin pago (crédito)'},
+}
+_SIN_CLAVE = {'producto': 'Sin producto', 'categoria': 'Sin categoría', 'caja': 'Sin caja',
+              'vendedor': 'Sin vendedor', 'tipo_cliente': 'Sin tipo'}
+
+
+class Diccionario:
+    """Codificación de una dimensión: clave original <-> código entero consecutivo"""
+    __slots__ = ('codigos', 'claves', 'nombres')
+
+    def __init__(self):
+        self.codigos = {}
+        self.claves = []
+        self.nombres = []
+
+    def codigo(self, clave):
+        codigo = self.codigos.get(clave)
+        if codigo is None:
+            codigo = self.codigos[clave] = len(self.claves)
+            self.claves.append(clave)
+            self.nombres.append(None)
+        return codigo
+
+    def __len__(self):
+        return len(self.claves)
+
+
+class CuboVentas:
+    """
+    Columnas del cubo (arrays del mismo largo, filas ordenadas por venta) y
+    los diccionarios de sus dimensiones.
+    """
+    COLUMNAS = (('venta', np.int64), ('dia', np.int32)) + tuple((d, np.int32) for d in DIMENSIONES) + (
+        ('monto', np.int64), ('cantidad', np.float64))
+
+    def __init__(self, columnas=None, diccionarios=None, max_venta_id=0):
+        columnas = columnas or {}
+        self.columnas = {nombre: np.asarray(columnas.get(nombre, ()), dtype=tipo) for nombre, tipo in self.COLUMNAS}
+        self.diccionarios = diccionarios or {d: Diccionario() for d in DIMENSIONES}
+        self.max_venta_id = max_venta_id
+
+    def __len__(self):
+        return len(self.columnas['venta'])
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columnas.values())
+
+    def con_cambios(self, nuevas, quitar_ventas, max_venta_id):
+        """Cubo nuevo sin las filas de quitar_ventas y con las filas nuevas (ordenadas por venta) intercaladas"""
+        columnas = self.columnas
+        if quitar_ventas:
+            conservar = ~np.isin(columnas['venta'], np.fromiter(quitar_ventas, dtype=np.int64))
+            columnas = {nombre: col[conservar] for nombre, col in columnas.items()}
+        if nuevas and len(nuevas['venta']):
+            posiciones = np.searchsorted(columnas['venta'], nuevas['venta'])
+            columnas = {nombre: np.insert(col, posiciones, nuevas[nombre]) for nombre, col in columnas.items()}
+        return CuboVentas(columnas, self.diccionarios, max_venta_id)
+
+    # -------------------------------------------------------------------
+    # Consultas
+    # -------------------------------------------------------------------
+
+    def _codigos_tiempo(self, dias, granularidad):
+        if granularidad == 'dia':
+            return dias
+        if granularidad == 'semana':
+            # 1970-01-01 fue jueves: (días + 3) % 7 es 0 los lunes
+            return dias - (dias + 3) % 7
+        # Mes (meses desde 1970-01) de cada día del rango, calculado una vez por día y no por fila
+        if not len(dias):
+            return dias
+        primero = int(dias.min())
+        meses = np.arange(primero, int(dias.max()) + 1).astype('datetime64[D]').astype('datetime64[M]').astype(np.int32)
+        if granularidad == 'trimestre':
+            meses -= meses % 3
+        return meses[dias - primero]
+
+    @staticmethod
+    def _fecha_tiempo(codigo, granularidad):
+        if granularidad in ('dia', 'semana'):
+            return _EPOCA + timedelta(days=int(codigo))
+        return date(1970 + int(codigo) // 12, int(codigo) % 12 + 1, 1)
+
+    def consultar(self, por=(), filtros=None, desde=None, hasta=None, medidas=('total',), orden=None,
+                  limite=MAX_FILAS):
+        """
+        Agrupa las filas por las dimensiones de `por` (DIMENSIONES o una
+        granularidad de tiempo: dia, semana, mes, trimestre) y suma las
+        medidas. filtros: {dimensión: [claves]}; desde/hasta: fechas
+        inclusive. Las filas salen ordenadas por `orden` (por defecto la
+        primera medida) de mayor a menor, hasta `limite`.
+        ValueError si alguna dimensión o medida no existe.
+        """
+        inicio = time.perf_counter()
+        por = list(por)
+        for dimension in por:
+            if dimension not in DIMENSIONES and dimension not in GRANULARIDADES:
+                raise ValueError(f'Dimensión desconocida: {dimension}')
+        if len(set(por)) != len(por):
+            raise ValueError('Dimensión repetida')
+        medidas = list(medidas) or ['total']
+        for medida in medidas:
+            if medida not in MEDIDAS:
+                raise ValueError(f'Medida desconocida: {medida}')
+        orden = orden or medidas[0]
+        if orden not in medidas:
+            raise ValueError(f'Orden por una medida no pedida: {orden}')
+
+        col = self.columnas
+        mascara = None
+        condiciones = []
+        if desde is not None:
+            condiciones.append(col['dia'] >= (desde - _EPOCA).days)
+        if hasta is not None:
+            condiciones.append(col['dia'] <= (hasta - _EPOCA).days)
+        for dimension, claves in (filtros or {}).items():
+            if dimension not in DIMENSIONES:
+                raise ValueError(f'Dimensión desconocida: {dimension}')
+            codigos = self.diccionarios[dimension].codigos
+            buscados = [codigos[c] for c in claves if c in codigos]
+            condiciones.append(np.isin(col[dimension], np.array(buscados, dtype=np.int32)))
+        for condicion in condiciones:
+            mascara = condicion if mascara is None else mascara & condicion
+        # Sin filtros se trabaja sobre las columnas enteras, sin copiarlas
+        tomar = (lambda nombre: col[nombre]) if mascara is None else (lambda nombre: col[nombre][mascara])
+        n = len(self) if mascara is None else int(np.count_nonzero(mascara))
+
+        dias = tomar('dia') if any(d in GRANULARIDADES for d in por) else None
+        claves = [self._codigos_tiempo(dias, d) if d in GRANULARIDADES else tomar(d) for d in por]
+        grupo, tamano, presentes, codigos = _agrupar(claves, n)
+
+        valores = {}
+        if 'total' in medidas:
+            suma = np.bincount(grupo, weights=tomar('monto'), minlength=tamano)[presentes]
+            valores['total'] = np.rint(suma).astype(np.int64)
+        if 'cantidad' in medidas:
+            valores['cantidad'] = np.bincount(grupo, weights=tomar('cantidad'), minlength=tamano)[presentes]
+        if 'lineas' in medidas:
+            valores['lineas'] = np.bincount(grupo, minlength=tamano)[presentes]
+        if 'ventas' in medidas:
+            primeras = _primeras_lineas(tomar('venta'))
+            if all(d in GRANULARIDADES or d in DIMENSIONES_VENTA for d in por):
+                # Todas las líneas de la venta caen en el mismo grupo: se cuenta la primera
+                valores['ventas'] = np.bincount(grupo[primeras], minlength=tamano)[presentes]
+            else:
+                ventas = tomar('venta')
+                base = int(ventas.max(initial=0)) + 1
+                pares = _unicos(grupo * base + ventas)
+                valores['ventas'] = np.bincount(pares // base, minlength=tamano)[presentes]
+
+        seleccion = np.argsort(-valores[orden], kind='stable')[:limite]
+        resultado = []
+        for g in seleccion.tolist():
+            fila = {}
+            for dimension, codigos_dimension in zip(por, codigos):
+                codigo = int(codigos_dimension[g])
+                if dimension in GRANULARIDADES:
+                    inicio_periodo = self._fecha_tiempo(codigo, dimension)
+                    fila[dimension] = {'clave': inicio_periodo, 'nombre': etiqueta_periodo(inicio_periodo, dimension)}
+                else:
+                    diccionario = self.diccionarios[dimension]
+                    fila[dimension] = {'clave': diccionario.claves[codigo], 'nombre': diccionario.nombres[codigo]}
+            for medida in medidas:
+                fila[medida] = valores[medida][g].item()
+            resultado.append(fila)
+
+        totales = {}
+        for medida in medidas:
+            if medida == 'ventas':
+                totales[medida] = int(np.count_nonzero(primeras))
+            else:
+                totales[medida] = valores[medida].sum().item() if len(presentes) else 0
+        return {
+            'por': por,
+            'medidas': medidas,
+            'filas': resultado,
+            'grupos': len(presentes),
+            'totales': totales,
+            'filas_leidas': n,
+            'filas_cubo': len(self),
+            'milisegundos': round((time.perf_counter() - inicio) * 1000, 2),
+        }
+
+
+def _primeras_lineas(ventas):
+    """Máscara de la primera línea de cada venta (las filas están ordenadas por venta)"""
+    primeras = np.empty(len(ventas), dtype=bool)
+    if len(ventas):
+        primeras[0] = True
+        np.not_equal(ventas[1:], ventas[:-1], out=primeras[1:])
+    return primeras
+
+
+def _unicos(valores):
+    """Valores distintos, ordenados (por ordenamiento: más rápido que np.unique con enteros grandes)"""
+    ordenados = np.sort(valores)
+    if len(ordenados) < 2:
+        return ordenados
+    distinto = np.empty(len(ordenados), dtype=bool)
+    distinto[0] = True
+    np.not_equal(ordenados[1:], ordenados[:-1], out=distinto[1:])
+    return ordenados[distinto]
+
+
+def _agrupar(claves, n):
+    """
+    Grupo de cada fila según la combinación de claves. Devuelve (grupo,
+    tamano, presentes, codigos): grupo de cada fila en 0..tamano-1, los
+    grupos que tienen filas y, por cada clave, su código en esos grupos.
+    """
+    if not claves or n == 0:
+        presentes = np.arange(1 if (n and not claves) else 0)
+        return np.zeros(n, dtype=np.int64), len(presentes), presentes, [np.zeros(0, dtype=np.int64) for _ in claves]
+    minimos = [int(clave.min()) for clave in claves]
+    rangos = [int(clave.max()) - minimo + 1 for clave, minimo in zip(claves, minimos)]
+    tamano = 1
+    for rango in rangos:
+        tamano *= rango
+    if tamano >= 1 << 62:
+        # Demasiadas combinaciones para una clave int64: grupos por filas distintas
+        unicas, grupo = np.unique(np.stack(claves, axis=1), axis=0, return_inverse=True)
+        return grupo.reshape(-1), len(unicas), np.arange(len(unicas)), [unicas[:, i] for i in range(len(claves))]
+
+    if len(claves) == 1 and minimos[0] == 0:
+        combinada = claves[0]  # una sola dimensión: el código ya es el número de grupo
+    else:
+        combinada = np.zeros(n, dtype=np.int64)
+        for clave, minimo, rango in zip(claves, minimos, rangos):
+            combinada *= rango
+            combinada += clave
+            combinada -= minimo
+    if tamano <= LIMITE_DENSO:
+        # La clave combinada ya es el número de grupo; se descartan los vacíos al final
+        grupo, presentes = combinada, np.flatnonzero(np.bincount(combinada, minlength=tamano))
+        valores_presentes = presentes
+    else:
+        valores_presentes, grupo = np.unique(combinada, return_inverse=True)
+        grupo = grupo.reshape(-1)
+        tamano = len(valores_presentes)
+        presentes = np.arange(tamano)
+    codigos = []
+    for minimo, rango in zip(reversed(minimos), reversed(rangos)):
+        codigos.append(valores_presentes % rango + minimo)
+        valores_presentes = valores_presentes // rango
+    return grupo, tamano, presentes, codigos[::-1]
+
+
+# -----------------------------------------------------------------------
+# Carga desde la base
+# -----------------------------------------------------------------------
+
+def _leer_filas(diccionarios, condicion):
+    """Filas de las ventas completadas que cumplen condicion(columna_venta_id), como columnas NumPy"""
+    formas = db.session.query(
+        Pago.venta_id.label('venta_id'),
+        case((func.count(func.distinct(FormaPago.codigo)) > 1, literal('mixto')),
+             else_=func.min(FormaPago.codigo)).label('forma')
+    ).join(FormaPago, FormaPago.id == Pago.forma_pago_id).filter(
+        Pago.estado == 'confirmado', condicion(Pago.venta_id)
+    ).group_by(Pago.venta_id).subquery()
+    consulta = db.session.query(
+        VentaDetalle.venta_id, Venta.fecha_venta, VentaDetalle.producto_id, Producto.categoria_id,
+        Cliente.tipo_cliente, Venta.vendedor_id, AperturaCaja.caja_id, formas.c.forma,
+        VentaDetalle.cantidad, VentaDetalle.total
+    ).join(Venta, Venta.id == VentaDetalle.venta_id).join(Cliente, Cliente.id == Venta.cliente_id).outerjoin(
+        Producto, Producto.id == VentaDetalle.producto_id
+    ).outerjoin(AperturaCaja, AperturaCaja.id == Venta.apertura_caja_id).outerjoin(
+        formas, formas.c.venta_id == Venta.id
+    ).filter(Venta.estado == 'completada', condicion(Venta.id)).order_by(VentaDetalle.venta_id).yield_per(LOTE)
+
+    buffers = {nombre: array('q' if tipo == np.int64 else 'i' if tipo == np.int32 else 'd')
+               for nombre, tipo in CuboVentas.COLUMNAS}
+    agregar = {nombre: buffer.append for nombre, buffer in buffers.items()}
+    codigo = {d: diccionarios[d].codigo for d in DIMENSIONES}
+    for (venta_id, fecha, producto_id, categoria_id, tipo_cliente, vendedor_id, caja_id, forma,
+         cantidad, total) in consulta:
+        agregar['venta'](venta_id)
+        agregar['dia'](fecha.toordinal() - _ORDINAL_EPOCA if fecha else 0)
+        agregar['producto'](codigo['producto'](producto_id))
+        agregar['categoria'](codigo['categoria'](categoria_id))
+        agregar['tipo_cliente'](codigo['tipo_cliente'](tipo_cliente))
+        agregar['vendedor'](codigo['vendedor'](vendedor_id))
+        agregar['caja'](codigo['caja'](caja_id))
+        agregar['forma_pago'](codigo['forma_pago'](forma or 'sin_pago'))
+        agregar['monto'](int(round(total or 0)))
+        agregar['cantidad'](float(cantidad or 0))
+    _completar_nombres(diccionarios)
+    return {nombre: np.frombuffer(buffer, dtype=tipo) if len(buffer) else np.zeros(0, dtype=tipo)
+            for (nombre, tipo), buffer in zip(CuboVentas.COLUMNAS, buffers.values())}
+
+
+def _completar_nombres(diccionarios):
+    """Nombres de las claves nuevas de cada diccionario (una consulta por dimensión)"""
+    consultas = {
+        'producto': lambda ids: db.session.query(Producto.id, Producto.nombre).filter(Producto.id.in_(ids)),
+        'categoria': lambda ids: db.session.query(Categoria.id, Categoria.nombre).filter(Categoria.id.in_(ids)),
+        'vendedor': lambda ids: db.session.query(
+            Usuario.id, Usuario.nombre + ' ' + Usuario.apellido).filter(Usuario.id.in_(ids)),
+        'caja': lambda ids: db.session.query(Caja.id, Caja.nombre).filter(Caja.id.in_(ids)),
+        'forma_pago': lambda codigos: db.session.query(FormaPago.codigo, FormaPago.nombre).filter(
+            FormaPago.codigo.in_(codigos)),
+    }
+    for dimension, diccionario in diccionarios.items():
+        pendientes = [c for c, nombre in enumerate(diccionario.nombres) if nombre is None]
+        if not pendientes:
+            continue
+        claves = [diccionario.claves[c] for c in pendientes if diccionario.claves[c] is not None]
+        nombres = dict(_NOMBRES_FIJOS.get(dimension, {}))
+        if dimension in consultas and claves:
+            nombres.update(consultas[dimension](claves).all())
+        for c in pendientes:
+            clave = diccionario.claves[c]
+            if clave is None:
+                diccionario.nombres[c] = _SIN_CLAVE.get(dimension, 'Sin dato')
+            else:
+                diccionario.nombres[c] = nombres.get(clave) or str(clave).replace('_', ' ').capitalize()
+
+
+def _ultima_venta():
+    return db.session.query(func.max(Venta.id)).scalar() or 0
+
+
+def cargar_cubo():
+    """Cubo completo con todas las ventas completadas"""
+    tope = _ultima_venta()
+    diccionarios = {d: Diccionario() for d in DIMENSIONES}
+    columnas = _leer_filas(diccionarios, lambda venta_id: venta_id <= tope)
+    return CuboVentas(columnas, diccionarios, tope)
+
+
+def refrescar_cubo(cubo, modificadas=()):
+    """El cubo con las ventas nuevas (id mayor al último cargado) y las modificadas vueltas a leer"""
+    tope = _ultima_venta()
+    modificadas = sorted(set(modificadas))
+    if tope <= cubo.max_venta_id and not modificadas:
+        return cubo
+    desde = cubo.max_venta_id
+
+    def condicion(venta_id):
+        nuevas = (venta_id > desde) & (venta_id <= tope)
+        return or_(nuevas, venta_id.in_(modificadas)) if modificadas else nuevas
+
+    nuevas = _leer_filas(cubo.diccionarios, condicion)
+    return cubo.con_cambios(nuevas, modificadas, max(tope, cubo.max_venta_id))
+
+
+# -----------------------------------------------------------------------
+# Cubo del proceso
+# -----------------------------------------------------------------------
+
+_cubo = None  # (instante de la última carga completa, CuboVentas)
+_cubo_lock = threading.Lock()
+_modificadas = set()  # ids de ventas modificadas (ya confirmadas) que el cubo tiene que volver a leer
+_modificadas_lock = threading.Lock()
+
+
+def obtener_cubo(recargar=False):
+    """El cubo al día: completo si no hay, venció el TTL o se pide recargar; si no, refrescado por partes"""
+    global _cubo
+    with _cubo_lock:
+        with _modificadas_lock:
+            modificadas = set(_modificadas)
+            _modificadas.clear()
+        if recargar or _cubo is None or time.monotonic() - _cubo[0] > CUBO_VENTAS_TTL:
+            _cubo = (time.monotonic(), cargar_cubo())
+        else:
+            _cubo = (_cubo[0], refrescar_cubo(_cubo[1], modificadas))
+        return _cubo[1]
+
+
+def invalidar_cubo():
+    global _cubo
+    with _cubo_lock:
+        _cubo = None
+
+
+@event.listens_for(Venta, 'after_update')
+def _marcar_venta(mapper, connection, venta):
+    session = object_session(venta)
+    if session is not None:
+        session.info.setdefault('cubo_ventas_modificadas', set()).add(venta.id)
+
+
+@event.listens_for(VentaDetalle, 'after_insert')
+@event.listens_for(VentaDetalle, 'after_update')
+@event.listens_for(VentaDetalle, 'after_delete')
+@event.listens_for(Pago, 'after_insert')
+@event.listens_for(Pago, 'after_update')
+@event.listens_for(Pago, 'after_delete')
+def _marcar_venta_de_linea(mapper, connection, objeto):
+    session = object_session(objeto)
+    if session is not None and objeto.venta_id:
+        session.info.setdefault('cubo_ventas_modificadas', set()).add(objeto.venta_id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _registrar_modificadas(session):
+    ids = session.info.pop('cubo_ventas_modificadas', None)
+    if ids:
+        with _modificadas_lock:
+            _modificadas.update(ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_modificadas(session):
+    session.info.pop('cubo_ventas_modificadas', None)
+
+
+# -----------------------------------------------------------------------
+# Parámetros y JSON
+# -----------------------------------------------------------------------
+
+def _lista(valor):
+    return [v.strip() for v in (valor or '').split(',') if v.strip()]
+
+
+def parametros_cubo(args):
+    """
+    Lee por (dimensiones separadas por coma), medidas, orden, desde, hasta
+    (YYYY-MM-DD), limite y un filtro por cada dimensión (claves separadas
+    por coma; 'ninguno' para las filas sin dato) de los argumentos del
+    request. ValueError si algún valor no es válido.
+    """
+    from datetime import datetime
+
+    parametros = {
+        'por': _lista(args.get('por')),
+        'medidas': _lista(args.get('medidas')) or ['total'],
+        'orden': args.get('orden') or None,
+        'desde': datetime.strptime(args['desde'], '%Y-%m-%d').date() if args.get('desde') else None,
+        'hasta': datetime.strptime(args['hasta'], '%Y-%m-%d').date() if args.get('hasta') else None,
+        'limite': min(int(args.get('limite') or MAX_FILAS), MAX_FILAS),
+        'filtros': {},
+    }
+    if parametros['limite'] < 1:
+        raise ValueError('El límite debe ser mayor a cero')
+    for dimension in DIMENSIONES:
+        claves = _lista(args.get(dimension))
+        if not claves:
+            continue
+        if dimension in DIMENSIONES_ID:
+            claves = [None if c == 'ninguno' else int(c) for c in claves]
+        else:
+            claves = [None if c == 'ninguno' else c for c in claves]
+        parametros['filtros'][dimension] = claves
+    return parametros
+
+
+def consulta_a_json(resultado):
+    """El resultado de CuboVentas.consultar con fechas ISO, para las respuestas JSON"""
+    filas = []
+    for fila in resultado['filas']:
+        fila = dict(fila)
+        for dimension in resultado['por']:
+            if dimension in GRANULARIDADES:
+                fila[dimension] = dict(fila[dimension], clave=fila[dimension]['clave'].isoformat())
+        filas.append(fila)
+    return dict(resultado, filas=filas)
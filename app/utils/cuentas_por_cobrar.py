@@ -0,0 +1,130 @@
+"""
+Antigüedad de saldos de cuentas por cobrar.
+Los saldos abiertos (Venta.saldo > 0, no anuladas) se agrupan por cliente y por
+tramo de días vencidos respecto a fecha_vencimiento, en una sola consulta.
+Los tramos se resuelven comparando fechas contra límites calculados en Python,
+así la consulta no depende de funciones de fecha del motor.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from sqlalchemy import case, func
+from app import db
+from app.models import Venta, Cliente
+
+# (clave, etiqueta) en orden de antigüedad
+TRAMOS_ANTIGUEDAD = [
+    ('corriente', 'Al día'),
+    ('d1_30', '1-30 días'),
+    ('d31_60', '31-60 días'),
+    ('d61_90', '61-90 días'),
+    ('mas_90', 'Más de 90 días'),
+]
+
+
+def _filtro_abiertas():
+    return (Venta.saldo > 0, Venta.estado != 'anulada')
+
+
+def _expresion_tramo(fecha_corte):
+    """Clave del tramo de cada venta (las ventas sin vencimiento se consideran al día)"""
+    venc = Venta.fecha_vencimiento
+    return case(
+        (venc.is_(None), 'corriente'),
+        (venc >= fecha_corte, 'corriente'),
+        (venc >= fecha_corte - timedelta(days=30), 'd1_30'),
+        (venc >= fecha_corte - timedelta(days=60), 'd31_60'),
+        (venc >= fecha_corte - timedelta(days=90), 'd61_90'),
+        else_='mas_90'
+    )
+
+
+def antiguedad_saldos(fecha_corte=None):
+    """
+    Saldos abiertos por cliente y tramo, más los totales generales.
+    Devuelve {'fecha_corte', 'clientes': [...], 'totales': {...}}; cada cliente
+    tiene id, nombre, documento, un Decimal por tramo, total y cantidad de ventas.
+    """
+    fecha_corte = fecha_corte or date.today()
+    tramo = _expresion_tramo(fecha_corte)
+    columnas = [
+        func.coalesce(func.sum(case((tramo == clave, Venta.saldo), else_=0)), 0).label(clave)
+        for clave, _ in TRAMOS_ANTIGUEDAD
+    ]
+    filas = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.numero_documento,
+        *columnas,
+        func.sum(Venta.saldo).label('total'),
+        func.count(Venta.id).label('ventas')
+    ).join(Venta, Venta.cliente_id == Cliente.id).filter(
+        *_filtro_abiertas()
+    ).group_by(Cliente.id, Cliente.nombre, Cliente.numero_documento).order_by(
+        func.sum(Venta.saldo).desc()
+    ).all()
+
+    totales = {clave: Decimal('0') for clave, _ in TRAMOS_ANTIGUEDAD}
+    totales.update(total=Decimal('0'), ventas=0)
+    clientes = []
+    for fila in filas:
+        item = {'id': fila.id, 'nombre': fila.nombre, 'documento': fila.numero_documento}
+        for clave, _ in TRAMOS_ANTIGUEDAD:
+            item[clave] = Decimal(str(getattr(fila, clave) or 0))
+            totales[clave] += item[clave]
+        item['total'] = Decimal(str(fila.total or 0))
+        item['ventas'] = fila.ventas
+        totales['total'] += item['total']
+        totales['ventas'] += fila.ventas
+        clientes.append(item)
+    return {'fecha_corte': fecha_corte, 'clientes': clientes, 'totales': totales}
+
+
+def ventas_abiertas(fecha_corte=None, lote=1000):
+    """Detalle de ventas con saldo (solo columnas, por lotes) ordenado por cliente y vencimiento"""
+    fecha_corte = fecha_corte or date.today()
+    return db.session.query(
+        Venta.numero_factura, Venta.fecha_venta, Venta.fecha_vencimiento,
+        Cliente.nombre.label('cliente'), Cliente.numero_documento,
+        Venta.total, Venta.monto_pagado, Venta.saldo,
+        _expresion_tramo(fecha_corte).label('tramo')
+    ).join(Cliente, Venta.cliente_id == Cliente.id).filter(
+        *_filtro_abiertas()
+    ).order_by(Cliente.nombre, Venta.fecha_vencimiento, Venta.id).yield_per(lote)
+
+
+def exportar_antiguedad_xlsx(ruta, fecha_corte=None):
+    """Escribe el resumen por cliente y el detalle de ventas en modo write_only (memoria constante)"""
+    from openpyxl import Workbook
+
+    fecha_corte = fecha_corte or date.today()
+    etiquetas = dict(TRAMOS_ANTIGUEDAD)
+    wb = Workbook(write_only=True)
+
+    resumen = wb.create_sheet('Resumen')
+    resumen.append([f'Antigüedad de saldos al {fecha_corte.strftime("%d/%m/%Y")}'])
+    resumen.append(['Cliente', 'Documento'] + [e for _, e in TRAMOS_ANTIGUEDAD] + ['Total', 'Ventas'])
+    datos = antiguedad_saldos(fecha_corte)
+    for c in datos['clientes']:
+        resumen.append([c['nombre'], c['documento']] + [float(c[k]) for k, _ in TRAMOS_ANTIGUEDAD]
+                       + [float(c['total']), c['ventas']])
+    t = datos['totales']
+    resumen.append(['TOTAL', ''] + [float(t[k]) for k, _ in TRAMOS_ANTIGUEDAD] + [float(t['total']), t['ventas']])
+
+    detalle = wb.create_sheet('Detalle')
+    detalle.append(['Factura', 'Fecha', 'Vencimiento', 'Días vencidos', 'Cliente', 'Documento',
+                    'Total', 'Pagado', 'Saldo', 'Tramo'])
+    for v in ventas_abiertas(fecha_corte):
+        dias = (fecha_corte - v.fecha_vencimiento).days if v.fecha_vencimiento else 0
+        detalle.append([
+            v.numero_factura,
+            v.fecha_venta.date() if v.fecha_venta else None,
+            v.fecha_vencimiento,
+            max(dias, 0),
+            v.cliente,
+            v.numero_documento,
+            float(v.total or 0),
+            float(v.monto_pagado or 0),
+            float(v.saldo or 0),
+            etiquetas.get(v.tramo, v.tramo),
+        ])
+
+    wb.save(ruta)
+    return ruta
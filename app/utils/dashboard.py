@@ -0,0 +1,136 @@
+"""
+Indicadores del dashboard.
+Cada cifra sale de una consulta agregada (COUNT / SUM / LIMIT), sin cargar
+objetos, y el conjunto se guarda en un cache del proceso por unos segundos.
+Los cambios en ventas, pagos y productos (stock) invalidan el cache al
+confirmarse la transacción; el resto (clientes, servicios) se refresca por TTL.
+"""
+import time
+from datetime import date, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import Cliente, Producto, OrdenServicio, VentaDiaria, Venta, Pago
+from app.utils.series_tiempo import serie_ventas
+
+CACHE_DASHBOARD_TTL = 60
+STOCK_BAJO_TOP = 10
+
+_cache = None  # (instante, fecha, indicadores)
+
+
+def _total_clientes(hoy):
+    return db.session.query(func.count(Cliente.id)).filter(Cliente.activo == True).scalar()
+
+
+def _total_productos(hoy):
+    return db.session.query(func.count(Producto.id)).filter(Producto.activo == True).scalar()
+
+
+def _total_ventas_mes(hoy):
+    return db.session.query(func.coalesce(func.sum(VentaDiaria.total), 0)).filter(
+        VentaDiaria.fecha >= hoy.replace(day=1)
+    ).scalar()
+
+
+def _servicios_pendientes(hoy):
+    return db.session.query(func.count(OrdenServicio.id)).filter(
+        OrdenServicio.estado.in_(['pendiente', 'en_proceso'])
+    ).scalar()
+
+
+def _filtro_stock_bajo():
+    return (Producto.stock_actual <= Producto.stock_minimo, Producto.activo == True)
+
+
+def _stock_bajo_cantidad(hoy):
+    return db.session.query(func.count(Producto.id)).filter(*_filtro_stock_bajo()).scalar()
+
+
+def _productos_stock_bajo(hoy):
+    """Los más comprometidos primero (mayor faltante respecto al mínimo)"""
+    return db.session.query(
+        Producto.id, Producto.codigo, Producto.nombre, Producto.stock_actual, Producto.stock_minimo
+    ).filter(*_filtro_stock_bajo()).order_by(
+        (Producto.stock_actual - Producto.stock_minimo), Producto.nombre
+    ).limit(STOCK_BAJO_TOP).all()
+
+
+def _ventas_por_dia(hoy):
+    """Últimos 7 días, incluidos los días sin ventas (total 0)"""
+    serie = serie_ventas(hoy - timedelta(days=6), hoy, 'dia')
+    return [{'fecha': dia, 'total': total} for dia, total in zip(serie['periodos'], serie['totales'])]
+
+
+# (clave, función) en el orden en que se calculan y se muestran los tiempos
+INDICADORES = [
+    ('total_clientes', _total_clientes),
+    ('total_productos', _total_productos),
+    ('total_ventas_mes', _total_ventas_mes),
+    ('servicios_pendientes', _servicios_pendientes),
+    ('stock_bajo_cantidad', _stock_bajo_cantidad),
+    ('productos_stock_bajo', _productos_stock_bajo),
+    ('ventas_por_dia', _ventas_por_dia),
+]
+
+
+def calcular_indicadores():
+    """Calcula todos los indicadores. Devuelve (valores, tiempos en ms por indicador)"""
+    hoy = date.today()
+    valores, tiempos = {}, {}
+    for clave, funcion in INDICADORES:
+        inicio = time.perf_counter()
+        valores[clave] = funcion(hoy)
+        tiempos[clave] = (time.perf_counter() - inicio) * 1000
+    return valores, tiempos
+
+
+def indicadores_dashboard(refrescar=False):
+    """
+    Indicadores desde el cache (se recalculan si venció el TTL, cambió el día
+    o se pidió refrescar). Devuelve {'valores', 'tiempos', 'calculado', 'desde_cache'}.
+    """
+    global _cache
+    hoy = date.today()
+    cache = _cache
+    if refrescar or cache is None or cache[1] != hoy or time.monotonic() - cache[0] > CACHE_DASHBOARD_TTL:
+        valores, tiempos = calcular_indicadores()
+        cache = (time.monotonic(), hoy, {'valores': valores, 'tiempos': tiempos, 'calculado': time.time()})
+        _cache = cache
+        return dict(cache[2], desde_cache=False)
+    return dict(cache[2], desde_cache=True)
+
+
+def invalidar_cache_dashboard():
+    global _cache
+    _cache = None
+
+
+@event.listens_for(Venta, 'after_insert')
+@event.listens_for(Venta, 'after_update')
+@event.listens_for(Venta, 'after_delete')
+@event.listens_for(Pago, 'after_insert')
+@event.listens_for(Pago, 'after_update')
+@event.listens_for(Producto, 'after_insert')
+@event.listens_for(Producto, 'after_update')
+@event.listens_for(Producto, 'after_delete')
+def _marcar_dashboard_modificado(mapper, connection, objeto):
+    session = object_session(objeto)
+    if session is not None:
+        marcar_dashboard_modificado(session)
+
+
+def marcar_dashboard_modificado(session):
+    """Invalida el cache al confirmar la transacción (para UPDATE masivos, que no disparan los eventos)"""
+    session.info['dashboard_modificado'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_dashboard(session):
+    if session.info.pop('dashboard_modificado', False):
+        invalidar_cache_dashboard()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_marca_dashboard(session):
+    session.info.pop('dashboard_modificado', None)
@@ -1,7 +1,7 @@
 from app.utils.base_pdf import PDFReportBase
 from app.utils.tabla_pdf import build_pdf_table
 
-def arqueo_caja_pdf(arqueos, empresa):
+def arqueo_caja_pdf(arqueos, empresa=None):
     # Configuración del reporte
     title = "Reporte de Arqueo de Caja"
     filename = "arqueo_caja.pdf"
@@ -19,7 +19,7 @@ def arqueo_caja_pdf(arqueos, empresa):
             a.estado.capitalize() if a.estado else ''
         ])
     # Crear reporte base
-    pdf = PDFReportBase(empresa, title, filename)
+    pdf = PDFReportBase(title, filename, empresa)
     pdf.add_membrete()
     pdf.add_title()
     pdf.elements.append(build_pdf_table(table_data, col_widths))
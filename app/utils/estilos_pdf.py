@@ -0,0 +1,321 @@
+"""
+Estilos y membrete compartidos de los PDF.
+getSampleStyleSheet() arma todos los estilos base en cada llamada, y cada
+reporte repetía sus ParagraphStyle / TableStyle y consultaba la empresa para
+el membrete. Aquí se construyen una sola vez por proceso:
+
+- ESTILOS: hoja de estilos base + los estilos propios de los reportes.
+  Es compartida: no modificar sus estilos (para un cambio puntual usar estilo_variante()).
+- estilo_tabla(): TableStyle por tema y color, en un lru_cache.
+- membrete(): párrafos del membrete ya armados con los datos de la empresa.
+  Se guardan con la configuración de la empresa y se descartan cuando esta
+  cambia (nombre, RUC, dirección, teléfono) o pasado CACHE_EMPRESA_TTL.
+  Cada llamada devuelve copias, así dos reportes simultáneos no comparten
+  el estado de armado de reportlab.
+"""
+import copy
+import time
+from functools import lru_cache
+from types import SimpleNamespace
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer, TableStyle
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app import db
+from app.models import ConfiguracionEmpresa
+
+CACHE_EMPRESA_TTL = 300
+LEMA = 'El Mundo Feliz'
+CAMPOS_MEMBRETE = ('nombre_empresa', 'ruc', 'direccion', 'telefono')
+
+
+# -----------------------------------------------------------------------
+# Estilos de párrafo
+# -----------------------------------------------------------------------
+
+ESTILOS = getSampleStyleSheet()
+
+
+def _registrar(nombre, padre, **atributos):
+    ESTILOS.add(ParagraphStyle(nombre, parent=ESTILOS[padre], **atributos))
+
+
+_registrar('Centrado', 'Normal', alignment=1)
+_registrar('Membrete', 'Normal', fontSize=11, alignment=1, spaceAfter=2)
+_registrar('MembreteLema', 'Normal', fontSize=10, alignment=1, textColor='#888')
+_registrar('TituloListado', 'Heading1', fontSize=18, alignment=1, spaceAfter=20)
+_registrar('TituloReporte', 'Heading1', fontSize=18, alignment=1, spaceAfter=16)
+_registrar('TituloBase', 'Heading1', fontSize=17, alignment=1, spaceAfter=10, textColor='#222')
+_registrar('TituloTabla', 'Heading1', fontSize=16, alignment=1)
+_registrar('SubtituloTabla', 'Normal', fontSize=12, alignment=1, textColor=colors.HexColor('#2980b9'), spaceAfter=8)
+_registrar('PieBase', 'Normal', fontSize=9, alignment=1, textColor='#888', spaceBefore=16)
+_registrar('ArqueoTitulo', 'Heading1', fontSize=18, textColor=colors.HexColor('#1a3a52'), spaceAfter=6, alignment=1)
+_registrar('ArqueoSubtitulo', 'Normal', fontSize=11, textColor=colors.HexColor('#555555'), spaceAfter=4, alignment=1)
+_registrar('ArqueoSeccion', 'Heading2', fontSize=12, textColor=colors.HexColor('#0d6efd'), spaceAfter=8, spaceBefore=8)
+_registrar('ArqueoEstado', 'Heading2', fontSize=14, spaceAfter=8, alignment=1)
+
+
+@lru_cache(maxsize=64)
+def estilo_variante(nombre, **cambios):
+    """Copia cacheada de un estilo de ESTILOS con algunos atributos cambiados (p. ej. textColor)"""
+    return ParagraphStyle(f"{nombre}_{len(cambios)}_{hash(tuple(sorted(cambios.items())))}",
+                          parent=ESTILOS[nombre], **cambios)
+
+
+# -----------------------------------------------------------------------
+# Estilos de tabla
+# -----------------------------------------------------------------------
+
+def _comandos_pie():
+    return [
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f9e79f')),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#2c3e50')),
+    ]
+
+
+def _tema_encabezado(color, tamano_fuente, con_pie):
+    # Encabezado grande sobre filas grises (build_pdf_table)
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), tamano_fuente or 13),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]
+
+
+def _tema_grilla(color, tamano_fuente, con_pie):
+    # Misma fuente en toda la tabla, filas grises
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), tamano_fuente or 9),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]
+
+
+def _tema_listado(color, tamano_fuente, con_pie):
+    # Grilla oscura y letra grande (listados de clientes y productos)
+    comandos = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#34495e')),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ]
+    if con_pie:
+        comandos += _comandos_pie()
+    comandos += [
+        ('FONTSIZE', (0, 0), (-1, -1), tamano_fuente or 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('TOPPADDING', (0, 0), (-1, 0), 8),
+    ]
+    if con_pie:
+        comandos += [
+            ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
+            ('TOPPADDING', (0, -1), (-1, -1), 8),
+        ]
+    return comandos
+
+
+def _tema_compacto(color, tamano_fuente, con_pie):
+    # Filas de alto fijo para las tablas en streaming (app.utils.pdf_streaming)
+    comandos = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#34495e')),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), tamano_fuente or 9),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]
+    if con_pie:
+        comandos += _comandos_pie()
+    return comandos
+
+
+def _tema_totales(color, tamano_fuente, con_pie):
+    # Comparación con fila de totales (arqueo de caja)
+    return [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, -1), (-1, -1), 11),
+        ('TOPPADDING', (0, -1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTSIZE', (0, 1), (-1, -2), tamano_fuente or 10),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f8f9fa')]),
+    ]
+
+
+def _tema_datos(color, tamano_fuente, con_pie):
+    # Pares etiqueta/valor sin grilla
+    return [
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), tamano_fuente or 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ]
+
+
+def _tema_firmas(color, tamano_fuente, con_pie):
+    return [
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTSIZE', (0, 0), (-1, -1), tamano_fuente or 9),
+        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+    ]
+
+
+TEMAS_TABLA = {
+    'encabezado': _tema_encabezado,
+    'grilla': _tema_grilla,
+    'listado': _tema_listado,
+    'compacto': _tema_compacto,
+    'totales': _tema_totales,
+    'datos': _tema_datos,
+    'firmas': _tema_firmas,
+}
+
+
+@lru_cache(maxsize=128)
+def estilo_tabla(tema='encabezado', color_encabezado='#27ae60', tamano_fuente=None, con_pie=False):
+    """TableStyle compartido del tema (ver TEMAS_TABLA). No modificarlo: Table.setStyle solo lo lee."""
+    return TableStyle(TEMAS_TABLA[tema](color_encabezado, tamano_fuente, con_pie))
+
+
+# -----------------------------------------------------------------------
+# Empresa y membrete
+# -----------------------------------------------------------------------
+
+_cache = None  # (instante, datos de la empresa, {variante: flowables})
+
+
+def _datos(empresa):
+    """Copia de los campos de la empresa, desligada de la sesión"""
+    if empresa is None:
+        return None
+    if isinstance(empresa, dict):
+        return SimpleNamespace(nombre_empresa=empresa.get('nombre'), ruc=empresa.get('ruc'),
+                               direccion=empresa.get('direccion'), telefono=empresa.get('telefono'))
+    return SimpleNamespace(**{campo: getattr(empresa, campo, None) for campo in CAMPOS_MEMBRETE})
+
+
+def _vigente():
+    global _cache
+    cache = _cache
+    if cache is None or time.monotonic() - cache[0] > CACHE_EMPRESA_TTL:
+        cache = (time.monotonic(), _datos(ConfiguracionEmpresa.query.first()), {})
+        _cache = cache
+    return cache
+
+
+def datos_empresa():
+    """Nombre, RUC, dirección y teléfono de la empresa (cacheados), o None si no está configurada"""
+    return _vigente()[1]
+
+
+def _armar_membrete(variante, empresa):
+    nombre = (empresa.nombre_empresa if empresa else None) or 'Juguetería'
+    ruc = (empresa.ruc if empresa else None) or 'N/A'
+    direccion = (empresa.direccion if empresa else None) or ''
+    if variante == 'reporte':
+        return [
+            Paragraph(f"<b>{nombre}</b>", ESTILOS['Title']),
+            Paragraph(LEMA, ESTILOS['Normal']),
+            Paragraph(f"RUC: {ruc}", ESTILOS['Normal']),
+            Paragraph(direccion, ESTILOS['Normal']),
+            Spacer(1, 12),
+        ]
+    if variante == 'base':
+        return [
+            Spacer(1, 10),
+            Paragraph(f"<b>{nombre}</b>", ESTILOS['Membrete']),
+            Paragraph(LEMA, ESTILOS['MembreteLema']),
+            Paragraph(f"RUC: {ruc}", ESTILOS['Membrete']),
+            Paragraph(direccion, ESTILOS['Membrete']),
+            Spacer(1, 8),
+        ]
+    if variante == 'tabla':
+        elementos = [
+            Paragraph(f"<b>{nombre}</b>", ESTILOS['Title']),
+            Paragraph(f"RUC: {ruc}", ESTILOS['Centrado']),
+        ]
+        if direccion:
+            elementos.append(Paragraph(direccion, ESTILOS['Centrado']))
+        return elementos
+    if variante == 'arqueo':
+        return [
+            Paragraph(nombre if empresa else 'JUGUETERÍA', ESTILOS['ArqueoTitulo']),
+            Paragraph(LEMA, ESTILOS['ArqueoSubtitulo']),
+            Paragraph(f"RUC: {ruc}", ESTILOS['Normal']),
+            Paragraph(direccion, ESTILOS['Normal']),
+            Spacer(1, 14.4),
+        ]
+    raise ValueError(f'Membrete desconocido: {variante}')
+
+
+def membrete(variante='reporte', empresa=None):
+    """
+    Flowables del membrete. variante: 'reporte', 'base', 'tabla' o 'arqueo'.
+    Sin `empresa` se usa la configuración guardada (cacheada); con un
+    objeto o dict de empresa se arma sin cache.
+    """
+    if empresa is not None:
+        return _armar_membrete(variante, _datos(empresa))
+    _, datos, membretes = _vigente()
+    if variante not in membretes:
+        membretes[variante] = _armar_membrete(variante, datos)
+    return [copy.copy(f) for f in membretes[variante]]
+
+
+def invalidar_membrete():
+    global _cache
+    _cache = None
+
+
+def _marcar(empresa):
+    session = object_session(empresa)
+    if session is not None:
+        session.info['membrete_modificado'] = True
+
+
+@event.listens_for(ConfiguracionEmpresa, 'after_insert')
+@event.listens_for(ConfiguracionEmpresa, 'after_delete')
+def _empresa_creada_o_eliminada(mapper, connection, empresa):
+    _marcar(empresa)
+
+
+@event.listens_for(ConfiguracionEmpresa, 'after_update')
+def _empresa_modificada(mapper, connection, empresa):
+    # La numeración de facturas también vive en esta tabla: solo importan los campos del membrete
+    estado = inspect(empresa)
+    if any(estado.attrs[campo].history.has_changes() for campo in CAMPOS_MEMBRETE):
+        _marcar(empresa)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_membrete(session):
+    if session.info.pop('membrete_modificado', False):
+        invalidar_membrete()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_marca_membrete(session):
+    session.info.pop('membrete_modificado', None)
@@ -0,0 +1,225 @@
+"""
+Exportación de los reportes a CSV y Excel.
+Cada reporte es una consulta de columnas (sin objetos ORM) recorrida con
+yield_per, que en PostgreSQL usa un cursor del servidor; las filas pasan una
+por una al escritor (csv o Workbook write_only de openpyxl), así la memoria
+no depende de la cantidad de filas. Los valores se escriben con su tipo
+(fechas y montos), no como texto formateado.
+"""
+import csv
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import (Venta, Cliente, Usuario, Producto, Compra, Proveedor,
+                        SolicitudServicio, Reclamo, Presupuesto)
+from app.utils.perfiles_consulta import pagado_compra
+
+LOTE = 2000
+
+MIMETYPE_CSV = 'text/csv'
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATOS = {'csv': MIMETYPE_CSV, 'xlsx': MIMETYPE_XLSX}
+
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d') if valor else None
+
+
+def _filtrar_periodo(query, columna, parametros):
+    """Aplica desde/hasta (YYYY-MM-DD, hasta inclusive) sobre la columna. ValueError si no son fechas."""
+    desde, hasta = _fecha(parametros.get('desde')), _fecha(parametros.get('hasta'))
+    if desde:
+        query = query.filter(columna >= desde)
+    if hasta:
+        query = query.filter(columna < hasta + timedelta(days=1))
+    return query
+
+
+def _solo_fecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _capitalizar(valor):
+    return (valor or '').capitalize()
+
+
+# -----------------------------------------------------------------------
+# Reportes
+# -----------------------------------------------------------------------
+
+def _ventas(parametros):
+    # Mismo período por defecto que el PDF: el mes actual
+    parametros = dict(parametros)
+    parametros.setdefault('desde', parametros.get('fecha_desde'))
+    parametros.setdefault('hasta', parametros.get('fecha_hasta'))
+    if not parametros['desde']:
+        parametros['desde'] = date.today().replace(day=1).isoformat()
+    vendedor = (Usuario.nombre + ' ' + Usuario.apellido).label('vendedor')
+    query = db.session.query(
+        Venta.numero_factura, Venta.fecha_venta, Cliente.nombre, vendedor, Venta.total
+    ).outerjoin(Cliente, Cliente.id == Venta.cliente_id).outerjoin(
+        Usuario, Usuario.id == Venta.vendedor_id
+    ).filter(Venta.estado == 'completada')
+    query = _filtrar_periodo(query, Venta.fecha_venta, parametros)
+    for v in query.order_by(Venta.fecha_venta, Venta.id).yield_per(LOTE):
+        yield [v.numero_factura, _solo_fecha(v.fecha_venta), v.nombre, v.vendedor, v.total]
+
+
+def _productos(parametros):
+    query = db.session.query(
+        Producto.codigo, Producto.nombre, Producto.stock_actual, Producto.stock_minimo,
+        Producto.precio_venta, Producto.activo
+    ).filter(Producto.activo.is_(True)).order_by(Producto.codigo)
+    for p in query.yield_per(LOTE):
+        yield [p.codigo, p.nombre, p.stock_actual, p.stock_minimo, p.precio_venta,
+               'Activo' if p.activo else 'Inactivo']
+
+
+def _stock_bajo(parametros):
+    query = db.session.query(
+        Producto.codigo, Producto.nombre, Producto.stock_actual, Producto.stock_minimo
+    ).filter(
+        Producto.stock_actual <= Producto.stock_minimo,
+        Producto.activo.is_(True)
+    ).order_by(Producto.codigo)
+    for p in query.yield_per(LOTE):
+        yield [p.codigo, p.nombre, p.stock_actual, p.stock_minimo]
+
+
+def _compras(parametros):
+    query = db.session.query(
+        Compra.numero_compra, Proveedor.razon_social, Compra.fecha_compra, Compra.total, Compra.estado
+    ).outerjoin(Proveedor, Proveedor.id == Compra.proveedor_id)
+    query = _filtrar_periodo(query, Compra.fecha_compra, parametros)
+    for c in query.order_by(Compra.fecha_compra, Compra.id).yield_per(LOTE):
+        yield [c.numero_compra, c.razon_social, _solo_fecha(c.fecha_compra), c.total, _capitalizar(c.estado)]
+
+
+def _compras_pendientes(parametros):
+    # Pagado por compra en una subconsulta correlacionada (antes: compra.pagos por cada fila)
+    pagado = pagado_compra()
+    query = db.session.query(
+        Compra.numero_compra, Proveedor.razon_social, Compra.fecha_compra, Compra.total,
+        pagado.label('pagado'), Compra.estado
+    ).outerjoin(Proveedor, Proveedor.id == Compra.proveedor_id).filter(
+        Compra.estado.in_(['registrada', 'parcial_pagada'])
+    )
+    for c in query.order_by(Compra.fecha_compra, Compra.id).yield_per(LOTE):
+        total = c.total or 0
+        yield [c.numero_compra, c.razon_social, _solo_fecha(c.fecha_compra), total, c.pagado,
+               total - c.pagado, _capitalizar(c.estado)]
+
+
+def _servicios(parametros):
+    query = db.session.query(
+        SolicitudServicio.numero_solicitud, SolicitudServicio.fecha_solicitud, Cliente.nombre,
+        SolicitudServicio.prioridad, SolicitudServicio.total_estimado, SolicitudServicio.fecha_estimada,
+        SolicitudServicio.estado
+    ).outerjoin(Cliente, Cliente.id == SolicitudServicio.cliente_id)
+    query = _filtrar_periodo(query, SolicitudServicio.fecha_solicitud, parametros)
+    for s in query.order_by(SolicitudServicio.fecha_solicitud, SolicitudServicio.id).yield_per(LOTE):
+        yield [s.numero_solicitud, _solo_fecha(s.fecha_solicitud), s.nombre, _capitalizar(s.prioridad),
+               s.total_estimado, s.fecha_estimada, _capitalizar(s.estado)]
+
+
+def _reclamos(parametros):
+    query = db.session.query(
+        Reclamo.numero, Reclamo.fecha_creacion, Cliente.nombre, Reclamo.tipo_reclamo,
+        Reclamo.prioridad, Reclamo.estado
+    ).outerjoin(Cliente, Cliente.id == Reclamo.cliente_id)
+    query = _filtrar_periodo(query, Reclamo.fecha_creacion, parametros)
+    for r in query.order_by(Reclamo.fecha_creacion, Reclamo.id).yield_per(LOTE):
+        yield [r.numero, _solo_fecha(r.fecha_creacion), r.nombre or '', r.tipo_reclamo or '',
+               _capitalizar(r.prioridad), _capitalizar(r.estado)]
+
+
+def _presupuestos_sin_aprobar(parametros):
+    query = db.session.query(
+        Presupuesto.numero_presupuesto, Presupuesto.fecha_emision, Cliente.nombre,
+        Presupuesto.total, Presupuesto.estado
+    ).outerjoin(SolicitudServicio, SolicitudServicio.id == Presupuesto.solicitud_id).outerjoin(
+        Cliente, Cliente.id == SolicitudServicio.cliente_id
+    ).filter(Presupuesto.estado != 'aprobado')
+    query = _filtrar_periodo(query, Presupuesto.fecha_emision, parametros)
+    for p in query.order_by(Presupuesto.fecha_emision, Presupuesto.id).yield_per(LOTE):
+        yield [p.numero_presupuesto, _solo_fecha(p.fecha_emision), p.nombre or '', p.total or 0,
+               _capitalizar(p.estado)]
+
+
+def _clientes(parametros):
+    query = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.numero_documento, Cliente.telefono, Cliente.email, Cliente.direccion
+    ).order_by(Cliente.id)
+    for c in query.yield_per(LOTE):
+        yield [c.id, c.nombre, c.numero_documento, c.telefono or '', c.email or '', c.direccion or '']
+
+
+def _proveedores(parametros):
+    query = db.session.query(
+        Proveedor.codigo, Proveedor.ruc, Proveedor.razon_social, Proveedor.telefono, Proveedor.email,
+        Proveedor.activo
+    )
+    query = _filtrar_periodo(query, Proveedor.fecha_registro, parametros)
+    for p in query.order_by(Proveedor.codigo).yield_per(LOTE):
+        yield [p.codigo, p.ruc, p.razon_social, p.telefono or '', p.email or '',
+               'Activo' if p.activo else 'Inactivo']
+
+
+# nombre -> (título, encabezados, filas(parametros))
+REPORTES = {
+    'ventas': ('Reporte de Ventas', ['Factura', 'Fecha', 'Cliente', 'Vendedor', 'Total'], _ventas),
+    'productos': ('Reporte de Productos',
+                  ['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo', 'Precio Venta', 'Estado'], _productos),
+    'stock_bajo': ('Productos con Stock Bajo', ['Código', 'Nombre', 'Stock Actual', 'Stock Mínimo'], _stock_bajo),
+    'compras': ('Reporte de Compras', ['N° Compra', 'Proveedor', 'Fecha', 'Total', 'Estado'], _compras),
+    'compras_pendientes': ('Compras Pendientes de Pago',
+                           ['N° Compra', 'Proveedor', 'Fecha', 'Total', 'Pagado', 'Saldo Pendiente', 'Estado'],
+                           _compras_pendientes),
+    'servicios': ('Servicios por Fecha y Prioridad',
+                  ['N° Solicitud', 'Fecha', 'Cliente', 'Prioridad', 'Precio', 'Fecha Estimada', 'Estado'],
+                  _servicios),
+    'reclamos': ('Reporte de Reclamos', ['N° Reclamo', 'Fecha', 'Cliente', 'Tipo', 'Prioridad', 'Estado'], _reclamos),
+    'presupuestos_sin_aprobar': ('Presupuestos Sin Aprobar',
+                                 ['N° Presup.', 'Fecha', 'Cliente', 'Total', 'Estado'], _presupuestos_sin_aprobar),
+    'clientes': ('Reporte de Clientes', ['ID', 'Nombre', 'Documento', 'Teléfono', 'Email', 'Dirección'], _clientes),
+    'proveedores': ('Reporte de Proveedores',
+                    ['Código', 'RUC', 'Razón Social', 'Teléfono', 'Email', 'Estado'], _proveedores),
+}
+
+
+# -----------------------------------------------------------------------
+# Escritores
+# -----------------------------------------------------------------------
+
+def escribir_csv(ruta, encabezados, filas):
+    # utf-8 con BOM para que Excel reconozca los acentos al abrirlo
+    with open(ruta, 'w', newline='', encoding='utf-8-sig') as archivo:
+        escritor = csv.writer(archivo)
+        escritor.writerow(encabezados)
+        escritor.writerows(filas)
+
+
+def escribir_xlsx(ruta, titulo, encabezados, filas):
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    hoja = wb.create_sheet(titulo[:31])  # Excel limita el nombre de la hoja a 31 caracteres
+    hoja.append(encabezados)
+    for fila in filas:
+        hoja.append(fila)
+    wb.save(ruta)
+
+
+def exportar_reporte(nombre, formato, ruta, parametros):
+    """
+    Escribe el reporte en `ruta` y devuelve (nombre_descarga, mimetype).
+    ValueError si el reporte o el formato no existen o los parámetros son inválidos.
+    """
+    if nombre not in REPORTES or formato not in FORMATOS:
+        raise ValueError(f'Exportación desconocida: {nombre}.{formato}')
+    titulo, encabezados, consulta = REPORTES[nombre]
+    filas = consulta(parametros)
+    if formato == 'csv':
+        escribir_csv(ruta, encabezados, filas)
+    else:
+        escribir_xlsx(ruta, titulo, encabezados, filas)
+    return f'reporte_{nombre}_{date.today().isoformat()}.{formato}', FORMATOS[formato]
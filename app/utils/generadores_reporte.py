@@ -0,0 +1,150 @@
+"""
+Reportes pesados que se pueden generar fuera del request.
+Cada generador recibe la ruta del archivo de salida y los parámetros como
+dict de strings (los mismos argumentos que la ruta web), escribe el archivo
+y devuelve (nombre_descarga, mimetype). Parámetros inválidos -> ValueError.
+Los usan tanto las rutas de reportes (en línea) como los trabajos en segundo
+plano (app.utils.trabajos_reporte), así el resultado es el mismo.
+"""
+from datetime import date, datetime, timedelta
+from app import db
+from app.models import Venta, Cliente, Usuario
+from app.utils.pdf_streaming import ReportePDF
+from app.utils.series_tiempo import MESES_ES
+
+MIMETYPE_PDF = 'application/pdf'
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+def _fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d').date() if valor else None
+
+
+def generar_ventas_pdf(ruta, parametros):
+    """Listado de ventas completadas del período (por defecto, el mes actual)"""
+    fecha_desde = parametros.get('fecha_desde') or parametros.get('desde')
+    fecha_hasta = parametros.get('fecha_hasta') or parametros.get('hasta')
+    hoy = date.today()
+    if not fecha_desde:
+        fecha_desde_dt = datetime.combine(hoy.replace(day=1), datetime.min.time())
+        fecha_desde = fecha_desde_dt.strftime('%Y-%m-%d')
+    else:
+        fecha_desde_dt = datetime.strptime(fecha_desde, '%Y-%m-%d')
+    if not fecha_hasta:
+        # último día del mes actual
+        next_month = hoy.replace(day=28) + timedelta(days=4)
+        fecha_hasta_dt = datetime.combine(next_month - timedelta(days=next_month.day), datetime.min.time())
+        fecha_hasta = fecha_hasta_dt.strftime('%Y-%m-%d')
+    else:
+        fecha_hasta_dt = datetime.strptime(fecha_hasta, '%Y-%m-%d')
+
+    # Solo las columnas necesarias, leídas por lotes desde el cursor del servidor
+    vendedor = (Usuario.nombre + ' ' + Usuario.apellido).label('vendedor')
+    filas = db.session.query(
+        Venta.numero_factura, Venta.fecha_venta, Venta.cliente_id, Venta.vendedor_id,
+        Venta.total, Cliente.nombre.label('cliente'), vendedor
+    ).outerjoin(Cliente, Cliente.id == Venta.cliente_id).outerjoin(
+        Usuario, Usuario.id == Venta.vendedor_id
+    ).filter(
+        Venta.fecha_venta >= fecha_desde_dt,
+        Venta.fecha_venta < fecha_hasta_dt + timedelta(days=1),  # días completos, como reportes.ventas
+        Venta.estado == 'completada'
+    ).order_by(Venta.fecha_venta, Venta.id).yield_per(1000)
+
+    periodo_str = f"{fecha_desde_dt.strftime('%d/%m/%Y')} al {fecha_hasta_dt.strftime('%d/%m/%Y')}"
+    if fecha_desde_dt.day == 1 and fecha_hasta_dt.day in [28, 29, 30, 31] and fecha_desde_dt.month == fecha_hasta_dt.month:
+        mes = MESES_ES[fecha_desde_dt.month - 1]
+        periodo_str = f"{mes.capitalize()} {fecha_desde_dt.year}"
+
+    total = [0]
+
+    def filas_reporte():
+        for v in filas:
+            total[0] += v.total or 0
+            yield [
+                v.numero_factura,
+                v.fecha_venta.strftime('%d/%m/%Y'),
+                (v.cliente or str(v.cliente_id))[:30],
+                (v.vendedor or str(v.vendedor_id))[:30],
+                f"Gs. {v.total or 0:,.0f}"
+            ]
+
+    nombre = f'reporte_ventas_{fecha_desde}_{fecha_hasta}.pdf'
+    ReportePDF(
+        'Reporte de Ventas', nombre,
+        ['Factura', 'Fecha', 'Cliente', 'Vendedor', 'Total'], [100, 70, 130, 130, 90],
+        subtitulo=f"Período: {periodo_str}"
+    ).generar(filas_reporte(), ruta, pie=lambda: ['', '', '', 'TOTAL', f"Gs. {total[0]:,.0f}"])
+    return nombre, MIMETYPE_PDF
+
+
+def generar_ventas_cliente_pdf(ruta, parametros):
+    """Ranking de clientes por monto comprado (ver app.utils.ranking_clientes)"""
+    from app.utils.ranking_clientes import ranking_clientes
+
+    desde, hasta = _fecha(parametros.get('desde')), _fecha(parametros.get('hasta'))
+    # Como el reporte anterior: todo cliente con compras, activo o no
+    clientes, _ = ranking_clientes(desde=desde, hasta=hasta, solo_activos=False, incluir_sin_compras=False)
+    filas = ([
+        c['nombre'][:35],
+        c['cantidad'],
+        f"Gs. {c['total']:,.0f}",
+        f"Gs. {c['ticket_promedio']:,.0f}",
+        c['ultima_compra'].strftime('%d/%m/%Y') if c['ultima_compra'] else '-',
+        f"Gs. {c['saldo']:,.0f}",
+    ] for c in clientes)
+    subtitulo = None
+    if desde or hasta:
+        subtitulo = (f"Período: {desde.strftime('%d/%m/%Y') if desde else 'inicio'} al "
+                     f"{hasta.strftime('%d/%m/%Y') if hasta else 'hoy'}")
+    ReportePDF(
+        'Reporte de Ventas por Cliente', 'ventas_cliente.pdf',
+        ['Cliente', 'Compras', 'Total Comprado', 'Ticket Prom.', 'Última Compra', 'Saldo'],
+        [150, 50, 85, 75, 70, 75], subtitulo=subtitulo, color_encabezado='#2c3e50'
+    ).generar(filas, ruta)
+    return 'ventas_cliente.pdf', MIMETYPE_PDF
+
+
+def generar_productos_mas_vendidos_pdf(ruta, parametros):
+    """Ranking de productos más vendidos (ver app.utils.ranking_productos)"""
+    from app.utils.ranking_productos import parametros_ranking, productos_mas_vendidos
+
+    filtros = parametros_ranking(parametros)
+    ranking = productos_mas_vendidos(**filtros)
+    filas = ([posicion, p['codigo'], p['nombre'][:40], f"{p['cantidad']:,.0f}", f"Gs. {p['total']:,.0f}"]
+             for posicion, p in enumerate(ranking, start=1))
+    subtitulo = None
+    if filtros['desde'] or filtros['hasta']:
+        desde = filtros['desde'].strftime('%d/%m/%Y') if filtros['desde'] else 'inicio'
+        hasta = filtros['hasta'].strftime('%d/%m/%Y') if filtros['hasta'] else 'hoy'
+        subtitulo = f"Período: {desde} al {hasta}"
+    ReportePDF(
+        f"Productos Más Vendidos (Top {filtros['top']})",
+        'productos_mas_vendidos.pdf', ['#', 'Código', 'Producto', 'Cantidad Vendida', 'Total Vendido'],
+        [30, 70, 200, 90, 110], subtitulo=subtitulo, color_encabezado='#2c3e50'
+    ).generar(filas, ruta)
+    return 'productos_mas_vendidos.pdf', MIMETYPE_PDF
+
+
+def generar_antiguedad_saldos_xlsx(ruta, parametros):
+    """Antigüedad de saldos de cuentas por cobrar (resumen y detalle)"""
+    from app.utils.cuentas_por_cobrar import exportar_antiguedad_xlsx
+
+    fecha_corte = _fecha(parametros.get('fecha') or parametros.get('hasta')) or date.today()
+    exportar_antiguedad_xlsx(ruta, fecha_corte)
+    return f'antiguedad_saldos_{fecha_corte.isoformat()}.xlsx', MIMETYPE_XLSX
+
+
+# nombre -> (descripción, extensión del archivo, generador)
+GENERADORES = {
+    'ventas_pdf': ('Reporte de Ventas', '.pdf', generar_ventas_pdf),
+    'ventas_cliente_pdf': ('Ventas por Cliente', '.pdf', generar_ventas_cliente_pdf),
+    'productos_mas_vendidos_pdf': ('Productos Más Vendidos', '.pdf', generar_productos_mas_vendidos_pdf),
+    'antiguedad_saldos_xlsx': ('Antigüedad de Saldos (Excel)', '.xlsx', generar_antiguedad_saldos_xlsx),
+}
+
+
+def generar_reporte(nombre, ruta, parametros):
+    """Ejecuta el generador registrado con ese nombre. Devuelve (nombre_descarga, mimetype)"""
+    if nombre not in GENERADORES:
+        raise ValueError(f'Reporte desconocido: {nombre}')
+    return GENERADORES[nombre][2](ruta, parametros)
@@ -0,0 +1,62 @@
+"""
+Movimientos de stock en lote.
+Bloquea todos los productos involucrados con un único SELECT ... FOR UPDATE
+(ordenado por id, para que dos transacciones no se bloqueen en orden cruzado),
+ajusta el stock y registra los MovimientoProducto con un solo INSERT.
+"""
+from sqlalchemy import insert
+from app import db
+from app.models.producto import Producto, MovimientoProducto
+
+
+def bloquear_productos(producto_ids):
+    """Carga y bloquea los productos hasta el fin de la transacción. Devuelve {id: Producto}"""
+    ids = sorted({int(pid) for pid in producto_ids if pid})
+    if not ids:
+        return {}
+    productos = Producto.query.filter(Producto.id.in_(ids)).order_by(Producto.id) \
+        .with_for_update().populate_existing().all()
+    return {p.id: p for p in productos}
+
+
+def aplicar_movimientos_stock(lineas, tipo_movimiento, motivo, referencia_tipo=None,
+                              referencia_id=None, usuario_id=None, observaciones=None):
+    """
+    Aplica un lote de movimientos de stock dentro de la transacción actual.
+
+    lineas: iterable de (producto_id, cantidad) o (producto_id, cantidad, costo_unitario).
+    tipo_movimiento: 'entrada' suma al stock, 'salida' descuenta.
+    Si no se indica costo se usa el precio de compra del producto. Los productos
+    inexistentes se ignoran. Devuelve {producto_id: Producto} con los productos
+    bloqueados (ya actualizados).
+    """
+    lineas = [tuple(linea) for linea in lineas if linea[0]]
+    productos = bloquear_productos(linea[0] for linea in lineas)
+    signo = -1 if tipo_movimiento == 'salida' else 1
+
+    movimientos = []
+    for linea in lineas:
+        producto = productos.get(int(linea[0]))
+        if producto is None:
+            continue
+        cantidad = int(round(float(linea[1])))
+        costo = linea[2] if len(linea) > 2 and linea[2] is not None else producto.precio_compra
+        stock_anterior = int(producto.stock_actual or 0)
+        producto.stock_actual = stock_anterior + signo * cantidad
+        movimientos.append({
+            'producto_id': producto.id,
+            'tipo_movimiento': tipo_movimiento,
+            'cantidad': cantidad,
+            'stock_anterior': stock_anterior,
+            'stock_actual': producto.stock_actual,
+            'motivo': motivo,
+            'referencia_tipo': referencia_tipo,
+            'referencia_id': referencia_id,
+            'costo_unitario': costo,
+            'usuario_id': usuario_id,
+            'observaciones': observaciones,
+        })
+
+    if movimientos:
+        db.session.execute(insert(MovimientoProducto), movimientos)
+    return productos
@@ -0,0 +1,352 @@
+"""
+Inventario físico (conteos de stock).
+
+Un conteo se abre, recibe cantidades contadas en una o varias cargas
+(archivo CSV / XLSX con código y cantidad, o lecturas de escáner, una por
+línea) y se aplica en una sola transacción:
+
+- Las cantidades se agrupan por código en memoria y se guardan con INSERT
+  de muchas filas por sentencia, no fila por fila.
+- Las diferencias contra stock_actual se calculan en la base con una sola
+  consulta (consulta_diferencias / resumen_diferencias).
+- aplicar_conteo bloquea los productos del conteo (en orden de id, como
+  app.utils.inventario), guarda el stock y el costo del sistema en cada
+  línea, inserta los MovimientoProducto con un INSERT ... SELECT y actualiza
+  stock_actual con un UPDATE ... FROM: la cantidad de sentencias no depende
+  de la cantidad de productos.
+
+En un conteo completo los productos activos que no se contaron se agregan
+con cantidad 0 al aplicar.
+"""
+import csv
+import io
+import os
+import re
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import case, delete, exists, func, insert, literal, select, update
+from app import db
+from app.models import Producto, MovimientoProducto, ConteoInventario, ConteoInventarioLinea
+from app.utils.busqueda_productos import normalizar
+from app.utils.catalogo_memoria import marcar_modificado
+from app.utils.dashboard import marcar_dashboard_modificado
+
+# Valores por sentencia en las listas IN (códigos, productos) y filas por lote al exportar
+LOTE = 1000
+MAX_LINEAS = 200_000
+
+EXTENSIONES_ARCHIVO = ('.csv', '.txt', '.xlsx', '.xlsm')
+ENCABEZADOS_CODIGO = {'codigo', 'cod', 'code', 'sku', 'codigo de barras'}
+ENCABEZADOS_CANTIDAD = {'cantidad', 'cant', 'contado', 'conteo', 'cantidad contada', 'qty'}
+
+ENCABEZADOS_DIFERENCIAS = ['Código', 'Producto', 'Stock Sistema', 'Contado', 'Diferencia', 'Costo Unitario',
+                           'Valor Diferencia']
+
+Linea = ConteoInventarioLinea
+
+
+# -----------------------------------------------------------------------
+# Lectura de cantidades
+# -----------------------------------------------------------------------
+
+def _texto_celda(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)  # códigos numéricos en Excel
+    return str(valor).strip()
+
+
+def _cantidad(valor, numero_fila):
+    texto = _texto_celda(valor).replace(',', '.')
+    try:
+        cantidad = Decimal(texto)
+    except InvalidOperation:
+        raise ValueError(f'Fila {numero_fila}: cantidad inválida "{valor}"')
+    if cantidad < 0 or cantidad != cantidad.to_integral_value():
+        raise ValueError(f'Fila {numero_fila}: la cantidad debe ser un entero no negativo ("{valor}")')
+    return int(cantidad)
+
+
+def leer_cantidades(filas):
+    """
+    {código: cantidad} a partir de filas (listas de celdas). La primera fila
+    puede ser un encabezado con las columnas código y cantidad; si no, se
+    toma la primera columna como código y la segunda como cantidad. Sin
+    columna de cantidad cada fila cuenta 1 (lecturas de escáner). Los
+    códigos repetidos se suman. ValueError si una cantidad no es válida.
+    """
+    cantidades = {}
+    columna_codigo, columna_cantidad = 0, 1
+    primera = True
+    for numero_fila, fila in enumerate(filas, start=1):
+        if numero_fila > MAX_LINEAS:
+            raise ValueError(f'El archivo supera el máximo de {MAX_LINEAS} filas')
+        celdas = [_texto_celda(c) for c in fila]
+        if not any(celdas):
+            continue
+        if primera:
+            primera = False
+            nombres = [normalizar(c) for c in celdas]
+            if any(n in ENCABEZADOS_CODIGO or n in ENCABEZADOS_CANTIDAD for n in nombres):
+                columna_codigo = next((i for i, n in enumerate(nombres) if n in ENCABEZADOS_CODIGO), 0)
+                columna_cantidad = next((i for i, n in enumerate(nombres) if n in ENCABEZADOS_CANTIDAD), None)
+                continue
+        codigo = celdas[columna_codigo] if columna_codigo < len(celdas) else ''
+        if not codigo:
+            continue
+        if columna_cantidad is None or columna_cantidad >= len(celdas):
+            cantidad = 1
+        elif not celdas[columna_cantidad]:
+            continue  # fila sin contar
+        else:
+            cantidad = _cantidad(celdas[columna_cantidad], numero_fila)
+        cantidades[codigo] = cantidades.get(codigo, 0) + cantidad
+    return cantidades
+
+
+def _filas_csv(contenido):
+    try:
+        texto = contenido.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = contenido.decode('latin-1')
+    try:
+        dialecto = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialecto = csv.excel  # una sola columna (lecturas de escáner)
+    return csv.reader(io.StringIO(texto), dialecto)
+
+
+def _filas_xlsx(archivo):
+    from openpyxl import load_workbook
+
+    try:
+        wb = load_workbook(archivo, read_only=True, data_only=True)
+    except Exception:
+        raise ValueError('El archivo no es un Excel válido')
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def leer_archivo_conteo(archivo, nombre_archivo):
+    """{código: cantidad} de un archivo CSV / TXT / XLSX (ver leer_cantidades)"""
+    extension = os.path.splitext(nombre_archivo or '')[1].lower()
+    if extension not in EXTENSIONES_ARCHIVO:
+        raise ValueError(f'Formato de archivo no soportado ({", ".join(EXTENSIONES_ARCHIVO)})')
+    if extension in ('.xlsx', '.xlsm'):
+        return leer_cantidades(_filas_xlsx(archivo))
+    return leer_cantidades(_filas_csv(archivo.read()))
+
+
+def leer_lecturas(texto):
+    """{código: cantidad} de lecturas de escáner: un código por línea, opcionalmente 'código;cantidad'"""
+    return leer_cantidades(re.split(r'\s*[;,\t]\s*', linea.strip()) for linea in (texto or '').splitlines())
+
+
+# -----------------------------------------------------------------------
+# Conteos
+# -----------------------------------------------------------------------
+
+def bloquear_conteo(conteo_id):
+    """Carga y bloquea el conteo hasta el fin de la transacción. ValueError si no está abierto"""
+    conteo = ConteoInventario.query.filter_by(id=conteo_id).with_for_update().populate_existing().first()
+    if conteo is None:
+        raise ValueError('El conteo no existe')
+    if conteo.estado != 'abierto':
+        raise ValueError(f'El conteo {conteo.numero} está {conteo.estado}')
+    return conteo
+
+
+def _lotes(valores):
+    valores = list(valores)
+    for inicio in range(0, len(valores), LOTE):
+        yield valores[inicio:inicio + LOTE]
+
+
+def _productos_por_codigo(codigos):
+    ids = {}
+    for lote in _lotes(codigos):
+        ids.update(db.session.execute(select(Producto.codigo, Producto.id).where(Producto.codigo.in_(lote))).all())
+    return ids
+
+
+def cargar_cantidades(conteo_id, cantidades, modo='reemplazar'):
+    """
+    Guarda {código: cantidad} en el conteo, dentro de la transacción actual.
+    modo 'reemplazar': la cantidad reemplaza a la ya cargada del producto;
+    'sumar': se suma (conteo por sectores, varias pasadas del escáner).
+    Devuelve {'productos', 'nuevos', 'actualizados', 'desconocidos'}.
+    """
+    if modo not in ('reemplazar', 'sumar'):
+        raise ValueError(f'Modo de carga desconocido: {modo}')
+    conteo = bloquear_conteo(conteo_id)
+    ids = _productos_por_codigo(cantidades)
+    actuales = dict(db.session.execute(
+        select(Linea.producto_id, Linea.cantidad_contada).where(Linea.conteo_id == conteo.id)).all())
+
+    filas, reemplazadas, nuevos = [], [], 0
+    for codigo, producto_id in ids.items():
+        cantidad = cantidades[codigo]
+        if producto_id in actuales:
+            if modo == 'sumar':
+                cantidad += actuales[producto_id]
+            if cantidad == actuales[producto_id]:
+                continue
+            reemplazadas.append(producto_id)
+        else:
+            nuevos += 1
+        filas.append({'conteo_id': conteo.id, 'producto_id': producto_id, 'cantidad_contada': cantidad})
+
+    for lote in _lotes(reemplazadas):
+        db.session.execute(delete(Linea).where(Linea.conteo_id == conteo.id, Linea.producto_id.in_(lote)))
+    if filas:
+        # Con RETURNING SQLAlchemy agrupa las filas en INSERT de muchas filas (insertmanyvalues),
+        # también con pg8000, cuyo executemany manda una sentencia por fila
+        tabla = Linea.__table__
+        db.session.execute(insert(tabla).returning(tabla.c.id), filas)
+    return {
+        'productos': len(ids),
+        'nuevos': nuevos,
+        'actualizados': len(reemplazadas),
+        'desconocidos': sorted(set(cantidades) - set(ids)),
+    }
+
+
+def _columnas(conteo):
+    """(stock, costo, diferencia): los guardados si el conteo se aplicó; si no, los actuales del producto"""
+    if conteo.estado == 'aplicado':
+        stock, costo = Linea.stock_sistema, Linea.costo_unitario
+    else:
+        stock, costo = func.coalesce(Producto.stock_actual, 0), Producto.precio_compra
+    return stock, costo, Linea.cantidad_contada - stock
+
+
+def consulta_diferencias(conteo, solo_diferencias=False, orden='codigo'):
+    """SELECT de las líneas del conteo con stock del sistema, diferencia y su valor al costo"""
+    stock, costo, diferencia = _columnas(conteo)
+    valor = diferencia * func.coalesce(costo, 0)
+    consulta = select(
+        Producto.id.label('producto_id'), Producto.codigo, Producto.nombre, stock.label('stock_sistema'),
+        Linea.cantidad_contada, diferencia.label('diferencia'), costo.label('costo_unitario'),
+        valor.label('valor_diferencia')
+    ).join(Producto, Producto.id == Linea.producto_id).where(Linea.conteo_id == conteo.id)
+    if solo_diferencias:
+        consulta = consulta.where(diferencia != 0)
+    if orden == 'valor':
+        return consulta.order_by(func.abs(valor).desc(), Producto.codigo)
+    return consulta.order_by(Producto.codigo)
+
+
+def _no_contados(conteo):
+    """Productos activos sin línea (en un conteo completo quedarán en 0)"""
+    return ~exists().where(Linea.conteo_id == conteo.id, Linea.producto_id == Producto.id)
+
+
+def resumen_diferencias(conteo):
+    """
+    Totales del conteo en una consulta: productos contados, con diferencia,
+    unidades sobrantes y faltantes y valor neto de la diferencia. En un
+    conteo completo abierto incluye los productos activos no contados.
+    """
+    stock, costo, diferencia = _columnas(conteo)
+    fila = db.session.execute(
+        select(func.count(),
+               func.sum(case((diferencia != 0, 1), else_=0)),
+               func.sum(case((diferencia > 0, diferencia), else_=0)),
+               func.sum(case((diferencia < 0, -diferencia), else_=0)),
+               func.sum(diferencia * func.coalesce(costo, 0)))
+        .select_from(Linea).join(Producto, Producto.id == Linea.producto_id).where(Linea.conteo_id == conteo.id)
+    ).one()
+    resumen = {
+        'productos': fila[0],
+        'productos_ajustados': int(fila[1] or 0),
+        'unidades_sobrantes': int(fila[2] or 0),
+        'unidades_faltantes': int(fila[3] or 0),
+        'valor_diferencia': Decimal(str(fila[4] or 0)),
+        'no_contados': 0,
+    }
+    if conteo.completo and conteo.estado == 'abierto':
+        stock = func.coalesce(Producto.stock_actual, 0)
+        fila = db.session.execute(
+            select(func.count(),
+                   func.sum(case((stock != 0, 1), else_=0)),
+                   func.sum(case((stock < 0, -stock), else_=0)),
+                   func.sum(case((stock > 0, stock), else_=0)),
+                   func.sum(-stock * func.coalesce(Producto.precio_compra, 0)))
+            .where(Producto.activo == True, _no_contados(conteo))
+        ).one()
+        resumen['no_contados'] = fila[0]
+        resumen['productos_ajustados'] += int(fila[1] or 0)
+        resumen['unidades_sobrantes'] += int(fila[2] or 0)
+        resumen['unidades_faltantes'] += int(fila[3] or 0)
+        resumen['valor_diferencia'] += Decimal(str(fila[4] or 0))
+    return resumen
+
+
+def aplicar_conteo(conteo_id, usuario_id):
+    """
+    Ajusta el stock de todos los productos del conteo a la cantidad contada,
+    dentro de la transacción actual (el que llama hace el commit). Devuelve
+    el resumen de las diferencias aplicadas.
+    """
+    conteo = bloquear_conteo(conteo_id)
+    ahora = datetime.utcnow()
+    del_conteo = Linea.conteo_id == conteo.id
+
+    if conteo.completo:
+        db.session.execute(insert(Linea).from_select(
+            ['conteo_id', 'producto_id', 'cantidad_contada'],
+            select(literal(conteo.id, db.Integer), Producto.id, literal(0, db.Integer))
+            .where(Producto.activo == True, _no_contados(conteo))
+        ))
+
+    # Bloquear los productos del conteo (en orden de id) y guardar su stock y costo en las líneas
+    db.session.execute(
+        select(Producto.id).where(Producto.id.in_(select(Linea.producto_id).where(del_conteo)))
+        .order_by(Producto.id).with_for_update()
+    ).all()
+    db.session.execute(
+        update(Linea).where(del_conteo, Linea.producto_id == Producto.id)
+        .values(stock_sistema=func.coalesce(Producto.stock_actual, 0), costo_unitario=Producto.precio_compra),
+        execution_options={'synchronize_session': False}
+    )
+
+    diferencia = Linea.cantidad_contada - Linea.stock_sistema
+    db.session.execute(insert(MovimientoProducto).from_select(
+        ['producto_id', 'tipo_movimiento', 'cantidad', 'stock_anterior', 'stock_actual', 'motivo',
+         'referencia_tipo', 'referencia_id', 'costo_unitario', 'usuario_id', 'fecha', 'observaciones'],
+        select(Linea.producto_id, case((diferencia > 0, 'entrada'), else_='salida'), func.abs(diferencia),
+               Linea.stock_sistema, Linea.cantidad_contada, literal('ajuste'), literal('conteo_inventario'),
+               literal(conteo.id, db.Integer), Linea.costo_unitario, literal(usuario_id, db.Integer),
+               literal(ahora, db.DateTime), literal(f'Inventario físico {conteo.numero}'))
+        .where(del_conteo, diferencia != 0).order_by(Linea.producto_id)
+    ))
+    db.session.execute(
+        update(Producto).where(Producto.id == Linea.producto_id, del_conteo, diferencia != 0)
+        .values(stock_actual=Linea.cantidad_contada, fecha_modificacion=ahora),
+        execution_options={'synchronize_session': False}
+    )
+
+    conteo.estado = 'aplicado'
+    conteo.usuario_aplica_id = usuario_id
+    conteo.fecha_aplicacion = ahora
+    resumen = resumen_diferencias(conteo)
+    conteo.productos_ajustados = resumen['productos_ajustados']
+    conteo.unidades_sobrantes = resumen['unidades_sobrantes']
+    conteo.unidades_faltantes = resumen['unidades_faltantes']
+    conteo.valor_diferencia = resumen['valor_diferencia']
+
+    # Los UPDATE / INSERT masivos no disparan los eventos del ORM: avisar al catálogo y al dashboard
+    marcar_modificado(db.session, Producto)
+    marcar_dashboard_modificado(db.session)
+    return resumen
+
+
+def filas_diferencias(conteo, solo_diferencias=False):
+    """Filas del reporte de diferencias (ENCABEZADOS_DIFERENCIAS), recorridas por lotes"""
+    consulta = consulta_diferencias(conteo, solo_diferencias).execution_options(yield_per=LOTE)
+    for f in db.session.execute(consulta):
+        yield [f.codigo, f.nombre, f.stock_sistema, f.cantidad_contada, f.diferencia, f.costo_unitario,
+               f.valor_diferencia]
@@ -1,7 +1,8 @@
 # Función de utilidad para el endpoint
 def generar_nota_credito_pdf(nota):
     from app.models import ConfiguracionEmpresa
-    config = ConfiguracionEmpresa.get_config()
+    from app.utils.estilos_pdf import datos_empresa
+    config = datos_empresa() or ConfiguracionEmpresa.get_config()
     detalles = nota.detalles.all() if hasattr(nota.detalles, 'all') else nota.detalles
     cliente = nota.venta.cliente
     generador = GeneradorNotaCreditoPDF(config, nota, detalles, cliente)
@@ -0,0 +1,82 @@
+"""
+Numeración de documentos internos por serie (secuencias_documento).
+
+Cada serie tiene su fila con prefijo, relleno (cantidad de dígitos) y
+próximo número. siguiente_numero reserva el número dentro de la transacción
+actual con SecuenciaDocumento.reservar: dos usuarios que crean el mismo tipo
+de documento a la vez reciben números distintos, y un rollback no deja
+saltos. Llamar justo antes del commit para que el bloqueo dure poco.
+
+SERIES tiene el formato inicial de cada serie y la columna donde se guarda el
+número: al crear la fila (sincronizar_bd.py o el primer documento) la serie
+continúa desde el número más alto ya usado con ese prefijo. El formato se
+cambia editando prefijo y relleno en la fila; los números ya emitidos no se
+tocan.
+"""
+import re
+from sqlalchemy import select
+from app import db
+from app.models import (Producto, SolicitudServicio, Presupuesto, OrdenServicio, Reclamo, PedidoCompra,
+                        PresupuestoProveedor, OrdenCompra, Compra, NotaCredito, NotaDebito, ConteoInventario)
+from app.models.configuracion import SecuenciaDocumento
+
+# serie: (columna con los números, prefijo, relleno)
+SERIES = {
+    'producto': (Producto.codigo, '', 3),
+    'solicitud_servicio': (SolicitudServicio.numero_solicitud, 'SOL-', 6),
+    'presupuesto_servicio': (Presupuesto.numero_presupuesto, 'PRES-', 6),
+    'orden_servicio': (OrdenServicio.numero_orden, 'OS-', 6),
+    'reclamo': (Reclamo.numero, 'REC-', 6),
+    'pedido_compra': (PedidoCompra.numero_pedido, 'PED-', 6),
+    'presupuesto_proveedor': (PresupuestoProveedor.numero_presupuesto, 'PRES-PROV-', 6),
+    'orden_compra': (OrdenCompra.numero_orden, 'OC-', 6),
+    'compra': (Compra.numero_compra, 'C-', 6),
+    'nota_credito': (NotaCredito.numero_nota, 'NC-', 7),
+    'nota_debito': (NotaDebito.numero_nota, 'ND-', 7),
+    'conteo_inventario': (ConteoInventario.numero, 'INV-', 6),
+}
+
+_DIGITOS = re.compile(r'[0-9]+')
+
+
+def numero_inicial(serie, conexion=None):
+    """Primer número libre de la serie: el más alto ya guardado con su prefijo, más uno"""
+    columna, prefijo, _ = SERIES[serie]
+    consulta = select(columna).where(columna.isnot(None))
+    if prefijo:
+        consulta = consulta.where(columna.startswith(prefijo, autoescape=True))
+    numeros = (valor[len(prefijo):] for valor, in (conexion or db.session).execute(consulta))
+    return max((int(n) for n in numeros if _DIGITOS.fullmatch(n)), default=0) + 1
+
+
+def siguiente_numero(serie):
+    """Reserva y devuelve el próximo número de la serie, ya formateado (ej. 'SOL-000123')"""
+    _, prefijo, relleno = SERIES[serie]
+    return SecuenciaDocumento.reservar(serie, prefijo, relleno, inicio=lambda: numero_inicial(serie))
+
+
+def proximo_numero(serie):
+    """
+    El número que tomaría el próximo documento, sin reservarlo (para mostrar
+    en formularios). Si otro usuario guarda antes, el documento recibe el
+    siguiente.
+    """
+    fila = SecuenciaDocumento.consultar(serie)
+    if fila is None:
+        _, prefijo, relleno = SERIES[serie]
+        return SecuenciaDocumento.formatear(prefijo, relleno, numero_inicial(serie))
+    return SecuenciaDocumento.formatear(fila.prefijo, fila.relleno, fila.proximo)
+
+
+def inicializar_series(conexion):
+    """Crea las filas de las series que todavía no existen. Devuelve [(serie, proximo)] creadas"""
+    existentes = set(conexion.execute(select(SecuenciaDocumento.serie)).scalars())
+    creadas = []
+    for serie, (_, prefijo, relleno) in SERIES.items():
+        if serie in existentes:
+            continue
+        proximo = numero_inicial(serie, conexion)
+        conexion.execute(db.insert(SecuenciaDocumento).values(serie=serie, prefijo=prefijo, relleno=relleno,
+                                                              proximo=proximo))
+        creadas.append((serie, proximo))
+    return creadas
@@ -0,0 +1,137 @@
+"""
+Reportes PDF tabulares con memoria constante.
+Las filas se consumen de un iterador (típicamente una consulta con yield_per)
+a medida que reportlab va armando las páginas: TablaPorPartes solo pide las
+filas que entran en el espacio disponible, las dibuja como una tabla con su
+encabezado y deja el resto para la página siguiente. El PDF se escribe en un
+archivo temporal y se envía por bloques (ver app.utils.archivos).
+"""
+import os
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import SimpleDocTemplate, Flowable, Paragraph, Spacer, Table
+from app.utils.archivos import ruta_temporal, respuesta_archivo_temporal
+from app.utils import estilos_pdf
+
+ALTO_FILA = 16
+
+
+def estilo_tabla(color_encabezado='#2980b9', con_pie=False, tamano_fuente=9):
+    return estilos_pdf.estilo_tabla('compacto', color_encabezado, tamano_fuente, con_pie)
+
+
+class TablaPorPartes(Flowable):
+    """
+    Tabla de largo desconocido que se parte página a página.
+    filas: iterador de listas ya formateadas. pie: función sin argumentos que
+    devuelve la fila de totales (o None); se evalúa al agotar las filas, así
+    puede usar acumulados calculados mientras se iteraban.
+    Todas las filas tienen alto fijo, por eso se sabe cuántas entran sin medirlas.
+    """
+
+    def __init__(self, encabezados, filas, anchos, pie=None, color_encabezado='#2980b9',
+                 alto_fila=ALTO_FILA, tamano_fuente=9):
+        super().__init__()
+        self.encabezados = list(encabezados)
+        self.filas = iter(filas)
+        self.anchos = anchos
+        self.pie = pie
+        self.alto_fila = alto_fila
+        self._estilo = estilo_tabla(color_encabezado, tamano_fuente=tamano_fuente)
+        self._estilo_final = estilo_tabla(color_encabezado, con_pie=pie is not None, tamano_fuente=tamano_fuente)
+        self._pendientes = []  # filas leídas que aún no se dibujaron
+        self._agotado = False
+        self._final = None
+
+    def _entran(self, alto_disponible, filas_extra=0):
+        """Cantidad de filas de datos que entran junto al encabezado (y filas_extra)"""
+        return int(alto_disponible // self.alto_fila) - 1 - filas_extra
+
+    def _leer_hasta(self, cantidad):
+        while not self._agotado and len(self._pendientes) < cantidad:
+            try:
+                self._pendientes.append(next(self.filas))
+            except StopIteration:
+                self._agotado = True
+
+    def _tabla(self, filas, estilo):
+        datos = [self.encabezados] + filas
+        return Table(datos, colWidths=self.anchos, rowHeights=[self.alto_fila] * len(datos),
+                     style=estilo, repeatRows=1)
+
+    def wrap(self, availWidth, availHeight):
+        extra = 1 if self.pie else 0
+        entran = self._entran(availHeight, extra)
+        # Se lee una fila más de las que entran para saber si queda algo después
+        self._leer_hasta(max(entran, 0) + 1)
+        if entran >= 0 and self._agotado and len(self._pendientes) <= entran:
+            filas = self._pendientes
+            if self.pie:
+                pie = self.pie()
+                if pie is not None:
+                    filas = filas + [pie]
+            self._final = self._tabla(filas, self._estilo_final if self.pie else self._estilo)
+            return self._final.wrap(availWidth, availHeight)
+        # No entra todo: se informa un alto mayor al disponible para que reportlab llame a split
+        self._final = None
+        return availWidth, availHeight + self.alto_fila
+
+    def split(self, availWidth, availHeight):
+        entran = self._entran(availHeight)
+        if entran < 1:
+            return []  # ni una fila: pasar a la página siguiente
+        self._leer_hasta(entran)
+        parte, self._pendientes = self._pendientes[:entran], self._pendientes[entran:]
+        # Se avanzó: la marca de "postergada" de reportlab vale para la página anterior, no para el resto
+        self.__dict__.pop('_postponed', None)
+        return [self._tabla(parte, self._estilo), self]
+
+    def draw(self):
+        if self._final is not None:
+            self._final.drawOn(self.canv, 0, 0)
+
+
+class ReportePDF:
+    """
+    Reporte con membrete, título y una tabla que se genera en streaming.
+    Uso:
+        reporte = ReportePDF('Reporte de Ventas', 'ventas.pdf', encabezados, anchos)
+        return reporte.respuesta(filas, pie=lambda: ['', 'TOTAL', total])
+    """
+
+    def __init__(self, titulo, nombre_archivo, encabezados, anchos, subtitulo=None,
+                 color_encabezado='#2980b9', pagesize=A4, tamano_fuente=9, empresa=None):
+        self.empresa = empresa
+        self.titulo = titulo
+        self.nombre_archivo = nombre_archivo
+        self.encabezados = encabezados
+        self.anchos = anchos
+        self.subtitulo = subtitulo
+        self.color_encabezado = color_encabezado
+        self.pagesize = pagesize
+        self.tamano_fuente = tamano_fuente
+
+    def _encabezado(self):
+        elementos = estilos_pdf.membrete('tabla', self.empresa)
+        elementos += [Spacer(1, 10), Paragraph(self.titulo, estilos_pdf.ESTILOS['TituloTabla'])]
+        if self.subtitulo:
+            elementos.append(Paragraph(self.subtitulo, estilos_pdf.ESTILOS['SubtituloTabla']))
+        elementos.append(Spacer(1, 8))
+        return elementos
+
+    def generar(self, filas, ruta, pie=None):
+        """Escribe el PDF en ruta consumiendo las filas una sola vez"""
+        doc = SimpleDocTemplate(ruta, pagesize=self.pagesize, title=self.titulo)
+        tabla = TablaPorPartes(self.encabezados, filas, self.anchos, pie=pie,
+                               color_encabezado=self.color_encabezado, tamano_fuente=self.tamano_fuente)
+        doc.build(self._encabezado() + [tabla])
+        return ruta
+
+    def respuesta(self, filas, pie=None):
+        """Genera el PDF en un archivo temporal y lo devuelve como descarga"""
+        ruta = ruta_temporal('.pdf')
+        try:
+            self.generar(filas, ruta, pie=pie)
+        except Exception:
+            os.remove(ruta)
+            raise
+        return respuesta_archivo_temporal(ruta, self.nombre_archivo, 'application/pdf')
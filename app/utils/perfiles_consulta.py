@@ -0,0 +1,67 @@
+"""
+Perfiles de carga de las consultas de reportes y listados.
+Cada perfil reúne las opciones de carga (joinedload para relaciones
+muchos-a-uno, en el mismo SELECT; selectinload para colecciones, en una
+consulta más) que necesita una vista para no disparar una consulta por fila
+al mostrar cliente, proveedor, vendedor, etc.
+
+    query = con_perfil(Venta.query, 'ventas')
+
+Las relaciones lazy='dynamic' (pagos, detalles) no se pueden precargar; los
+montos que dependen de ellas se calculan en la misma consulta con
+with_expression (ver el perfil 'compras_con_pagado').
+La prueba tests/manual_test_consultas_perfiles.py cuenta las consultas de
+cada vista con pocos y con muchos registros.
+"""
+from functools import lru_cache
+from sqlalchemy import func
+from sqlalchemy.orm import configure_mappers, joinedload, selectinload, with_expression
+from app import db
+from app.models import (Venta, Reclamo, Compra, PagoCompra, Producto, AperturaCaja,
+                        SolicitudServicio, OrdenServicio)
+from app.models.servicio import Presupuesto
+
+
+def pagado_compra():
+    """Total pagado de la compra (pagos_compra) como subconsulta correlacionada"""
+    return db.session.query(func.coalesce(func.sum(PagoCompra.monto), 0)).filter(
+        PagoCompra.compra_id == Compra.id
+    ).correlate(Compra).scalar_subquery()
+
+
+# nombre -> función que arma las opciones (se arman al primer uso, con los mappers ya configurados)
+PERFILES = {
+    # Reporte de ventas, ventas del día
+    'ventas': lambda: (joinedload(Venta.cliente), joinedload(Venta.vendedor)),
+    # Listado de ventas: además las notas de crédito y débito (botones NC/ND de cada fila)
+    'ventas_listado': lambda: (joinedload(Venta.cliente), joinedload(Venta.vendedor),
+                               selectinload(Venta.notas_credito), selectinload(Venta.notas_debito)),
+    # Reportes y listados de reclamos
+    'reclamos': lambda: (joinedload(Reclamo.cliente), joinedload(Reclamo.responsable)),
+    # Presupuestos de servicio con el cliente de la solicitud
+    'presupuestos': lambda: (joinedload(Presupuesto.solicitud).joinedload(SolicitudServicio.cliente),),
+    'compras': lambda: (joinedload(Compra.proveedor),),
+    # Compras con saldo o tipo de pago: proveedor y total pagado (Compra.pagado_consulta) en la misma consulta
+    'compras_con_pagado': lambda: (joinedload(Compra.proveedor),
+                                   with_expression(Compra.pagado_consulta, pagado_compra())),
+    'productos': lambda: (joinedload(Producto.categoria),),
+    'solicitudes_servicio': lambda: (joinedload(SolicitudServicio.cliente),
+                                     joinedload(SolicitudServicio.tipo_servicio)),
+    'ordenes_servicio': lambda: (joinedload(OrdenServicio.solicitud).joinedload(SolicitudServicio.cliente),
+                                 joinedload(OrdenServicio.tecnico)),
+    'aperturas_caja': lambda: (joinedload(AperturaCaja.caja), joinedload(AperturaCaja.cajero)),
+    # Pagos de compras del estado de caja: compra y proveedor
+    'pagos_compra': lambda: (joinedload(PagoCompra.compra).joinedload(Compra.proveedor),),
+}
+
+
+@lru_cache(maxsize=None)
+def perfil(nombre):
+    """Opciones de carga del perfil (tupla). KeyError si no existe."""
+    configure_mappers()  # las relaciones definidas con backref existen recién después
+    return tuple(PERFILES[nombre]())
+
+
+def con_perfil(query, nombre):
+    """La consulta con las opciones de carga del perfil"""
+    return query.options(*perfil(nombre))
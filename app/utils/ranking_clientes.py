@@ -0,0 +1,118 @@
+"""
+Ranking de clientes por monto comprado.
+Una consulta agrupada sobre ventas completadas (cantidad, total, última
+compra, ticket promedio) más el saldo abierto actual del cliente como
+subconsulta (usa el índice cliente_id + saldo). Paginación por cursor
+(keyset) sobre el orden total DESC, id ASC: las páginas no se corren si
+cambian los datos entre una y otra, y solo se traen y formatean las filas
+de la página. La agregación sí recorre todos los clientes en cada página
+(el total se conoce recién después de agrupar).
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, func, or_
+from app import db
+from app.models import Venta, Cliente
+
+POR_PAGINA = 50
+
+
+def parametros_ranking_clientes(args):
+    """
+    Lee desde, hasta (YYYY-MM-DD) y cursor de los argumentos del request.
+    Lanza ValueError si una fecha o el cursor no son válidos.
+    """
+    desde = args.get('desde') or None
+    hasta = args.get('hasta') or None
+    return {
+        'desde': datetime.strptime(desde, '%Y-%m-%d').date() if desde else None,
+        'hasta': datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None,
+        'cursor': leer_cursor(args.get('cursor')),
+    }
+
+
+def leer_cursor(cursor):
+    """'total:id' -> (Decimal, int); None si no hay cursor"""
+    if not cursor:
+        return None
+    total, _, cliente_id = cursor.partition(':')
+    try:
+        return Decimal(total), int(cliente_id)
+    except (InvalidOperation, ValueError):
+        raise ValueError(f'Cursor inválido: {cursor}')
+
+
+def _formatear_cursor(fila):
+    return f"{fila['total']}:{fila['id']}"
+
+
+def ranking_clientes(desde=None, hasta=None, cursor=None, limite=None, solo_activos=True,
+                     incluir_sin_compras=True):
+    """
+    Clientes del que más compró al que menos (ventas completadas en el rango).
+    Por defecto, como el reporte en pantalla: solo clientes activos, incluidos
+    los que no compraron (cantidad y total 0, al final). El PDF de ventas por
+    cliente pide solo_activos=False, incluir_sin_compras=False: todo cliente
+    con compras, activo o no.
+    Devuelve (filas, siguiente_cursor); siguiente_cursor es None en la última página
+    o si no hay límite. Cada fila es un dict con id, nombre, documento, telefono,
+    email, cantidad, total, ultima_compra, ticket_promedio y saldo.
+    """
+    saldo = db.session.query(func.coalesce(func.sum(Venta.saldo), 0)).filter(
+        Venta.cliente_id == Cliente.id,
+        Venta.saldo > 0,
+        Venta.estado != 'anulada'
+    ).correlate(Cliente).scalar_subquery()
+
+    # Las condiciones de las ventas van en el join: con outer join quedan los clientes sin compras
+    condiciones = [Venta.cliente_id == Cliente.id, Venta.estado == 'completada']
+    if desde:
+        condiciones.append(Venta.fecha_venta >= datetime.combine(desde, datetime.min.time()))
+    if hasta:
+        condiciones.append(Venta.fecha_venta < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+
+    total = func.coalesce(func.sum(Venta.total), 0)
+    query = db.session.query(
+        Cliente.id, Cliente.nombre, Cliente.numero_documento, Cliente.telefono, Cliente.email,
+        func.count(Venta.id).label('cantidad'),
+        total.label('total'),
+        func.max(Venta.fecha_venta).label('ultima_compra'),
+        saldo.label('saldo'),
+    )
+    if incluir_sin_compras:
+        query = query.outerjoin(Venta, and_(*condiciones))
+    else:
+        query = query.join(Venta, and_(*condiciones))
+    if solo_activos:
+        query = query.filter(Cliente.activo == True)
+    query = query.group_by(Cliente.id, Cliente.nombre, Cliente.numero_documento, Cliente.telefono, Cliente.email)
+    if cursor:
+        total_cursor, id_cursor = cursor
+        query = query.having(or_(total < total_cursor, and_(total == total_cursor, Cliente.id > id_cursor)))
+    query = query.order_by(total.desc(), Cliente.id)
+    if limite:
+        # Se pide uno de más para saber si hay página siguiente
+        query = query.limit(limite + 1)
+
+    filas = []
+    for fila in query.all():
+        cantidad = fila.cantidad or 0
+        monto = Decimal(str(fila.total or 0))
+        filas.append({
+            'id': fila.id,
+            'nombre': fila.nombre,
+            'documento': fila.numero_documento,
+            'telefono': fila.telefono,
+            'email': fila.email,
+            'cantidad': cantidad,
+            'total': monto,
+            'ultima_compra': fila.ultima_compra,
+            'ticket_promedio': (monto / cantidad).quantize(Decimal('0.01')) if cantidad else Decimal('0'),
+            'saldo': Decimal(str(fila.saldo or 0)),
+        })
+
+    siguiente = None
+    if limite and len(filas) > limite:
+        filas = filas[:limite]
+        siguiente = _formatear_cursor(filas[-1])
+    return filas, siguiente
@@ -0,0 +1,72 @@
+"""
+Ranking de productos más vendidos.
+Una sola consulta agregada sobre venta_detalles + ventas (completadas),
+agrupada por producto_id, con filtros de fechas y categoría y límite top-N.
+Las líneas sin producto (servicios) no entran en el ranking.
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import func
+from app import db
+from app.models import Venta, VentaDetalle, Producto
+from app.models.producto import Categoria
+
+TOP_PREDETERMINADO = 20
+TOP_MAXIMO = 500
+
+
+def parametros_ranking(args):
+    """
+    Lee desde, hasta (YYYY-MM-DD), categoria_id y top de los argumentos del request.
+    Lanza ValueError si una fecha o un número no son válidos.
+    """
+    desde = args.get('desde') or None
+    hasta = args.get('hasta') or None
+    categoria_id = args.get('categoria_id') or None
+    top = args.get('top') or TOP_PREDETERMINADO
+    return {
+        'desde': datetime.strptime(desde, '%Y-%m-%d').date() if desde else None,
+        'hasta': datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else None,
+        'categoria_id': int(categoria_id) if categoria_id else None,
+        'top': max(1, min(int(top), TOP_MAXIMO)),
+    }
+
+
+def productos_mas_vendidos(desde=None, hasta=None, categoria_id=None, top=TOP_PREDETERMINADO):
+    """
+    Productos ordenados por cantidad vendida (y luego por importe).
+    Devuelve una lista de dicts con producto_id, codigo, nombre, categoria,
+    cantidad, total y ventas (cantidad de facturas distintas).
+    """
+    cantidad = func.sum(VentaDetalle.cantidad)
+    total = func.sum(VentaDetalle.total)
+    query = db.session.query(
+        VentaDetalle.producto_id,
+        Producto.codigo, Producto.nombre, Categoria.nombre.label('categoria'),
+        cantidad.label('cantidad'),
+        total.label('total'),
+        func.count(func.distinct(VentaDetalle.venta_id)).label('ventas'),
+    ).join(Venta, Venta.id == VentaDetalle.venta_id).join(
+        Producto, Producto.id == VentaDetalle.producto_id
+    ).outerjoin(Categoria, Categoria.id == Producto.categoria_id).filter(
+        Venta.estado == 'completada'
+    )
+    if desde:
+        query = query.filter(Venta.fecha_venta >= datetime.combine(desde, datetime.min.time()))
+    if hasta:
+        query = query.filter(Venta.fecha_venta < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+    if categoria_id:
+        query = query.filter(Producto.categoria_id == categoria_id)
+    filas = query.group_by(
+        VentaDetalle.producto_id, Producto.codigo, Producto.nombre, Categoria.nombre
+    ).order_by(cantidad.desc(), total.desc(), Producto.nombre).limit(top).all()
+
+    return [{
+        'producto_id': fila.producto_id,
+        'codigo': fila.codigo,
+        'nombre': fila.nombre,
+        'categoria': fila.categoria or '',
+        'cantidad': Decimal(str(fila.cantidad or 0)),
+        'total': Decimal(str(fila.total or 0)),
+        'ventas': fila.ventas,
+    } for fila in filas]
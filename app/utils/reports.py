@@ -3,23 +3,22 @@ Utilidades para generar reportes con ReportLab
 """
 from io import BytesIO
 from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak, Image
+from reportlab.platypus import SimpleDocTemplate, Table, Paragraph, Spacer, PageBreak, Image
 from reportlab.pdfgen import canvas
 from datetime import datetime
 from decimal import Decimal
+from app.utils.estilos_pdf import ESTILOS, estilo_tabla, estilo_variante, membrete
 
 
-def generar_reporte_arqueo(apertura, totales_esperados, empresa_config, return_elements=False):
+def generar_reporte_arqueo(apertura, totales_esperados, empresa_config=None, return_elements=False):
     """
     Genera un PDF con el reporte de arqueo de caja
     
     Args:
         apertura: Objeto AperturaCaja
         totales_esperados: Dict con totales esperados
-        empresa_config: Configuración de la empresa
+        empresa_config: Configuración de la empresa (por defecto, la guardada)
     
     Returns:
         BytesIO con el PDF generado
@@ -38,47 +37,15 @@ def generar_reporte_arqueo(apertura, totales_esperados, empresa_config, return_e
         bottomMargin=0.5*inch
     )
     
-    # Estilos
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1a3a52'),
-        spaceAfter=6,
-        alignment=1  # Centrado
-    )
-    
-    subtitle_style = ParagraphStyle(
-        'CustomSubtitle',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor=colors.HexColor('#555555'),
-        spaceAfter=4,
-        alignment=1  # Centrado
-    )
-    
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=12,
-        textColor=colors.HexColor('#0d6efd'),
-        spaceAfter=8,
-        spaceBefore=8,
-        bold=True
-    )
-    
-    normal_style = styles['Normal']
+    # Estilos compartidos (app.utils.estilos_pdf)
+    heading_style = ESTILOS['ArqueoSeccion']
+    normal_style = ESTILOS['Normal']
     
     # Contenido del documento
     elements = []
     
     # ===== MEMBRETE =====
-    elements.append(Paragraph(empresa_config.get('nombre', 'JUGUETERÍA'), title_style))
-    elements.append(Paragraph(empresa_config.get('subtitulo', 'El Mundo Feliz'), subtitle_style))
-    elements.append(Paragraph(f"RUC: {empresa_config.get('ruc', 'N/A')}", normal_style))
-    elements.append(Paragraph(f"{empresa_config.get('direccion', '')}", normal_style))
-    elements.append(Spacer(1, 0.2*inch))
+    elements.extend(membrete('arqueo', empresa_config))
     
     # ===== TÍTULO DEL REPORTE =====
     elements.append(Paragraph("REPORTE DE ARQUEO DE CAJA", heading_style))
@@ -93,12 +60,7 @@ def generar_reporte_arqueo(apertura, totales_esperados, empresa_config, return_e
     ]
     
     info_table = Table(info_data, colWidths=[1.2*inch, 2*inch, 1.2*inch, 2*inch])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-    ]))
+    info_table.setStyle(estilo_tabla('datos'))
     elements.append(info_table)
     elements.append(Spacer(1, 0.15*inch))
     
@@ -139,45 +101,22 @@ def generar_reporte_arqueo(apertura, totales_esperados, empresa_config, return_e
     ]
     
     tabla = Table(tabla_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1.5*inch])
-    tabla.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0d6efd')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 11),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-        ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e9ecef')),
-        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, -1), (-1, -1), 11),
-        ('TOPPADDING', (0, -1), (-1, -1), 8),
-        ('BOTTOMPADDING', (0, -1), (-1, -1), 8),
-        ('GRID', (0, 0), (-1, -1), 1, colors.black),
-        ('FONTSIZE', (0, 1), (-1, -2), 10),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f8f9fa')]),
-    ]))
+    tabla.setStyle(estilo_tabla('totales', '#0d6efd'))
     elements.append(tabla)
     elements.append(Spacer(1, 0.15*inch))
     
     # ===== ESTADO DEL ARQUEO =====
     if abs(diferencia_total) < 1:
         estado = "ARQUEO CUADRADO ✓"
-        color_estado = colors.HexColor('#28a745')
+        color_estado = '#28a745'
     elif diferencia_total > 0:
         estado = f"SOBRANTE: Gs. {diferencia_total:,.0f}"
-        color_estado = colors.HexColor('#ffc107')
+        color_estado = '#ffc107'
     else:
         estado = f"FALTANTE: Gs. {abs(diferencia_total):,.0f}"
-        color_estado = colors.HexColor('#dc3545')
-    
-    estado_style = ParagraphStyle(
-        'Estado',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=color_estado,
-        spaceAfter=8,
-        alignment=1,
-        bold=True
-    )
+        color_estado = '#dc3545'
+    
+    estado_style = estilo_variante('ArqueoEstado', textColor=color_estado)
     elements.append(Paragraph(estado, estado_style))
     elements.append(Spacer(1, 0.1*inch))
     
@@ -196,11 +135,7 @@ def generar_reporte_arqueo(apertura, totales_esperados, empresa_config, return_e
     ]
     
     firma_table = Table(firma_data, colWidths=[2*inch, 1*inch, 2*inch])
-    firma_table.setStyle(TableStyle([
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTSIZE', (0, 0), (-1, -1), 9),
-        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
-    ]))
+    firma_table.setStyle(estilo_tabla('firmas'))
     elements.append(firma_table)
     
     if return_elements:
@@ -0,0 +1,279 @@
+"""
+Series de tiempo de ventas.
+Agrupa en la base por período (día, semana, mes o trimestre) con date_trunc
+en PostgreSQL (funciones de fecha en SQLite), opcionalmente abierto por una
+dimensión (caja, vendedor, forma de pago o categoría), y completa con cero
+los períodos sin ventas. Las series salen ordenadas: los períodos de menor a
+mayor y las series por total descendente.
+
+Los totales por caja, vendedor y forma de pago salen del resumen
+ventas_diarias; por categoría, de venta_detalles (líneas sin producto van a
+"Sin categoría"). Las semanas empiezan el lunes.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy import Date, cast, func, literal_column
+from app import db
+from app.models import VentaDiaria, Venta, VentaDetalle, Producto, Caja, Usuario
+from app.models.producto import Categoria
+from app.models.venta import CATEGORIAS_PAGO
+
+GRANULARIDADES = {'dia': 'Día', 'semana': 'Semana', 'mes': 'Mes', 'trimestre': 'Trimestre'}
+DIMENSIONES = {'caja': 'Caja', 'vendedor': 'Vendedor', 'forma_pago': 'Forma de pago', 'categoria': 'Categoría'}
+MEDIDAS = ('total', 'cantidad')
+
+# Límite de períodos por serie (p. ej. ~2 años y medio por día)
+MAX_PERIODOS = 1000
+
+MESES_ES = [
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
+    'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
+]
+
+_UNIDAD_DATE_TRUNC = {'dia': 'day', 'semana': 'week', 'mes': 'month', 'trimestre': 'quarter'}
+
+
+# -----------------------------------------------------------------------
+# Períodos
+# -----------------------------------------------------------------------
+
+def inicio_periodo(columna, granularidad):
+    """Expresión SQL con la fecha de inicio del período de `columna`"""
+    if db.engine.dialect.name == 'postgresql':
+        unidad = literal_column(f"'{_UNIDAD_DATE_TRUNC[granularidad]}'")
+        return cast(func.date_trunc(unidad, columna), Date)
+    # SQLite (pruebas y desarrollo): modificadores de date()
+    if granularidad == 'dia':
+        return func.date(columna)
+    if granularidad == 'semana':
+        # strftime('%w'): 0 = domingo; se retrocede hasta el lunes
+        dias = func.printf(literal_column("'-%d days'"), (func.strftime('%w', columna) + 6) % 7)
+        return func.date(columna, dias)
+    if granularidad == 'mes':
+        return func.date(columna, literal_column("'start of month'"))
+    meses = func.printf(literal_column("'-%d months'"), (func.strftime('%m', columna) - 1) % 3)
+    return func.date(columna, literal_column("'start of month'"), meses)
+
+
+def inicio_periodo_fecha(fecha, granularidad):
+    """Lo mismo que inicio_periodo, en Python"""
+    if granularidad == 'dia':
+        return fecha
+    if granularidad == 'semana':
+        return fecha - timedelta(days=fecha.weekday())
+    if granularidad == 'mes':
+        return fecha.replace(day=1)
+    return fecha.replace(month=(fecha.month - 1) // 3 * 3 + 1, day=1)
+
+
+def _siguiente_periodo(inicio, granularidad):
+    if granularidad == 'dia':
+        return inicio + timedelta(days=1)
+    if granularidad == 'semana':
+        return inicio + timedelta(days=7)
+    meses = 1 if granularidad == 'mes' else 3
+    mes = inicio.month - 1 + meses
+    return inicio.replace(year=inicio.year + mes // 12, month=mes % 12 + 1)
+
+
+def periodos(desde, hasta, granularidad):
+    """Inicios de todos los períodos que tocan el rango [desde, hasta]"""
+    resultado = []
+    inicio = inicio_periodo_fecha(desde, granularidad)
+    while inicio <= hasta:
+        resultado.append(inicio)
+        inicio = _siguiente_periodo(inicio, granularidad)
+    return resultado
+
+
+def etiqueta_periodo(inicio, granularidad):
+    if granularidad == 'dia':
+        return inicio.strftime('%d/%m/%Y')
+    if granularidad == 'semana':
+        anio, semana, _ = inicio.isocalendar()
+        return f"Semana {semana:02d}/{anio} ({inicio.strftime('%d/%m')})"
+    if granularidad == 'mes':
+        return f"{MESES_ES[inicio.month - 1].capitalize()} {inicio.year}"
+    return f"T{(inicio.month - 1) // 3 + 1} {inicio.year}"
+
+
+def _a_fecha(valor):
+    # SQLite devuelve el período como texto 'YYYY-MM-DD'
+    return date.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+# -----------------------------------------------------------------------
+# Consultas por dimensión: filas (inicio, clave, nombre, valor)
+# -----------------------------------------------------------------------
+
+def _medida_resumen(medida):
+    return func.sum(VentaDiaria.cantidad if medida == 'cantidad' else VentaDiaria.total)
+
+
+def _consulta_resumen(desde, hasta, *columnas):
+    return db.session.query(*columnas).select_from(VentaDiaria).filter(
+        VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta
+    )
+
+
+def _sin_dimension(desde, hasta, granularidad, medida):
+    periodo = inicio_periodo(VentaDiaria.fecha, granularidad)
+    filas = _consulta_resumen(
+        desde, hasta, periodo.label('periodo'), _medida_resumen(medida).label('valor')
+    ).group_by(periodo)
+    return ((fila.periodo, None, 'Total', fila.valor) for fila in filas)
+
+
+def _por_caja(desde, hasta, granularidad, medida):
+    periodo = inicio_periodo(VentaDiaria.fecha, granularidad)
+    filas = _consulta_resumen(
+        desde, hasta, periodo.label('periodo'), VentaDiaria.caja_id, Caja.nombre, _medida_resumen(medida).label('valor')
+    ).outerjoin(Caja, Caja.id == VentaDiaria.caja_id).group_by(periodo, VentaDiaria.caja_id, Caja.nombre)
+    return ((fila.periodo, fila.caja_id, fila.nombre or 'Sin caja', fila.valor) for fila in filas)
+
+
+def _por_vendedor(desde, hasta, granularidad, medida):
+    periodo = inicio_periodo(VentaDiaria.fecha, granularidad)
+    filas = _consulta_resumen(
+        desde, hasta, periodo.label('periodo'), VentaDiaria.vendedor_id, Usuario.nombre, Usuario.apellido,
+        _medida_resumen(medida).label('valor')
+    ).outerjoin(Usuario, Usuario.id == VentaDiaria.vendedor_id).group_by(
+        periodo, VentaDiaria.vendedor_id, Usuario.nombre, Usuario.apellido
+    )
+    for fila in filas:
+        nombre = ' '.join(filter(None, (fila.nombre, fila.apellido))) or f'Vendedor {fila.vendedor_id}'
+        yield fila.periodo, fila.vendedor_id, nombre, fila.valor
+
+
+def _por_forma_pago(desde, hasta, granularidad, medida):
+    if medida != 'total':
+        raise ValueError('La cantidad de ventas no se reparte por forma de pago')
+    columnas = CATEGORIAS_PAGO + ('otros',)
+    periodo = inicio_periodo(VentaDiaria.fecha, granularidad)
+    filas = _consulta_resumen(
+        desde, hasta, periodo.label('periodo'), *[func.sum(getattr(VentaDiaria, col)).label(col) for col in columnas]
+    ).group_by(periodo)
+    for fila in filas:
+        for col in columnas:
+            yield fila.periodo, col, 'Otros / crédito' if col == 'otros' else col.capitalize(), getattr(fila, col)
+
+
+def _por_categoria(desde, hasta, granularidad, medida):
+    periodo = inicio_periodo(Venta.fecha_venta, granularidad)
+    valor = func.sum(VentaDetalle.cantidad if medida == 'cantidad' else VentaDetalle.total)
+    filas = db.session.query(
+        periodo.label('periodo'), Categoria.id, Categoria.nombre, valor.label('valor')
+    ).select_from(VentaDetalle).join(Venta, Venta.id == VentaDetalle.venta_id).outerjoin(
+        Producto, Producto.id == VentaDetalle.producto_id
+    ).outerjoin(Categoria, Categoria.id == Producto.categoria_id).filter(
+        Venta.estado == 'completada',
+        Venta.fecha_venta >= datetime.combine(desde, datetime.min.time()),
+        Venta.fecha_venta < datetime.combine(hasta + timedelta(days=1), datetime.min.time()),
+    ).group_by(periodo, Categoria.id, Categoria.nombre)
+    return ((fila.periodo, fila.id, fila.nombre or 'Sin categoría', fila.valor) for fila in filas)
+
+
+_CONSULTAS = {
+    None: _sin_dimension,
+    'caja': _por_caja,
+    'vendedor': _por_vendedor,
+    'forma_pago': _por_forma_pago,
+    'categoria': _por_categoria,
+}
+
+
+# -----------------------------------------------------------------------
+# Serie completa
+# -----------------------------------------------------------------------
+
+def serie_ventas(desde, hasta, granularidad='dia', dimension=None, medida='total', max_series=None):
+    """
+    Ventas completadas entre desde y hasta (fechas, inclusive) por período.
+    Devuelve un dict con periodos (fechas de inicio), etiquetas, series
+    ([{clave, nombre, valores, total}], una por valor de la dimensión o una
+    sola "Total"), totales por período y total general. Con max_series, las
+    series que sobran se suman en una última "Resto".
+    ValueError si algún parámetro no es válido.
+    """
+    if granularidad not in GRANULARIDADES:
+        raise ValueError(f'Granularidad desconocida: {granularidad}')
+    if dimension not in _CONSULTAS:
+        raise ValueError(f'Dimensión desconocida: {dimension}')
+    if medida not in MEDIDAS:
+        raise ValueError(f'Medida desconocida: {medida}')
+    if desde > hasta:
+        raise ValueError('La fecha desde es posterior a la fecha hasta')
+    inicios = periodos(desde, hasta, granularidad)
+    if len(inicios) > MAX_PERIODOS:
+        raise ValueError(f'Demasiados períodos ({len(inicios)}); use una granularidad mayor')
+
+    posicion = {inicio: i for i, inicio in enumerate(inicios)}
+    series = {}
+    for inicio, clave, nombre, valor in _CONSULTAS[dimension](desde, hasta, granularidad, medida):
+        serie = series.setdefault(clave, {'clave': clave, 'nombre': nombre, 'valores': [Decimal(0)] * len(inicios)})
+        serie['valores'][posicion[_a_fecha(inicio)]] += Decimal(str(valor or 0))
+    if dimension is None and not series:
+        series[None] = {'clave': None, 'nombre': 'Total', 'valores': [Decimal(0)] * len(inicios)}
+
+    ordenadas = list(series.values())
+    for serie in ordenadas:
+        serie['total'] = sum(serie['valores'], Decimal(0))
+    ordenadas.sort(key=lambda s: (-s['total'], s['nombre']))
+    if max_series and len(ordenadas) > max_series:
+        resto = ordenadas[max_series - 1:]
+        ordenadas = ordenadas[:max_series - 1] + [{
+            'clave': '_resto', 'nombre': 'Resto',
+            'valores': [sum(valores, Decimal(0)) for valores in zip(*(s['valores'] for s in resto))],
+            'total': sum((s['total'] for s in resto), Decimal(0)),
+        }]
+
+    totales = [sum(valores, Decimal(0)) for valores in zip(*(s['valores'] for s in ordenadas))] \
+        if ordenadas else [Decimal(0)] * len(inicios)
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'granularidad': granularidad,
+        'dimension': dimension,
+        'medida': medida,
+        'periodos': inicios,
+        'etiquetas': [etiqueta_periodo(inicio, granularidad) for inicio in inicios],
+        'series': ordenadas,
+        'totales': totales,
+        'total': sum(totales, Decimal(0)),
+    }
+
+
+def parametros_serie(args, granularidad='dia'):
+    """
+    Lee desde, hasta (YYYY-MM-DD; por defecto, el mes actual hasta hoy),
+    granularidad, dimension y medida de los argumentos del request.
+    ValueError si algún valor no es válido.
+    """
+    hoy = date.today()
+    desde, hasta = args.get('desde') or None, args.get('hasta') or None
+    parametros = {
+        'desde': datetime.strptime(desde, '%Y-%m-%d').date() if desde else hoy.replace(day=1),
+        'hasta': datetime.strptime(hasta, '%Y-%m-%d').date() if hasta else hoy,
+        'granularidad': args.get('granularidad') or granularidad,
+        'dimension': args.get('dimension') or None,
+        'medida': args.get('medida') or 'total',
+    }
+    if parametros['granularidad'] not in GRANULARIDADES:
+        raise ValueError(f"Granularidad desconocida: {parametros['granularidad']}")
+    if parametros['dimension'] is not None and parametros['dimension'] not in DIMENSIONES:
+        raise ValueError(f"Dimensión desconocida: {parametros['dimension']}")
+    return parametros
+
+
+def serie_a_json(serie):
+    """La serie con fechas ISO y montos float, para las respuestas JSON (gráficos)"""
+    return dict(
+        serie,
+        desde=serie['desde'].isoformat(),
+        hasta=serie['hasta'].isoformat(),
+        periodos=[inicio.isoformat() for inicio in serie['periodos']],
+        series=[dict(s, valores=[float(v) for v in s['valores']], total=float(s['total']))
+                for s in serie['series']],
+        totales=[float(v) for v in serie['totales']],
+        total=float(serie['total']),
+    )
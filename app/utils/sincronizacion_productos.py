@@ -0,0 +1,159 @@
+"""
+Catálogo de productos versionado para /productos/api/productos.
+
+Sin parámetros la respuesta es la de siempre: la lista de productos activos.
+Con since, cursor o limite la respuesta es un sobre para sincronizar por
+partes:
+
+    {"version": "2026-10-18T12:00:00.123456",  # marca para el próximo since
+     "productos": [...],                       # activos nuevos o modificados
+     "eliminados": [12, 40],                   # desactivados desde since
+     "siguiente": "eyJz..." | null}            # cursor de la página siguiente
+
+- since: la version recibida en la sincronización anterior (vacío = todo el
+  catálogo). Se devuelven los productos con fecha_modificacion desde since
+  menos MARGEN_REFRESCO (transacciones que confirman tarde), así que un
+  producto puede repetirse entre sincronizaciones: el cliente reemplaza por
+  id.
+- cursor / limite: páginas ordenadas por id; el cursor guarda since, la
+  version de la primera página y el último id, así todas las páginas de una
+  sincronización usan el mismo corte. Se guarda la version recién al recibir
+  la última página (siguiente null).
+
+Todas las respuestas llevan ETag (débil) calculado del sello de la tabla
+productos (COUNT, MAX(id) y MAX(fecha_modificacion)) y de los parámetros:
+con If-None-Match igual se responde 304 sin leer productos. Mientras el
+último cambio tenga menos de MARGEN_REFRESCO el ETag no se repite (una
+transacción que confirma tarde no mueve el sello). El cuerpo va comprimido
+con gzip si el cliente lo acepta.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import time
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import select
+from app import db
+from app.models import Producto
+from app.utils.cache_reportes import version_datos
+from app.utils.catalogo_memoria import MARGEN_REFRESCO
+
+LIMITE_POR_DEFECTO = 1000
+MAX_LIMITE = 5000
+# Cuerpos más chicos no se comprimen
+MIN_GZIP = 1024
+
+_COLUMNAS = (Producto.id, Producto.codigo, Producto.nombre, Producto.precio_compra, Producto.precio_venta,
+             Producto.stock_actual, Producto.unidad_medida)
+
+
+def _fecha(texto, nombre):
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f'{nombre} no es una fecha ISO válida: {texto}')
+
+
+def parametros_sincronizacion(args):
+    """
+    None si el pedido es el catálogo completo de siempre; si no, dict con
+    since, version (None = se toma al leer), ultimo_id y limite.
+    ValueError si algún valor no es válido.
+    """
+    if not any(k in args for k in ('since', 'cursor', 'limite')):
+        return None
+    limite = args.get('limite') or str(LIMITE_POR_DEFECTO)
+    if not limite.isdigit() or not 1 <= int(limite) <= MAX_LIMITE:
+        raise ValueError(f'El límite debe ser un número entre 1 y {MAX_LIMITE}')
+    if args.get('cursor'):
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(args['cursor'].encode()))
+            since, version, ultimo_id = cursor['s'], cursor['v'], int(cursor['id'])
+        except (ValueError, KeyError, TypeError):
+            raise ValueError('Cursor inválido')
+        return {'since': since and _fecha(since, 'cursor'), 'version': version and _fecha(version, 'cursor'),
+                'ultimo_id': ultimo_id, 'limite': int(limite), 'con_version': True}
+    since = args.get('since') or None
+    return {'since': since and _fecha(since, 'since'), 'version': None, 'ultimo_id': 0, 'limite': int(limite),
+            'con_version': False}
+
+
+def sello_productos():
+    """(COUNT, MAX(id), MAX(fecha_modificacion)) de productos"""
+    (_, filas, maximo_id, marca), = version_datos(['productos'])
+    return filas, maximo_id, marca
+
+
+def etag_catalogo(sello, args):
+    clave = [sello, sorted(args.items(multi=True))]
+    if sello[2] is not None and sello[2] > datetime.utcnow() - MARGEN_REFRESCO:
+        clave.append(time.monotonic_ns())  # cambios recientes: sin 304
+    clave = json.dumps(clave, default=str)
+    return hashlib.sha1(clave.encode()).hexdigest()
+
+
+def _producto_json(fila):
+    id_, codigo, nombre, precio_compra, precio_venta, stock_actual, unidad_medida = fila
+    return {
+        'id': id_,
+        'codigo': codigo,
+        'nombre': nombre,
+        'precio_compra': float(precio_compra or 0),
+        'precio_venta': float(precio_venta or 0),
+        'stock_actual': float(stock_actual or 0),
+        'unidad_medida': unidad_medida or 'und'
+    }
+
+
+def catalogo_completo():
+    """Todos los productos activos (la respuesta sin parámetros)"""
+    filas = db.session.execute(select(*_COLUMNAS).where(Producto.activo == True).order_by(Producto.id))
+    return [_producto_json(f) for f in filas]
+
+
+def pagina_catalogo(parametros, sello):
+    """El sobre de sincronización para `parametros` (ver parametros_sincronizacion)"""
+    since, limite = parametros['since'], parametros['limite']
+    version = parametros['version'] if parametros['con_version'] else sello[2]
+    consulta = select(*_COLUMNAS, Producto.activo).where(Producto.id > parametros['ultimo_id'])
+    if since is None:
+        consulta = consulta.where(Producto.activo == True)
+    else:
+        consulta = consulta.where(Producto.fecha_modificacion >= since - MARGEN_REFRESCO)
+    filas = db.session.execute(consulta.order_by(Producto.id).limit(limite + 1)).all()
+
+    siguiente = None
+    if len(filas) > limite:
+        filas = filas[:limite]
+        cursor = {'s': since and since.isoformat(), 'v': version and version.isoformat(), 'id': filas[-1][0]}
+        siguiente = base64.urlsafe_b64encode(json.dumps(cursor, separators=(',', ':')).encode()).decode()
+    return {
+        'version': version and version.isoformat(),
+        'productos': [_producto_json(f[:-1]) for f in filas if f[-1]],
+        'eliminados': [f[0] for f in filas if not f[-1]],
+        'siguiente': siguiente,
+    }
+
+
+def respuesta_json(datos, etag, acepta_gzip):
+    """Respuesta JSON con ETag débil, comprimida si el cliente acepta gzip"""
+    cuerpo = current_app.json.dumps(datos).encode()
+    respuesta = current_app.response_class(mimetype='application/json')
+    if acepta_gzip and len(cuerpo) >= MIN_GZIP:
+        cuerpo = gzip.compress(cuerpo, compresslevel=6)
+        respuesta.headers['Content-Encoding'] = 'gzip'
+    respuesta.set_data(cuerpo)
+    return _cabeceras(respuesta, etag)
+
+
+def respuesta_no_modificada(etag):
+    return _cabeceras(current_app.response_class(status=304), etag)
+
+
+def _cabeceras(respuesta, etag):
+    respuesta.set_etag(etag, weak=True)
+    respuesta.headers['Vary'] = 'Accept-Encoding'
+    respuesta.headers['Cache-Control'] = 'private, no-cache'
+    return respuesta
@@ -1,18 +1,9 @@
-from reportlab.platypus import Table, TableStyle
-from reportlab.lib import colors
+from reportlab.platypus import Table
+from app.utils.estilos_pdf import estilo_tabla
 
 def build_pdf_table(table_data, col_widths=None, header_color='#27ae60'):
     if not col_widths:
         col_widths = [100] * len(table_data[0])
     table = Table(table_data, colWidths=col_widths)
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 13),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-    ]))
+    table.setStyle(estilo_tabla('encabezado', header_color))
     return table
@@ -38,6 +38,12 @@ class GeneradorTicket:
             '10': {'subtotal': 0, 'iva': 0}
         }
         """
+        # Desglose guardado en la venta al registrarla
+        desglose = getattr(self.venta, 'desglose_iva', None)
+        if desglose and any(d['subtotal'] for d in desglose.values()):
+            return desglose
+        
+        # Ventas sin desglose guardado: calcular línea por línea
         subtotales = {
             'exenta': {'subtotal': Decimal('0'), 'iva': Decimal('0')},
             '5': {'subtotal': Decimal('0'), 'iva': Decimal('0')},
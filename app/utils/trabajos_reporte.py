@@ -0,0 +1,246 @@
+"""
+Reportes en segundo plano.
+Encolar un reporte crea una fila en trabajos_reporte y lo manda a un
+ProcessPoolExecutor (reportlab usa CPU; en procesos no bloquea a los workers
+web). Cada proceso del pool tiene su propia app y conexión a la base y
+actualiza el estado del trabajo; la web consulta la fila y descarga el
+archivo, que queda en disco hasta su vencimiento.
+
+Configuración (config.py): REPORTES_TRABAJOS_DIR, REPORTES_TRABAJOS_PROCESOS
+(0 = generar en el mismo request), REPORTES_TRABAJOS_POR_USUARIO (trabajos
+activos por usuario), REPORTES_TRABAJOS_EXPIRACION_HORAS y
+REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS (los trabajos activos más viejos se
+marcan como error: el proceso que los generaba se reinició o no es este).
+"""
+import json
+import multiprocessing
+import os
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from uuid import uuid4
+from flask import current_app
+from sqlalchemy import func
+from app import db
+from app.models.trabajo_reporte import TrabajoReporte, ESTADOS_ACTIVOS
+from app.utils.generadores_reporte import GENERADORES, generar_reporte
+
+
+class LimiteTrabajosError(Exception):
+    """El usuario ya tiene el máximo de trabajos activos"""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_futuros = {}  # trabajo_id -> Future (solo en el proceso que encoló)
+
+# App del proceso del pool (se crea una vez por proceso)
+_app_worker = None
+
+
+# -----------------------------------------------------------------------
+# Proceso del pool
+# -----------------------------------------------------------------------
+
+def _iniciar_worker(valores_config):
+    global _app_worker
+    from app import create_app
+    from config import Config
+
+    _app_worker = create_app(type('ConfigTrabajos', (Config,), valores_config))
+
+
+def ejecutar_trabajo(trabajo_id):
+    """Genera el archivo del trabajo y deja el resultado en la fila. Corre en el proceso del pool."""
+    app = _app_worker or current_app._get_current_object()
+    with app.app_context():
+        trabajo = db.session.get(TrabajoReporte, trabajo_id)
+        if trabajo is None or trabajo.estado != 'pendiente':
+            return
+        trabajo.estado = 'en_proceso'
+        trabajo.fecha_inicio = datetime.utcnow()
+        db.session.commit()
+
+        carpeta = app.config['REPORTES_TRABAJOS_DIR']
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, trabajo.id + GENERADORES[trabajo.tipo][1])
+        try:
+            nombre, mimetype = generar_reporte(trabajo.tipo, ruta, trabajo.parametros_dict)
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            trabajo = db.session.get(TrabajoReporte, trabajo_id)
+            trabajo.estado = 'error'
+            trabajo.error = f'{type(e).__name__}: {e}'
+            trabajo.fecha_fin = datetime.utcnow()
+            db.session.commit()
+            traceback.print_exc()
+            return
+        trabajo.estado = 'terminado'
+        trabajo.ruta_archivo = ruta
+        trabajo.nombre_archivo = nombre
+        trabajo.mimetype = mimetype
+        trabajo.tamano = os.path.getsize(ruta)
+        trabajo.fecha_fin = datetime.utcnow()
+        db.session.commit()
+
+
+# -----------------------------------------------------------------------
+# Proceso web
+# -----------------------------------------------------------------------
+
+def _config_para_workers(app):
+    """Valores de configuración (serializables) para crear la app en cada proceso del pool"""
+    valores = {}
+    for clave, valor in app.config.items():
+        if clave.isupper() and isinstance(valor, (str, int, float, bool, type(None), dict, list, tuple)):
+            valores[clave] = valor
+    return valores
+
+
+def _obtener_pool(app):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: los procesos no heredan conexiones abiertas ni el estado del proceso web
+            _pool = ProcessPoolExecutor(
+                max_workers=app.config['REPORTES_TRABAJOS_PROCESOS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_iniciar_worker,
+                initargs=(_config_para_workers(app),),
+            )
+        return _pool
+
+
+def cerrar_pool(esperar=True):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=esperar)
+            _pool = None
+
+
+def _enviar_al_pool(app, trabajo_id):
+    try:
+        return _obtener_pool(app).submit(ejecutar_trabajo, trabajo_id)
+    except BrokenProcessPool:
+        # Un proceso del pool murió (p. ej. por falta de memoria): se arma uno nuevo
+        cerrar_pool(esperar=False)
+        return _obtener_pool(app).submit(ejecutar_trabajo, trabajo_id)
+
+
+def encolar_reporte(tipo, parametros, usuario_id=None):
+    """
+    Registra el trabajo y lo envía al pool. Devuelve el TrabajoReporte.
+    ValueError si el reporte no existe; LimiteTrabajosError si el usuario
+    ya tiene REPORTES_TRABAJOS_POR_USUARIO trabajos activos.
+    """
+    if tipo not in GENERADORES:
+        raise ValueError(f'Reporte desconocido: {tipo}')
+    app = current_app._get_current_object()
+    limpiar_trabajos_vencidos()  # los colgados pasan a error y dejan de contar para el límite
+
+    if usuario_id is not None:
+        activos = TrabajoReporte.query.filter(
+            TrabajoReporte.usuario_id == usuario_id,
+            TrabajoReporte.estado.in_(ESTADOS_ACTIVOS)
+        ).count()
+        if activos >= app.config['REPORTES_TRABAJOS_POR_USUARIO']:
+            raise LimiteTrabajosError(f'Ya tiene {activos} reportes en preparación; espere a que terminen')
+
+    trabajo = TrabajoReporte(
+        id=uuid4().hex,
+        tipo=tipo,
+        parametros=json.dumps({k: v for k, v in parametros.items() if v not in (None, '')}),
+        estado='pendiente',
+        usuario_id=usuario_id,
+        fecha_expiracion=datetime.utcnow() + timedelta(hours=app.config['REPORTES_TRABAJOS_EXPIRACION_HORAS']),
+    )
+    db.session.add(trabajo)
+    db.session.commit()
+
+    if app.config['REPORTES_TRABAJOS_PROCESOS'] > 0:
+        _futuros[trabajo.id] = _enviar_al_pool(app, trabajo.id)
+    else:
+        ejecutar_trabajo(trabajo.id)
+        db.session.expire(trabajo)
+    return trabajo
+
+
+def consultar_trabajo(trabajo_id):
+    """
+    Trabajo por id (o None). Si el proceso que lo generaba murió sin
+    actualizar la fila, se marca como error.
+    """
+    trabajo = db.session.get(TrabajoReporte, trabajo_id)
+    if trabajo is None:
+        return None
+    if trabajo.activo and _inicio(trabajo) < _corte_colgados(datetime.utcnow()):
+        marcar_trabajos_colgados()
+        db.session.refresh(trabajo)
+    futuro = _futuros.get(trabajo_id)
+    if futuro is not None and futuro.done():
+        _futuros.pop(trabajo_id, None)
+        db.session.refresh(trabajo)
+        excepcion = futuro.exception()
+        if excepcion is not None and trabajo.activo:
+            trabajo.estado = 'error'
+            trabajo.error = f'{type(excepcion).__name__}: {excepcion}'
+            trabajo.fecha_fin = datetime.utcnow()
+            db.session.commit()
+    return trabajo
+
+
+def _corte_colgados(ahora):
+    return ahora - timedelta(minutes=current_app.config['REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS'])
+
+
+def _inicio(trabajo):
+    return trabajo.fecha_inicio or trabajo.fecha_creacion
+
+
+def marcar_trabajos_colgados(ahora=None):
+    """
+    Pasa a error los trabajos activos que empezaron (o se encolaron) antes del
+    tiempo máximo: el proceso que los generaba murió o se reinició sin
+    actualizar la fila. Devuelve cuántos se marcaron.
+    """
+    ahora = ahora or datetime.utcnow()
+    minutos = current_app.config['REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS']
+    marcados = TrabajoReporte.query.filter(
+        TrabajoReporte.estado.in_(ESTADOS_ACTIVOS),
+        func.coalesce(TrabajoReporte.fecha_inicio, TrabajoReporte.fecha_creacion) < _corte_colgados(ahora)
+    ).update({
+        'estado': 'error',
+        'error': f'El reporte no terminó en {minutos} minutos (proceso reiniciado o interrumpido)',
+        'fecha_fin': ahora,
+    }, synchronize_session=False)
+    if marcados:
+        db.session.commit()
+    return marcados
+
+
+def limpiar_trabajos_vencidos(ahora=None):
+    """
+    Marca los trabajos colgados y borra los archivos y las filas de los
+    trabajos vencidos. Devuelve cuántos se eliminaron.
+    """
+    ahora = ahora or datetime.utcnow()
+    marcar_trabajos_colgados(ahora)
+    vencidos = TrabajoReporte.query.filter(
+        TrabajoReporte.fecha_expiracion < ahora,
+        TrabajoReporte.estado.notin_(ESTADOS_ACTIVOS)
+    ).all()
+    for trabajo in vencidos:
+        if trabajo.ruta_archivo and os.path.exists(trabajo.ruta_archivo):
+            try:
+                os.remove(trabajo.ruta_archivo)
+            except OSError:
+                continue  # se reintenta en la próxima limpieza
+        db.session.delete(trabajo)
+    if vencidos:
+        db.session.commit()
+    return len(vencidos)
@@ -20,6 +20,22 @@ class Config:
     # Configuración de sesión
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hora
     
+    # Reportes en segundo plano (0 procesos = se generan en el mismo request)
+    REPORTES_TRABAJOS_DIR = os.environ.get('REPORTES_TRABAJOS_DIR') or os.path.join(basedir, 'instance', 'reportes')
+    REPORTES_TRABAJOS_PROCESOS = int(os.environ.get('REPORTES_TRABAJOS_PROCESOS') or 2)
+    REPORTES_TRABAJOS_POR_USUARIO = int(os.environ.get('REPORTES_TRABAJOS_POR_USUARIO') or 3)
+    REPORTES_TRABAJOS_EXPIRACION_HORAS = int(os.environ.get('REPORTES_TRABAJOS_EXPIRACION_HORAS') or 24)
+    # Un trabajo activo con más minutos que esto se da por perdido (proceso reiniciado) y pasa a error
+    REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS = int(os.environ.get('REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS') or 30)
+
+    # Cache de reportes generados (0 MB = sin cache)
+    REPORTES_CACHE_DIR = os.environ.get('REPORTES_CACHE_DIR') or os.path.join(basedir, 'instance', 'cache_reportes')
+    REPORTES_CACHE_MAX_MB = int(os.environ.get('REPORTES_CACHE_MAX_MB') or 200)
+
+    # Catálogo de productos y clientes en memoria para el autocompletado (uno por proceso)
+    CATALOGO_MEMORIA = (os.environ.get('CATALOGO_MEMORIA') or '').lower() in ('1', 'true', 'si')
+    CATALOGO_REFRESCO_SEGUNDOS = float(os.environ.get('CATALOGO_REFRESCO_SEGUNDOS') or 2)
+    
     # Zona horaria
     TIMEZONE = 'America/Asuncion'
 
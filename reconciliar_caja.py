@@ -0,0 +1,74 @@
+"""
+Compara los acumulados de cada apertura de caja (acumulado_efectivo, tarjeta,
+transferencia, cheque y egresos) contra el recalculo desde ventas, pagos y
+movimientos de caja. Con --corregir sobrescribe los acumulados con el recalculo.
+
+Ejecutar con el entorno virtual activo:
+    python reconciliar_caja.py              # solo aperturas abiertas
+    python reconciliar_caja.py --todas      # todas las aperturas
+    python reconciliar_caja.py --corregir   # corrige las diferencias encontradas
+"""
+import os
+import sys
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models import AperturaCaja, MovimientoCaja
+from app.models.venta import CATEGORIAS_PAGO
+from app.routes.caja import calcular_totales_por_forma_pago
+from sqlalchemy import func
+
+
+def recalcular_apertura(apertura_id):
+    """Totales reales de la apertura (categorias y egresos) calculados desde las tablas de origen."""
+    totales = calcular_totales_por_forma_pago(apertura_id)
+    egresos = db.session.query(func.coalesce(func.sum(MovimientoCaja.monto), 0)).filter(
+        MovimientoCaja.apertura_caja_id == apertura_id,
+        MovimientoCaja.tipo == 'egreso'
+    ).scalar()
+    reales = {cat: Decimal(totales[cat]) for cat in CATEGORIAS_PAGO}
+    reales['egresos'] = Decimal(egresos)
+    return reales
+
+
+def reconciliar_aperturas(todas=False, corregir=False):
+    """Devuelve [(apertura_id, campo, acumulado, real)] con las diferencias encontradas."""
+    query = AperturaCaja.query
+    if not todas:
+        query = query.filter_by(estado='abierto')
+    diferencias = []
+    for apertura in query.order_by(AperturaCaja.id).all():
+        reales = recalcular_apertura(apertura.id)
+        for campo, real in reales.items():
+            acumulado = Decimal(getattr(apertura, f'acumulado_{campo}') or 0)
+            if acumulado != real:
+                diferencias.append((apertura.id, campo, acumulado, real))
+                if corregir:
+                    setattr(apertura, f'acumulado_{campo}', real)
+    if corregir:
+        db.session.commit()
+    return diferencias
+
+
+def main():
+    todas = '--todas' in sys.argv
+    corregir = '--corregir' in sys.argv
+    app = create_app()
+    with app.app_context():
+        diferencias = reconciliar_aperturas(todas=todas, corregir=corregir)
+        if not diferencias:
+            print("Acumulados de caja consistentes.")
+            return 0
+        for apertura_id, campo, acumulado, real in diferencias:
+            print(f"Apertura {apertura_id} - {campo}: acumulado={acumulado} real={real}")
+        if corregir:
+            print(f"{len(diferencias)} diferencias corregidas.")
+            return 0
+        print(f"{len(diferencias)} diferencias. Ejecutar con --corregir para ajustarlas.")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
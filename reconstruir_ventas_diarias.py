@@ -0,0 +1,65 @@
+"""
+Reconstruye el resumen ventas_diarias a partir de ventas y pagos.
+Se usa para cargar el historial la primera vez o para corregir un rango de fechas;
+el día a día lo mantienen las rutas de ventas (crear, facturar, registrar pago, anular).
+
+Ejecutar con el entorno virtual activo:
+    python reconstruir_ventas_diarias.py                          # todo el historial
+    python reconstruir_ventas_diarias.py 2025-01-01 2025-12-31    # solo ese rango
+"""
+import os
+import sys
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models.venta_diaria import VentaDiaria, MONTOS_VENTA_DIARIA
+
+
+def _como_fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor)[:10])
+
+
+def reconstruir_ventas_diarias(desde=None, hasta=None):
+    """Reemplaza las filas del rango (o todas) con la agregación de las ventas. Devuelve la cantidad de filas."""
+    borrar = VentaDiaria.query
+    if desde:
+        borrar = borrar.filter(VentaDiaria.fecha >= desde)
+    if hasta:
+        borrar = borrar.filter(VentaDiaria.fecha <= hasta)
+    borrar.delete(synchronize_session=False)
+
+    filas = []
+    for fila in VentaDiaria.consulta_agregada(desde, hasta):
+        registro = {
+            'fecha': _como_fecha(fila.fecha),
+            'caja_id': fila.caja_id,
+            'vendedor_id': fila.vendedor_id,
+            'tipo_venta': fila.tipo_venta,
+            'cantidad': fila.cantidad,
+        }
+        registro.update({col: getattr(fila, col) or 0 for col in MONTOS_VENTA_DIARIA})
+        filas.append(registro)
+    if filas:
+        db.session.execute(db.insert(VentaDiaria), filas)
+    db.session.commit()
+    return len(filas)
+
+
+def main():
+    desde = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    hasta = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+    app = create_app()
+    with app.app_context():
+        total = reconstruir_ventas_diarias(desde, hasta)
+        print(f"ventas_diarias reconstruido: {total} filas.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -73,11 +73,29 @@ def migrar_formas_pago(conn, inspector):
     if not tabla_existe(inspector, 'formas_pago'):
         skip("tabla formas_pago no existe aun, se creara con create_all")
         return
-    for col, tipo in [('descripcion', 'TEXT'), ('requiere_referencia', 'BOOLEAN DEFAULT FALSE')]:
+    for col, tipo in [('descripcion', 'TEXT'), ('requiere_referencia', 'BOOLEAN DEFAULT FALSE'),
+                      ('categoria', 'VARCHAR(20)')]:
         if not col_exists(inspector, 'formas_pago', col):
             run(conn, f"ALTER TABLE formas_pago ADD COLUMN {col} {tipo}", f"ADD COLUMN {col}")
         else:
             skip(f"formas_pago.{col}")
+    # Categoria a partir del nombre (mismo criterio que FormaPago.categoria_por_nombre)
+    run(conn, """
+        UPDATE formas_pago SET categoria = CASE
+            WHEN lower(nombre) LIKE '%efectivo%' THEN 'efectivo'
+            WHEN lower(nombre) LIKE '%tarjeta%' OR lower(nombre) LIKE '%débito%'
+                 OR lower(nombre) LIKE '%crédito%' THEN 'tarjeta'
+            WHEN lower(nombre) LIKE '%transferencia%' THEN 'transferencia'
+            WHEN lower(nombre) LIKE '%cheque%' THEN 'cheque'
+            ELSE 'otros'
+        END
+        WHERE categoria IS NULL
+    """, "formas_pago.categoria completada desde el nombre")
+    if not index_exists(inspector, 'formas_pago', 'ix_formas_pago_categoria'):
+        run(conn, "CREATE INDEX ix_formas_pago_categoria ON formas_pago (categoria)",
+            "CREATE INDEX ix_formas_pago_categoria")
+    else:
+        skip("ix_formas_pago_categoria")
 
 
 def migrar_tipos_servicio(conn, inspector):
@@ -258,6 +276,296 @@ def migrar_pagos_nota_debito(conn, inspector):
     """, "CREATE TABLE pagos_nota_debito")
 
 
+def migrar_aperturas_caja(conn, inspector):
+    print("\n--- aperturas_caja ---")
+    if not tabla_existe(inspector, 'aperturas_caja'):
+        skip("tabla aperturas_caja no existe aun, se creara con create_all")
+        return
+    agregadas = False
+    for col in ['acumulado_efectivo', 'acumulado_tarjeta', 'acumulado_transferencia',
+                'acumulado_cheque', 'acumulado_egresos']:
+        if not col_exists(inspector, 'aperturas_caja', col):
+            run(conn, f"ALTER TABLE aperturas_caja ADD COLUMN {col} NUMERIC(12,2) DEFAULT 0",
+                f"ADD COLUMN {col}")
+            agregadas = True
+        else:
+            skip(f"aperturas_caja.{col}")
+    if agregadas:
+        # Cargar los acumulados de las aperturas existentes desde ventas, pagos y egresos
+        from reconciliar_caja import reconciliar_aperturas
+        diferencias = reconciliar_aperturas(todas=True, corregir=True)
+        ok(f"acumulados de caja recalculados ({len(diferencias)} valores)")
+
+
+def migrar_secuencias_factura(conn, inspector):
+    print("\n--- secuencias_factura ---")
+    if tabla_existe(inspector, 'cajas'):
+        if not col_exists(inspector, 'cajas', 'numero_expedicion'):
+            run(conn, "ALTER TABLE cajas ADD COLUMN numero_expedicion VARCHAR(10)",
+                "ADD COLUMN cajas.numero_expedicion")
+        else:
+            skip("cajas.numero_expedicion")
+    if not tabla_existe(inspector, 'secuencias_factura') or not tabla_existe(inspector, 'configuracion_empresa'):
+        skip("tablas secuencias_factura/configuracion_empresa no existen aun")
+        return
+    # La secuencia del punto de expedicion de la empresa continua desde numero_factura_actual
+    run(conn, """
+        INSERT INTO secuencias_factura (numero_establecimiento, numero_expedicion, proximo, numero_hasta)
+        SELECT COALESCE(c.numero_establecimiento, '001'), COALESCE(c.numero_expedicion, '001'),
+               COALESCE(c.numero_factura_actual, 1), COALESCE(c.numero_factura_hasta, 99999)
+        FROM configuracion_empresa c
+        WHERE NOT EXISTS (
+            SELECT 1 FROM secuencias_factura s
+            WHERE s.numero_establecimiento = COALESCE(c.numero_establecimiento, '001')
+              AND s.numero_expedicion = COALESCE(c.numero_expedicion, '001')
+        )
+    """, "secuencia inicial desde configuracion_empresa")
+
+
+def migrar_ventas_saldo(conn, inspector):
+    print("\n--- ventas (monto_pagado / saldo) ---")
+    if not tabla_existe(inspector, 'ventas'):
+        skip("tabla ventas no existe aun, se creara con create_all")
+        return
+    agregadas = False
+    for col in ['monto_pagado', 'saldo']:
+        if not col_exists(inspector, 'ventas', col):
+            run(conn, f"ALTER TABLE ventas ADD COLUMN {col} NUMERIC(12,2) DEFAULT 0", f"ADD COLUMN {col}")
+            agregadas = True
+        else:
+            skip(f"ventas.{col}")
+    if agregadas:
+        # Backfill desde los pagos confirmados
+        run(conn, """
+            UPDATE ventas SET
+                monto_pagado = (SELECT COALESCE(SUM(p.monto), 0) FROM pagos p
+                                WHERE p.venta_id = ventas.id AND p.estado = 'confirmado'),
+                saldo = COALESCE(total, 0) - (SELECT COALESCE(SUM(p.monto), 0) FROM pagos p
+                                              WHERE p.venta_id = ventas.id AND p.estado = 'confirmado')
+        """, "ventas.monto_pagado / saldo calculados desde pagos")
+    for nombre, columnas in [('ix_ventas_saldo', 'saldo'), ('ix_ventas_cliente_saldo', 'cliente_id, saldo')]:
+        if not index_exists(inspector, 'ventas', nombre):
+            run(conn, f"CREATE INDEX {nombre} ON ventas ({columnas})", f"CREATE INDEX {nombre}")
+        else:
+            skip(nombre)
+
+
+def migrar_ventas_desglose_iva(conn, inspector):
+    print("\n--- ventas (desglose de IVA) ---")
+    if not tabla_existe(inspector, 'ventas'):
+        skip("tabla ventas no existe aun, se creara con create_all")
+        return
+    agregadas = False
+    for col in ['gravada_10', 'iva_10', 'gravada_5', 'iva_5', 'exenta']:
+        if not col_exists(inspector, 'ventas', col):
+            run(conn, f"ALTER TABLE ventas ADD COLUMN {col} NUMERIC(12,2) DEFAULT 0", f"ADD COLUMN {col}")
+            agregadas = True
+        else:
+            skip(f"ventas.{col}")
+    if agregadas:
+        # Ventas existentes: calcular desde los detalles (mismo criterio que Venta.calcular_desglose_iva)
+        importe = """(SELECT COALESCE(SUM(d.cantidad * d.precio_unitario), 0)
+                      FROM venta_detalles d LEFT JOIN productos p ON p.id = d.producto_id
+                      WHERE d.venta_id = ventas.id AND {condicion})"""
+        run(conn, f"""
+            UPDATE ventas SET
+                gravada_10 = {importe.format(condicion="(d.producto_id IS NULL OR COALESCE(p.tipo_iva, '10') = '10')")},
+                gravada_5 = {importe.format(condicion="d.producto_id IS NOT NULL AND p.tipo_iva = '5'")},
+                exenta = {importe.format(condicion="d.producto_id IS NOT NULL AND p.tipo_iva NOT IN ('10', '5')")}
+        """, "gravadas y exentas calculadas desde venta_detalles")
+        run(conn, "UPDATE ventas SET iva_10 = ROUND(gravada_10 / 11, 2), iva_5 = ROUND(gravada_5 / 21, 2)",
+            "IVA 10% y 5% calculados")
+    # Ventas de servicios: el desglose guardado como [DESGLOSE_IVA]{json} en observaciones
+    import json
+    from decimal import Decimal
+    from sqlalchemy import bindparam, Numeric
+    actualizar = text("""
+        UPDATE ventas SET gravada_10 = :gravada_10, iva_10 = :iva_10, gravada_5 = :gravada_5,
+                          iva_5 = :iva_5, exenta = :exenta, observaciones = :observaciones
+        WHERE id = :id
+    """).bindparams(*[bindparam(col, type_=Numeric(12, 2))
+                      for col in ['gravada_10', 'iva_10', 'gravada_5', 'iva_5', 'exenta']])
+    filas = conn.execute(text(
+        "SELECT id, observaciones FROM ventas WHERE observaciones LIKE '%[DESGLOSE_IVA]%'"
+    )).fetchall()
+    convertidas = 0
+    for venta_id, observaciones in filas:
+        texto, _, blob = observaciones.partition('[DESGLOSE_IVA]')
+        try:
+            desglose = json.loads(blob.strip())
+        except ValueError:
+            warn(f"venta {venta_id}: desglose de IVA ilegible, se omite")
+            continue
+        iva_10 = Decimal(str(desglose.get('iva_10') or 0))
+        iva_5 = Decimal(str(desglose.get('iva_5') or 0))
+        conn.execute(actualizar, {
+            'id': venta_id,
+            'gravada_10': round(iva_10 * 11, 2), 'iva_10': round(iva_10, 2),
+            'gravada_5': round(iva_5 * 21, 2), 'iva_5': round(iva_5, 2),
+            'exenta': round(Decimal(str(desglose.get('exentas') or 0)), 2),
+            'observaciones': texto.rstrip() or None,
+        })
+        convertidas += 1
+    conn.commit()
+    if filas:
+        ok(f"{convertidas} desgloses [DESGLOSE_IVA] migrados a columnas")
+    else:
+        ok("no quedan desgloses [DESGLOSE_IVA] en observaciones")
+
+
+def migrar_ventas_diarias(conn, inspector):
+    print("\n--- ventas_diarias (resumen diario de ventas) ---")
+    if not tabla_existe(inspector, 'ventas_diarias'):
+        warn("tabla ventas_diarias no existe (create_all no la creo)")
+        return
+    con_datos = conn.execute(text("SELECT COUNT(*) FROM ventas_diarias")).scalar()
+    conn.commit()
+    if con_datos:
+        skip("ventas_diarias ya tiene datos")
+        return
+    # Primera vez: cargar el historial completo desde ventas y pagos
+    from reconstruir_ventas_diarias import reconstruir_ventas_diarias
+    filas = reconstruir_ventas_diarias()
+    ok(f"ventas_diarias cargado desde el historial ({filas} filas)")
+
+
+def migrar_indices_ranking_ventas(conn, inspector):
+    print("\n--- indices para ranking de productos ---")
+    indices = [
+        ('ventas', 'ix_ventas_estado_fecha', 'estado, fecha_venta'),
+        ('venta_detalles', 'ix_venta_detalles_venta', 'venta_id'),
+        ('venta_detalles', 'ix_venta_detalles_producto', 'producto_id'),
+    ]
+    for tabla, nombre, columnas in indices:
+        if not tabla_existe(inspector, tabla):
+            skip(f"tabla {tabla} no existe aun, se creara con create_all")
+        elif not index_exists(inspector, tabla, nombre):
+            run(conn, f"CREATE INDEX {nombre} ON {tabla} ({columnas})", f"CREATE INDEX {nombre}")
+        else:
+            skip(nombre)
+
+
+def migrar_indices_estado_caja(conn, inspector):
+    print("\n--- indices para el estado de caja ---")
+    nombre = 'ix_ventas_apertura_estado_fecha'
+    if not tabla_existe(inspector, 'ventas'):
+        skip("tabla ventas no existe aun, se creara con create_all")
+    elif not index_exists(inspector, 'ventas', nombre):
+        run(conn, f"CREATE INDEX {nombre} ON ventas (apertura_caja_id, estado, fecha_venta)",
+            f"CREATE INDEX {nombre}")
+    else:
+        skip(nombre)
+
+
+def migrar_fecha_modificacion_reportes(conn, inspector):
+    print("\n--- fecha_modificacion de las tablas de reportes (sello del cache de reportes) ---")
+    # Las filas existentes quedan en NULL: el sello usa MAX(fecha_modificacion), que las ignora
+    tablas = ['proveedores', 'reclamos', 'presupuestos', 'solicitudes_servicio', 'compras', 'ordenes_servicio',
+              'tipos_servicio', 'usuarios', 'ventas', 'venta_detalles', 'categorias', 'ventas_diarias', 'cajas']
+    for tabla in tablas:
+        if not tabla_existe(inspector, tabla):
+            skip(f"tabla {tabla} no existe aun, se creara con create_all")
+            continue
+        if not col_exists(inspector, tabla, 'fecha_modificacion'):
+            run(conn, f"ALTER TABLE {tabla} ADD COLUMN fecha_modificacion TIMESTAMP",
+                f"ADD COLUMN {tabla}.fecha_modificacion")
+        else:
+            skip(f"{tabla}.fecha_modificacion")
+        nombre = f"ix_{tabla}_fecha_modificacion"
+        if not index_exists(inspector, tabla, nombre):
+            run(conn, f"CREATE INDEX {nombre} ON {tabla} (fecha_modificacion)", f"CREATE INDEX {nombre}")
+        else:
+            skip(nombre)
+    # El contador por tabla que usaba antes el cache ya no se lee ni se escribe
+    if tabla_existe(inspector, 'versiones_tablas'):
+        run(conn, "DROP TABLE versiones_tablas", "DROP TABLE versiones_tablas")
+
+
+def migrar_indices_busqueda_productos(conn, inspector):
+    print("\n--- indices de trigramas para la busqueda de productos ---")
+    if conn.dialect.name != 'postgresql':
+        skip("solo PostgreSQL (en SQLite la busqueda no usa indices)")
+        return
+    run(conn, "CREATE EXTENSION IF NOT EXISTS pg_trgm", "CREATE EXTENSION pg_trgm")
+    run(conn, "CREATE EXTENSION IF NOT EXISTS unaccent", "CREATE EXTENSION unaccent")
+    # unaccent() no es IMMUTABLE (depende del diccionario por defecto): se envuelve
+    # fijando el diccionario para poder indexar la expresion
+    run(conn, """
+        CREATE OR REPLACE FUNCTION normalizar_busqueda(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+        $$ SELECT lower(public.unaccent('public.unaccent'::regdictionary, $1)) $$
+    """, "FUNCTION normalizar_busqueda(text)")
+    indices = [
+        ('ix_productos_nombre_trgm', 'normalizar_busqueda(nombre)'),
+        ('ix_productos_codigo_trgm', 'lower(codigo)'),
+    ]
+    for nombre, expresion in indices:
+        if not index_exists(inspector, 'productos', nombre):
+            run(conn, f"CREATE INDEX {nombre} ON productos USING gin ({expresion} gin_trgm_ops)",
+                f"CREATE INDEX {nombre}")
+        else:
+            skip(nombre)
+
+
+def migrar_fecha_modificacion_catalogo(conn, inspector):
+    print("\n--- fecha_modificacion de productos y clientes (refresco del catalogo en memoria) ---")
+    for tabla in ['productos', 'clientes']:
+        if not tabla_existe(inspector, tabla):
+            skip(f"tabla {tabla} no existe aun, se creara con create_all")
+            continue
+        if not col_exists(inspector, tabla, 'fecha_modificacion'):
+            run(conn, f"ALTER TABLE {tabla} ADD COLUMN fecha_modificacion TIMESTAMP",
+                f"ADD COLUMN {tabla}.fecha_modificacion")
+            run(conn, f"UPDATE {tabla} SET fecha_modificacion = COALESCE(fecha_registro, CURRENT_TIMESTAMP)",
+                f"{tabla}.fecha_modificacion desde fecha_registro")
+        else:
+            skip(f"{tabla}.fecha_modificacion")
+        nombre = f"ix_{tabla}_fecha_modificacion"
+        if not index_exists(inspector, tabla, nombre):
+            run(conn, f"CREATE INDEX {nombre} ON {tabla} (fecha_modificacion)", f"CREATE INDEX {nombre}")
+        else:
+            skip(nombre)
+    if conn.dialect.name != 'postgresql':
+        return
+    # El ORM la actualiza (onupdate); el trigger cubre ademas los UPDATE/INSERT hechos con SQL directo
+    run(conn, """
+        CREATE OR REPLACE FUNCTION tocar_fecha_modificacion() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.fecha_modificacion := timezone('utc', clock_timestamp());
+            RETURN NEW;
+        END $$
+    """, "FUNCTION tocar_fecha_modificacion()")
+    for tabla in ['productos', 'clientes']:
+        if tabla_existe(inspector, tabla):
+            run(conn, f"DROP TRIGGER IF EXISTS tr_{tabla}_fecha_modificacion ON {tabla}",
+                f"DROP TRIGGER tr_{tabla}_fecha_modificacion")
+            run(conn, f"""
+                CREATE TRIGGER tr_{tabla}_fecha_modificacion BEFORE INSERT OR UPDATE ON {tabla}
+                FOR EACH ROW EXECUTE FUNCTION tocar_fecha_modificacion()
+            """, f"CREATE TRIGGER tr_{tabla}_fecha_modificacion")
+
+
+def migrar_secuencias_documento(conn, inspector):
+    print("\n--- secuencias_documento ---")
+    if not tabla_existe(inspector, 'secuencias_documento'):
+        warn("tabla secuencias_documento no existe (create_all no la creo)")
+        return
+    from app.utils.numeracion import inicializar_series
+    # Cada serie continua desde el numero mas alto ya usado con su prefijo
+    try:
+        creadas = inicializar_series(conn)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        warn(f"series de numeracion => {e}")
+        return
+    for serie, proximo in creadas:
+        ok(f"serie {serie} desde {proximo}")
+    if not creadas:
+        skip("series de numeracion")
+
+
 # -----------------------------------------------------------------------
 # Main
 # -----------------------------------------------------------------------
@@ -297,6 +605,17 @@ def main():
             migrar_notas_debito_compra(conn, inspector)
             migrar_presupuestos_proveedor(conn, inspector)
             migrar_pagos_nota_debito(conn, inspector)
+            migrar_aperturas_caja(conn, inspector)
+            migrar_secuencias_factura(conn, inspector)
+            migrar_ventas_saldo(conn, inspector)
+            migrar_ventas_desglose_iva(conn, inspector)
+            migrar_ventas_diarias(conn, inspector)
+            migrar_indices_ranking_ventas(conn, inspector)
+            migrar_indices_estado_caja(conn, inspector)
+            migrar_fecha_modificacion_reportes(conn, inspector)
+            migrar_indices_busqueda_productos(conn, inspector)
+            migrar_fecha_modificacion_catalogo(conn, inspector)
+            migrar_secuencias_documento(conn, inspector)
 
         # --- PASO 3: reporte final ---
         inspector = db.inspect(db.engine)
@@ -0,0 +1,102 @@
+"""
+Benchmark del catálogo de productos en memoria (app.utils.catalogo_memoria):
+memoria ocupada cada 100.000 productos, tiempo de armado y latencia de
+autocompletado para términos de una tecla, palabras, códigos y varias
+palabras, más el costo de un refresco por partes. Las filas son sintéticas
+(las mismas que benchmark_busqueda_productos.py), sin base.
+
+Como referencia se mide la memoria de los mismos productos como objetos
+Producto del ORM (lo que ocuparía cachear las filas ya hidratadas).
+
+Ejecutar con:
+    python tests/benchmark_catalogo_memoria.py                    # 200.000 productos
+    python tests/benchmark_catalogo_memoria.py --productos 1000000
+    python tests/benchmark_catalogo_memoria.py --sin-orm          # no medir la referencia
+"""
+import argparse
+import gc
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from config import TestingConfig
+from benchmark_busqueda_productos import catalogo, TERMINOS
+
+
+def filas(cantidad):
+    ahora = datetime(2026, 1, 1)
+    return [(i, f['codigo'], f['nombre'], True, ahora, Decimal('15000.00'), Decimal('9000.00'), i % 50, '10',
+             'unidad', 'juguete')
+            for i, f in enumerate(catalogo(cantidad), start=1)]
+
+
+def medir_memoria(armar):
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    objeto = armar()
+    segundos = time.perf_counter() - inicio
+    gc.collect()
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return objeto, memoria, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--productos', type=int, default=200_000)
+    parser.add_argument('--repeticiones', type=int, default=200)
+    parser.add_argument('--sin-orm', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        from app.models import Producto
+        from app.utils.catalogo_memoria import CatalogoProductos
+
+        datos = filas(args.productos)
+        cat, memoria, segundos = medir_memoria(lambda: CatalogoProductos(datos))
+        por_100k = memoria / args.productos * 100_000 / 2**20
+        print(f"catálogo: {len(cat):,} productos, {memoria / 2**20:.1f} MB ({por_100k:.1f} MB cada 100.000, "
+              f"{memoria / args.productos:.0f} bytes por producto), armado en {segundos:.2f} s")
+
+        if not args.sin_orm:
+            columnas = [c.key for c in CatalogoProductos.COLUMNAS]
+            objetos, memoria_orm, _ = medir_memoria(
+                lambda: [Producto(**dict(zip(columnas, fila))) for fila in datos])
+            print(f"referencia ORM: {memoria_orm / 2**20:.1f} MB "
+                  f"({memoria_orm / args.productos * 100_000 / 2**20:.1f} MB cada 100.000)")
+            del objetos
+
+        print(f"{'término':<32} {'ms (mediana)':>13} {'ms (máx)':>9}  primer resultado")
+        for descripcion, termino in TERMINOS:
+            tiempos = []
+            for _ in range(args.repeticiones):
+                inicio = time.perf_counter()
+                resultado = cat.autocompletar(termino)
+                tiempos.append(time.perf_counter() - inicio)
+            primero = resultado[0]['label'] if resultado else '(ninguno)'
+            print(f"{descripcion + ' ' + repr(termino):<32} {statistics.median(tiempos) * 1000:>13.3f} "
+                  f"{max(tiempos) * 1000:>9.3f}  {primero}")
+
+        # Refresco: 200 productos con stock cambiado y 20 renombrados
+        cambios = [fila[:7] + (fila[7] + 1,) + fila[8:] for fila in datos[:200]]
+        cambios += [fila[:2] + (fila[2] + ' edición especial',) + fila[3:] for fila in datos[200:220]]
+        inicio = time.perf_counter()
+        cat.aplicar(cambios)
+        print(f"refresco de {len(cambios)} filas (20 renombradas): {(time.perf_counter() - inicio) * 1000:.1f} ms, "
+              f"segmento adicional de {len(cat.adicional)} filas")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark del cubo de ventas (app.utils.cubo_ventas) sobre filas sintéticas:
+tiempo de cada consulta vectorizada y, como referencia, la misma agrupación
+recorriendo las filas en Python (lo que costaría agrupar objetos o tuplas
+leídos de la base). Las columnas se arman directamente con NumPy, sin base.
+
+Ejecutar con:
+    python tests/benchmark_cubo_ventas.py                  # 3 millones de filas
+    python tests/benchmark_cubo_ventas.py --filas 10000000
+    python tests/benchmark_cubo_ventas.py --sin-python     # no medir la referencia en Python
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from app import create_app
+from config import TestingConfig
+
+PRODUCTOS, CATEGORIAS, VENDEDORES, CAJAS = 5000, 60, 25, 6
+TIPOS_CLIENTE = ('particular', 'empresa', 'gobierno')
+FORMAS_PAGO = ('efectivo', 'tarjeta_credito', 'tarjeta_debito', 'transferencia', 'cheque', 'mixto', 'sin_pago')
+DESDE = date(2024, 1, 1)
+DIAS = 730
+
+
+def armar_cubo(filas, semilla=1):
+    """Cubo con `filas` líneas sintéticas de ~filas/3 ventas repartidas en dos años"""
+    from app.utils.cubo_ventas import CuboVentas, Diccionario, DIMENSIONES, _EPOCA
+
+    rng = np.random.default_rng(semilla)
+    claves = {
+        'producto': list(range(1, PRODUCTOS + 1)),
+        'categoria': list(range(1, CATEGORIAS + 1)),
+        'tipo_cliente': list(TIPOS_CLIENTE),
+        'vendedor': list(range(1, VENDEDORES + 1)),
+        'caja': list(range(1, CAJAS + 1)),
+        'forma_pago': list(FORMAS_PAGO),
+    }
+    diccionarios = {}
+    for dimension in DIMENSIONES:
+        diccionario = Diccionario()
+        for clave in claves[dimension]:
+            diccionario.nombres[diccionario.codigo(clave)] = f'{dimension} {clave}'
+        diccionarios[dimension] = diccionario
+
+    ventas = filas // 3 + 1
+    venta = np.sort(rng.integers(1, ventas + 1, filas))
+    # Los atributos de la venta (día, cliente, vendedor, caja, forma de pago) son los de su cabecera
+    por_venta = lambda n: rng.integers(0, n, ventas + 1)[venta]
+    producto = (rng.zipf(1.3, filas) - 1) % PRODUCTOS  # pocos productos concentran las ventas
+    columnas = {
+        'venta': venta,
+        'dia': ((DESDE - _EPOCA).days + np.sort(rng.integers(0, DIAS, ventas + 1))[venta]),
+        'producto': producto,
+        'categoria': producto % CATEGORIAS,
+        'tipo_cliente': por_venta(len(TIPOS_CLIENTE)),
+        'vendedor': por_venta(VENDEDORES),
+        'caja': por_venta(CAJAS),
+        'forma_pago': por_venta(len(FORMAS_PAGO)),
+        'monto': rng.integers(1, 500, filas) * 1000,
+        'cantidad': rng.integers(1, 6, filas).astype(np.float64),
+    }
+    return CuboVentas(columnas, diccionarios, int(ventas))
+
+
+def consultas():
+    return [
+        ('Total por categoría', dict(por=['categoria'])),
+        ('Mes x forma de pago', dict(por=['mes', 'forma_pago'], medidas=['total', 'cantidad'])),
+        ('Top 20 productos de un vendedor en un trimestre',
+         dict(por=['producto'], filtros={'vendedor': [3]}, desde=date(2025, 4, 1), hasta=date(2025, 6, 30),
+              limite=20)),
+        ('Día x caja x tipo de cliente', dict(por=['dia', 'caja', 'tipo_cliente'])),
+        ('Ventas distintas por semana y vendedor', dict(por=['semana', 'vendedor'], medidas=['ventas'])),
+        ('Producto x mes (espacio de claves grande)', dict(por=['producto', 'mes', 'caja'])),
+    ]
+
+
+def medir(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos)
+
+
+def por_categoria_python(cubo):
+    """Referencia: la agrupación 'Total por categoría' recorriendo tuplas en Python"""
+    filas = zip(cubo.columnas['categoria'].tolist(), cubo.columnas['monto'].tolist())
+    totales = defaultdict(int)
+    for categoria, monto in filas:
+        totales[categoria] += monto
+    return totales
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filas', type=int, default=3_000_000)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--sin-python', action='store_true')
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        inicio = time.perf_counter()
+        cubo = armar_cubo(args.filas)
+        print(f"cubo: {len(cubo):,} filas, {cubo.nbytes / 2**20:.1f} MB "
+              f"({cubo.nbytes / len(cubo):.0f} bytes por fila), armado en {time.perf_counter() - inicio:.2f} s")
+
+        print(f"{'consulta':<46} {'grupos':>8} {'ms':>9}")
+        for nombre, parametros in consultas():
+            resultado = cubo.consultar(**parametros)  # calentamiento
+            segundos = medir(lambda: cubo.consultar(**parametros), args.repeticiones)
+            print(f"{nombre:<46} {resultado['grupos']:>8,} {segundos * 1000:>9.1f}")
+
+        if not args.sin_python:
+            numpy_s = medir(lambda: cubo.consultar(por=['categoria']), args.repeticiones)
+            python_s = medir(lambda: por_categoria_python(cubo), 1)
+            esperado = por_categoria_python(cubo)
+            obtenido = {f['categoria']['clave'] - 1: f['total']
+                        for f in cubo.consultar(por=['categoria'])['filas']}
+            assert obtenido == dict(esperado), 'el cubo y la referencia no coinciden'
+            print(f"Total por categoría en Python: {python_s * 1000:.0f} ms "
+                  f"(cubo x{python_s / numpy_s:.0f} más rápido)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark del costo de preparación de cada reporte PDF: armar la hoja de
+estilos, los ParagraphStyle, el TableStyle y el membrete (con su consulta a
+configuracion_empresa) en cada request, contra los estilos compartidos de
+app.utils.estilos_pdf (ESTILOS, estilo_tabla y membrete cacheado).
+
+Ejecutar con:
+    python tests/benchmark_estilos_pdf.py
+    python tests/benchmark_estilos_pdf.py --repeticiones 5000
+"""
+import argparse
+import os
+import sys
+import timeit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import Paragraph, Spacer, TableStyle
+
+from app import create_app, db
+from config import TestingConfig
+
+
+def preparar_antes():
+    """Lo que hacía cada ruta antes: estilos, tabla y membrete desde cero"""
+    from app.models import ConfiguracionEmpresa
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=18, alignment=1, spaceAfter=16)
+    empresa = ConfiguracionEmpresa.query.first()
+    nombre = empresa.nombre_empresa if empresa else 'JUGUETERÍA'
+    ruc = empresa.ruc if empresa else 'N/A'
+    direccion = empresa.direccion if empresa else ''
+    elements = [
+        Paragraph(f"<b>{nombre}</b>", styles['Title']),
+        Paragraph("El Mundo Feliz", styles['Normal']),
+        Paragraph(f"RUC: {ruc}", styles['Normal']),
+        Paragraph(direccion, styles['Normal']),
+        Spacer(1, 12),
+        Paragraph("Ventas por Período", title_style),
+    ]
+    estilo = TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 13),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor('#f8f9fa')),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ])
+    return elements, estilo
+
+
+def preparar_despues():
+    from app.utils.estilos_pdf import ESTILOS, estilo_tabla, membrete
+
+    elements = membrete()
+    elements.append(Paragraph("Ventas por Período", ESTILOS['TituloReporte']))
+    return elements, estilo_tabla('encabezado', '#2c3e50')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeticiones', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        from app.models import ConfiguracionEmpresa
+
+        db.create_all()
+        config = ConfiguracionEmpresa.get_config()
+        config.direccion = 'Av. Principal 123'
+        db.session.commit()
+
+        print(f"{'armado':<10} {'total (s)':>10} {'por reporte (µs)':>17}")
+        resultados = {}
+        for nombre, funcion in (('antes', preparar_antes), ('después', preparar_despues)):
+            funcion()  # calentamiento (llena el cache del membrete)
+            segundos = timeit.timeit(funcion, number=args.repeticiones)
+            resultados[nombre] = segundos
+            print(f"{nombre:<10} {segundos:>10.3f} {segundos / args.repeticiones * 1e6:>17.1f}")
+        print(f"aceleración: x{resultados['antes'] / resultados['después']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Benchmark del reporte de ventas en PDF: armado en memoria (una sola Table
+sobre todas las ventas cargadas como objetos, en BytesIO) contra el armado
+en streaming (yield_per + TablaPorPartes + archivo temporal).
+Cada medición corre en un proceso aparte para que el pico de memoria (RSS)
+sea el de ese armado solamente.
+
+Ejecutar con:
+    python tests/benchmark_reporte_pdf.py                       # 10k, 100k y 1M filas
+    python tests/benchmark_reporte_pdf.py --filas 10000,100000
+    python tests/benchmark_reporte_pdf.py --legado-hasta 100000 # no medir el armado en memoria por encima de 100k
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from config import TestingConfig
+
+
+def setup_app(ruta_db):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{ruta_db}'
+
+    return create_app(BenchConfig)
+
+
+def poblar(ruta_db, filas):
+    """Crea clientes, un vendedor y `filas` ventas completadas con inserts por lote"""
+    from app.models import Usuario, Cliente, Venta
+    app = setup_app(ruta_db)
+    with app.app_context():
+        db.create_all()
+        usuario = Usuario(username='bench', email='bench@example.com', nombre='Vendedor', apellido='Bench', rol='admin')
+        usuario.set_password('bench')
+        db.session.add(usuario)
+        db.session.flush()
+        db.session.execute(db.insert(Cliente), [
+            {'tipo_documento': 'CI', 'numero_documento': str(1000 + i), 'nombre': f'Cliente {i}',
+             'tipo_cliente': 'particular'} for i in range(500)
+        ])
+        inicio = datetime(2024, 1, 1)
+        lote = []
+        for i in range(filas):
+            lote.append({
+                'numero_factura': f'001-001-{i + 1:07d}', 'tipo_venta': 'producto',
+                'cliente_id': i % 500 + 1, 'vendedor_id': usuario.id, 'total': 10000 + i % 90000,
+                'estado': 'completada', 'fecha_venta': inicio + timedelta(seconds=i * 30),
+            })
+            if len(lote) == 10000:
+                db.session.execute(db.insert(Venta), lote)
+                lote = []
+        if lote:
+            db.session.execute(db.insert(Venta), lote)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def armar_en_memoria(ruta_salida):
+    """El armado anterior de reportes.ventas_pdf"""
+    from io import BytesIO
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table
+    from app.models import Venta
+    from app.utils.pdf_streaming import estilo_tabla
+
+    ventas = Venta.query.filter(Venta.estado == 'completada').all()
+    data = [['Factura', 'Fecha', 'Cliente', 'Vendedor', 'Total']]
+    for v in ventas:
+        data.append([
+            v.numero_factura, v.fecha_venta.strftime('%d/%m/%Y'),
+            v.cliente.nombre[:30], v.vendedor.nombre_completo[:30], f"Gs. {v.total:,.0f}"
+        ])
+    data.append(['', '', '', 'TOTAL', f"Gs. {sum(v.total for v in ventas):,.0f}"])
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc.build([Table(data, colWidths=[100, 70, 130, 130, 90], style=estilo_tabla(con_pie=True), repeatRows=1)])
+    with open(ruta_salida, 'wb') as archivo:
+        archivo.write(buffer.getvalue())
+
+
+def armar_en_streaming(ruta_salida):
+    from app.models import Venta, Cliente, Usuario
+    from app.utils.pdf_streaming import ReportePDF
+
+    filas = db.session.query(
+        Venta.numero_factura, Venta.fecha_venta, Venta.total, Cliente.nombre.label('cliente'),
+        (Usuario.nombre + ' ' + Usuario.apellido).label('vendedor')
+    ).outerjoin(Cliente, Cliente.id == Venta.cliente_id).outerjoin(
+        Usuario, Usuario.id == Venta.vendedor_id
+    ).filter(Venta.estado == 'completada').order_by(Venta.fecha_venta, Venta.id).yield_per(1000)
+    total = [0]
+
+    def formatear():
+        for v in filas:
+            total[0] += v.total
+            yield [v.numero_factura, v.fecha_venta.strftime('%d/%m/%Y'), v.cliente[:30],
+                   v.vendedor[:30], f"Gs. {v.total:,.0f}"]
+
+    reporte = ReportePDF('Reporte de Ventas', 'ventas.pdf', ['Factura', 'Fecha', 'Cliente', 'Vendedor', 'Total'],
+                         [100, 70, 130, 130, 90])
+    reporte.generar(formatear(), ruta_salida, pie=lambda: ['', '', '', 'TOTAL', f"Gs. {total[0]:,.0f}"])
+
+
+def medir(modo, ruta_db):
+    """Se ejecuta en un proceso hijo: arma el PDF e imprime segundos, pico RSS en MB y tamaño"""
+    app = setup_app(ruta_db)
+    ruta_salida = ruta_db + f'.{modo}.pdf'
+    with app.app_context():
+        inicio = time.perf_counter()
+        (armar_en_memoria if modo == 'memoria' else armar_en_streaming)(ruta_salida)
+        segundos = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+    print(f"{segundos:.2f} {pico_mb:.1f} {os.path.getsize(ruta_salida)}")
+    os.remove(ruta_salida)
+
+
+def ejecutar_medicion(modo, ruta_db):
+    salida = subprocess.run([sys.executable, __file__, '--medir', modo, ruta_db],
+                            capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+    segundos, pico_mb, tamano = salida.split()
+    return float(segundos), float(pico_mb), int(tamano)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--filas', default='10000,100000,1000000')
+    parser.add_argument('--legado-hasta', type=int, default=None,
+                        help='no medir el armado en memoria por encima de esta cantidad de filas')
+    parser.add_argument('--medir', nargs=2, metavar=('MODO', 'RUTA_DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.medir:
+        medir(*args.medir)
+        return
+
+    print(f"{'filas':>9} | {'modo':>9} | {'segundos':>9} | {'pico RSS MB':>11} | {'PDF KB':>9}")
+    for filas in [int(n) for n in args.filas.split(',')]:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta_db = os.path.join(carpeta, 'bench.db')
+            poblar(ruta_db, filas)
+            for modo in ('memoria', 'streaming'):
+                if modo == 'memoria' and args.legado_hasta and filas > args.legado_hasta:
+                    print(f"{filas:>9} | {modo:>9} | {'(omitido)':>9} |")
+                    continue
+                segundos, pico_mb, tamano = ejecutar_medicion(modo, ruta_db)
+                print(f"{filas:>9} | {modo:>9} | {segundos:>9.2f} | {pico_mb:>11.1f} | {tamano / 1024:>9.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Prueba de los acumulados de AperturaCaja mantenidos por las rutas de ventas.
+Abre una caja y, por HTTP, registra ventas con pagos mixtos y vuelto
+(/ventas/crear), anula una venta, cobra una venta a crédito con un pago
+posterior (/ventas/registrar-pago) y factura una venta pendiente
+(/ventas/<id>/facturar). Verifica que reconciliar_aperturas() no encuentra
+diferencias contra el recalculo desde pagos, y que efectivo_disponible
+coincide con el efectivo esperado que guarda el arqueo al cerrar la caja
+(/caja/cerrar). Base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_acumulados_caja.py
+"""
+import json
+import os
+import sys
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import AperturaCaja, Producto, Venta
+from manual_test_totales_caja import setup_app, seed_base
+from reconciliar_caja import reconciliar_aperturas
+
+MONTO_INICIAL = 100000
+
+
+def crear_venta(client, producto_id, total, pagos, dias_credito=0):
+    """POST /ventas/crear con una línea de producto; devuelve la venta creada"""
+    detalles = [{'tipo_item': 'producto', 'producto_id': producto_id, 'descripcion': 'Juguete',
+                 'cantidad': 1, 'precio_unitario': total, 'subtotal': total, 'total': total}]
+    respuesta = client.post('/ventas/crear', data={
+        'tipo_venta': 'producto', 'cliente_id': 1, 'subtotal': total, 'iva': 0, 'total': total,
+        'dias_credito': dias_credito, 'detalles_json': json.dumps(detalles),
+        'pagos_json': json.dumps([{'forma_pago': codigo, 'monto': monto} for codigo, monto in pagos]),
+    })
+    assert respuesta.status_code == 302 and '/ventas/crear' not in respuesta.location, respuesta.location
+    return int(respuesta.location.rstrip('/').rsplit('/', 1)[-1])
+
+
+def acumulados(app):
+    with app.app_context():
+        apertura = AperturaCaja.query.filter_by(estado='abierto').one()
+        return apertura.id, apertura.totales_acumulados(), apertura.efectivo_disponible
+
+
+def sin_diferencias(app, descripcion):
+    with app.app_context():
+        diferencias = reconciliar_aperturas()
+    assert diferencias == [], f"{descripcion}: {diferencias}"
+    print(f"[OK] {descripcion}: acumulados iguales al recalculo")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        _, _, caja, formas = seed_base()
+        producto = Producto(codigo='JUG-1', nombre='Juguete', tipo_producto='producto',
+                            precio_compra=10000, precio_venta=80000, stock_actual=50)
+        db.session.add(producto)
+        db.session.commit()
+        caja_id, producto_id = caja.id, producto.id
+        ids_formas = {codigo: forma.id for codigo, forma in formas.items()}
+
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    assert client.post('/caja/abrir', data={'caja_id': caja_id, 'monto_inicial': MONTO_INICIAL}).status_code == 302
+
+    # Efectivo y luego tarjeta (sin vuelto); tarjeta y luego efectivo con 10000 de vuelto;
+    # efectivo con vuelto después de una transferencia
+    crear_venta(client, producto_id, 80000, [('efectivo', 60000), ('tarjeta_credito', 30000)])
+    crear_venta(client, producto_id, 80000, [('tarjeta_credito', 30000), ('efectivo', 60000)])
+    crear_venta(client, producto_id, 70000, [('efectivo', 50000), ('transferencia', 40000), ('efectivo', 10000)])
+    sin_diferencias(app, 'Ventas con pagos mixtos y vuelto')
+
+    anulada = crear_venta(client, producto_id, 15000, [('efectivo', 15000)])
+    assert client.post(f'/ventas/{anulada}/anular').status_code == 302
+    sin_diferencias(app, 'Venta anulada')
+
+    # Venta a crédito: seña con tarjeta y saldo en efectivo con 20000 de vuelto
+    credito = crear_venta(client, producto_id, 40000, [('tarjeta_debito', 10000)], dias_credito=30)
+    sin_diferencias(app, 'Venta a crédito con seña')
+    respuesta = client.post('/ventas/registrar-pago', data={'venta_id': credito, 'forma_pago': 'efectivo',
+                                                            'monto': 50000})
+    assert respuesta.status_code == 302
+    sin_diferencias(app, 'Pago posterior de la venta a crédito')
+
+    # Venta pendiente (sin caja) facturada con cheque y efectivo con 10000 de vuelto
+    with app.app_context():
+        pendiente = Venta(numero_factura='TMP-pendiente', tipo_venta='producto', cliente_id=1, vendedor_id=1,
+                          total=40000, estado='pendiente', estado_pago='pendiente')
+        db.session.add(pendiente)
+        db.session.commit()
+        pendiente_id = pendiente.id
+    pagos = [{'forma_pago_id': ids_formas['cheque'], 'monto': 20000},
+             {'forma_pago_id': ids_formas['efectivo'], 'monto': 30000}]
+    respuesta = client.post(f'/ventas/{pendiente_id}/facturar', data={'pagos_json': json.dumps(pagos)})
+    assert respuesta.status_code == 302 and 'confirmar-vuelto' in respuesta.location, respuesta.location
+    sin_diferencias(app, 'Venta pendiente facturada')
+
+    apertura_id, totales, efectivo_disponible = acumulados(app)
+    with app.app_context():
+        assert Venta.query.filter_by(apertura_caja_id=apertura_id, estado='completada').count() == 5
+    esperado = {'efectivo': 60000 + 50000 + 30000 + 30000 + 20000, 'tarjeta': 70000,
+                'transferencia': 40000, 'cheque': 20000}
+    for categoria, monto in esperado.items():
+        assert totales[categoria] == monto, (categoria, totales[categoria], monto)
+    assert efectivo_disponible == MONTO_INICIAL + esperado['efectivo'], efectivo_disponible
+    print(f"[OK] Acumulados: {dict((k, int(v)) for k, v in totales.items())}")
+
+    respuesta = client.post('/caja/cerrar', data={
+        'monto_efectivo': int(efectivo_disponible), 'monto_tarjeta': esperado['tarjeta'],
+        'monto_transferencias': esperado['transferencia'], 'monto_cheques': esperado['cheque'],
+    })
+    respuesta.data
+    with app.app_context():
+        apertura = db.session.get(AperturaCaja, apertura_id)
+        assert apertura.estado == 'cerrada', apertura.estado
+        assert Decimal(apertura.monto_efectivo_esperado) == efectivo_disponible, apertura.monto_efectivo_esperado
+    print(f"[OK] efectivo_disponible ({int(efectivo_disponible)}) coincide con el arqueo al cerrar")
+    print("Acumulados de caja verificados.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+Prueba de app.utils.busqueda_productos.
+Verifica la búsqueda sin acentos ni mayúsculas, varias palabras, el orden
+(código exacto primero), el escape de % y _, y los endpoints
+/productos/buscar (autocompletado) y /productos/ (listado), sobre una base
+SQLite en memoria (la función normalizar_busqueda se registra en Python).
+
+Ejecutar con: python tests/manual_test_busqueda_productos.py
+"""
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Producto
+from app.utils.busqueda_productos import normalizar, filtrar_productos
+from manual_test_totales_caja import setup_app, seed_base
+
+PRODUCTOS = [
+    # (codigo, nombre, tipo, activo)
+    ('12', 'Pelota de fútbol', 'juguete', True),
+    ('120', 'Muñeca de trapo', 'juguete', True),
+    ('312', 'Auto de carrera rojo', 'juguete', True),
+    ('AUTO-1', 'Camión de bomberos', 'juguete', True),
+    ('400', 'Autopista con rampas', 'juguete', True),
+    ('401', 'Libro "El Principito"', 'libro', True),
+    ('402', 'Globos 100% látex', 'juguete', True),
+    ('403', 'Muñeco articulado', 'juguete', False),
+    ('404', 'Pila_AA alcalina', 'insumo', True),
+]
+
+
+def codigos(query):
+    return [p.codigo for p in query]
+
+
+def test_normalizar():
+    assert normalizar('Muñeca CAMIÓN Pingüino') == 'muneca camion pinguino'
+    print("[OK] Normalización sin acentos ni mayúsculas")
+
+
+def test_filtro():
+    base = Producto.query
+    assert codigos(filtrar_productos(base, 'MUNECA')) == ['120']
+    assert codigos(filtrar_productos(base, 'muñeco')) == ['403']
+    assert codigos(filtrar_productos(base, 'camion')) == ['AUTO-1']
+    assert codigos(filtrar_productos(base, 'rojo auto')) == ['312']
+    print("[OK] Sin acentos, sin mayúsculas y con varias palabras")
+
+    # '12': código exacto, código que empieza con 12, el resto (312 contiene 12)
+    assert codigos(filtrar_productos(base, '12')) == ['12', '120', '312']
+    # 'auto': código que empieza, nombre que empieza (por nombre), palabra del nombre que empieza
+    assert codigos(filtrar_productos(base, 'auto')) == ['AUTO-1', '312', '400'], codigos(filtrar_productos(base, 'auto'))
+    assert codigos(filtrar_productos(base, 'auto-1')) == ['AUTO-1']
+    print("[OK] Orden: código exacto, prefijo de código, prefijo de nombre, palabra del nombre")
+
+    assert codigos(filtrar_productos(base, '100%')) == ['402']
+    assert codigos(filtrar_productos(base, '0%')) == ['402']
+    assert codigos(filtrar_productos(base, 'a_a')) == ['404']
+    assert codigos(filtrar_productos(base, '"el')) == ['401']
+    print("[OK] % y _ se buscan literalmente")
+
+    todos = codigos(filtrar_productos(base, '   '))
+    assert todos == codigos(base.order_by(Producto.nombre)) and len(todos) == len(PRODUCTOS)
+    print("[OK] Sin término: todos, por nombre")
+
+
+def test_endpoints(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+
+    datos = client.get('/productos/buscar?term=12').get_json()
+    assert [d['codigo'] for d in datos] == ['12', '120', '312'], datos
+    assert datos[0]['label'] == '12 - Pelota de fútbol' and datos[0]['precio_venta'] == 1000.0
+    datos = client.get('/productos/buscar?term=muneco').get_json()
+    assert datos == [], 'los productos inactivos no salen en el autocompletado'
+    datos = client.get('/productos/buscar?term=a&tipo=insumo').get_json()
+    assert [d['codigo'] for d in datos] == ['404'], datos
+    print("[OK] /productos/buscar: orden, inactivos y filtro por tipo")
+
+    respuesta = client.get('/productos/?search=CAMION')
+    assert respuesta.status_code == 200
+    html = respuesta.get_data(as_text=True)
+    assert 'Camión de bomberos' in html and 'Pelota de fútbol' not in html
+    respuesta = client.get('/productos/?search=auto&tipo=juguete')
+    html = respuesta.get_data(as_text=True)
+    assert html.index('Camión de bomberos') < html.index('Auto de carrera rojo') < html.index('Autopista')
+    print("[OK] /productos/: búsqueda sin acentos y orden por relevancia")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        seed_base()
+        for codigo, nombre, tipo, activo in PRODUCTOS:
+            db.session.add(Producto(codigo=codigo, nombre=nombre, tipo_producto=tipo, activo=activo,
+                                    precio_venta=1000, precio_compra=500))
+        db.session.commit()
+        test_normalizar()
+        test_filtro()
+    test_endpoints(app)
+    print("Búsqueda verificada.")
+
+
+if __name__ == '__main__':
+    main()
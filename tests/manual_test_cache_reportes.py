@@ -0,0 +1,137 @@
+"""
+Prueba del cache de reportes (app.utils.cache_reportes).
+Verifica que el sello de las tablas (COUNT, MAX(id), MAX(fecha_modificacion))
+cambia con altas, modificaciones por el ORM y por UPDATE masivos, y bajas;
+que todas las tablas vigiladas tienen columna de modificación; y el ciclo
+del cache sobre /reportes/ventas/pdf: fallo, acierto, cambio reciente sin
+cache y clave nueva después del cambio. Base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_cache_reportes.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Venta, Usuario
+from app.utils import cache_reportes
+from app.utils.cache_reportes import version_datos, columna_modificacion
+from manual_test_totales_caja import setup_app, seed_base, nueva_apertura, nueva_venta
+
+TABLAS = ['ventas', 'clientes', 'usuarios', 'configuracion_empresa']
+
+
+def envejecer():
+    """Lleva las fechas de modificación al pasado (fuera de MARGEN_CAMBIOS)"""
+    antes = datetime.utcnow() - cache_reportes.MARGEN_CAMBIOS * 2
+    for nombre in TABLAS:
+        tabla = db.metadata.tables[nombre]
+        columna = columna_modificacion(tabla)
+        db.session.execute(tabla.update().values({columna: antes}))
+    db.session.commit()
+
+
+def test_columnas():
+    sin_columna = [t for t in sorted(cache_reportes._tablas_vigiladas)
+                   if columna_modificacion(db.metadata.tables[t]) is None]
+    assert not sin_columna, f"Tablas vigiladas sin fecha de modificación: {sin_columna}"
+    print(f"[OK] Las {len(cache_reportes._tablas_vigiladas)} tablas vigiladas tienen fecha de modificación")
+
+
+def test_sello(usuario, cliente, caja, formas):
+    apertura = nueva_apertura(usuario, caja)
+    nueva_venta(apertura, usuario, cliente, 10000, [(formas['efectivo'], 10000, 'confirmado')])
+    envejecer()
+    sello = version_datos(['ventas'])
+    (_, filas, maximo_id, modificacion), = sello
+    assert not cache_reportes.datos_recientes(sello)
+
+    venta = nueva_venta(apertura, usuario, cliente, 20000, [(formas['efectivo'], 20000, 'confirmado')])
+    nuevo = version_datos(['ventas'])
+    assert nuevo[0][1:3] == (filas + 1, venta.id) and cache_reportes.datos_recientes(nuevo), nuevo
+    print("[OK] Alta: cambian la cantidad, el máximo id y la fecha")
+
+    envejecer()
+    sello = version_datos(['ventas'])
+    venta.estado = 'anulada'
+    db.session.commit()
+    nuevo = version_datos(['ventas'])
+    assert nuevo[0][1:3] == sello[0][1:3] and nuevo[0][3] > sello[0][3], (sello, nuevo)
+    envejecer()
+    sello = version_datos(['ventas'])
+    db.session.execute(db.update(Venta).where(Venta.id == venta.id).values(estado='completada'))
+    db.session.commit()
+    assert version_datos(['ventas'])[0][3] > sello[0][3], 'el UPDATE masivo asigna fecha_modificacion'
+    print("[OK] Modificación por el ORM y por UPDATE masivo: cambia la fecha")
+
+    otro = Usuario(username='temporal', email='temporal@example.com', nombre='Temporal', apellido='Test', rol='caja')
+    otro.set_password('x')
+    db.session.add(otro)
+    db.session.add(Usuario(username='ultimo', email='ultimo@example.com', nombre='Último', apellido='Test',
+                           rol='caja', password_hash='x'))
+    db.session.commit()
+    sello = version_datos(['usuarios'])
+    db.session.delete(otro)
+    db.session.commit()
+    nuevo = version_datos(['usuarios'])
+    assert nuevo[0][1] == sello[0][1] - 1 and nuevo[0][2] == sello[0][2], (sello, nuevo)
+    print("[OK] Baja de una fila que no es la última: cambia la cantidad")
+
+
+def test_ciclo(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    url = '/reportes/ventas/pdf'
+
+    with app.app_context():
+        envejecer()
+    primera = client.get(url)
+    contenido = primera.data  # la entrada se publica al terminar de enviar el archivo
+    assert primera.status_code == 200 and 'X-Reporte-Cache' not in primera.headers
+    segunda = client.get(url)
+    assert segunda.headers.get('X-Reporte-Cache') == 'HIT' and segunda.data == contenido
+    print("[OK] Fallo y luego acierto con los datos sin cambios")
+
+    with app.app_context():
+        venta = Venta.query.order_by(Venta.id).first()
+        venta.observaciones = 'Corregida'
+        db.session.commit()
+    recientes = cache_reportes._contadores['ventas_pdf']['recientes']
+    reciente = client.get(url)
+    reciente.data
+    assert 'X-Reporte-Cache' not in reciente.headers
+    assert cache_reportes._contadores['ventas_pdf']['recientes'] == recientes + 1
+    print("[OK] Cambio reciente: el reporte se genera sin leer ni guardar el cache")
+
+    with app.app_context():
+        envejecer()
+    despues = client.get(url)
+    despues.data
+    assert 'X-Reporte-Cache' not in despues.headers, 'los datos cambiaron: la clave es otra'
+    assert client.get(url).headers.get('X-Reporte-Cache') == 'HIT'
+    print("[OK] Después del cambio la clave es nueva y se vuelve a cachear")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = setup_app()
+        app.config.update(REPORTES_CACHE_DIR=carpeta, REPORTES_CACHE_MAX_MB=10)
+        with app.app_context():
+            db.create_all()
+            usuario, cliente, caja, formas = seed_base()
+            usuario.rol = 'admin'
+            db.session.commit()
+            test_columnas()
+            test_sello(usuario, cliente, caja, formas)
+        test_ciclo(app)
+    print("Cache de reportes verificado.")
+
+
+if __name__ == '__main__':
+    main()
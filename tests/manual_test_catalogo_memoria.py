@@ -0,0 +1,212 @@
+"""
+Prueba de app.utils.catalogo_memoria.
+Compara las búsquedas del catálogo en memoria contra el mismo criterio
+calculado en Python fila por fila y contra la búsqueda en la base
+(filtrar_productos), verifica el refresco por partes (stock, nombre y código
+cambiados, productos nuevos, desactivados y reactivados, rearmado del
+segmento principal, catálogo cargado sin fechas de modificación) y los endpoints /productos/buscar y /clientes/buscar con
+CATALOGO_MEMORIA activado, sobre una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_catalogo_memoria.py
+"""
+import os
+import random
+import sys
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Producto, Cliente
+from app.utils import catalogo_memoria
+from app.utils.busqueda_productos import normalizar, filtrar_productos
+from app.utils.catalogo_memoria import obtener_catalogo, invalidar_catalogos, CatalogoProductos, CatalogoClientes
+from manual_test_totales_caja import setup_app, seed_base
+
+TIPOS = ['Auto', 'Muñeca', 'Pelota', 'Camión', 'Robot', 'Pingüino', 'Avión', 'Tren', 'Lápiz', 'Yoyó']
+ADJETIVOS = ['rojo', 'azul', 'grande', 'pequeño', 'eléctrico', 'de madera', 'a control remoto', 'mini']
+TERMINOS = ['', 'a', 'au', 'auto', 'AUTO', 'camion', 'camión', 'pin', 'pinguino', 'ño', 'o r', 'rojo auto',
+            'control remoto', 'de', '1', '12', '0012', 'p-0012', 'x', 'zzz', 'mini 3', 'ro', '%', 'a_b']
+
+
+def sembrar(cantidad):
+    rng = random.Random(7)
+    for i in range(1, cantidad + 1):
+        nombre = f'{rng.choice(TIPOS)} {rng.choice(ADJETIVOS)} {rng.randint(1, 40)}'
+        db.session.add(Producto(codigo=f'P-{i:04d}', nombre=nombre, tipo_producto=rng.choice(['juguete', 'insumo']),
+                                precio_venta=1000 * i, precio_compra=500 * i, stock_actual=i, tipo_iva='10',
+                                unidad_medida='unidad', activo=i % 13 != 0))
+    db.session.add(Producto(codigo='AUTO', nombre='Zeppelin', tipo_producto='juguete', precio_venta=1))
+    db.session.add(Producto(codigo='12', nombre='Globo 12', tipo_producto='juguete', precio_venta=1))
+    db.session.commit()
+
+
+def esperado(termino, tipo=None):
+    """El criterio de búsqueda calculado fila por fila (ids en orden)"""
+    palabras = normalizar(termino).split()
+    completo = ' '.join(palabras)
+    filas = []
+    for p in Producto.query.filter_by(activo=True):
+        if tipo and p.tipo_producto != tipo:
+            continue
+        nombre, codigo = normalizar(p.nombre), p.codigo.lower()
+        if not all(x in nombre or x in codigo for x in palabras):
+            continue
+        if not palabras:
+            nivel = 0
+        elif codigo == completo:
+            nivel = 0
+        elif codigo.startswith(completo):
+            nivel = 1
+        elif nombre.startswith(completo):
+            nivel = 2
+        elif ' ' + completo in nombre:
+            nivel = 3
+        else:
+            nivel = 4
+        filas.append((nivel, nombre, p.id))
+    return [i for _, _, i in sorted(filas)]
+
+
+def ids(resultados):
+    return [r['id'] for r in resultados]
+
+
+def verificar(catalogo, descripcion):
+    for termino in TERMINOS:
+        todos = esperado(termino)
+        obtenido = ids(catalogo.autocompletar(termino, limite=10 ** 6))
+        assert obtenido == todos, f"{descripcion} {termino!r}: esperado={todos[:15]} obtenido={obtenido[:15]}"
+        assert ids(catalogo.autocompletar(termino)) == todos[:10], termino
+        en_base = [p.id for p in filtrar_productos(Producto.query.filter(Producto.activo == True), termino)]
+        assert sorted(en_base) == sorted(todos), f"{descripcion} {termino!r}: la base devuelve otros productos"
+    assert ids(catalogo.autocompletar('a', tipo='insumo', limite=10 ** 6)) == esperado('a', 'insumo')
+    assert catalogo.autocompletar('a', tipo='inexistente') == []
+    print(f"[OK] {descripcion}: {len(TERMINOS)} términos iguales al cálculo fila por fila y a la base")
+
+
+def test_busquedas():
+    catalogo = obtener_catalogo(CatalogoProductos)
+    assert len(catalogo) == Producto.query.filter_by(activo=True).count()
+    verificar(catalogo, 'Carga completa')
+    primero = catalogo.autocompletar('p-0001')[0]
+    producto = db.session.get(Producto, primero['id'])
+    assert primero == {'id': producto.id, 'label': f'{producto.codigo} - {producto.nombre}', 'value': producto.nombre,
+                       'codigo': 'P-0001', 'precio_venta': 1000.0, 'precio_compra': 500.0, 'tipo_iva': '10',
+                       'stock_actual': 1, 'unidad_medida': 'unidad'}, primero
+    assert ids(catalogo.autocompletar('auto'))[0] == Producto.query.filter_by(codigo='AUTO').one().id
+    print("[OK] Datos del resultado y código exacto primero")
+
+
+def test_refresco():
+    catalogo = obtener_catalogo(CatalogoProductos)
+    productos = Producto.query.filter_by(activo=True).order_by(Producto.id).all()
+    inactivo = Producto.query.filter_by(activo=False).first()
+    productos[0].stock_actual = 999                     # solo datos
+    productos[1].nombre = 'Aeroplano supersónico'      # nombre
+    productos[2].codigo = 'NUEVO-2'                     # código
+    productos[3].activo = False                         # desactivado
+    inactivo.activo = True                              # reactivado
+    db.session.add(Producto(codigo='N-1', nombre='Ñandú de peluche', tipo_producto='juguete', precio_venta=5))
+    db.session.commit()
+
+    mismo = obtener_catalogo(CatalogoProductos)
+    assert mismo is catalogo, 'un commit del proceso refresca por partes, no recarga'
+    assert len(catalogo.adicional) == 4, len(catalogo.adicional)
+    assert catalogo.autocompletar('P-0001')[0]['stock_actual'] == 999
+    assert ids(catalogo.autocompletar('nandu')) == [Producto.query.filter_by(codigo='N-1').one().id]
+    assert ids(catalogo.autocompletar('supersonico')) == [productos[1].id]
+    assert ids(catalogo.autocompletar('nuevo-2')) == [productos[2].id]
+    verificar(catalogo, 'Refresco por partes')
+
+    # Cambio confirmado por otro proceso: lo trae la consulta "modificados desde"
+    db.session.execute(db.update(Producto).where(Producto.id == productos[4].id).values(
+        nombre='Barrilete', fecha_modificacion=datetime.utcnow()))
+    db.session.commit()
+    catalogo_memoria._pendientes.discard(CatalogoProductos)
+    catalogo.refrescar()
+    assert ids(catalogo.autocompletar('barrilete')) == [productos[4].id]
+    print("[OK] Refresco por partes: datos en el lugar, nombres y códigos al segmento adicional")
+
+    # Muchos cambios: se integra todo en el principal
+    anterior = catalogo_memoria.MAX_ADICIONAL
+    catalogo_memoria.MAX_ADICIONAL = 5
+    try:
+        for producto in productos[10:60]:
+            producto.nombre = producto.nombre + ' edición especial'
+        db.session.commit()
+        obtener_catalogo(CatalogoProductos)
+    finally:
+        catalogo_memoria.MAX_ADICIONAL = anterior
+    assert len(catalogo.adicional) == 0 and catalogo.principal.vigente.count(0) == 0
+    verificar(catalogo, 'Segmento principal rearmado')
+
+    # Un refresco sin cambios dentro del margen no duplica ni mueve filas
+    catalogo.refrescar()
+    catalogo.refrescar()
+    verificar(catalogo, 'Refresco repetido')
+
+
+def test_sin_marca():
+    # Catálogo cargado de filas sin fecha de modificación (o de una tabla vacía): no tiene marca
+    db.session.execute(db.update(Cliente).values(fecha_modificacion=None))
+    db.session.commit()
+    invalidar_catalogos()
+    catalogo = obtener_catalogo(CatalogoClientes)
+    assert catalogo.marca is None and len(catalogo) == Cliente.query.filter_by(activo=True).count()
+    db.session.add(Cliente(tipo_documento='CI', numero_documento='7770001', nombre='Nuevo Sin Marca',
+                           tipo_cliente='particular'))
+    db.session.commit()
+    assert obtener_catalogo(CatalogoClientes) is catalogo
+    assert [r['numero_documento'] for r in catalogo.autocompletar('nuevo sin')] == ['7770001']
+    assert catalogo.marca is not None
+    print("[OK] Catálogo sin marca: el refresco lee todas las filas y ve el cliente nuevo")
+
+
+def test_endpoints(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    for url in ('/productos/buscar?term=p-001', '/productos/buscar?term=robot%20azul&tipo=juguete',
+                '/clientes/buscar?term=1002'):
+        app.config['CATALOGO_MEMORIA'] = False
+        base = client.get(url).get_json()
+        app.config['CATALOGO_MEMORIA'] = True
+        memoria = client.get(url).get_json()
+        assert base and sorted(base, key=lambda r: r['id']) == sorted(memoria, key=lambda r: r['id']), url
+        print(f"[OK] {url}: {len(memoria)} resultados iguales a los de la base")
+
+    with app.app_context():
+        cliente = Cliente(tipo_documento='CI', numero_documento='5550001', nombre='José Pérez',
+                          tipo_cliente='particular', direccion='Calle 1', telefono='0981')
+        db.session.add(cliente)
+        db.session.commit()
+    datos = client.get('/clientes/buscar?term=jose perez').get_json()
+    assert [d['numero_documento'] for d in datos] == ['5550001'] and datos[0]['direccion'] == 'Calle 1', datos
+    print("[OK] Cliente nuevo visible en /clientes/buscar después del commit")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        seed_base()
+        for i in range(30):
+            db.session.add(Cliente(tipo_documento='CI', numero_documento=f'100{i}', nombre=f'Cliente {i}',
+                                   tipo_cliente='particular', activo=i % 7 != 0))
+        sembrar(400)
+        app.config['CATALOGO_MEMORIA'] = True
+        app.config['CATALOGO_REFRESCO_SEGUNDOS'] = 3600  # solo refrescan los commits del proceso
+        invalidar_catalogos()
+        test_busquedas()
+        test_refresco()
+        assert obtener_catalogo(CatalogoClientes) is not None
+        test_sin_marca()
+    test_endpoints(app)
+    print("Catálogo verificado.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""
+Prueba de cantidad de consultas de los reportes y listados.
+Carga cada vista con pocos registros y con el triple, contando las sentencias
+SQL que ejecuta el request; si la cantidad crece con los registros hay una
+consulta por fila (N+1) y la prueba falla indicando la vista.
+Los perfiles de carga están en app.utils.perfiles_consulta.
+
+Ejecutar con: python tests/manual_test_consultas_perfiles.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+
+from app import db
+from app.models import (Usuario, Cliente, Caja, AperturaCaja, Reclamo, Proveedor, Compra, PagoCompra,
+                        Producto, Categoria, TipoServicio, SolicitudServicio, OrdenServicio,
+                        ConfiguracionEmpresa)
+from app.models.servicio import Presupuesto
+from manual_test_totales_caja import setup_app, seed_base, nueva_venta
+
+FECHA = (datetime.now() - timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+DIA = FECHA.strftime('%Y-%m-%d')
+
+# Todas las vistas muestran menos de 20 filas (el tamaño de página de los listados).
+# Quedan fuera /servicios/ordenes (su plantilla pide 'estadisticas', que la vista no envía)
+# y /caja/historial (su plantilla lee apertura.monto_efectivo, que no existe, en las cajas cerradas).
+VISTAS = [
+    '/reportes/ventas',
+    '/reportes/ventas-diarias/pdf?desde=' + DIA,
+    '/reportes/reclamos/pdf',
+    '/reportes/presupuestos-sin-aprobar/pdf',
+    '/reportes/compras/pdf',
+    '/reportes/compras-pendientes-pago/pdf',
+    '/reportes/cajas-cerradas?fecha=' + DIA,
+    '/ventas/',
+    '/compras/',
+    '/compras/pendientes-pago',
+    '/productos/',
+    '/productos/stock-bajo',
+    '/servicios/solicitudes',
+    '/servicios/reclamos',
+    '/caja/estado',
+]
+
+
+def sembrar(desde, hasta, formas, tipo, abierta_id):
+    """
+    Registros desde..hasta-1 de cada vista, cada uno con su propio cliente, usuario, proveedor, etc.
+    Cada registro suma además una venta y un pago de caja chica a la apertura abierta del cajero.
+    """
+    abierta = db.session.get(AperturaCaja, abierta_id)
+    for i in range(desde, hasta):
+        usuario = Usuario(username=f'usuario{i}', email=f'u{i}@example.com', nombre='Usuario', apellido=str(i),
+                          rol='caja')
+        usuario.set_password('password123')
+        cliente = Cliente(tipo_documento='CI', numero_documento=f'900{i}', nombre=f'Cliente {i}',
+                          tipo_cliente='particular')
+        caja = Caja(numero_caja=f'C{i:03d}', nombre=f'Caja {i}')
+        proveedor = Proveedor(codigo=f'PR{i}', razon_social=f'Proveedor {i}', ruc=f'8000{i}-1')
+        categoria = Categoria(codigo=f'CAT{i}', nombre=f'Categoría {i}')
+        db.session.add_all([usuario, cliente, caja, proveedor, categoria])
+        db.session.flush()
+
+        apertura = AperturaCaja(caja_id=caja.id, cajero_id=usuario.id, monto_inicial=100000, estado='cerrada',
+                                fecha_apertura=FECHA, fecha_cierre=FECHA + timedelta(hours=8))
+        db.session.add(apertura)
+        db.session.flush()
+        venta = nueva_venta(apertura, usuario, cliente, 10000 * (i + 1), [(formas['efectivo'], 10000 * (i + 1),
+                                                                           'confirmado')])
+        venta.fecha_venta = FECHA
+        nueva_venta(abierta, usuario, cliente, 5000, [(formas['efectivo'], 5000, 'confirmado')])
+
+        db.session.add(Producto(codigo=f'P{i}', nombre=f'Producto {i}', categoria_id=categoria.id,
+                                tipo_producto='juguete', precio_venta=1000, stock_actual=1, stock_minimo=5))
+        db.session.add(Reclamo(numero=f'REC-{i}', cliente_id=cliente.id, responsable_id=usuario.id,
+                               descripcion='Falla', fecha_creacion=FECHA))
+        compra = Compra(numero_compra=f'C-{i}', proveedor_id=proveedor.id, usuario_registra_id=usuario.id,
+                        fecha_compra=FECHA, total=50000, estado='parcial_pagada')
+        solicitud = SolicitudServicio(numero_solicitud=f'SOL-{i}', cliente_id=cliente.id,
+                                      tipo_servicio_id=tipo.id, descripcion='Reparación')
+        db.session.add_all([compra, solicitud])
+        db.session.flush()
+        db.session.add(PagoCompra(compra_id=compra.id, monto=20000, origen_pago='otra_fuente',
+                                  usuario_paga_id=usuario.id))
+        db.session.add(PagoCompra(compra_id=compra.id, monto=1000, origen_pago='caja_chica',
+                                  apertura_caja_id=abierta.id, usuario_paga_id=usuario.id))
+        db.session.add(Presupuesto(numero_presupuesto=f'PRE-{i}', solicitud_id=solicitud.id,
+                                   descripcion_trabajo='Cambio de pieza', fecha_emision=FECHA))
+        db.session.add(OrdenServicio(numero_orden=f'OS-{i}', solicitud_id=solicitud.id, tecnico_id=usuario.id))
+    db.session.commit()
+
+
+def contar_consultas(client, motor, url):
+    """Sentencias SQL del request (fuera del app context de la prueba: sesión e identity map nuevos)"""
+    client.get(url)  # calentamiento: membrete y demás caches ya cargados
+    sentencias = []
+
+    def registrar(conn, cursor, statement, parameters, context, executemany):
+        sentencias.append(statement)
+
+    event.listen(motor, 'before_cursor_execute', registrar)
+    try:
+        respuesta = client.get(url)
+    finally:
+        event.remove(motor, 'before_cursor_execute', registrar)
+    assert respuesta.status_code == 200, f'{url}: status {respuesta.status_code}'
+    return len(sentencias)
+
+
+def main():
+    app = setup_app()
+    app.config['REPORTES_CACHE_MAX_MB'] = 0  # sin cache: cada request consulta la base
+    with app.app_context():
+        db.create_all()
+        usuario, _, caja, formas = seed_base()
+        usuario.rol = 'admin'
+        abierta = AperturaCaja(caja_id=caja.id, cajero_id=usuario.id, monto_inicial=100000, estado='abierto')
+        db.session.add(abierta)
+        ConfiguracionEmpresa.get_config().direccion = 'Av. Principal 123'
+        tipo = TipoServicio(codigo='REP', nombre='Reparación')
+        db.session.add(tipo)
+        db.session.commit()
+        db.session.flush()
+        abierta_id = abierta.id
+        sembrar(0, 3, formas, tipo, abierta_id)
+        motor = db.engine
+
+    client = app.test_client()
+    respuesta = client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    assert respuesta.status_code in (200, 302), respuesta.status_code
+
+    pocos = {url: contar_consultas(client, motor, url) for url in VISTAS}
+    with app.app_context():
+        formas = {codigo: db.session.merge(forma) for codigo, forma in formas.items()}
+        sembrar(3, 9, formas, db.session.merge(tipo), abierta_id)
+    muchos = {url: contar_consultas(client, motor, url) for url in VISTAS}
+
+    crecen = []
+    for url in VISTAS:
+        marca = 'OK' if pocos[url] == muchos[url] else 'N+1'
+        print(f"[{marca}] {url}: {pocos[url]} consultas con 3 filas, {muchos[url]} con 9")
+        if pocos[url] != muchos[url]:
+            crecen.append(url)
+    assert not crecen, f"La cantidad de consultas crece con las filas en: {', '.join(crecen)}"
+    print("Consultas verificadas.")
+
+
+if __name__ == '__main__':
+    main()
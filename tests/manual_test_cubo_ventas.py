@@ -0,0 +1,212 @@
+"""
+Prueba de app.utils.cubo_ventas.
+Compara las consultas del cubo (por categoría, producto, tipo de cliente,
+forma de pago, mes, con filtros y ventas distintas) contra el mismo cálculo
+hecho en Python sobre las líneas de venta, verifica el refresco por partes
+(venta nueva, anulada y facturada después de cargar el cubo) y el endpoint
+JSON, sobre una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_cubo_ventas.py
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app import db
+from app.models import Venta, VentaDetalle, Producto, Categoria, Caja, Cliente
+from app.utils.cubo_ventas import obtener_cubo, invalidar_cubo
+from manual_test_totales_caja import setup_app, seed_base, nueva_apertura, nueva_venta
+
+
+def agregar_lineas(venta, lineas):
+    for producto, cantidad, total in lineas:
+        db.session.add(VentaDetalle(venta_id=venta.id, tipo_item='producto' if producto else 'servicio',
+                                    producto_id=producto.id if producto else None,
+                                    descripcion=producto.nombre if producto else 'Armado', cantidad=cantidad,
+                                    precio_unitario=total // cantidad, subtotal=total, total=total))
+    db.session.commit()
+
+
+def sembrar(usuario, cliente, caja, f):
+    segunda = Caja(numero_caja='CAJA-2', nombre='Caja 2')
+    empresa = Cliente(tipo_documento='RUC', numero_documento='80000001-1', nombre='Empresa SA',
+                      tipo_cliente='empresa')
+    juguetes, libros = Categoria(codigo='JUG', nombre='Juguetes'), Categoria(codigo='LIB', nombre='Libros')
+    db.session.add_all([segunda, empresa, juguetes, libros])
+    db.session.flush()
+    robot = Producto(codigo='P1', nombre='Robot', categoria_id=juguetes.id, tipo_producto='juguete',
+                     precio_venta=50000, stock_actual=100)
+    cuento = Producto(codigo='P2', nombre='Cuento', categoria_id=libros.id, tipo_producto='libro',
+                      precio_venta=20000, stock_actual=100)
+    db.session.add_all([robot, cuento])
+    db.session.commit()
+    a1, a2 = nueva_apertura(usuario, caja), nueva_apertura(usuario, segunda)
+
+    ventas = [
+        # (apertura, cliente, fecha, pagos, líneas, estado)
+        (a1, cliente, datetime(2026, 1, 5, 10), [(f['efectivo'], 120000, 'confirmado')],
+         [(robot, 2, 100000), (None, 1, 20000)], 'completada'),
+        (a2, empresa, datetime(2026, 1, 20, 16), [(f['tarjeta_credito'], 40000, 'confirmado'),
+                                                  (f['efectivo'], 30000, 'confirmado')],
+         [(cuento, 1, 20000), (robot, 1, 50000)], 'completada'),
+        (a1, empresa, datetime(2026, 2, 3, 9), [(f['transferencia'], 60000, 'confirmado')],
+         [(cuento, 3, 60000)], 'completada'),
+        (a2, cliente, datetime(2026, 2, 14, 11), [], [(robot, 1, 50000)], 'completada'),  # a crédito
+        (a1, cliente, datetime(2026, 2, 15, 11), [(f['efectivo'], 90000, 'confirmado')],
+         [(robot, 1, 90000)], 'anulada'),
+        (a2, empresa, datetime(2026, 3, 1, 12), [(f['efectivo'], 80000, 'pendiente')],
+         [(cuento, 4, 80000)], 'completada'),
+    ]
+    for apertura, cli, fecha, pagos, lineas, estado in ventas:
+        venta = nueva_venta(apertura, usuario, cli, sum(t for _, _, t in lineas), pagos, estado=estado)
+        venta.fecha_venta = fecha
+        agregar_lineas(venta, lineas)
+    return robot, cuento, a1
+
+
+def esperado(clave, medida='total', filtro=lambda linea, venta: True):
+    """Totales por clave calculados en Python sobre las líneas de ventas completadas"""
+    totales = defaultdict(float)
+    ventas = defaultdict(set)
+    for linea in VentaDetalle.query.join(Venta).filter(Venta.estado == 'completada'):
+        venta = linea.venta
+        if not filtro(linea, venta):
+            continue
+        k = clave(linea, venta)
+        if medida == 'total':
+            totales[k] += int(linea.total)
+        elif medida == 'cantidad':
+            totales[k] += float(linea.cantidad)
+        else:
+            ventas[k].add(venta.id)
+    return {k: len(v) for k, v in ventas.items()} if medida == 'ventas' else dict(totales)
+
+
+def forma_pago(venta):
+    formas = {p.forma_pago.codigo for p in venta.pagos if p.estado == 'confirmado'}
+    return 'mixto' if len(formas) > 1 else formas.pop() if formas else 'sin_pago'
+
+
+def obtenido(resultado, *dimensiones, medida='total'):
+    return {tuple(f[d]['clave'] for d in dimensiones) if len(dimensiones) > 1 else f[dimensiones[0]]['clave']:
+            f[medida] for f in resultado['filas']}
+
+
+def comparar(resultado, esperados, descripcion, *dimensiones, medida='total'):
+    obt = obtenido(resultado, *dimensiones, medida=medida)
+    assert obt == esperados, f"{descripcion}: esperado={esperados} obtenido={obt}"
+    print(f"[OK] {descripcion}: {len(obt)} grupos en {resultado['milisegundos']} ms")
+
+
+def test_consultas(robot):
+    cubo = obtener_cubo(recargar=True)
+    comparar(cubo.consultar(['categoria']),
+             esperado(lambda l, v: l.producto.categoria_id if l.producto else None), 'Total por categoría', 'categoria')
+    comparar(cubo.consultar(['producto'], medidas=['cantidad']),
+             esperado(lambda l, v: l.producto_id, 'cantidad'), 'Cantidad por producto', 'producto', medida='cantidad')
+    comparar(cubo.consultar(['forma_pago']), esperado(lambda l, v: forma_pago(v)), 'Total por forma de pago',
+             'forma_pago')
+    comparar(cubo.consultar(['mes', 'tipo_cliente']),
+             esperado(lambda l, v: (v.fecha_venta.date().replace(day=1), v.cliente.tipo_cliente)),
+             'Total por mes y tipo de cliente', 'mes', 'tipo_cliente')
+    comparar(cubo.consultar(['caja'], medidas=['ventas']),
+             esperado(lambda l, v: v.apertura_caja.caja_id, 'ventas'), 'Ventas distintas por caja', 'caja',
+             medida='ventas')
+    comparar(cubo.consultar(['semana'], filtros={'producto': [robot.id]}, desde=date(2026, 1, 1),
+                            hasta=date(2026, 1, 31)),
+             esperado(lambda l, v: v.fecha_venta.date() - timedelta(days=v.fecha_venta.weekday()),
+                      filtro=lambda l, v: l.producto_id == robot.id and v.fecha_venta.month == 1),
+             'Robot por semana en enero', 'semana')
+
+    resultado = cubo.consultar([], medidas=['total', 'ventas', 'lineas'])
+    assert resultado['totales'] == {'total': 380000, 'ventas': 5, 'lineas': 7}, resultado['totales']
+    nombres = {f['forma_pago']['nombre'] for f in cubo.consultar(['forma_pago'])['filas']}
+    assert nombres == {'Efectivo', 'Mixto', 'Transferencia Bancaria', 'Sin pago (crédito)'}, nombres
+    vacio = cubo.consultar(['categoria'], filtros={'caja': [9999]})
+    assert vacio['filas'] == [] and vacio['totales']['total'] == 0
+    # 'ventas' por una dimensión de línea sin filas: sin grupos, no un error
+    for por in (['producto'], ['categoria', 'mes']):
+        vacio = cubo.consultar(por, medidas=['ventas'], filtros={'caja': [9999]})
+        assert vacio['filas'] == [] and vacio['totales']['ventas'] == 0, vacio
+    vacio = cubo.consultar(['producto'], medidas=['ventas', 'total'], desde=date(2030, 1, 1))
+    assert vacio['filas'] == [] and vacio['totales'] == {'ventas': 0, 'total': 0}, vacio
+    print(f"[OK] Totales generales, nombres y filtro sin filas ({len(cubo)} filas, {cubo.nbytes} bytes)")
+
+
+def test_refresco(usuario, cliente, f, robot, apertura):
+    antes = obtener_cubo().consultar([], medidas=['total', 'ventas'])['totales']
+    # Venta nueva
+    nueva = nueva_venta(apertura, usuario, cliente, 150000, [(f['efectivo'], 150000, 'confirmado')])
+    agregar_lineas(nueva, [(robot, 3, 150000)])
+    # Anulación de una venta ya cargada
+    anulada = Venta.query.filter_by(estado='completada').order_by(Venta.id).first()
+    anulada.estado = 'anulada'
+    db.session.commit()
+    # Facturación de una venta pendiente (id menor al último cargado)
+    pendiente = Venta.query.filter_by(estado='anulada').order_by(Venta.id.desc()).first()
+    assert pendiente.id != anulada.id
+    pendiente.estado = 'completada'
+    db.session.commit()
+
+    cubo = obtener_cubo()
+    despues = cubo.consultar([], medidas=['total', 'ventas'])['totales']
+    esperado_total = antes['total'] + 150000 - 120000 + 90000
+    assert despues == {'total': esperado_total, 'ventas': antes['ventas'] + 1}, despues
+    comparar(cubo.consultar(['categoria']),
+             esperado(lambda l, v: l.producto.categoria_id if l.producto else None),
+             'Refresco por partes (nueva, anulada, facturada)', 'categoria')
+    comparar(cubo.consultar(['caja'], medidas=['ventas']),
+             esperado(lambda l, v: v.apertura_caja.caja_id, 'ventas'), 'Ventas por caja tras el refresco', 'caja',
+             medida='ventas')
+    comparar(cubo.consultar(['producto'], medidas=['ventas']),
+             esperado(lambda l, v: l.producto_id, 'ventas'), 'Ventas por producto tras el refresco', 'producto',
+             medida='ventas')
+    assert (np.diff(cubo.columnas['venta']) >= 0).all(), 'el cubo refrescado debe seguir ordenado por venta'
+    completo = obtener_cubo(recargar=True)
+    assert len(completo) == len(cubo), (len(completo), len(cubo))
+    print("[OK] El refresco por partes coincide con la recarga completa")
+
+
+def test_endpoint(app):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    respuesta = client.get('/reportes/api/cubo-ventas?por=mes,forma_pago&medidas=total,ventas&desde=2026-01-01')
+    assert respuesta.status_code == 200, respuesta.status_code
+    datos = respuesta.get_json()
+    assert datos['filas'][0]['mes']['clave'].startswith('2026-') and 'total' in datos['filas'][0], datos['filas'][0]
+    filtrado = client.get('/reportes/api/cubo-ventas?por=tipo_cliente&tipo_cliente=empresa').get_json()
+    assert [f['tipo_cliente']['clave'] for f in filtrado['filas']] == ['empresa'], filtrado
+    vacio = client.get('/reportes/api/cubo-ventas?por=producto&medidas=ventas&desde=2030-01-01')
+    assert vacio.status_code == 200 and vacio.get_json()['filas'] == [], vacio.status_code
+    for invalido in ('por=cliente', 'medidas=margen', 'desde=01/01/2026', 'caja=uno', 'por=mes,mes'):
+        respuesta = client.get(f'/reportes/api/cubo-ventas?{invalido}')
+        assert respuesta.status_code == 400, f'{invalido}: {respuesta.status_code}'
+    indice = client.get('/reportes/')
+    assert indice.status_code == 200 and b'form-cubo-ventas' in indice.data, indice.status_code
+    print("[OK] Endpoint JSON, parámetros inválidos -> 400 y formulario en el índice de reportes")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, cliente, caja, formas = seed_base()
+        usuario.rol = 'admin'  # el índice de reportes no está disponible para el rol caja
+        robot, _, apertura = sembrar(usuario, cliente, caja, formas)
+        invalidar_cubo()
+        test_consultas(robot)
+        test_refresco(usuario, cliente, formas, robot, apertura)
+    test_endpoint(app)
+    print("Cubo verificado.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Prueba de app.utils.inventario.aplicar_movimientos_stock, el camino común de
+stock de ventas (crear, facturar, anular) y compras (pagar).
+Verifica el stock antes y después, las filas de MovimientoProducto
+(stock_anterior, stock_actual, costo), que los productos inexistentes se
+ignoran, que /ventas/crear y /ventas/<id>/facturar descuentan el stock y que
+/ventas/<id>/anular lo devuelve. Base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_inventario.py
+"""
+import json
+import os
+import sys
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import FormaPago, MovimientoProducto, Producto, Venta, VentaDetalle
+from app.utils.inventario import aplicar_movimientos_stock
+from manual_test_totales_caja import setup_app, seed_base
+
+
+def nuevo_producto(codigo, stock, precio_compra):
+    producto = Producto(codigo=codigo, nombre=f'Juguete {codigo}', tipo_producto='producto',
+                        precio_compra=precio_compra, precio_venta=precio_compra * 2, stock_actual=stock)
+    db.session.add(producto)
+    db.session.commit()
+    return producto.id
+
+
+def stock(producto_id):
+    return db.session.get(Producto, producto_id).stock_actual
+
+
+def movimientos(**filtros):
+    return [(m.producto_id, m.tipo_movimiento, m.cantidad, m.stock_anterior, m.stock_actual,
+             Decimal(str(m.costo_unitario)), m.motivo)
+            for m in MovimientoProducto.query.filter_by(**filtros).order_by(MovimientoProducto.id)]
+
+
+def test_lote(usuario_id):
+    a, b = nuevo_producto('A', 10, 4000), nuevo_producto('B', 5, 7000)
+
+    # Salida con costo por defecto y explícito, un producto repetido y ids inexistentes o vacíos
+    productos = aplicar_movimientos_stock([(a, 3), (b, '2', Decimal('6500')), (99999, 4), (None, 1), (a, 1.0)],
+                                          'salida', 'venta', referencia_tipo='venta', referencia_id=1,
+                                          usuario_id=usuario_id)
+    db.session.commit()
+    assert set(productos) == {a, b}, productos
+    assert (stock(a), stock(b)) == (6, 3), (stock(a), stock(b))
+    assert movimientos(referencia_id=1) == [
+        (a, 'salida', 3, 10, 7, Decimal('4000'), 'venta'),
+        (b, 'salida', 2, 5, 3, Decimal('6500'), 'venta'),
+        (a, 'salida', 1, 7, 6, Decimal('4000'), 'venta'),
+    ], movimientos(referencia_id=1)
+    print("[OK] Salida: stock, movimientos encadenados y costo (del producto o de la línea)")
+    print("[OK] Productos inexistentes o sin id se ignoran")
+
+    # Entrada (compra pagada) con costo de la compra
+    aplicar_movimientos_stock([(b, 10, Decimal('6800'))], 'entrada', 'compra', referencia_tipo='compra',
+                              referencia_id=2, usuario_id=usuario_id)
+    db.session.commit()
+    assert stock(b) == 13 and movimientos(referencia_id=2) == [(b, 'entrada', 10, 3, 13, Decimal('6800'), 'compra')]
+    print("[OK] Entrada: suma al stock con el costo de la línea")
+
+    antes = MovimientoProducto.query.count()
+    assert aplicar_movimientos_stock([], 'salida', 'venta') == {}
+    assert aplicar_movimientos_stock([(99999, 1)], 'salida', 'venta') == {}
+    assert MovimientoProducto.query.count() == antes
+    print("[OK] Lote vacío o sin productos existentes: sin movimientos")
+
+
+def test_rutas_ventas(app, caja_id):
+    with app.app_context():
+        producto_id = nuevo_producto('C', 20, 3000)
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    client.post('/caja/abrir', data={'caja_id': caja_id, 'monto_inicial': 0})
+    detalles = [{'tipo_item': 'producto', 'producto_id': producto_id, 'descripcion': 'Juguete C',
+                 'cantidad': 4, 'precio_unitario': 6000, 'subtotal': 24000, 'total': 24000},
+                {'tipo_item': 'servicio', 'descripcion': 'Envoltorio', 'cantidad': 1,
+                 'precio_unitario': 1000, 'subtotal': 1000, 'total': 1000}]
+    respuesta = client.post('/ventas/crear', data={
+        'tipo_venta': 'producto', 'cliente_id': 1, 'subtotal': 25000, 'iva': 0, 'total': 25000,
+        'detalles_json': json.dumps(detalles), 'pagos_json': json.dumps([{'forma_pago': 'efectivo', 'monto': 25000}]),
+    })
+    assert respuesta.status_code == 302 and '/ventas/crear' not in respuesta.location, respuesta.location
+    venta_id = int(respuesta.location.rstrip('/').rsplit('/', 1)[-1])
+    with app.app_context():
+        assert stock(producto_id) == 16
+        assert movimientos(producto_id=producto_id) == [(producto_id, 'salida', 4, 20, 16, Decimal('3000'), 'venta')]
+    print("[OK] /ventas/crear descuenta el stock de las líneas de producto")
+
+    assert client.post(f'/ventas/{venta_id}/anular').status_code == 302
+    with app.app_context():
+        assert stock(producto_id) == 20
+        assert movimientos(producto_id=producto_id, referencia_id=venta_id)[-1] == \
+            (producto_id, 'entrada', 4, 16, 20, Decimal('3000'), 'devolucion')
+    print("[OK] /ventas/<id>/anular devuelve el stock")
+
+    # Venta pendiente: el stock se descuenta al facturarla
+    with app.app_context():
+        pendiente = Venta(numero_factura='TMP-inventario', tipo_venta='producto', cliente_id=1, vendedor_id=1,
+                          total=12000, estado='pendiente', estado_pago='pendiente')
+        db.session.add(pendiente)
+        db.session.flush()
+        db.session.add(VentaDetalle(venta_id=pendiente.id, tipo_item='producto', producto_id=producto_id,
+                                    descripcion='Juguete C', cantidad=2, precio_unitario=6000,
+                                    subtotal=12000, total=12000))
+        db.session.commit()
+        pendiente_id, efectivo_id = pendiente.id, FormaPago.id_por_codigo('efectivo')
+    pagos = [{'forma_pago_id': efectivo_id, 'monto': 12000}]
+    assert client.post(f'/ventas/{pendiente_id}/facturar', data={'pagos_json': json.dumps(pagos)}).status_code == 302
+    with app.app_context():
+        assert stock(producto_id) == 18
+        assert movimientos(producto_id=producto_id, referencia_id=pendiente_id) == \
+            [(producto_id, 'salida', 2, 20, 18, Decimal('3000'), 'venta')]
+    print("[OK] /ventas/<id>/facturar descuenta el stock al quedar pagada")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, _, caja, _ = seed_base()
+        caja_id = caja.id
+        test_lote(usuario.id)
+    test_rutas_ventas(app, caja_id)
+    print("Movimientos de stock verificados.")
+
+
+if __name__ == '__main__':
+    main()
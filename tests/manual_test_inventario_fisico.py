@@ -0,0 +1,220 @@
+"""
+Prueba del inventario físico (app.utils.inventario_fisico).
+Verifica la lectura de CSV / XLSX / lecturas de escáner, la carga por
+/productos/inventario (reemplazar y sumar, códigos desconocidos), las
+diferencias contra un cálculo en Python, la aplicación (stock, movimientos,
+resumen, conteo cerrado), el reporte exportado y el conteo completo, sobre
+una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_inventario_fisico.py
+"""
+import csv
+import io
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook
+from app import db
+from app.models import Producto, MovimientoProducto, ConteoInventario, Usuario
+from app.utils.cache_reportes import version_datos
+from app.utils.dashboard import indicadores_dashboard
+from app.utils.inventario_fisico import (leer_archivo_conteo, leer_lecturas, consulta_diferencias,
+                                         resumen_diferencias)
+from manual_test_totales_caja import setup_app, seed_base
+
+
+def sembrar():
+    admin = Usuario(username='admin', email='admin@example.com', nombre='Admin', apellido='Test', rol='admin')
+    admin.set_password('password123')
+    db.session.add(admin)
+    for i in range(1, 31):
+        db.session.add(Producto(codigo=f'A{i:03d}', nombre=f'Producto {i}', tipo_producto='juguete',
+                                precio_compra=100 * i, precio_venta=200 * i, stock_actual=i, activo=i % 10 != 0))
+    db.session.commit()
+
+
+def stock():
+    return {p.codigo: p.stock_actual for p in Producto.query.populate_existing()}
+
+
+def test_lectura():
+    archivo = io.BytesIO('﻿Código;Descripción;Cantidad\nA001;Uno;5\nA002;Dos;\nA001;Uno otra vez;2\n'
+                         'A003;Tres;7,0\n'.encode('utf-8'))
+    assert leer_archivo_conteo(archivo, 'conteo.csv') == {'A001': 7, 'A003': 7}
+
+    assert leer_archivo_conteo(io.BytesIO(b'A001\nA001\nA002\n'), 'escaner.txt') == {'A001': 2, 'A002': 1}
+    assert leer_lecturas('A001\nA001\n\nA002; 4\nA003\t1') == {'A001': 2, 'A002': 4, 'A003': 1}
+
+    wb = Workbook()
+    hoja = wb.active
+    hoja.append(['cantidad', 'codigo'])
+    hoja.append([3, 'A004'])
+    hoja.append([1.0, 12345])
+    contenido = io.BytesIO()
+    wb.save(contenido)
+    contenido.seek(0)
+    assert leer_archivo_conteo(contenido, 'conteo.xlsx') == {'A004': 3, '12345': 1}
+
+    for texto in ('A001;-1', 'A001;1.5', 'A001;diez'):
+        try:
+            leer_lecturas(texto)
+            raise AssertionError(f'Se aceptó una cantidad inválida: {texto}')
+        except ValueError:
+            pass
+    try:
+        leer_archivo_conteo(io.BytesIO(b''), 'conteo.pdf')
+        raise AssertionError('Se aceptó un formato no soportado')
+    except ValueError:
+        pass
+    print("[OK] Lectura de CSV, XLSX y lecturas de escáner (encabezados, repetidos, cantidades inválidas)")
+
+
+def esperado(app, conteo_id, contados):
+    """Diferencias calculadas en Python: [(codigo, stock, contado, diferencia, valor)]"""
+    with app.app_context():
+        productos = {p.codigo: p for p in Producto.query}
+        filas = []
+        for codigo in sorted(contados):
+            p = productos[codigo]
+            diferencia = contados[codigo] - p.stock_actual
+            filas.append((codigo, p.stock_actual, contados[codigo], diferencia, diferencia * float(p.precio_compra)))
+        return filas
+
+
+def obtenido(app, conteo_id, solo_diferencias=False):
+    with app.app_context():
+        conteo = db.session.get(ConteoInventario, conteo_id)
+        return [(f.codigo, f.stock_sistema, f.cantidad_contada, f.diferencia, float(f.valor_diferencia))
+                for f in db.session.execute(consulta_diferencias(conteo, solo_diferencias))]
+
+
+def test_conteo_parcial(app, client):
+    respuesta = client.post('/productos/inventario/abrir', data={'descripcion': 'Sector A'})
+    assert respuesta.status_code == 302
+    with app.app_context():
+        conteo = ConteoInventario.query.order_by(ConteoInventario.id.desc()).first()
+        conteo_id, numero = conteo.id, conteo.numero
+    assert numero == 'INV-000001', numero
+
+    archivo = 'codigo,cantidad\nA001,1\nA002,5\nA003,3\nA004,0\nZZZ9,4\n'.encode()
+    respuesta = client.post(f'/productos/inventario/{conteo_id}/cargar', data={
+        'archivo': (io.BytesIO(archivo), 'conteo.csv'), 'modo': 'reemplazar'},
+        content_type='multipart/form-data', follow_redirects=True)
+    assert 'ZZZ9' in respuesta.get_data(as_text=True), 'avisa los códigos desconocidos'
+    # Segunda pasada del escáner: suma; A001 con reemplazar después
+    client.post(f'/productos/inventario/{conteo_id}/cargar', data={'lecturas': 'A002\nA002\nA005;6', 'modo': 'sumar'})
+    client.post(f'/productos/inventario/{conteo_id}/cargar', data={'lecturas': 'A001;2', 'modo': 'reemplazar'})
+    contados = {'A001': 2, 'A002': 7, 'A003': 3, 'A004': 0, 'A005': 6}
+    assert obtenido(app, conteo_id) == esperado(app, conteo_id, contados)
+    assert [f[0] for f in obtenido(app, conteo_id, solo_diferencias=True)] == ['A001', 'A002', 'A004', 'A005']
+    with app.app_context():
+        resumen = resumen_diferencias(db.session.get(ConteoInventario, conteo_id))
+    assert resumen['productos'] == 5 and resumen['productos_ajustados'] == 4, resumen
+    assert resumen['unidades_sobrantes'] == 1 + 5 + 1 and resumen['unidades_faltantes'] == 4, resumen
+    assert float(resumen['valor_diferencia']) == 100 + 5 * 200 - 4 * 400 + 500, resumen
+    assert client.get(f'/productos/inventario/{conteo_id}').status_code == 200
+    print("[OK] Carga por archivo y escáner (reemplazar / sumar) y diferencias iguales al cálculo en Python")
+
+    with app.app_context():
+        antes = stock()
+        sello = version_datos(['productos'])
+        stock_bajo = indicadores_dashboard()['valores']['stock_bajo_cantidad']  # queda en el cache del dashboard
+    respuesta = client.post(f'/productos/inventario/{conteo_id}/aplicar', follow_redirects=True)
+    assert 'Conteo aplicado: 4 productos ajustados' in respuesta.get_data(as_text=True)
+    with app.app_context():
+        despues = stock()
+        assert {c: despues[c] for c in contados} == contados
+        assert all(despues[c] == antes[c] for c in antes if c not in contados)
+        movimientos = MovimientoProducto.query.filter_by(referencia_tipo='conteo_inventario',
+                                                         referencia_id=conteo_id).all()
+        por_codigo = {m.producto.codigo: m for m in movimientos}
+        assert sorted(por_codigo) == ['A001', 'A002', 'A004', 'A005']
+        m = por_codigo['A004']
+        assert (m.tipo_movimiento, m.cantidad, m.stock_anterior, m.stock_actual, m.motivo) == \
+            ('salida', 4, 4, 0, 'ajuste'), m
+        m = por_codigo['A002']
+        assert (m.tipo_movimiento, m.cantidad, m.stock_anterior, m.stock_actual) == ('entrada', 5, 2, 7)
+        assert float(m.costo_unitario) == 200 and m.usuario.username == 'admin'
+        conteo = db.session.get(ConteoInventario, conteo_id)
+        assert conteo.estado == 'aplicado' and conteo.productos_ajustados == 4
+        assert (conteo.unidades_sobrantes, conteo.unidades_faltantes, float(conteo.valor_diferencia)) == (7, 4, 0)
+        # Después de aplicar el reporte muestra el stock de ese momento, no el actual
+        assert [f[0] for f in obtenido(app, conteo_id, solo_diferencias=True)] == ['A001', 'A002', 'A004', 'A005']
+        assert version_datos(['productos']) != sello, 'el UPDATE masivo mueve el sello del cache de reportes'
+        # A004 quedó en 0 (stock_minimo 0): el dashboard no sirve el valor anterior del cache
+        indicadores = indicadores_dashboard()
+        assert not indicadores['desde_cache'] and indicadores['valores']['stock_bajo_cantidad'] == stock_bajo + 1, \
+            (stock_bajo, indicadores['valores'])
+    print("[OK] Aplicación: stock ajustado, movimientos en bloque, resumen guardado y dashboard invalidado")
+
+    respuesta = client.post(f'/productos/inventario/{conteo_id}/aplicar', follow_redirects=True)
+    assert 'está aplicado' in respuesta.get_data(as_text=True)
+    respuesta = client.post(f'/productos/inventario/{conteo_id}/cargar', data={'lecturas': 'A001'},
+                            follow_redirects=True)
+    assert 'está aplicado' in respuesta.get_data(as_text=True)
+
+    exportado = client.get(f'/productos/inventario/{conteo_id}/diferencias.csv')
+    filas = list(csv.reader(io.StringIO(exportado.get_data().decode('utf-8-sig'))))
+    assert filas[0][0] == 'Código' and [f[0] for f in filas[1:]] == ['A001', 'A002', 'A004', 'A005'], filas
+    assert filas[3][2:5] == ['4', '0', '-4'], filas[3]
+    assert client.get(f'/productos/inventario/{conteo_id}/diferencias.xlsx').status_code == 200
+    print("[OK] Conteo cerrado después de aplicar y reporte de diferencias exportado")
+
+
+def test_conteo_completo(app, client):
+    client.post('/productos/inventario/abrir', data={'descripcion': 'Anual', 'completo': 'on'})
+    with app.app_context():
+        conteo_id = ConteoInventario.query.order_by(ConteoInventario.id.desc()).first().id
+        activos = Producto.query.filter_by(activo=True).count()
+        inactivos = {p.codigo: p.stock_actual for p in Producto.query.filter_by(activo=False)}
+    client.post(f'/productos/inventario/{conteo_id}/cargar', data={'lecturas': 'A011;11\nA012;20'})
+    with app.app_context():
+        resumen = resumen_diferencias(db.session.get(ConteoInventario, conteo_id))
+        faltantes = sum(p.stock_actual for p in Producto.query.filter_by(activo=True)
+                        if p.codigo not in ('A011', 'A012'))
+    assert resumen['no_contados'] == activos - 2, resumen
+    assert resumen['unidades_sobrantes'] == 8 and resumen['unidades_faltantes'] == faltantes, resumen
+
+    client.post(f'/productos/inventario/{conteo_id}/aplicar')
+    with app.app_context():
+        despues = stock()
+        conteo = db.session.get(ConteoInventario, conteo_id)
+        assert despues['A011'] == 11 and despues['A012'] == 20
+        assert all(v == 0 for c, v in despues.items() if c not in ('A011', 'A012') and c not in inactivos)
+        assert all(despues[c] == v for c, v in inactivos.items()), 'los inactivos no se tocan'
+        assert conteo.unidades_faltantes == resumen['unidades_faltantes']
+        assert conteo.productos_ajustados == resumen['productos_ajustados']
+        assert conteo.lineas.count() == activos
+    print(f"[OK] Conteo completo: {activos - 2} productos no contados quedaron en 0")
+
+    client.post('/productos/inventario/abrir', data={})
+    with app.app_context():
+        conteo_id = ConteoInventario.query.order_by(ConteoInventario.id.desc()).first().id
+    client.post(f'/productos/inventario/{conteo_id}/anular')
+    with app.app_context():
+        assert db.session.get(ConteoInventario, conteo_id).estado == 'anulado'
+    assert client.get('/productos/inventario').status_code == 200
+    print("[OK] Conteo anulado y listado de conteos")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        seed_base()
+        sembrar()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'password123'})
+    test_lectura()
+    test_conteo_parcial(app, client)
+    test_conteo_completo(app, client)
+    print("Inventario físico verificado.")
+
+
+if __name__ == '__main__':
+    main()
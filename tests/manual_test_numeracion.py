@@ -0,0 +1,166 @@
+"""
+Prueba de la numeración de documentos (app.utils.numeracion).
+Verifica que cada serie continúa desde los números ya guardados, que
+proximo_numero no reserva, el cambio de formato, y una prueba de estrés:
+varios hilos reservan números de varias series en paralelo sobre una base
+SQLite en archivo, con rollbacks a propósito, y otros crean productos a la
+vez por /productos/crear. Al final los números confirmados no se repiten ni
+tienen saltos.
+
+Ejecutar con: python tests/manual_test_numeracion.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from config import TestingConfig
+from app.models import Producto, Compra, Proveedor, Usuario, SecuenciaDocumento
+from app.utils.numeracion import siguiente_numero, proximo_numero, inicializar_series, SERIES
+from manual_test_totales_caja import seed_base
+
+HILOS = 8
+NUMEROS_POR_HILO = 30
+SERIES_PRUEBA = ['solicitud_servicio', 'reclamo', 'nota_credito']
+PRODUCTOS_POR_HILO = 5
+
+
+def setup_app(ruta_db):
+    class StressConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{ruta_db}'
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 60, 'check_same_thread': False}}
+
+    app = create_app(StressConfig)
+    app.config.update({"TESTING": True})
+    return app
+
+
+def test_inicio(app):
+    with app.app_context():
+        for codigo in ('001', '002', '007', 'AUTO', '12a'):
+            db.session.add(Producto(codigo=codigo, nombre=f'Producto {codigo}', tipo_producto='juguete'))
+        proveedor = Proveedor(codigo='PROV1', razon_social='Proveedor', ruc='80000001-1')
+        db.session.add(proveedor)
+        db.session.flush()
+        usuario = Usuario.query.filter_by(username='cajero').one()
+        for numero in ('C-000004', 'C-000011', 'C-X'):
+            db.session.add(Compra(numero_compra=numero, proveedor_id=proveedor.id, usuario_registra_id=usuario.id,
+                                  total=0))
+        db.session.commit()
+
+        assert proximo_numero('producto') == '008' and proximo_numero('producto') == '008'
+        assert SecuenciaDocumento.query.count() == 0, 'proximo_numero no crea ni reserva'
+        with db.engine.connect() as conn:
+            creadas = dict(inicializar_series(conn))
+            conn.commit()
+            assert inicializar_series(conn) == [], 'inicializar_series es idempotente'
+        assert set(creadas) == set(SERIES) and creadas['producto'] == 8 and creadas['compra'] == 12, creadas
+        assert siguiente_numero('compra') == 'C-000012'
+        db.session.rollback()
+        assert siguiente_numero('compra') == 'C-000012', 'un rollback devuelve el número'
+        db.session.commit()
+        assert proximo_numero('compra') == 'C-000013'
+        print("[OK] Las series continúan desde los números guardados y proximo_numero no reserva")
+
+        # Formato configurable en la fila
+        db.session.execute(db.update(SecuenciaDocumento).where(SecuenciaDocumento.serie == 'compra')
+                           .values(prefijo='COMP-', relleno=8))
+        assert siguiente_numero('compra') == 'COMP-00000013'
+        db.session.rollback()
+        print("[OK] Prefijo y relleno se toman de la fila de la serie")
+
+        # Una serie sin fila se crea al reservar el primer número
+        db.session.execute(db.delete(SecuenciaDocumento).where(SecuenciaDocumento.serie == 'reclamo'))
+        db.session.commit()
+        assert siguiente_numero('reclamo') == 'REC-000001'
+        db.session.rollback()
+        db.session.remove()
+
+
+def trabajador(app, indice, confirmados, errores, lock):
+    azar = random.Random(indice)
+    with app.app_context():
+        for _ in range(NUMEROS_POR_HILO):
+            serie = SERIES_PRUEBA[azar.randrange(len(SERIES_PRUEBA))]
+            try:
+                numero = siguiente_numero(serie)
+                if azar.random() < 0.2:
+                    # Documento que falla después de reservar el número
+                    db.session.rollback()
+                    continue
+                db.session.commit()
+                with lock:
+                    confirmados.append((serie, numero))
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errores.append(repr(e))
+        db.session.remove()
+
+
+def creador_productos(app, indice, errores, lock):
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    for i in range(PRODUCTOS_POR_HILO):
+        respuesta = client.post('/productos/crear', data={
+            'nombre': f'Concurrente {indice}-{i}', 'tipo_producto': 'juguete', 'unidad_medida': 'unidad',
+            'precio_compra': '1', 'precio_venta': '2', 'tipo_iva': '10'})
+        if respuesta.status_code != 302:
+            with lock:
+                errores.append(f'/productos/crear respondió {respuesta.status_code}')
+
+
+def test_concurrencia(app):
+    with app.app_context():
+        inicio = {s: int(proximo_numero(s)[len(SERIES[s][1]):]) for s in SERIES_PRUEBA}
+        productos_antes = {p.codigo for p in Producto.query}
+        db.session.remove()
+
+    confirmados, errores, lock = [], [], threading.Lock()
+    hilos = [threading.Thread(target=trabajador, args=(app, i, confirmados, errores, lock)) for i in range(HILOS)]
+    hilos += [threading.Thread(target=creador_productos, args=(app, i, errores, lock)) for i in range(HILOS // 2)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert not errores, f"Errores durante la reserva: {errores[:3]}"
+    assert len(confirmados) == len(set(confirmados)), "Hay números duplicados"
+
+    for serie in SERIES_PRUEBA:
+        prefijo = SERIES[serie][1]
+        numeros = sorted(int(n[len(prefijo):]) for s, n in confirmados if s == serie)
+        assert numeros == list(range(inicio[serie], inicio[serie] + len(numeros))), f"Saltos en la serie {serie}"
+        print(f"[OK] Serie {serie}: {len(numeros)} números sin duplicados ni saltos")
+
+    with app.app_context():
+        nuevos = sorted(p.codigo for p in Producto.query if p.codigo not in productos_antes)
+        esperados = [f'{n:03d}' for n in range(8, 8 + HILOS // 2 * PRODUCTOS_POR_HILO)]
+        assert nuevos == esperados, nuevos
+        db.session.remove()
+    print(f"[OK] /productos/crear en {HILOS // 2} hilos: {len(nuevos)} productos con códigos "
+          f"{nuevos[0]}..{nuevos[-1]} sin repetir")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = setup_app(os.path.join(carpeta, 'numeracion.db'))
+        with app.app_context():
+            db.create_all()
+            seed_base()
+            db.session.remove()
+        test_inicio(app)
+        test_concurrencia(app)
+        with app.app_context():
+            db.engine.dispose()
+        print("Numeración de documentos verificada.")
+
+
+if __name__ == '__main__':
+    main()
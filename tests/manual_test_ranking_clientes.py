@@ -0,0 +1,116 @@
+"""
+Prueba de app.utils.ranking_clientes.
+Compara el ranking (solo clientes activos, incluidos los que no compraron)
+contra el mismo cálculo en Python, recorre todas las páginas por cursor, y
+verifica la variante del PDF de ventas por cliente (todo cliente con
+compras, activo o no) y la página /reportes/clientes, sobre una base SQLite
+en memoria.
+
+Ejecutar con: python tests/manual_test_ranking_clientes.py
+"""
+import os
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Cliente, Venta
+from app.utils.ranking_clientes import leer_cursor, ranking_clientes
+from manual_test_totales_caja import setup_app, seed_base, nueva_apertura, nueva_venta
+
+# (nombre, activo, [(fecha, total, estado)])
+CLIENTES = [
+    ('Ana', True, [(datetime(2026, 1, 5), 30000, 'completada'), (datetime(2026, 2, 1), 20000, 'completada')]),
+    ('Beto', True, [(datetime(2026, 1, 10), 50000, 'completada')]),
+    ('Carla', False, [(datetime(2026, 1, 12), 90000, 'completada')]),  # inactiva
+    ('Dario', True, []),                                                 # sin compras
+    ('Elena', True, [(datetime(2026, 1, 20), 70000, 'anulada')]),       # solo una anulada
+    ('Fabio', True, [(datetime(2026, 3, 1), 10000, 'completada')]),
+]
+
+
+def sembrar(usuario, caja, formas):
+    apertura = nueva_apertura(usuario, caja)
+    for i, (nombre, activo, ventas) in enumerate(CLIENTES):
+        cliente = Cliente(tipo_documento='CI', numero_documento=f'800{i}', nombre=nombre,
+                          tipo_cliente='particular', activo=activo)
+        db.session.add(cliente)
+        db.session.commit()
+        for fecha, total, estado in ventas:
+            venta = nueva_venta(apertura, usuario, cliente, total, [(formas['efectivo'], total, 'confirmado')],
+                                estado=estado)
+            venta.fecha_venta = fecha
+        db.session.commit()
+
+
+def esperado(desde=None, hasta=None, solo_activos=True, incluir_sin_compras=True):
+    """[(nombre, cantidad, total)] calculado en Python, en el orden del ranking"""
+    filas = []
+    for cliente in Cliente.query.order_by(Cliente.id):
+        if solo_activos and not cliente.activo:
+            continue
+        ventas = [v for v in Venta.query.filter_by(cliente_id=cliente.id, estado='completada')
+                  if (not desde or v.fecha_venta.date() >= desde) and (not hasta or v.fecha_venta.date() <= hasta)]
+        if not ventas and not incluir_sin_compras:
+            continue
+        filas.append((cliente.id, cliente.nombre, len(ventas), sum((Decimal(str(v.total)) for v in ventas),
+                                                                    Decimal('0'))))
+    filas.sort(key=lambda f: (-f[3], f[0]))
+    return [f[1:] for f in filas]
+
+
+def obtenido(filas):
+    return [(f['nombre'], f['cantidad'], f['total']) for f in filas]
+
+
+def test_ranking():
+    # Los clientes de seed_base y de sembrar, en una sola comparación
+    filas, siguiente = ranking_clientes()
+    assert siguiente is None and obtenido(filas) == esperado(), (obtenido(filas), esperado())
+    nombres = [f['nombre'] for f in filas]
+    assert 'Carla' not in nombres and 'Dario' in nombres and 'Elena' in nombres, nombres
+    dario = next(f for f in filas if f['nombre'] == 'Dario')
+    assert dario['ultima_compra'] is None and dario['ticket_promedio'] == 0
+    print(f"[OK] Solo clientes activos, incluidos los que no compraron ({len(filas)} filas)")
+
+    desde, hasta = date(2026, 1, 1), date(2026, 1, 31)
+    assert obtenido(ranking_clientes(desde=desde, hasta=hasta)[0]) == esperado(desde, hasta)
+    print("[OK] Rango de fechas: las compras fuera del rango no cuentan")
+
+    paginas, cursor = [], None
+    while True:
+        filas, cursor = ranking_clientes(cursor=leer_cursor(cursor), limite=2)
+        paginas.extend(filas)
+        if cursor is None:
+            break
+    assert obtenido(paginas) == esperado(), obtenido(paginas)
+    print("[OK] Páginas por cursor: el recorrido completo da el ranking sin repetidos ni faltantes")
+
+    filas, _ = ranking_clientes(solo_activos=False, incluir_sin_compras=False)
+    assert obtenido(filas) == esperado(solo_activos=False, incluir_sin_compras=False)
+    assert 'Carla' in [f['nombre'] for f in filas] and 'Dario' not in [f['nombre'] for f in filas]
+    print("[OK] Variante del PDF: clientes con compras, activos o no")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, _, caja, formas = seed_base()
+        sembrar(usuario, caja, formas)
+        test_ranking()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    html = client.get('/reportes/clientes').get_data(as_text=True)
+    assert 'Dario' in html and 'Carla' not in html
+    print("[OK] /reportes/clientes")
+    print("Ranking de clientes verificado.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Prueba de estrés de la numeración de facturas (SecuenciaFactura).
+Varios hilos reservan números en paralelo sobre una base SQLite en archivo,
+algunas transacciones se deshacen a propósito, y al final se verifica que
+los números confirmados no se repiten y no tienen saltos, por punto de
+expedición, y que se respeta el límite del timbrado.
+
+Ejecutar con: python tests/manual_test_secuencia_factura.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from config import TestingConfig
+from app.models import ConfiguracionEmpresa, SecuenciaFactura
+
+HILOS = 8
+FACTURAS_POR_HILO = 40
+EXPEDICIONES = ['001', '002']
+
+
+def setup_app(ruta_db):
+    class StressConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{ruta_db}'
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 60, 'check_same_thread': False}}
+
+    app = create_app(StressConfig)
+    app.config.update({"TESTING": True})
+    return app
+
+
+def trabajador(app, indice, confirmados, errores, lock):
+    azar = random.Random(indice)
+    with app.app_context():
+        for _ in range(FACTURAS_POR_HILO):
+            expedicion = EXPEDICIONES[azar.randrange(len(EXPEDICIONES))]
+            try:
+                numero = ConfiguracionEmpresa.get_config().generar_numero_factura(expedicion)
+                if azar.random() < 0.2:
+                    # Venta que falla después de reservar el número
+                    db.session.rollback()
+                    continue
+                db.session.commit()
+                with lock:
+                    confirmados.append(numero)
+            except Exception as e:
+                db.session.rollback()
+                with lock:
+                    errores.append(repr(e))
+        db.session.remove()
+
+
+def test_concurrencia(app):
+    confirmados, errores, lock = [], [], threading.Lock()
+    hilos = [threading.Thread(target=trabajador, args=(app, i, confirmados, errores, lock)) for i in range(HILOS)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert not errores, f"Errores durante la reserva: {errores[:3]}"
+    assert len(confirmados) == len(set(confirmados)), "Hay números de factura duplicados"
+
+    with app.app_context():
+        for expedicion in EXPEDICIONES:
+            numeros = sorted(int(n.split('-')[2]) for n in confirmados if n.split('-')[1] == expedicion)
+            assert numeros == list(range(1, len(numeros) + 1)), f"Saltos en la secuencia {expedicion}"
+            secuencia = SecuenciaFactura.query.filter_by(numero_expedicion=expedicion).one()
+            assert secuencia.proximo == len(numeros) + 1, f"Próximo número incorrecto en {expedicion}"
+            print(f"[OK] Expedición {expedicion}: {len(numeros)} facturas sin duplicados ni saltos")
+
+
+def test_limite_timbrado(app):
+    with app.app_context():
+        config = ConfiguracionEmpresa.get_config()
+        secuencia = SecuenciaFactura.query.filter_by(numero_expedicion='001').one()
+        limite = secuencia.proximo + 1
+        SecuenciaFactura.actualizar_rango('001', limite)
+        db.session.commit()
+        config.generar_numero_factura('001')
+        ultimo = config.generar_numero_factura('001')
+        db.session.commit()
+        assert ultimo.endswith(str(limite).zfill(7))
+        try:
+            config.generar_numero_factura('001')
+            raise AssertionError("Se reservó un número fuera del timbrado")
+        except ValueError:
+            db.session.rollback()
+        print(f"[OK] Límite del timbrado respetado ({limite})")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as carpeta:
+        app = setup_app(os.path.join(carpeta, 'secuencias.db'))
+        with app.app_context():
+            db.create_all()
+            ConfiguracionEmpresa.get_config()
+            db.session.remove()
+        test_concurrencia(app)
+        test_limite_timbrado(app)
+        with app.app_context():
+            db.engine.dispose()
+        print("Numeración verificada.")
+
+
+if __name__ == '__main__':
+    main()
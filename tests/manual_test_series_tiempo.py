@@ -0,0 +1,178 @@
+"""
+Prueba de app.utils.series_tiempo.
+Compara las series agrupadas en la base (día, semana, mes, trimestre y por
+caja, vendedor, forma de pago y categoría) contra el mismo cálculo hecho en
+Python sobre las ventas, incluidos los períodos sin ventas, y el total del
+reporte /reportes/ventas (tomado del resumen diario) en todas sus páginas,
+sobre una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_series_tiempo.py
+"""
+import os
+import sys
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.routes import reportes
+from app.models import Venta, VentaDetalle, Producto, Categoria, Caja
+from app.utils.series_tiempo import serie_ventas, periodos, inicio_periodo_fecha, parametros_serie
+from manual_test_totales_caja import setup_app, seed_base, nueva_apertura, nueva_venta
+from reconstruir_ventas_diarias import reconstruir_ventas_diarias
+
+DESDE, HASTA = date(2025, 12, 20), date(2026, 4, 10)
+
+# (fecha, total, forma de pago) — hay semanas y un mes entero (febrero) sin ventas
+VENTAS = [
+    (datetime(2025, 12, 21, 23, 30), 10000, 'efectivo'),   # domingo: semana del lunes 15/12
+    (datetime(2025, 12, 22, 8, 0), 20000, 'tarjeta_credito'),  # lunes
+    (datetime(2025, 12, 31, 18, 0), 30000, 'efectivo'),
+    (datetime(2026, 1, 1, 9, 0), 40000, 'transferencia'),
+    (datetime(2026, 1, 15, 12, 0), 50000, 'cheque'),
+    (datetime(2026, 3, 31, 20, 0), 60000, 'efectivo'),
+    (datetime(2026, 4, 1, 10, 0), 70000, 'efectivo'),
+    (datetime(2026, 4, 11, 10, 0), 99000, 'efectivo'),    # fuera del rango
+]
+
+
+def sembrar(usuario, cliente, caja, formas):
+    segunda = Caja(numero_caja='CAJA-2', nombre='Caja 2')
+    categoria = Categoria(codigo='JUG', nombre='Juguetes')
+    db.session.add_all([segunda, categoria])
+    db.session.flush()
+    producto = Producto(codigo='P1', nombre='Robot', categoria_id=categoria.id, tipo_producto='juguete',
+                        precio_venta=1000, stock_actual=100)
+    db.session.add(producto)
+    db.session.commit()
+    aperturas = [nueva_apertura(usuario, caja), nueva_apertura(usuario, segunda)]
+    for i, (fecha, total, forma) in enumerate(VENTAS):
+        venta = nueva_venta(aperturas[i % 2], usuario, cliente, total, [(formas[forma], total, 'confirmado')])
+        venta.fecha_venta = fecha
+        # La mitad en productos de la categoría, el resto en una línea sin producto
+        db.session.add(VentaDetalle(venta_id=venta.id, tipo_item='producto', producto_id=producto.id,
+                                    descripcion='Robot', cantidad=1, precio_unitario=total // 2,
+                                    subtotal=total // 2, total=total // 2))
+        db.session.add(VentaDetalle(venta_id=venta.id, tipo_item='servicio', descripcion='Armado',
+                                    cantidad=1, precio_unitario=total - total // 2,
+                                    subtotal=total - total // 2, total=total - total // 2))
+    db.session.commit()
+    reconstruir_ventas_diarias()
+
+
+def esperado(granularidad, clave=lambda venta, fecha: None):
+    """Totales por (serie, período) calculados en Python sobre las ventas"""
+    totales = defaultdict(lambda: defaultdict(Decimal))
+    for venta in Venta.query.filter_by(estado='completada'):
+        fecha = venta.fecha_venta.date()
+        if DESDE <= fecha <= HASTA:
+            totales[clave(venta, fecha)][inicio_periodo_fecha(fecha, granularidad)] += Decimal(str(venta.total))
+    return totales
+
+
+def comparar(serie, totales, descripcion):
+    inicios = periodos(DESDE, HASTA, serie['granularidad'])
+    assert serie['periodos'] == inicios, f"{descripcion}: períodos {serie['periodos']}"
+    obtenidas = {s['clave']: s for s in serie['series']}
+    assert set(obtenidas) == set(totales), f"{descripcion}: series {set(obtenidas)} != {set(totales)}"
+    for clave, por_periodo in totales.items():
+        valores = [por_periodo.get(inicio, Decimal(0)) for inicio in inicios]
+        assert obtenidas[clave]['valores'] == valores, \
+            f"{descripcion}: {clave} esperado={valores} obtenido={obtenidas[clave]['valores']}"
+    ordenadas = [s['total'] for s in serie['series']]
+    assert ordenadas == sorted(ordenadas, reverse=True), f"{descripcion}: series sin ordenar"
+    assert serie['total'] == sum(serie['totales']) == Decimal(280000), f"{descripcion}: total {serie['total']}"
+    print(f"[OK] {descripcion}: {len(inicios)} períodos, {len(obtenidas)} series")
+
+
+def test_granularidades():
+    for granularidad in ('dia', 'semana', 'mes', 'trimestre'):
+        serie = serie_ventas(DESDE, HASTA, granularidad)
+        comparar(serie, esperado(granularidad), f'Total por {granularidad}')
+    semana = serie_ventas(DESDE, HASTA, 'semana')
+    assert semana['periodos'][0] == date(2025, 12, 15) and semana['totales'][0] == Decimal(10000)
+    assert semana['totales'][1] == Decimal(20000)  # lunes 22/12 al domingo 28/12; el 31/12 cae en la siguiente
+    mes = serie_ventas(DESDE, HASTA, 'mes')
+    assert mes['totales'][2] == 0 and mes['etiquetas'][2] == 'Febrero 2026', 'febrero debe aparecer en cero'
+
+
+def test_dimensiones():
+    comparar(serie_ventas(DESDE, HASTA, 'mes', 'caja'),
+             esperado('mes', lambda v, f: v.apertura_caja.caja_id), 'Mes por caja')
+    comparar(serie_ventas(DESDE, HASTA, 'mes', 'vendedor'),
+             esperado('mes', lambda v, f: v.vendedor_id), 'Mes por vendedor')
+    forma = serie_ventas(DESDE, HASTA, 'trimestre', 'forma_pago')
+    por_clave = {s['clave']: s['total'] for s in forma['series']}
+    assert por_clave == {'efectivo': 170000, 'tarjeta': 20000, 'transferencia': 40000, 'cheque': 50000,
+                         'otros': 0}, por_clave
+    print(f"[OK] Trimestre por forma de pago: {dict((k, int(v)) for k, v in por_clave.items())}")
+
+    categoria = serie_ventas(DESDE, HASTA, 'mes', 'categoria')
+    por_nombre = {s['nombre']: s['total'] for s in categoria['series']}
+    assert por_nombre == {'Juguetes': 140000, 'Sin categoría': 140000}, por_nombre
+    print(f"[OK] Mes por categoría: {dict((k, int(v)) for k, v in por_nombre.items())}")
+
+    resto = serie_ventas(DESDE, HASTA, 'mes', 'forma_pago', max_series=3)
+    assert [s['nombre'] for s in resto['series']] == ['Efectivo', 'Cheque', 'Resto']
+    assert resto['series'][-1]['total'] == 60000 and resto['total'] == 280000
+    print("[OK] max_series suma las series que sobran en 'Resto'")
+
+
+def test_parametros():
+    assert parametros_serie({'desde': '2026-01-01', 'granularidad': 'mes'})['desde'] == date(2026, 1, 1)
+    for invalidos in ({'desde': '01/01/2026'}, {'granularidad': 'anio'}, {'dimension': 'cliente'}):
+        try:
+            parametros_serie(invalidos)
+        except ValueError:
+            continue
+        raise AssertionError(f'Se esperaba ValueError con {invalidos}')
+    for argumentos in ((HASTA, DESDE, 'dia'), (date(2000, 1, 1), HASTA, 'dia')):
+        try:
+            serie_ventas(*argumentos)
+        except ValueError:
+            continue
+        raise AssertionError(f'Se esperaba ValueError con {argumentos}')
+    print("[OK] Parámetros inválidos -> ValueError")
+
+
+def test_reporte_ventas(app):
+    # 21/12 al 31/03: seis ventas; la del 31/03 a las 20:00 entra (días completos)
+    with app.app_context():
+        facturas = [v.numero_factura for v in Venta.query.filter(
+            Venta.fecha_venta >= datetime(2025, 12, 21), Venta.fecha_venta < datetime(2026, 4, 1)
+        ).order_by(Venta.fecha_venta.desc())]
+    assert len(facturas) == 6
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    por_pagina, reportes.VENTAS_POR_PAGINA = reportes.VENTAS_POR_PAGINA, 4
+    try:
+        paginas = [client.get(f'/reportes/ventas?fecha_desde=2025-12-21&fecha_hasta=2026-03-31&page={n}')
+                   .get_data(as_text=True) for n in (1, 2)]
+    finally:
+        reportes.VENTAS_POR_PAGINA = por_pagina
+    for html, listadas in zip(paginas, (facturas[:4], facturas[4:])):
+        assert 'Total del período (6 ventas):' in html and 'Gs. 210,000.00' in html, html
+        assert [f for f in facturas if f in html] == listadas
+    print("[OK] Reporte de ventas: total del período desde el resumen diario y facturas por página")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, cliente, caja, formas = seed_base()
+        sembrar(usuario, cliente, caja, formas)
+        test_granularidades()
+        test_dimensiones()
+        test_parametros()
+    test_reporte_ventas(app)
+    print("Series verificadas.")
+
+
+if __name__ == '__main__':
+    main()
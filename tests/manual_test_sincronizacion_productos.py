@@ -0,0 +1,134 @@
+"""
+Prueba de /productos/api/productos (app.utils.sincronizacion_productos).
+Verifica la lista completa de siempre, ETag y 304, gzip, la paginación por
+cursor, la sincronización con since (modificados, nuevos y bajas) y los
+parámetros inválidos, sobre una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_sincronizacion_productos.py
+"""
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Producto
+from manual_test_totales_caja import setup_app, seed_base
+
+URL = '/productos/api/productos'
+
+
+def sembrar(cantidad):
+    for i in range(1, cantidad + 1):
+        db.session.add(Producto(codigo=f'P{i:03d}', nombre=f'Producto {i}', tipo_producto='juguete',
+                                precio_venta=1000 * i, precio_compra=500 * i, stock_actual=i, activo=i % 10 != 0))
+    db.session.commit()
+    # Catálogo "viejo": un producto modificado por minuto, terminando hace una hora
+    inicio = datetime.utcnow() - timedelta(hours=1, minutes=cantidad)
+    for i in range(1, cantidad + 1):
+        db.session.execute(db.update(Producto).where(Producto.codigo == f'P{i:03d}').values(
+            fecha_modificacion=inicio + timedelta(minutes=i)))
+    db.session.commit()
+
+
+def activos(app):
+    with app.app_context():
+        return {p.id for p in Producto.query.filter_by(activo=True)}
+
+
+def sincronizar(client, **args):
+    """Todas las páginas de una sincronización: (productos por id, eliminados, version)"""
+    productos, eliminados, paginas = {}, set(), 0
+    respuesta = client.get(URL, query_string=args).get_json()
+    while True:
+        paginas += 1
+        for p in respuesta['productos']:
+            assert p['id'] not in productos, 'un producto repetido entre páginas'
+            productos[p['id']] = p
+        eliminados.update(respuesta['eliminados'])
+        if not respuesta['siguiente']:
+            return productos, eliminados, respuesta['version'], paginas
+        respuesta = client.get(URL, query_string={'cursor': respuesta['siguiente'],
+                                                  'limite': args.get('limite', '')}).get_json()
+
+
+def test_completo(app, client):
+    respuesta = client.get(URL)
+    assert respuesta.status_code == 200 and respuesta.headers.get('Content-Encoding') is None
+    datos = respuesta.get_json()
+    assert isinstance(datos, list) and {p['id'] for p in datos} == activos(app)
+    assert set(datos[0]) == {'id', 'codigo', 'nombre', 'precio_compra', 'precio_venta', 'stock_actual',
+                             'unidad_medida'}, datos[0]
+    etag = respuesta.headers['ETag']
+    assert etag.startswith('W/')
+    repetida = client.get(URL, headers={'If-None-Match': etag})
+    assert repetida.status_code == 304 and repetida.data == b'' and repetida.headers['ETag'] == etag
+    print("[OK] Lista completa de siempre, ETag y 304")
+
+    comprimida = client.get(URL, headers={'Accept-Encoding': 'gzip, deflate'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in comprimida.headers['Vary']
+    assert json.loads(gzip.decompress(comprimida.data)) == datos
+    print(f"[OK] gzip: {len(respuesta.data)} -> {len(comprimida.data)} bytes")
+    return etag
+
+
+def test_sincronizacion(app, client, etag_completo):
+    productos, eliminados, version, paginas = sincronizar(client, limite='7')
+    assert set(productos) == activos(app) and not eliminados and paginas == 7, (len(productos), paginas)
+    print(f"[OK] Sincronización completa en {paginas} páginas de 7, version {version}")
+
+    # Sin cambios: se repite solo lo modificado dentro del margen (el último, P050, que está inactivo)
+    repetida = client.get(URL, query_string={'since': version})
+    datos = repetida.get_json()
+    assert datos['productos'] == [] and datos['eliminados'] == [50], datos
+    assert client.get(URL, query_string={'since': version},
+                      headers={'If-None-Match': repetida.headers['ETag']}).status_code == 304
+    print("[OK] Sin cambios: el delta repite solo el margen y con el mismo ETag responde 304")
+
+    with app.app_context():
+        caro = Producto.query.filter_by(codigo='P003').one()
+        caro.precio_venta = 99999
+        baja = Producto.query.filter_by(codigo='P004').one()
+        baja.activo = False
+        db.session.add(Producto(codigo='P999', nombre='Nuevo', tipo_producto='juguete', precio_venta=1))
+        db.session.commit()
+        ids = {'caro': caro.id, 'baja': baja.id, 'nuevo': Producto.query.filter_by(codigo='P999').one().id}
+
+    assert client.get(URL, headers={'If-None-Match': etag_completo}).status_code == 200
+    productos, eliminados, nueva_version, _ = sincronizar(client, since=version, limite='2')
+    assert set(productos) == {ids['caro'], ids['nuevo']} and eliminados == {ids['baja'], 50}, (productos, eliminados)
+    assert productos[ids['caro']]['precio_venta'] == 99999.0
+    assert nueva_version > version
+    print(f"[OK] Delta desde {version}: precio cambiado, producto nuevo y baja; nueva version {nueva_version}")
+
+
+def test_invalidos(client):
+    for args in ({'limite': '0'}, {'limite': 'diez'}, {'limite': '999999'}, {'since': 'ayer'},
+                 {'cursor': 'no-es-un-cursor'}):
+        respuesta = client.get(URL, query_string=args)
+        assert respuesta.status_code == 400 and 'error' in respuesta.get_json(), args
+    print("[OK] Parámetros inválidos -> 400")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        seed_base()
+        sembrar(50)
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+    etag = test_completo(app, client)
+    test_sincronizacion(app, client, etag)
+    test_invalidos(client)
+    print("Sincronización verificada.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""
+Prueba de paridad de calcular_totales_por_forma_pago.
+Compara la consulta agrupada contra el cálculo anterior en Python
+(ventas -> pagos -> forma_pago) sobre una base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_totales_caja.py
+"""
+import os
+import sys
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from app import create_app, db
+from config import TestingConfig
+from app.models import (Usuario, Cliente, Caja, AperturaCaja, Venta, Pago, FormaPago,
+                        NotaDebito, PagoNotaDebito)
+from app.models.venta import CATEGORIAS_PAGO
+from app.routes.caja import calcular_totales_por_forma_pago
+
+
+def calcular_totales_legacy(apertura_id):
+    """Implementación anterior, recorriendo cada venta y cada pago en Python."""
+    ventas = Venta.query.filter_by(apertura_caja_id=apertura_id, estado='completada').all()
+    totales = {'efectivo': Decimal('0'), 'tarjeta': Decimal('0'),
+               'transferencia': Decimal('0'), 'cheque': Decimal('0')}
+    for venta in ventas:
+        total_venta = Decimal(venta.total)
+        pagado = Decimal('0')
+        for pago in venta.pagos.order_by(Pago.id):
+            if pago.estado == 'confirmado':
+                forma_nombre = pago.forma_pago.nombre.lower() if pago.forma_pago else 'otros'
+                monto_pago = Decimal(pago.monto)
+                if 'efectivo' in forma_nombre:
+                    neto_efectivo = min(monto_pago, total_venta - pagado)
+                    totales['efectivo'] += neto_efectivo
+                    pagado += neto_efectivo
+                elif 'tarjeta' in forma_nombre or 'débito' in forma_nombre or 'crédito' in forma_nombre:
+                    totales['tarjeta'] += monto_pago
+                    pagado += monto_pago
+                elif 'transferencia' in forma_nombre:
+                    totales['transferencia'] += monto_pago
+                    pagado += monto_pago
+                elif 'cheque' in forma_nombre:
+                    totales['cheque'] += monto_pago
+                    pagado += monto_pago
+    pagos_nd = PagoNotaDebito.query.filter_by(apertura_caja_id=apertura_id, estado='confirmado').all()
+    for pago in pagos_nd:
+        forma_nombre = pago.forma_pago.nombre.lower() if pago.forma_pago else None
+        monto_pago = Decimal(pago.monto)
+        if forma_nombre is None or 'efectivo' in forma_nombre:
+            totales['efectivo'] += monto_pago
+        elif 'tarjeta' in forma_nombre or 'débito' in forma_nombre or 'crédito' in forma_nombre:
+            totales['tarjeta'] += monto_pago
+        elif 'transferencia' in forma_nombre:
+            totales['transferencia'] += monto_pago
+        elif 'cheque' in forma_nombre:
+            totales['cheque'] += monto_pago
+    totales['total'] = totales['efectivo'] + totales['tarjeta'] + totales['transferencia'] + totales['cheque']
+    return totales
+
+
+def setup_app():
+    app = create_app(TestingConfig)
+    app.config.update({"TESTING": True, "WTF_CSRF_ENABLED": False})
+    return app
+
+
+def seed_base():
+    usuario = Usuario(username='cajero', email='cajero@example.com', nombre='Caja', apellido='Test', rol='caja')
+    usuario.set_password('password123')
+    cliente = Cliente(tipo_documento='CI', numero_documento='1234567', nombre='Cliente Test', tipo_cliente='particular')
+    caja = Caja(numero_caja='001', nombre='Principal')
+    db.session.add_all([usuario, cliente, caja])
+    formas = {}
+    for codigo, nombre in [('efectivo', 'Efectivo'), ('tarjeta_debito', 'Tarjeta de Débito'),
+                           ('tarjeta_credito', 'Tarjeta de Crédito'), ('transferencia', 'Transferencia Bancaria'),
+                           ('cheque', 'Cheque'), ('qr', 'Billetera QR')]:
+        formas[codigo] = FormaPago(codigo=codigo, nombre=nombre)
+        db.session.add(formas[codigo])
+    db.session.commit()
+    return usuario, cliente, caja, formas
+
+
+def nueva_apertura(usuario, caja):
+    apertura = AperturaCaja(caja_id=caja.id, cajero_id=usuario.id, monto_inicial=100000, estado='abierto')
+    db.session.add(apertura)
+    db.session.commit()
+    return apertura
+
+
+def nueva_venta(apertura, usuario, cliente, total, pagos, estado='completada', numero=[0]):
+    numero[0] += 1
+    venta = Venta(numero_factura=f'001-001-{numero[0]:07d}', tipo_venta='producto', cliente_id=cliente.id,
+                  apertura_caja_id=apertura.id, vendedor_id=usuario.id, total=total, estado=estado)
+    db.session.add(venta)
+    db.session.flush()
+    for forma, monto, estado_pago in pagos:
+        db.session.add(Pago(venta_id=venta.id, forma_pago_id=forma.id, monto=monto, estado=estado_pago))
+    db.session.commit()
+    return venta
+
+
+def comparar(apertura_id, descripcion):
+    esperado = calcular_totales_legacy(apertura_id)
+    obtenido = calcular_totales_por_forma_pago(apertura_id)
+    for clave in esperado:
+        assert Decimal(esperado[clave]) == Decimal(obtenido[clave]), \
+            f"{descripcion}: {clave} esperado={esperado[clave]} obtenido={obtenido[clave]}"
+    print(f"[OK] {descripcion}: {dict((k, int(v)) for k, v in obtenido.items())}")
+
+
+def test_apertura_vacia(usuario, caja):
+    apertura = nueva_apertura(usuario, caja)
+    comparar(apertura.id, 'Apertura sin movimientos')
+
+
+def test_medios_mixtos(usuario, cliente, caja, f):
+    apertura = nueva_apertura(usuario, caja)
+    # Efectivo exacto
+    nueva_venta(apertura, usuario, cliente, 50000, [(f['efectivo'], 50000, 'confirmado')])
+    # Efectivo con vuelto
+    nueva_venta(apertura, usuario, cliente, 35000, [(f['efectivo'], 50000, 'confirmado')])
+    # Tarjeta y luego efectivo con vuelto
+    nueva_venta(apertura, usuario, cliente, 80000, [(f['tarjeta_credito'], 30000, 'confirmado'),
+                                                   (f['efectivo'], 60000, 'confirmado')])
+    # Efectivo y luego tarjeta: el efectivo no se descuenta por el pago posterior
+    nueva_venta(apertura, usuario, cliente, 80000, [(f['efectivo'], 60000, 'confirmado'),
+                                                   (f['tarjeta_credito'], 30000, 'confirmado')])
+    # Efectivo con vuelto, tarjeta y otro efectivo (exceso negativo)
+    nueva_venta(apertura, usuario, cliente, 70000, [(f['efectivo'], 50000, 'confirmado'),
+                                                   (f['transferencia'], 40000, 'confirmado'),
+                                                   (f['efectivo'], 10000, 'confirmado')])
+    # Forma no clasificada entre pagos: no cuenta para lo pagado
+    nueva_venta(apertura, usuario, cliente, 30000, [(f['qr'], 20000, 'confirmado'),
+                                                   (f['efectivo'], 40000, 'confirmado')])
+    # Dos pagos en efectivo que superan el total
+    nueva_venta(apertura, usuario, cliente, 100000, [(f['efectivo'], 60000, 'confirmado'),
+                                                    (f['efectivo'], 60000, 'confirmado')])
+    # Débito, transferencia y cheque
+    nueva_venta(apertura, usuario, cliente, 90000, [(f['tarjeta_debito'], 30000, 'confirmado'),
+                                                   (f['transferencia'], 30000, 'confirmado'),
+                                                   (f['cheque'], 30000, 'confirmado')])
+    # Forma de pago no clasificada (no suma)
+    nueva_venta(apertura, usuario, cliente, 20000, [(f['qr'], 20000, 'confirmado')])
+    # Pagos no confirmados y venta anulada (no suman)
+    nueva_venta(apertura, usuario, cliente, 40000, [(f['efectivo'], 40000, 'pendiente')])
+    nueva_venta(apertura, usuario, cliente, 40000, [(f['efectivo'], 40000, 'confirmado')], estado='anulada')
+    comparar(apertura.id, 'Ventas con medios mixtos, vuelto y exclusiones')
+    # Lo que cada venta suma a los acumulados de la apertura (/caja/estado) da lo mismo que el arqueo
+    esperado = calcular_totales_por_forma_pago(apertura.id)
+    acumulado = {cat: Decimal('0') for cat in CATEGORIAS_PAGO}
+    for venta in Venta.query.filter_by(apertura_caja_id=apertura.id):
+        for cat, monto in venta.montos_por_categoria().items():
+            acumulado[cat] += monto
+    assert all(acumulado[cat] == esperado[cat] for cat in CATEGORIAS_PAGO), (acumulado, esperado)
+    print("[OK] Venta.montos_por_categoria coincide con el arqueo")
+
+
+def test_notas_debito(usuario, cliente, caja, f):
+    apertura = nueva_apertura(usuario, caja)
+    venta = nueva_venta(apertura, usuario, cliente, 10000, [(f['efectivo'], 10000, 'confirmado')])
+    nota = NotaDebito(numero_nota='ND-0000001', venta_id=venta.id, tipo='cargo', motivo='Cargo', monto=30000)
+    db.session.add(nota)
+    db.session.flush()
+    for forma, monto, estado in [(f['efectivo'], 10000, 'confirmado'), (f['tarjeta_debito'], 5000, 'confirmado'),
+                                 (f['transferencia'], 7000, 'confirmado'), (f['cheque'], 8000, 'confirmado'),
+                                 (f['efectivo'], 9000, 'rechazado')]:
+        db.session.add(PagoNotaDebito(nota_debito_id=nota.id, apertura_caja_id=apertura.id,
+                                      forma_pago_id=forma.id, monto=monto, estado=estado))
+    db.session.commit()
+    comparar(apertura.id, 'Pagos de Notas de Débito')
+
+
+def test_aislamiento_aperturas(usuario, cliente, caja, f):
+    a1 = nueva_apertura(usuario, caja)
+    a2 = nueva_apertura(usuario, caja)
+    nueva_venta(a1, usuario, cliente, 15000, [(f['efectivo'], 20000, 'confirmado')])
+    nueva_venta(a2, usuario, cliente, 25000, [(f['tarjeta_credito'], 25000, 'confirmado')])
+    comparar(a1.id, 'Apertura 1 no incluye ventas de otra apertura')
+    comparar(a2.id, 'Apertura 2 no incluye ventas de otra apertura')
+
+
+def test_categoria_sin_cargar(usuario, cliente, caja):
+    """Formas de pago insertadas fuera del ORM, con categoria NULL: se clasifican por el nombre"""
+    db.session.execute(db.text(
+        "INSERT INTO formas_pago (codigo, nombre, activo) VALUES "
+        "('visa', 'Visa Crédito', :activo), ('deposito', 'Depósito por Transferencia', :activo)"
+    ), {'activo': True})
+    db.session.commit()
+    FormaPago.invalidar_cache()
+    visa = FormaPago.query.filter_by(codigo='visa').one()
+    deposito = FormaPago.query.filter_by(codigo='deposito').one()
+    assert visa.categoria is None and deposito.categoria is None
+    apertura = nueva_apertura(usuario, caja)
+    venta = nueva_venta(apertura, usuario, cliente, 60000, [(visa, 25000, 'confirmado'),
+                                                           (deposito, 15000, 'confirmado')])
+    nota = NotaDebito(numero_nota='ND-0000002', venta_id=venta.id, tipo='cargo', motivo='Cargo', monto=5000)
+    db.session.add(nota)
+    db.session.flush()
+    db.session.add(PagoNotaDebito(nota_debito_id=nota.id, apertura_caja_id=apertura.id,
+                                  forma_pago_id=visa.id, monto=5000, estado='confirmado'))
+    db.session.commit()
+    comparar(apertura.id, 'Formas de pago sin categoria cargada')
+    esperado = calcular_totales_por_forma_pago(apertura.id)
+    montos = venta.montos_por_categoria()
+    assert montos['tarjeta'] == 25000 and montos['transferencia'] == 15000, montos
+    assert esperado['tarjeta'] == 30000 and esperado['transferencia'] == 15000, esperado
+    print("[OK] El cache (Python) y la consulta (SQL) clasifican igual una categoria NULL")
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, cliente, caja, formas = seed_base()
+        test_apertura_vacia(usuario, caja)
+        test_medios_mixtos(usuario, cliente, caja, formas)
+        test_notas_debito(usuario, cliente, caja, formas)
+        test_aislamiento_aperturas(usuario, cliente, caja, formas)
+        test_categoria_sin_cargar(usuario, cliente, caja)
+        print("Paridad verificada.")
+
+
+if __name__ == '__main__':
+    main()
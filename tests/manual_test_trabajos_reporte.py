@@ -0,0 +1,134 @@
+"""
+Prueba de los reportes en segundo plano (app.utils.trabajos_reporte).
+Por /reportes/trabajos: encolar, consultar el estado, descargar el archivo,
+reporte desconocido, límite de trabajos activos por usuario y recuperación
+de trabajos colgados (activos con más de REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS,
+p. ej. después de reiniciar el pool). Se corre generando en el mismo request
+(REPORTES_TRABAJOS_PROCESOS=0) y con un proceso en el pool (=1), sobre una
+base SQLite en un archivo temporal (el proceso del pool abre su propia conexión).
+
+Ejecutar con: python tests/manual_test_trabajos_reporte.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from app.models import TrabajoReporte
+from app.utils.trabajos_reporte import cerrar_pool
+from config import TestingConfig
+from manual_test_totales_caja import seed_base, nueva_apertura, nueva_venta
+
+ESPERA_MAXIMA = 120  # segundos (el primer proceso del pool importa la app)
+
+
+def crear_app(carpeta, procesos):
+    configuracion = type('ConfigTrabajos', (TestingConfig,), {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(carpeta, 'trabajos.db'),
+        'WTF_CSRF_ENABLED': False,
+        'REPORTES_TRABAJOS_DIR': os.path.join(carpeta, 'reportes'),
+        'REPORTES_TRABAJOS_PROCESOS': procesos,
+        'REPORTES_TRABAJOS_POR_USUARIO': 2,
+        'REPORTES_CACHE_MAX_MB': 0,
+    })
+    app = create_app(configuracion)
+    with app.app_context():
+        db.create_all()
+        usuario, cliente, caja, formas = seed_base()
+        apertura = nueva_apertura(usuario, caja)
+        for total in (10000, 25000, 40000):
+            nueva_venta(apertura, usuario, cliente, total, [(formas['efectivo'], total, 'confirmado')])
+    return app
+
+
+def esperar(client, trabajo_id):
+    limite = time.monotonic() + ESPERA_MAXIMA
+    while True:
+        estado = client.get(f'/reportes/trabajos/{trabajo_id}').get_json()
+        if estado['estado'] not in ('pendiente', 'en_proceso') or time.monotonic() > limite:
+            return estado
+        time.sleep(0.2)
+
+
+def trabajo_activo(usuario_id, estado='pendiente', antiguedad=timedelta(0)):
+    fecha = datetime.utcnow() - antiguedad
+    trabajo = TrabajoReporte(id=uuid4().hex, tipo='ventas_pdf', estado=estado, usuario_id=usuario_id,
+                             fecha_creacion=fecha, fecha_inicio=fecha if estado == 'en_proceso' else None,
+                             fecha_expiracion=datetime.utcnow() + timedelta(hours=1))
+    db.session.add(trabajo)
+    db.session.commit()
+    return trabajo.id
+
+
+def test_ciclo(app, client, procesos):
+    respuesta = client.post('/reportes/trabajos', json={'tipo': 'ventas_pdf', 'desde': '2000-01-01'})
+    assert respuesta.status_code == 202, respuesta.get_data(as_text=True)
+    datos = respuesta.get_json()
+    estado = esperar(client, datos['id'])
+    assert estado['estado'] == 'terminado' and estado['tamano'] > 0, estado
+    descarga = client.get(datos['url_descarga'])
+    assert descarga.status_code == 200 and descarga.data.startswith(b'%PDF'), descarga.status_code
+    listado = client.get('/reportes/trabajos', headers={'Accept': 'application/json'}).get_json()
+    assert any(t['id'] == datos['id'] for t in listado), listado
+    assert client.post('/reportes/trabajos', json={'tipo': 'no_existe'}).status_code == 400
+    print(f"[OK] Procesos={procesos}: encolar, estado, descarga y reporte desconocido")
+
+
+def test_limite_y_colgados(app, client, procesos):
+    minutos = app.config['REPORTES_TRABAJOS_TIEMPO_MAXIMO_MINUTOS']
+    with app.app_context():
+        usuario_id = TrabajoReporte.query.first().usuario_id
+        activos = [trabajo_activo(usuario_id), trabajo_activo(usuario_id, 'en_proceso')]
+    respuesta = client.post('/reportes/trabajos', json={'tipo': 'ventas_pdf'})
+    assert respuesta.status_code == 429, respuesta.status_code
+    print(f"[OK] Procesos={procesos}: límite de {len(activos)} trabajos activos por usuario")
+
+    # El pool se reinició: las filas quedaron activas y nadie las va a terminar
+    viejo = timedelta(minutes=minutos + 1)
+    with app.app_context():
+        db.session.execute(db.update(TrabajoReporte).where(TrabajoReporte.id.in_(activos)).values(
+            fecha_creacion=datetime.utcnow() - viejo, fecha_inicio=datetime.utcnow() - viejo))
+        db.session.commit()
+    respuesta = client.post('/reportes/trabajos', json={'tipo': 'ventas_pdf'})
+    assert respuesta.status_code == 202, respuesta.status_code
+    assert esperar(client, respuesta.get_json()['id'])['estado'] == 'terminado'
+    with app.app_context():
+        estados = {t.estado for t in TrabajoReporte.query.filter(TrabajoReporte.id.in_(activos))}
+    assert estados == {'error'}, estados
+
+    # Consultar un trabajo colgado (otro worker, sin el futuro en memoria) también lo pasa a error
+    with app.app_context():
+        colgado = trabajo_activo(usuario_id, 'en_proceso', antiguedad=viejo)
+        reciente = trabajo_activo(usuario_id, 'en_proceso')
+    estado = client.get(f'/reportes/trabajos/{colgado}').get_json()
+    assert estado['estado'] == 'error' and str(minutos) in estado['error'], estado
+    assert client.get(f'/reportes/trabajos/{reciente}').get_json()['estado'] == 'en_proceso'
+    print(f"[OK] Procesos={procesos}: trabajos colgados pasan a error y dejan de contar para el límite")
+
+
+def main():
+    for procesos in (0, 1):
+        with tempfile.TemporaryDirectory() as carpeta:
+            app = crear_app(carpeta, procesos)
+            client = app.test_client()
+            client.post('/auth/login', data={'username': 'cajero', 'password': 'password123'})
+            try:
+                test_ciclo(app, client, procesos)
+                test_limite_y_colgados(app, client, procesos)
+            finally:
+                cerrar_pool()
+                with app.app_context():
+                    db.engine.dispose()
+    print("Trabajos de reporte verificados.")
+
+
+if __name__ == '__main__':
+    main()
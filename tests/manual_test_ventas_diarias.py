@@ -0,0 +1,113 @@
+"""
+Prueba del resumen ventas_diarias (app.models.venta_diaria).
+Arma el resumen por el camino incremental (resumen_venta / aplicar_cambio_venta,
+como las rutas de ventas) con pagos mixtos, vuelto, pagos posteriores,
+anulaciones y ventas sin caja, y verifica que consulta_agregada (la que usa
+reconstruir_ventas_diarias) devuelve exactamente las mismas filas, y que
+reconstruir no cambia el resumen. Base SQLite en memoria.
+
+Ejecutar con: python tests/manual_test_ventas_diarias.py
+"""
+import os
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from app.models import Venta, Pago, VentaDiaria
+from app.models.venta_diaria import MONTOS_VENTA_DIARIA
+from manual_test_totales_caja import setup_app, seed_base, nueva_apertura
+from reconstruir_ventas_diarias import reconstruir_ventas_diarias
+
+DIA_1 = datetime(2026, 3, 2, 10, 0)
+DIA_2 = datetime(2026, 3, 3, 18, 30)
+
+
+def registrar(apertura, usuario, cliente, total, pagos, fecha=DIA_1):
+    """Venta con sus pagos, sumada al resumen como al crearla desde la ruta"""
+    venta = Venta(numero_factura=f'001-002-{Venta.query.count() + 1:07d}', tipo_venta='producto',
+                  cliente_id=cliente.id, apertura_caja_id=apertura.id if apertura else None,
+                  vendedor_id=usuario.id, total=total, estado='completada', fecha_venta=fecha)
+    db.session.add(venta)
+    db.session.flush()
+    for forma, monto in pagos:
+        db.session.add(Pago(venta_id=venta.id, forma_pago_id=forma.id, monto=monto, estado='confirmado'))
+    db.session.flush()
+    VentaDiaria.aplicar_cambio_venta(None, VentaDiaria.resumen_venta(venta))
+    db.session.commit()
+    return venta
+
+
+def cambiar(venta, cambio):
+    antes = VentaDiaria.resumen_venta(venta)
+    cambio()
+    db.session.flush()
+    VentaDiaria.aplicar_cambio_venta(antes, VentaDiaria.resumen_venta(venta))
+    db.session.commit()
+
+
+def filas(consulta):
+    resultado = []
+    for f in consulta:
+        fecha = f.fecha if isinstance(f.fecha, date) else date.fromisoformat(str(f.fecha)[:10])
+        resultado.append((fecha, f.caja_id, f.vendedor_id, f.tipo_venta, f.cantidad,
+                          *[Decimal(str(getattr(f, col) or 0)) for col in MONTOS_VENTA_DIARIA]))
+    return sorted(resultado)
+
+
+def sembrar(usuario, cliente, caja, f):
+    apertura = nueva_apertura(usuario, caja)
+    # Efectivo y luego tarjeta: el efectivo no se descuenta por el pago posterior
+    registrar(apertura, usuario, cliente, 80000, [(f['efectivo'], 60000), (f['tarjeta_credito'], 30000)])
+    # Tarjeta y luego efectivo con vuelto
+    registrar(apertura, usuario, cliente, 80000, [(f['tarjeta_credito'], 30000), (f['efectivo'], 60000)])
+    # Efectivo con vuelto, transferencia y otro efectivo
+    registrar(apertura, usuario, cliente, 70000, [(f['efectivo'], 50000), (f['transferencia'], 40000),
+                                                  (f['efectivo'], 10000)])
+    # Forma no clasificada y cheque
+    registrar(apertura, usuario, cliente, 50000, [(f['qr'], 20000), (f['cheque'], 30000)], fecha=DIA_2)
+    # Venta sin caja: solo total y otros
+    registrar(None, usuario, cliente, 25000, [(f['efectivo'], 25000)], fecha=DIA_2)
+    # Venta a crédito con un pago posterior en efectivo con vuelto
+    credito = registrar(apertura, usuario, cliente, 40000, [(f['tarjeta_debito'], 10000)], fecha=DIA_2)
+    cambiar(credito, lambda: db.session.add(Pago(venta_id=credito.id, forma_pago_id=f['efectivo'].id,
+                                                  monto=50000, estado='confirmado')))
+    # Venta anulada: sale del resumen
+    anulada = registrar(apertura, usuario, cliente, 15000, [(f['efectivo'], 15000)])
+    cambiar(anulada, lambda: setattr(anulada, 'estado', 'anulada'))
+
+
+def main():
+    app = setup_app()
+    with app.app_context():
+        db.create_all()
+        usuario, cliente, caja, formas = seed_base()
+        sembrar(usuario, cliente, caja, formas)
+
+        incremental = filas(VentaDiaria.query)
+        agregada = filas(VentaDiaria.consulta_agregada())
+        assert incremental == agregada, f"incremental={incremental}\nagregada={agregada}"
+        dia_1 = [fila for fila in incremental if fila[0] == DIA_1.date()]
+        assert len(dia_1) == 1 and dia_1[0][4] == 3, dia_1
+        # Efectivo: 60000 (la tarjeta posterior no lo descuenta) + 60000 - 10000 de vuelto
+        # + 50000 y el segundo pago (10000), que llega con 20000 de más: 50000 - 20000
+        assert dia_1[0][6] == 60000 + 50000 + 30000 and dia_1[0][10] == -10000, dia_1
+        print(f"[OK] consulta_agregada coincide con el resumen incremental ({len(incremental)} filas)")
+
+        assert filas(VentaDiaria.consulta_agregada(desde=DIA_2.date(), hasta=DIA_2.date())) == \
+            [fila for fila in incremental if fila[0] == DIA_2.date()]
+        print("[OK] consulta_agregada por rango de fechas")
+
+        reconstruir_ventas_diarias()
+        assert filas(VentaDiaria.query) == incremental
+        print("[OK] reconstruir_ventas_diarias no cambia el resumen")
+    print("Resumen diario verificado.")
+
+
+if __name__ == '__main__':
+    main()